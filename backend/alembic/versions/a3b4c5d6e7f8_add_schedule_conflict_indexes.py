@@ -0,0 +1,36 @@
+"""add_schedule_conflict_indexes
+
+Revision ID: a3b4c5d6e7f8
+Revises: f2a3b4c5d6e7
+Create Date: 2025-12-29 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3b4c5d6e7f8'
+down_revision = 'f2a3b4c5d6e7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # A student's active courses and a teacher's courses, checked for overlaps
+    op.create_index('ix_enrollments_student_id_status', 'enrollments', ['student_id', 'status'], unique=False)
+    op.create_index('ix_teacher_course_teacher_id', 'teacher_course', ['teacher_id'], unique=False)
+
+    # Overlap queries; the expression must match schedule_conflicts.SCHEDULE_RANGE_SQL.
+    # Other databases use an in-process interval tree instead.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_courses_schedule ON courses "
+            "USING gist ((tsrange(start_time, greatest(start_time, end_time))))"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_courses_schedule', table_name='courses')
+    op.drop_index('ix_teacher_course_teacher_id', table_name='teacher_course')
+    op.drop_index('ix_enrollments_student_id_status', table_name='enrollments')
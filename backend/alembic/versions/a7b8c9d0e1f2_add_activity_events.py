@@ -0,0 +1,129 @@
+"""add_activity_events
+
+Revision ID: a7b8c9d0e1f2
+Revises: f6a7b8c9d0e1
+Create Date: 2025-11-26 09:00:00.000000
+
+"""
+import json
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a7b8c9d0e1f2'
+down_revision = 'f6a7b8c9d0e1'
+branch_labels = None
+depends_on = None
+
+
+def _utc(value):
+    if isinstance(value, str):  # SQLite returns raw text for untyped SELECTs
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def _backfill(bind, events) -> None:
+    """Seed the log from existing rows so the feed is not empty after the upgrade"""
+    rows = []
+    for table, id_column in (('students', 'student_id'), ('teachers', 'teacher_id'),
+                             ('admins', 'admin_id'), ('parents', 'parent_id')):
+        user_type = table[:-1]
+        result = bind.execute(sa.text(
+            f"SELECT {id_column}, name, email, is_active, created_at FROM {table} WHERE created_at IS NOT NULL"
+        ))
+        for user_id, name, email, is_active, created_at in result:
+            rows.append({
+                'occurred_at': _utc(created_at), 'event_type': 'user_registered',
+                'entity_type': user_type, 'entity_id': user_id,
+                'user_type': user_type, 'user_id': user_id, 'user_name': name,
+                'description': f"New {user_type} registered: {name}"[:255],
+                'details': json.dumps({'email': email, 'is_active': bool(is_active) if is_active is not None else True}),
+            })
+
+    result = bind.execute(sa.text("SELECT course_id, title, created_at FROM courses WHERE created_at IS NOT NULL"))
+    for course_id, title, created_at in result:
+        rows.append({
+            'occurred_at': _utc(created_at), 'event_type': 'course_created',
+            'entity_type': 'course', 'entity_id': course_id,
+            'description': f"New course '{title}' created"[:255],
+        })
+
+    result = bind.execute(sa.text(
+        "SELECT e.enrollment_id, e.student_id, s.name, e.course_id, c.title, e.status, "
+        "e.enrollment_date, e.paid, e.paid_date "
+        "FROM enrollments e JOIN students s ON s.student_id = e.student_id "
+        "JOIN courses c ON c.course_id = e.course_id"
+    ))
+    for enrollment_id, student_id, name, course_id, title, status, enrolled_at, paid, paid_date in result:
+        base = {'entity_type': 'enrollment', 'entity_id': enrollment_id,
+                'user_type': 'student', 'user_id': student_id, 'user_name': name}
+        if enrolled_at is not None:
+            rows.append({**base, 'occurred_at': _utc(enrolled_at), 'event_type': 'enrollment_created',
+                         'description': f"New student enrolled in {title}"[:255],
+                         'details': json.dumps({'course_id': course_id, 'status': status})})
+        if paid and paid_date is not None:
+            rows.append({**base, 'occurred_at': _utc(paid_date), 'event_type': 'payment_received',
+                         'description': f"Payment received for {title}"[:255],
+                         'details': json.dumps({'course_id': course_id})})
+
+    # Insert oldest first so event ids follow time
+    rows.sort(key=lambda row: row['occurred_at'])
+    columns = ('user_type', 'user_id', 'user_name', 'details')
+    for start in range(0, len(rows), 1000):
+        op.bulk_insert(events, [{**{c: None for c in columns}, **row} for row in rows[start:start + 1000]])
+
+
+def upgrade() -> None:
+    # Append-only log behind the admin activity feed and audit trail
+    events = op.create_table(
+        'activity_events',
+        sa.Column('event_id', sa.BigInteger().with_variant(sa.Integer(), 'sqlite'), autoincrement=True, nullable=False),
+        sa.Column('occurred_at', sa.DateTime(), nullable=False),
+        sa.Column('event_type', sa.String(length=50), nullable=False),
+        sa.Column('entity_type', sa.String(length=30), nullable=False),
+        sa.Column('entity_id', sa.Integer(), nullable=False),
+        sa.Column('user_type', sa.String(length=20), nullable=True),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('user_name', sa.String(length=100), nullable=True),
+        sa.Column('actor_type', sa.String(length=20), nullable=True),
+        sa.Column('actor_id', sa.Integer(), nullable=True),
+        sa.Column('description', sa.String(length=255), nullable=False),
+        sa.Column('details', sa.Text(), nullable=True),
+        sa.PrimaryKeyConstraint('event_id')
+    )
+    op.create_index('ix_activity_events_occurred_at_event_id', 'activity_events', ['occurred_at', 'event_id'], unique=False)
+    op.create_index('ix_activity_events_type_occurred_at', 'activity_events', ['event_type', 'occurred_at', 'event_id'], unique=False)
+    op.create_index('ix_activity_events_entity', 'activity_events', ['entity_type', 'entity_id', 'event_id'], unique=False)
+    op.create_index('ix_activity_events_user', 'activity_events', ['user_type', 'user_id', 'event_id'], unique=False)
+
+    _backfill(op.get_bind(), events)
+
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("""
+            CREATE FUNCTION activity_events_append_only() RETURNS trigger AS $$
+            BEGIN
+                RAISE EXCEPTION 'activity_events is append-only';
+            END;
+            $$ LANGUAGE plpgsql
+        """)
+        op.execute("""
+            CREATE TRIGGER activity_events_append_only
+            BEFORE UPDATE OR DELETE ON activity_events
+            FOR EACH ROW EXECUTE FUNCTION activity_events_append_only()
+        """)
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP TRIGGER IF EXISTS activity_events_append_only ON activity_events")
+        op.execute("DROP FUNCTION IF EXISTS activity_events_append_only()")
+    op.drop_index('ix_activity_events_user', table_name='activity_events')
+    op.drop_index('ix_activity_events_entity', table_name='activity_events')
+    op.drop_index('ix_activity_events_type_occurred_at', table_name='activity_events')
+    op.drop_index('ix_activity_events_occurred_at_event_id', table_name='activity_events')
+    op.drop_table('activity_events')
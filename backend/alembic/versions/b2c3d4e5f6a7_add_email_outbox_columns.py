@@ -0,0 +1,29 @@
+"""add_email_outbox_columns
+
+Revision ID: b2c3d4e5f6a7
+Revises: a1b2c3d4e5f6
+Create Date: 2025-10-28 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b2c3d4e5f6a7'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Store the rendered body so queued emails can be delivered by outbox workers
+    op.add_column('email_logs', sa.Column('html_content', sa.Text(), nullable=True))
+
+    # Outbox workers claim pending rows that are due for delivery
+    op.create_index('ix_email_logs_outbox', 'email_logs', ['status', 'next_retry_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_email_logs_outbox', table_name='email_logs')
+    op.drop_column('email_logs', 'html_content')
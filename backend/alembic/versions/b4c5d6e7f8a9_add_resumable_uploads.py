@@ -0,0 +1,44 @@
+"""add_resumable_uploads
+
+Revision ID: b4c5d6e7f8a9
+Revises: a3b4c5d6e7f8
+Create Date: 2026-01-05 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4c5d6e7f8a9'
+down_revision = 'a3b4c5d6e7f8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Offsets of tus uploads in progress, so they can be resumed from any API worker
+    op.create_table(
+        'resumable_uploads',
+        sa.Column('upload_id', sa.String(length=32), nullable=False),
+        sa.Column('purpose', sa.String(length=20), nullable=False),
+        sa.Column('target_id', sa.Integer(), nullable=False),
+        sa.Column('owner', sa.String(length=50), nullable=False),
+        sa.Column('filename', sa.String(length=255), nullable=False),
+        sa.Column('upload_length', sa.BigInteger(), nullable=False),
+        sa.Column('upload_offset', sa.BigInteger(), nullable=False),
+        sa.Column('upload_metadata', sa.Text(), nullable=True),
+        sa.Column('status', sa.String(length=20), nullable=False),
+        sa.Column('result_id', sa.Integer(), nullable=True),
+        sa.Column('result_url', sa.String(length=500), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('upload_id')
+    )
+    op.create_index('ix_resumable_uploads_expires_at', 'resumable_uploads', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_resumable_uploads_expires_at', table_name='resumable_uploads')
+    op.drop_table('resumable_uploads')
@@ -0,0 +1,97 @@
+"""add_user_directory
+
+Revision ID: b8c9d0e1f2a3
+Revises: a7b8c9d0e1f2
+Create Date: 2025-12-03 09:00:00.000000
+
+"""
+import re
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8c9d0e1f2a3'
+down_revision = 'a7b8c9d0e1f2'
+branch_labels = None
+depends_on = None
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+
+
+def _digits(phone):
+    return re.sub(r"\D", "", phone or "")
+
+
+def _search_text(name, email, phone):
+    # Same normalization as app.services.user_search.build_search_text at this revision
+    email = (email or "").lower()
+    parts = _TOKEN_SPLIT.split((name or "").lower()) + [email] + _TOKEN_SPLIT.split(email)
+    parts.append(_digits(phone))
+    return " ".join(dict.fromkeys(part for part in parts if part))
+
+
+def _utc(value):
+    if isinstance(value, str):  # SQLite returns raw text for untyped SELECTs
+        value = datetime.fromisoformat(value)
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def upgrade() -> None:
+    # One searchable row per student, teacher, admin and parent
+    directory = op.create_table(
+        'user_directory',
+        sa.Column('user_type', sa.String(length=20), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('email', sa.String(length=255), nullable=False),
+        sa.Column('phone', sa.String(length=20), nullable=True),
+        sa.Column('phone_digits', sa.String(length=20), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=False, server_default=sa.true()),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.Column('search_text', sa.Text(), nullable=False),
+        sa.Column('indexed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('user_type', 'user_id')
+    )
+    op.create_index('ix_user_directory_created_at', 'user_directory', ['created_at', 'user_type', 'user_id'], unique=False)
+    op.create_index('ix_user_directory_indexed_at', 'user_directory', ['indexed_at'], unique=False)
+
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX ix_user_directory_search_text_trgm ON user_directory "
+            "USING gin (search_text gin_trgm_ops)"
+        )
+
+    now = datetime.utcnow()
+    for table, id_column in (('students', 'student_id'), ('teachers', 'teacher_id'),
+                             ('admins', 'admin_id'), ('parents', 'parent_id')):
+        user_type = table[:-1]
+        result = bind.execute(sa.text(
+            f"SELECT {id_column}, name, email, phone, is_active, created_at FROM {table}"
+        ))
+        rows = [
+            {
+                'user_type': user_type, 'user_id': user_id, 'name': name, 'email': email,
+                'phone': phone, 'phone_digits': _digits(phone) or None,
+                'is_active': True if is_active is None else bool(is_active),
+                'created_at': _utc(created_at) or now,
+                'search_text': _search_text(name, email, phone), 'indexed_at': now,
+            }
+            for user_id, name, email, phone, is_active, created_at in result
+        ]
+        for start in range(0, len(rows), 1000):
+            op.bulk_insert(directory, rows[start:start + 1000])
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_user_directory_search_text_trgm', table_name='user_directory')
+    op.drop_index('ix_user_directory_indexed_at', table_name='user_directory')
+    op.drop_index('ix_user_directory_created_at', table_name='user_directory')
+    op.drop_table('user_directory')
@@ -0,0 +1,34 @@
+"""add_monthly_report_metrics
+
+Revision ID: c3d4e5f6a7b8
+Revises: b2c3d4e5f6a7
+Create Date: 2025-11-03 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3d4e5f6a7b8'
+down_revision = 'b2c3d4e5f6a7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Reports are rendered from the stored row, so every rendered metric needs a column
+    op.add_column('monthly_reports', sa.Column('assignments_posted', sa.Integer(), nullable=True))
+    op.add_column('monthly_reports', sa.Column('new_enrollments', sa.Integer(), nullable=True))
+
+    # The builder skips recipients that already have a report for the month
+    op.create_index(
+        'ix_monthly_reports_period_recipient', 'monthly_reports',
+        ['year', 'month', 'report_type', 'recipient_id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_monthly_reports_period_recipient', table_name='monthly_reports')
+    op.drop_column('monthly_reports', 'new_enrollments')
+    op.drop_column('monthly_reports', 'assignments_posted')
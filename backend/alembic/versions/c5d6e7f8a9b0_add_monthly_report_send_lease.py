@@ -0,0 +1,25 @@
+"""add_monthly_report_send_lease
+
+Revision ID: c5d6e7f8a9b0
+Revises: b4c5d6e7f8a9
+Create Date: 2026-01-12 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5d6e7f8a9b0'
+down_revision = 'b4c5d6e7f8a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Reports are claimed as "sending" under a lease instead of staying row-locked during the SMTP sends
+    op.add_column('monthly_reports', sa.Column('lease_expires_at', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('monthly_reports', 'lease_expires_at')
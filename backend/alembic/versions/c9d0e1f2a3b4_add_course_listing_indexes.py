@@ -0,0 +1,26 @@
+"""add_course_listing_indexes
+
+Revision ID: c9d0e1f2a3b4
+Revises: b8c9d0e1f2a3
+Create Date: 2025-12-10 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c9d0e1f2a3b4'
+down_revision = 'b8c9d0e1f2a3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Course listings load teacher IDs and active enrollment counts per page of courses
+    op.create_index('ix_teacher_course_course_id', 'teacher_course', ['course_id'], unique=False)
+    op.create_index('ix_enrollments_course_id_status', 'enrollments', ['course_id', 'status'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_enrollments_course_id_status', table_name='enrollments')
+    op.drop_index('ix_teacher_course_course_id', table_name='teacher_course')
@@ -0,0 +1,52 @@
+"""add_course_seats_and_waitlist
+
+Revision ID: d0e1f2a3b4c5
+Revises: c9d0e1f2a3b4
+Create Date: 2025-12-17 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd0e1f2a3b4c5'
+down_revision = 'c9d0e1f2a3b4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Seat counter taken with a conditional UPDATE on enrollment
+    op.add_column('courses', sa.Column('seats_taken', sa.Integer(), nullable=False, server_default='0'))
+    op.execute(
+        "UPDATE courses SET seats_taken = ("
+        "SELECT count(*) FROM enrollments "
+        "WHERE enrollments.course_id = courses.course_id AND enrollments.status = 'active')"
+    )
+
+    # Students waiting for a seat in a full course
+    op.create_table(
+        'course_waitlist',
+        sa.Column('waitlist_id', sa.Integer(), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.Column('student_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=False, server_default='waiting'),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('promoted_at', sa.DateTime(), nullable=True),
+        sa.Column('enrollment_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['course_id'], ['courses.course_id'], ),
+        sa.ForeignKeyConstraint(['student_id'], ['students.student_id'], ),
+        sa.ForeignKeyConstraint(['enrollment_id'], ['enrollments.enrollment_id'], ),
+        sa.PrimaryKeyConstraint('waitlist_id'),
+        sa.UniqueConstraint('course_id', 'student_id', name='uq_course_waitlist_course_student')
+    )
+    op.create_index(op.f('ix_course_waitlist_waitlist_id'), 'course_waitlist', ['waitlist_id'], unique=False)
+    op.create_index('ix_course_waitlist_course_status', 'course_waitlist', ['course_id', 'status', 'waitlist_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_course_waitlist_course_status', table_name='course_waitlist')
+    op.drop_index(op.f('ix_course_waitlist_waitlist_id'), table_name='course_waitlist')
+    op.drop_table('course_waitlist')
+    op.drop_column('courses', 'seats_taken')
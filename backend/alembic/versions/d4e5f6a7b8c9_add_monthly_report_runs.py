@@ -0,0 +1,45 @@
+"""add_monthly_report_runs
+
+Revision ID: d4e5f6a7b8c9
+Revises: c3d4e5f6a7b8
+Create Date: 2025-11-05 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4e5f6a7b8c9'
+down_revision = 'c3d4e5f6a7b8'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # One checkpointed run per month of reports
+    op.create_table(
+        'monthly_report_runs',
+        sa.Column('run_id', sa.Integer(), nullable=False),
+        sa.Column('month', sa.Integer(), nullable=False),
+        sa.Column('year', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(length=20), nullable=True),
+        sa.Column('cursor', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_reports', sa.Integer(), nullable=True),
+        sa.Column('sent_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('failed_count', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('processed_at_start', sa.Integer(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('error_message', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('run_id'),
+        sa.UniqueConstraint('year', 'month', name='uq_monthly_report_runs_period')
+    )
+    op.create_index(op.f('ix_monthly_report_runs_run_id'), 'monthly_report_runs', ['run_id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_monthly_report_runs_run_id'), table_name='monthly_report_runs')
+    op.drop_table('monthly_report_runs')
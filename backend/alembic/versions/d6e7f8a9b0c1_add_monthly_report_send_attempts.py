@@ -0,0 +1,25 @@
+"""add_monthly_report_send_attempts
+
+Revision ID: d6e7f8a9b0c1
+Revises: c5d6e7f8a9b0
+Create Date: 2026-01-13 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6e7f8a9b0c1'
+down_revision = 'c5d6e7f8a9b0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Failed sends are retried by later runs up to monthly_report_max_attempts
+    op.add_column('monthly_reports', sa.Column('send_attempts', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade() -> None:
+    op.drop_column('monthly_reports', 'send_attempts')
@@ -0,0 +1,36 @@
+"""add_course_search_index
+
+Revision ID: e1f2a3b4c5d6
+Revises: d0e1f2a3b4c5
+Create Date: 2025-12-19 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1f2a3b4c5d6'
+down_revision = 'd0e1f2a3b4c5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Search results join the online course of each match for its difficulty level
+    op.create_index('ix_online_courses_course_id', 'online_courses', ['course_id'], unique=False)
+
+    # Catalog full-text search; the expression must match course_search.DOCUMENT_SQL.
+    # Other databases search an in-process index instead.
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute(
+            "CREATE INDEX ix_courses_search_document ON courses USING gin (("
+            "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+            "))"
+        )
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == 'postgresql':
+        op.drop_index('ix_courses_search_document', table_name='courses')
+    op.drop_index('ix_online_courses_course_id', table_name='online_courses')
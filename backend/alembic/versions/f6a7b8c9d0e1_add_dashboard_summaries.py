@@ -0,0 +1,54 @@
+"""add_dashboard_summaries
+
+Revision ID: f6a7b8c9d0e1
+Revises: e5f6a7b8c9d0
+Create Date: 2025-11-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f6a7b8c9d0e1'
+down_revision = 'e5f6a7b8c9d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Single-row snapshot read by the admin dashboard
+    op.create_table(
+        'dashboard_stats',
+        sa.Column('stats_id', sa.Integer(), nullable=False),
+        sa.Column('total_students', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_teachers', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_courses', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('active_enrollments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('pending_payments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('monthly_revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('average_attendance', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('stats_id')
+    )
+
+    # Revenue per course per month
+    op.create_table(
+        'revenue_monthly_summary',
+        sa.Column('month', sa.String(length=7), nullable=False),
+        sa.Column('course_id', sa.Integer(), nullable=False),
+        sa.Column('paid_enrollments', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('refreshed_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('month', 'course_id')
+    )
+
+    # Revenue aggregates filter paid enrollments by paid_date
+    op.create_index('ix_enrollments_paid_paid_date', 'enrollments', ['paid', 'paid_date'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_enrollments_paid_paid_date', table_name='enrollments')
+    op.drop_table('revenue_monthly_summary')
+    op.drop_table('dashboard_stats')
@@ -1,15 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
-from sqlalchemy import func, desc
+from sqlalchemy import desc
 from typing import List, Optional
-from datetime import datetime, timedelta
+import json
+from dataclasses import asdict
 
 from app.core.database import get_db
 from app.api.auth import get_current_user, require_role
-from app.models.models import Student, Teacher, Admin, Course, Enrollment, Attendance, Payment
+from app.models.models import Student, Teacher, Admin, Course, Enrollment, Payment
 from app.api.schemas import (
     StudentResponse, TeacherResponse, AdminResponse
 )
+from app.services.activity_log import USER_MODELS, InvalidCursor, list_activity, serialize_event
+from app.services.admin_stats import (
+    attendance_analytics, enrollment_analytics, get_dashboard_stats, revenue_analytics
+)
+from app.services.result_cache import analytics_cache
+from app.services.user_search import InvalidCursor as UserSearchCursorError, search_users
 
 router = APIRouter()
 
@@ -19,62 +26,24 @@ async def get_admin_stats(
     current_user=Depends(require_role(["admin"])),
     db: Session = Depends(get_db)
 ):
-    """Get comprehensive admin dashboard statistics from database"""
+    """
+    Get comprehensive admin dashboard statistics
+    
+    Served from the periodically refreshed snapshot (see app/services/admin_stats.py).
+    """
     try:
-        # Count totals
-        total_students = db.query(Student).filter(Student.is_active == True).count()
-        total_teachers = db.query(Teacher).filter(Teacher.is_active == True).count()
-        total_courses = db.query(Course).filter(Course.status == "active").count()
-        
-        # Count active enrollments
-        active_enrollments = db.query(Enrollment).filter(
-            Enrollment.status == "active"
-        ).count()
-        
-        # Count pending payments (unpaid enrollments)
-        pending_payments = db.query(Enrollment).filter(
-            Enrollment.paid == False
-        ).count()
-        
-        # Calculate total revenue from paid enrollments
-        paid_enrollments = db.query(Enrollment).join(
-            Course, Enrollment.course_id == Course.course_id
-        ).filter(
-            Enrollment.paid == True
-        ).all()
-        
-        total_revenue = sum(enrollment.course.price for enrollment in paid_enrollments)
-        
-        # Calculate monthly revenue (last 30 days)
-        thirty_days_ago = datetime.now() - timedelta(days=30)
-        monthly_paid_enrollments = db.query(Enrollment).join(
-            Course, Enrollment.course_id == Course.course_id
-        ).filter(
-            Enrollment.paid == True,
-            Enrollment.paid_date >= thirty_days_ago
-        ).all()
-        
-        monthly_revenue = sum(enrollment.course.price for enrollment in monthly_paid_enrollments)
-        
-        # Calculate average attendance percentage
-        total_attendance_records = db.query(Attendance).count()
-        if total_attendance_records > 0:
-            present_count = db.query(Attendance).filter(
-                Attendance.status.in_(["present", "late"])
-            ).count()
-            avg_attendance = round((present_count / total_attendance_records) * 100, 1)
-        else:
-            avg_attendance = 0.0
+        stats = get_dashboard_stats(db)
         
         return {
-            "totalStudents": total_students,
-            "totalTeachers": total_teachers,
-            "totalCourses": total_courses,
-            "totalRevenue": round(total_revenue, 2),
-            "activeEnrollments": active_enrollments,
-            "pendingPayments": pending_payments,
-            "monthlyRevenue": round(monthly_revenue, 2),
-            "averageAttendance": avg_attendance
+            "totalStudents": stats.total_students,
+            "totalTeachers": stats.total_teachers,
+            "totalCourses": stats.total_courses,
+            "totalRevenue": round(stats.total_revenue, 2),
+            "activeEnrollments": stats.active_enrollments,
+            "pendingPayments": stats.pending_payments,
+            "monthlyRevenue": round(stats.monthly_revenue, 2),
+            "averageAttendance": stats.average_attendance,
+            "asOf": stats.refreshed_at
         }
     except Exception as e:
         print(f"Admin stats error: {e}")  # Log to console for debugging
@@ -90,57 +59,32 @@ async def get_recent_users(
     current_user=Depends(require_role(["admin"])),
     db: Session = Depends(get_db)
 ):
-    """Get recently registered users across all types"""
+    """Get recently registered users across all types (from the activity log)"""
     try:
-        # Get recent students
-        recent_students = db.query(Student).order_by(desc(Student.created_at)).limit(limit//3).all()
-        # Get recent teachers
-        recent_teachers = db.query(Teacher).order_by(desc(Teacher.created_at)).limit(limit//3).all()
-        # Get recent admins
-        recent_admins = db.query(Admin).order_by(desc(Admin.created_at)).limit(limit//3).all()
-        
+        events, _ = list_activity(db, limit=limit, event_types=["user_registered"])
+
+        # The event records the user as registered; is_active comes from the live row
+        active = {}
+        for model, user_type in USER_MODELS.items():
+            ids = [item.user_id for item in events if item.user_type == user_type]
+            if ids:
+                pk = getattr(model, f"{user_type}_id")
+                for user_id, is_active in db.query(pk, model.is_active).filter(pk.in_(ids)):
+                    active[(user_type, user_id)] = is_active if is_active is not None else True
+
         users = []
-        
-        # Format students
-        for student in recent_students:
+        for item in events:
+            details = json.loads(item.details) if item.details else {}
             users.append({
-                "id": student.student_id,
-                "name": student.name,
-                "email": student.email,
-                "user_type": "student",
-                "is_active": student.is_active,
-                "created_at": student.created_at.isoformat(),
+                "id": item.user_id,
+                "name": item.user_name,
+                "email": details.get("email"),
+                "user_type": item.user_type,
+                "is_active": active.get((item.user_type, item.user_id), False),
+                "created_at": item.occurred_at.isoformat(),
                 "last_login": None  # TODO: Implement last login tracking
             })
-        
-        # Format teachers
-        for teacher in recent_teachers:
-            users.append({
-                "id": teacher.teacher_id,
-                "name": teacher.name,
-                "email": teacher.email,
-                "user_type": "teacher",
-                "is_active": teacher.is_active,
-                "created_at": teacher.created_at.isoformat(),
-                "last_login": None  # TODO: Implement last login tracking
-            })
-        
-        # Format admins
-        for admin in recent_admins:
-            users.append({
-                "id": admin.admin_id,
-                "name": admin.name,
-                "email": admin.email,
-                "user_type": "admin",
-                "is_active": admin.is_active,
-                "created_at": admin.created_at.isoformat(),
-                "last_login": None  # TODO: Implement last login tracking
-            })
-        
-        # Sort by created_at descending
-        users.sort(key=lambda x: x["created_at"], reverse=True)
-        
-        return users[:limit]
+        return users
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -193,68 +137,8 @@ async def get_recent_activity(
 ):
     """Get recent platform activity"""
     try:
-        activities = []
-        
-        # Recent enrollments
-        recent_enrollments = db.query(Enrollment).join(
-            Student, Enrollment.student_id == Student.student_id
-        ).join(
-            Course, Enrollment.course_id == Course.course_id
-        ).order_by(desc(Enrollment.enrollment_date)).limit(5).all()
-        
-        for enrollment in recent_enrollments:
-            activities.append({
-                "id": f"enrollment_{enrollment.enrollment_id}",
-                "type": "enrollment",
-                "description": f"New student enrolled in {enrollment.course.title}",
-                "timestamp": enrollment.enrollment_date.isoformat(),
-                "user_name": enrollment.student.name
-            })
-        
-        # Recent courses
-        recent_courses = db.query(Course).order_by(desc(Course.created_at)).limit(3).all()
-        
-        for course in recent_courses:
-            activities.append({
-                "id": f"course_{course.course_id}",
-                "type": "course_created",
-                "description": f"New course '{course.title}' created",
-                "timestamp": course.created_at.isoformat(),
-                "user_name": "System"
-            })
-        
-        # Recent payments
-        recent_payments = db.query(Enrollment).join(
-            Student, Enrollment.student_id == Student.student_id
-        ).filter(
-            Enrollment.paid == True,
-            Enrollment.paid_date.isnot(None)
-        ).order_by(desc(Enrollment.paid_date)).limit(3).all()
-        
-        for enrollment in recent_payments:
-            activities.append({
-                "id": f"payment_{enrollment.enrollment_id}",
-                "type": "payment",
-                "description": f"Payment received for {enrollment.course.title}",
-                "timestamp": enrollment.paid_date.isoformat(),
-                "user_name": enrollment.student.name
-            })
-        
-        # Recent user registrations
-        recent_students = db.query(Student).order_by(desc(Student.created_at)).limit(2).all()
-        for student in recent_students:
-            activities.append({
-                "id": f"user_{student.student_id}",
-                "type": "user_registered",
-                "description": f"New student registered: {student.name}",
-                "timestamp": student.created_at.isoformat(),
-                "user_name": student.name
-            })
-        
-        # Sort by timestamp descending
-        activities.sort(key=lambda x: x["timestamp"], reverse=True)
-        
-        return activities[:limit]
+        events, _ = list_activity(db, limit=limit)
+        return [serialize_event(item) for item in events]
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -262,58 +146,44 @@ async def get_recent_activity(
         )
 
 
-@router.get("/analytics/revenue")
-async def get_revenue_analytics(
+@router.get("/activity")
+async def get_activity_log(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    event_type: Optional[List[str]] = Query(None),
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    user_type: Optional[str] = None,
+    user_id: Optional[int] = None,
     current_user=Depends(require_role(["admin"])),
     db: Session = Depends(get_db)
 ):
-    """Get detailed revenue analytics by month and course"""
+    """Page through the activity log (newest first) for auditing; pass nextCursor back as cursor"""
     try:
-        # Revenue by month (last 12 months)
-        twelve_months_ago = datetime.now() - timedelta(days=365)
-        paid_enrollments = db.query(Enrollment).join(
-            Course, Enrollment.course_id == Course.course_id
-        ).filter(
-            Enrollment.paid == True,
-            Enrollment.paid_date >= twelve_months_ago
-        ).all()
-        
-        # Group by month
-        monthly_revenue = {}
-        for enrollment in paid_enrollments:
-            if enrollment.paid_date:
-                month_key = enrollment.paid_date.strftime("%Y-%m")
-                if month_key not in monthly_revenue:
-                    monthly_revenue[month_key] = 0.0
-                monthly_revenue[month_key] += enrollment.course.price
-        
-        # Revenue by course
-        course_revenue = db.query(
-            Course.title,
-            func.count(Enrollment.enrollment_id).label('enrollment_count'),
-            func.sum(Course.price).label('total_revenue')
-        ).join(
-            Enrollment, Course.course_id == Enrollment.course_id
-        ).filter(
-            Enrollment.paid == True
-        ).group_by(
-            Course.course_id, Course.title
-        ).all()
-        
-        return {
-            "monthlyRevenue": [
-                {"month": month, "revenue": round(revenue, 2)}
-                for month, revenue in sorted(monthly_revenue.items())
-            ],
-            "courseRevenue": [
-                {
-                    "course": course.title,
-                    "enrollments": course.enrollment_count,
-                    "revenue": round(float(course.total_revenue or 0), 2)
-                }
-                for course in course_revenue
-            ]
-        }
+        events, next_cursor = list_activity(
+            db, limit=limit, cursor=cursor, event_types=event_type,
+            entity_type=entity_type, entity_id=entity_id, user_type=user_type, user_id=user_id
+        )
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching activity log: {str(e)}"
+        )
+    return {"items": [serialize_event(item) for item in events], "nextCursor": next_cursor}
+
+
+@router.get("/analytics/revenue")
+async def get_revenue_analytics(
+    months: int = Query(12, ge=1, le=36),
+    current_user=Depends(require_role(["admin"]))
+):
+    """Get detailed revenue analytics by month and course (cached, see analytics_cache)"""
+    try:
+        return await analytics_cache.get(
+            ("revenue", months), lambda db: revenue_analytics(db, months=months)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -323,56 +193,14 @@ async def get_revenue_analytics(
 
 @router.get("/analytics/enrollment")
 async def get_enrollment_analytics(
-    current_user=Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    months: int = Query(6, ge=1, le=36),
+    current_user=Depends(require_role(["admin"]))
 ):
-    """Get enrollment analytics and trends"""
+    """Get enrollment analytics and trends (cached, see analytics_cache)"""
     try:
-        # Enrollments by course
-        course_enrollments = db.query(
-            Course.title,
-            Course.max_students,
-            func.count(Enrollment.enrollment_id).label('enrolled_count')
-        ).outerjoin(
-            Enrollment, Course.course_id == Enrollment.course_id
-        ).group_by(
-            Course.course_id, Course.title, Course.max_students
-        ).all()
-        
-        # Enrollment status breakdown
-        status_breakdown = db.query(
-            Enrollment.status,
-            func.count(Enrollment.enrollment_id).label('count')
-        ).group_by(Enrollment.status).all()
-        
-        # Enrollment trends (last 6 months)
-        six_months_ago = datetime.now() - timedelta(days=180)
-        monthly_enrollments = db.query(
-            func.strftime('%Y-%m', Enrollment.enrollment_date).label('month'),
-            func.count(Enrollment.enrollment_id).label('count')
-        ).filter(
-            Enrollment.enrollment_date >= six_months_ago
-        ).group_by('month').all()
-        
-        return {
-            "courseEnrollments": [
-                {
-                    "course": course.title,
-                    "enrolled": course.enrolled_count,
-                    "capacity": course.max_students,
-                    "utilization": round((course.enrolled_count / course.max_students * 100) if course.max_students > 0 else 0, 1)
-                }
-                for course in course_enrollments
-            ],
-            "statusBreakdown": [
-                {"status": status.status, "count": status.count}
-                for status in status_breakdown
-            ],
-            "monthlyTrend": [
-                {"month": enrollment.month, "count": enrollment.count}
-                for enrollment in monthly_enrollments
-            ]
-        }
+        return await analytics_cache.get(
+            ("enrollment", months), lambda db: enrollment_analytics(db, months=months)
+        )
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -382,57 +210,11 @@ async def get_enrollment_analytics(
 
 @router.get("/analytics/attendance")
 async def get_attendance_analytics(
-    current_user=Depends(require_role(["admin"])),
-    db: Session = Depends(get_db)
+    current_user=Depends(require_role(["admin"]))
 ):
-    """Get attendance analytics by course and student"""
+    """Get attendance analytics by course and student (cached, see analytics_cache)"""
     try:
-        # Attendance by course
-        course_attendance = db.query(
-            Course.title,
-            func.count(Attendance.attendance_id).label('total_sessions'),
-            func.sum(func.case([(Attendance.status == 'present', 1)], else_=0)).label('present_count'),
-            func.sum(func.case([(Attendance.status == 'absent', 1)], else_=0)).label('absent_count'),
-            func.sum(func.case([(Attendance.status == 'late', 1)], else_=0)).label('late_count')
-        ).join(
-            Attendance, Course.course_id == Attendance.course_id
-        ).group_by(
-            Course.course_id, Course.title
-        ).all()
-        
-        # Top attending students
-        top_students = db.query(
-            Student.name,
-            func.count(Attendance.attendance_id).label('total_sessions'),
-            func.sum(func.case([(Attendance.status == 'present', 1)], else_=0)).label('present_count')
-        ).join(
-            Attendance, Student.student_id == Attendance.student_id
-        ).group_by(
-            Student.student_id, Student.name
-        ).order_by(desc('present_count')).limit(10).all()
-        
-        return {
-            "courseAttendance": [
-                {
-                    "course": course.title,
-                    "totalSessions": course.total_sessions,
-                    "present": course.present_count,
-                    "absent": course.absent_count,
-                    "late": course.late_count,
-                    "attendanceRate": round((course.present_count / course.total_sessions * 100) if course.total_sessions > 0 else 0, 1)
-                }
-                for course in course_attendance
-            ],
-            "topStudents": [
-                {
-                    "name": student.name,
-                    "totalSessions": student.total_sessions,
-                    "present": student.present_count,
-                    "attendanceRate": round((student.present_count / student.total_sessions * 100) if student.total_sessions > 0 else 0, 1)
-                }
-                for student in top_students
-            ]
-        }
+        return await analytics_cache.get(("attendance",), attendance_analytics)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -440,6 +222,19 @@ async def get_attendance_analytics(
         )
 
 
+@router.get("/analytics/cache")
+async def get_analytics_cache_stats(
+    current_user=Depends(require_role(["admin"]))
+):
+    """Get hit/miss counters of the analytics result cache"""
+    return {
+        "entries": len(analytics_cache.entries()),
+        "ttlSeconds": analytics_cache.ttl_seconds,
+        "staleSeconds": analytics_cache.stale_seconds,
+        **asdict(analytics_cache.stats)
+    }
+
+
 @router.get("/users/all")
 async def get_all_users(
     user_type: Optional[str] = Query(None, regex="^(student|teacher|admin|parent)$"),
@@ -516,6 +311,31 @@ async def get_all_users(
         )
 
 
+@router.get("/users/search")
+async def search_all_users(
+    q: str = Query(..., min_length=1, max_length=100),
+    user_type: Optional[str] = Query(None, regex="^(student|teacher|admin|parent)$"),
+    is_active: Optional[bool] = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    current_user=Depends(require_role(["admin"])),
+    db: Session = Depends(get_db)
+):
+    """Search users of every type by name, email or phone; best matches first"""
+    try:
+        items, next_cursor = search_users(
+            db, q, user_type=user_type, is_active=is_active, limit=limit, cursor=cursor
+        )
+    except UserSearchCursorError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error searching users: {str(e)}"
+        )
+    return {"items": items, "nextCursor": next_cursor}
+
+
 @router.put("/users/{user_type}/{user_id}/status")
 async def update_user_status(
     user_type: str,
@@ -12,6 +12,7 @@ from app.api.schemas import (
     UserLogin, Token, StudentCreate, TeacherCreate, AdminCreate, ParentCreate,
     StudentResponse, TeacherResponse, AdminResponse, ParentResponse, ChangePassword
 )
+from app.services.activity_log import set_activity_actor
 from app.utils.qr_generator import generate_qr_code
 
 router = APIRouter()
@@ -84,6 +85,7 @@ def get_current_user(
             detail="User not found"
         )
     
+    set_activity_actor(db, user_type, user_id)
     return {"user": user, "user_type": user_type}
 
 
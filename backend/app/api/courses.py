@@ -1,12 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from collections import defaultdict
 from datetime import datetime
 
 from app.core.database import get_db
-from app.models.models import Course, Enrollment, Teacher, Student
+from app.models.models import Course, Enrollment, Teacher, Student, teacher_course_association
 from app.api.auth import get_current_user, require_role
-from pydantic import BaseModel
+from app.services.conditional_get import not_modified, resource_version
+from app.services.course_search import CourseFilters, InvalidCursor, search_courses
+from app.services.enrollment_seats import (
+    AlreadyEnrolled, CourseFull, CourseNotFound, enroll_student, leave_waitlist
+)
+from app.services.schedule_conflicts import (
+    check_schedule, course_summary, student_conflicts, teacher_conflicts
+)
+from pydantic import BaseModel, Field
 
 
 class CourseBase(BaseModel):
@@ -36,19 +46,87 @@ class CourseResponse(CourseBase):
         from_attributes = True
         
     @classmethod
-    def from_orm(cls, obj):
-        # Extract teacher IDs from the relationship
-        teacher_ids = [teacher.teacher_id for teacher in obj.teachers] if hasattr(obj, 'teachers') else []
-        # Count active enrollments
-        enrolled_count = len([e for e in obj.enrollments if e.status == 'active']) if hasattr(obj, 'enrollments') else 0
+    def from_orm(cls, obj, teacher_ids: Optional[List[int]] = None, enrolled_count: Optional[int] = None):
+        if teacher_ids is None:
+            teacher_ids = [teacher.teacher_id for teacher in obj.teachers]
+        if enrolled_count is None:
+            enrolled_count = len([e for e in obj.enrollments if e.status == 'active'])
         data = {
-            **{k: getattr(obj, k) for k in cls.__fields__ if k not in ['teacher_ids', 'enrolled_count'] and hasattr(obj, k)},
+            **{k: getattr(obj, k) for k in cls.model_fields if k not in ['teacher_ids', 'enrolled_count'] and hasattr(obj, k)},
             'teacher_ids': teacher_ids,
             'enrolled_count': enrolled_count
         }
         return cls(**data)
 
 
+def course_responses(db: Session, courses: List[Course]) -> List[CourseResponse]:
+    """
+    Serialize courses with their teacher IDs and active enrollment counts,
+    loaded for all of them at once (two queries, however many courses)
+    """
+    course_ids = [course.course_id for course in courses]
+    if not course_ids:
+        return []
+
+    teacher_ids: Dict[int, List[int]] = defaultdict(list)
+    for course_id, teacher_id in db.query(
+        teacher_course_association.c.course_id, teacher_course_association.c.teacher_id
+    ).filter(
+        teacher_course_association.c.course_id.in_(course_ids)
+    ).order_by(teacher_course_association.c.teacher_id):
+        teacher_ids[course_id].append(teacher_id)
+
+    enrolled_counts = dict(db.query(
+        Enrollment.course_id, func.count(Enrollment.enrollment_id)
+    ).filter(
+        Enrollment.course_id.in_(course_ids),
+        Enrollment.status == "active"
+    ).group_by(Enrollment.course_id).all())
+
+    return [
+        CourseResponse.from_orm(
+            course,
+            teacher_ids=teacher_ids.get(course.course_id, []),
+            enrolled_count=enrolled_counts.get(course.course_id, 0)
+        )
+        for course in courses
+    ]
+
+
+def ensure_teachers_available(
+    db: Session,
+    teacher_ids: List[int],
+    start_time: datetime,
+    end_time: datetime,
+    course_id: Optional[int] = None
+) -> None:
+    """Raise 409 if any teacher already teaches a course overlapping [start_time, end_time)"""
+    conflicts = teacher_conflicts(
+        db, teacher_ids, start_time, end_time, exclude_course_ids=[course_id] if course_id else []
+    )
+    if conflicts:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "One or more teachers already teach a course at this time",
+                "conflicts": [
+                    {"teacher_id": teacher_id, "courses": [course_summary(c) for c in courses]}
+                    for teacher_id, courses in conflicts.items()
+                ]
+            }
+        )
+
+
+class CourseSearchResponse(BaseModel):
+    items: List[CourseResponse]
+    facets: Dict[str, Any]
+    next_cursor: Optional[str] = None
+
+
+class ScheduleCheckRequest(BaseModel):
+    course_ids: List[int] = Field(default_factory=list, max_length=100)  # Empty: check the current schedule
+
+
 class EnrollmentResponse(BaseModel):
     enrollment_id: int
     student_id: int
@@ -112,13 +190,19 @@ router = APIRouter()
 
 @router.get("/", response_model=List[CourseResponse])
 async def get_courses(
+    request: Request,
+    response: Response,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     is_online: Optional[bool] = None,
     status: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get list of courses with optional filters"""
+    """Get list of courses with optional filters (supports conditional GET)"""
+    cached = not_modified(request, response, resource_version(db, Course))
+    if cached:
+        return cached
+    
     query = db.query(Course)
     
     if is_online is not None:
@@ -128,7 +212,41 @@ async def get_courses(
         query = query.filter(Course.status == status)
     
     courses = query.offset(skip).limit(limit).all()
-    return [CourseResponse.from_orm(course) for course in courses]
+    return course_responses(db, courses)
+
+
+@router.get("/search", response_model=CourseSearchResponse)
+async def search_course_catalog(
+    q: Optional[str] = Query(None, max_length=200),
+    is_online: Optional[bool] = None,
+    course_status: Optional[str] = Query(None, alias="status"),
+    difficulty: Optional[str] = Query(None, regex="^(beginner|intermediate|advanced)$"),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    teacher_id: List[int] = Query([]),
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Search the catalog by title and description, with facet counts and cursor paging"""
+    filters = CourseFilters(
+        is_online=is_online,
+        status=course_status,
+        difficulty=difficulty,
+        min_price=min_price,
+        max_price=max_price,
+        teacher_ids=teacher_id
+    )
+    try:
+        courses, facets, next_cursor = search_courses(db, q, filters, limit=limit, cursor=cursor)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    return CourseSearchResponse(
+        items=course_responses(db, courses),
+        facets=facets,
+        next_cursor=next_cursor
+    )
 
 
 @router.get("/my-courses", response_model=List[CourseResponse])
@@ -160,7 +278,7 @@ async def get_my_courses(
     else:
         courses = []
     
-    return [CourseResponse.from_orm(course) for course in courses]
+    return course_responses(db, courses)
 
 
 @router.get("/my-enrollments")
@@ -227,21 +345,50 @@ async def get_all_teachers(
     return teachers
 
 
+@router.post("/schedule/check")
+async def check_my_schedule(
+    request_data: ScheduleCheckRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["student", "teacher"]))
+):
+    """
+    Check courses for overlaps with the current user's schedule and with each
+    other. Without course_ids, check the current schedule itself.
+    """
+    user = current_user["user"]
+    if current_user["user_type"] == "student":
+        results = check_schedule(db, request_data.course_ids, student_id=user.student_id)
+    else:
+        results = check_schedule(db, request_data.course_ids, teacher_id=user.teacher_id)
+    
+    return {
+        "courses": results,
+        "conflict_count": sum(1 for result in results if result["has_conflicts"])
+    }
+
+
 @router.get("/{course_id}", response_model=CourseResponse)
-async def get_course(course_id: int, db: Session = Depends(get_db)):
-    """Get specific course by ID"""
+async def get_course(course_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    """Get specific course by ID (supports conditional GET)"""
+    cached = not_modified(
+        request, response, resource_version(db, Course, Course.course_id == course_id, single=True)
+    )
+    if cached:
+        return cached
+    
     course = db.query(Course).filter(Course.course_id == course_id).first()
     if not course:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Course not found"
         )
-    return CourseResponse.from_orm(course)
+    return course_responses(db, [course])[0]
 
 
 @router.post("/", response_model=CourseResponse)
 async def create_course(
     course_data: CourseCreate,
+    allow_conflicts: bool = Query(False, description="Assign teachers even if their schedules overlap"),
     db: Session = Depends(get_db),
     current_user=Depends(require_role(["admin"]))
 ):
@@ -256,6 +403,8 @@ async def create_course(
                 status_code=status.HTTP_400_BAD_REQUEST,
                 detail="One or more teacher IDs are invalid"
             )
+        if not allow_conflicts:
+            ensure_teachers_available(db, course_data.teacher_ids, course_data.start_time, course_data.end_time)
     
     db_course = Course(
         title=course_data.title,
@@ -280,17 +429,18 @@ async def create_course(
         db.commit()
         db.refresh(db_course)
     
-    return CourseResponse.from_orm(db_course)
+    return course_responses(db, [db_course])[0]
 
 
 @router.put("/{course_id}", response_model=CourseResponse)
 async def update_course(
     course_id: int,
     course_data: CourseCreate,
+    allow_conflicts: bool = Query(False, description="Keep teachers even if their schedules overlap"),
     db: Session = Depends(get_db),
     current_user=Depends(require_role(["admin"]))
 ):
-    """Update a course (admin only)"""
+    """Update a course (admin only); teacher_ids, when given, replaces the assigned teachers"""
     course = db.query(Course).filter(Course.course_id == course_id).first()
     if not course:
         raise HTTPException(
@@ -298,14 +448,30 @@ async def update_course(
             detail="Course not found"
         )
     
+    teachers = None
+    if "teacher_ids" in course_data.model_fields_set:
+        teachers = db.query(Teacher).filter(Teacher.teacher_id.in_(course_data.teacher_ids)).all()
+        if len(teachers) != len(set(course_data.teacher_ids)):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="One or more teacher IDs are invalid"
+            )
+    
+    # New times must also suit the teachers who stay assigned
+    teacher_ids = [t.teacher_id for t in (teachers if teachers is not None else course.teachers)]
+    if teacher_ids and not allow_conflicts:
+        ensure_teachers_available(db, teacher_ids, course_data.start_time, course_data.end_time, course_id)
+    
     # Update course fields
-    for field, value in course_data.dict().items():
+    for field, value in course_data.dict(exclude={"teacher_ids"}).items():
         setattr(course, field, value)
+    if teachers is not None:
+        course.teachers = teachers
     
     db.commit()
     db.refresh(course)
     
-    return course
+    return course_responses(db, [course])[0]
 
 
 @router.delete("/{course_id}")
@@ -331,56 +497,46 @@ async def delete_course(
 @router.post("/{course_id}/enroll")
 async def enroll_in_course(
     course_id: int,
+    response: Response,
+    waitlist: bool = Query(False, description="Join the waitlist if the course is full"),
+    allow_conflicts: bool = Query(False, description="Enroll even if the course overlaps the student's schedule"),
     db: Session = Depends(get_db),
     current_user=Depends(require_role(["student"]))
 ):
-    """Enroll current student in a course"""
+    """Enroll current student in a course, taking a seat atomically"""
     student_id = current_user["user"].student_id
     
-    # Check if course exists
-    course = db.query(Course).filter(Course.course_id == course_id).first()
-    if not course:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Course not found"
-        )
-    
-    # Check if already enrolled
-    existing_enrollment = db.query(Enrollment).filter(
-        Enrollment.student_id == student_id,
-        Enrollment.course_id == course_id
-    ).first()
-    
-    if existing_enrollment:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Already enrolled in this course"
-        )
-    
-    # Check course capacity
-    current_enrollments = db.query(Enrollment).filter(
-        Enrollment.course_id == course_id,
-        Enrollment.status == "active"
-    ).count()
-    
-    max_students = getattr(course, 'max_students', None)
-    if max_students is not None and current_enrollments >= max_students:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Course is full"
-        )
+    if not allow_conflicts:
+        schedule = db.query(Course.start_time, Course.end_time).filter(Course.course_id == course_id).first()
+        conflicts = student_conflicts(
+            db, student_id, schedule.start_time, schedule.end_time, exclude_course_ids=[course_id]
+        ) if schedule else []
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": "Course overlaps courses you are enrolled in",
+                    "conflicts": [course_summary(c) for c in conflicts]
+                }
+            )
     
-    # Create enrollment
-    enrollment = Enrollment(
-        student_id=student_id,
-        course_id=course_id,
-        paid=False,
-        payment_due=course.start_time  # Set payment due to course start time
-    )
+    try:
+        result = enroll_student(db, course_id, student_id, waitlist=waitlist)
+    except CourseNotFound as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except (CourseFull, AlreadyEnrolled) as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    
+    if result.status == "waitlisted":
+        response.status_code = status.HTTP_202_ACCEPTED
+        return {
+            "message": "Course is full; added to the waitlist",
+            "waitlist_id": result.waitlist_entry.waitlist_id,
+            "position": result.position
+        }
     
-    db.add(enrollment)
-    db.commit()
-    db.refresh(enrollment)
+    enrollment = result.enrollment
+    course = enrollment.course
     
     # Send enrollment confirmation notification to student
     try:
@@ -406,6 +562,21 @@ async def enroll_in_course(
     return {"message": "Successfully enrolled in course", "enrollment_id": enrollment.enrollment_id}
 
 
+@router.delete("/{course_id}/waitlist")
+async def leave_course_waitlist(
+    course_id: int,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["student"]))
+):
+    """Leave the waitlist of a full course"""
+    if not leave_waitlist(db, course_id, current_user["user"].student_id):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Not on the waitlist for this course"
+        )
+    return {"message": "Removed from the waitlist"}
+
+
 @router.get("/{course_id}/enrollments")
 async def get_course_enrollments(
     course_id: int,
@@ -12,9 +12,15 @@ import logging
 
 from app.core.database import get_db
 from app.core.security import get_current_user, get_password_hash, verify_password
-from app.models import Student, Teacher, Admin, Parent, PasswordResetToken, EmailLog, EmailPreference
+from app.models import Student, Teacher, Admin, Parent, PasswordResetToken, EmailLog, EmailPreference, MonthlyReportRun
 from app.api.schemas import Message
 from app.services.email_service import email_service
+from app.services.email_outbox import enqueue_email, process_outbox
+from app.services.email_dedup import dedup_index
+from app.services.email_stats import email_stats
+from app.services.monthly_reports import get_or_create_run, run_progress
+from app.services.task_queues import parse_queue_concurrency, queue_metrics
+from app.services.job_locks import lease_status
 # from app.services.celery_app import send_password_reset_email_task  # Not needed - sending directly
 from app.core.config import settings
 
@@ -156,23 +162,32 @@ async def forgot_password(
         ip_address="127.0.0.1"  # In production, get from request
     )
     db.add(reset_token)
-    db.commit()
     
-    # Send email directly (no Celery needed for simple emails)
+    # Queue the email in the same transaction as the token
     reset_url = f"{settings.password_reset_url}?token={plain_token}"
+    subject, html_content = email_service.render_password_reset_email(user_name, plain_token, reset_url)
+    email_log = enqueue_email(
+        db,
+        recipient_email=email,
+        subject=subject,
+        html_content=html_content,
+        email_type="password_reset",
+        recipient_name=user_name,
+        recipient_type=user_type,
+        recipient_id=user_id
+    )
+    db.commit()
     
+    # Deliver right away unless the rate limiter is backed up; otherwise the outbox worker sends it
     try:
         logger.info(f"📧 Attempting to send password reset email to {email}")
-        result = await email_service.send_password_reset_email(
-            email=email,
-            name=user_name,
-            reset_token=plain_token,
-            reset_url=reset_url
+        result = await process_outbox(
+            db, log_ids=[email_log.log_id], max_wait=settings.smtp_inline_max_wait_seconds
         )
-        if result:
+        if result["sent"] or result["suppressed"]:
             logger.info(f"✅ Password reset email sent successfully to {email}")
         else:
-            logger.error(f"❌ Password reset email FAILED to send to {email} - check email service configuration")
+            logger.error(f"❌ Password reset email to {email} not sent yet - queued for the interactive outbox worker")
     except Exception as e:
         # Log error but don't reveal to user for security
         logger.error(f"❌ Exception sending password reset email to {email}: {e}", exc_info=True)
@@ -421,27 +436,129 @@ async def get_email_logs(
 
 @admin_router.post("/trigger-monthly-reports")
 async def trigger_monthly_reports(
+    month: Optional[int] = None,
+    year: Optional[int] = None,
     current_user: dict = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
     """
-    Manually trigger monthly report generation (Admin only)
+    Manually trigger (or resume) monthly report generation (Admin only)
+    
+    Reports already sent for the month are not sent again.
     """
     
     # Check if user is admin
     if current_user.get("user_type") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    from app.services.celery_app import send_monthly_reports
+    now = datetime.utcnow()
+    month = month or now.month
+    year = year or now.year
+    if not 1 <= month <= 12:
+        raise HTTPException(status_code=400, detail="month must be between 1 and 12")
+    
+    run = get_or_create_run(db, month, year)
+    if run.status == "completed":
+        return {
+            "message": "Monthly reports for this month were already sent",
+            "run": run_progress(run)
+        }
+    
+    from app.services.celery_app import MONTHLY_REPORTS_LEASE, send_monthly_reports
+    
+    lease = next((item for item in lease_status(db) if item["name"] == MONTHLY_REPORTS_LEASE), None)
+    if lease and lease["held"]:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Monthly reports are already being sent by {lease['holder']} until {lease['expires_at']}"
+        )
     
-    task = send_monthly_reports.delay()
+    task = send_monthly_reports.delay(month, year)
     
     return {
         "message": "Monthly reports generation triggered",
-        "task_id": task.id
+        "task_id": task.id,
+        "run": run_progress(run)
     }
 
 
+@admin_router.get("/report-runs")
+async def list_report_runs(
+    limit: int = 12,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get recent monthly report runs with their progress (Admin only)
+    """
+    
+    # Check if user is admin
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    runs = db.query(MonthlyReportRun).order_by(
+        MonthlyReportRun.year.desc(), MonthlyReportRun.month.desc()
+    ).limit(limit).all()
+    
+    return [run_progress(run) for run in runs]
+
+
+@admin_router.get("/report-runs/{run_id}")
+async def get_report_run(
+    run_id: int,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get progress and throughput of one monthly report run (Admin only)
+    """
+    
+    # Check if user is admin
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    run = db.query(MonthlyReportRun).filter(MonthlyReportRun.run_id == run_id).first()
+    if not run:
+        raise HTTPException(status_code=404, detail="Report run not found")
+    
+    return run_progress(run)
+
+
+@admin_router.get("/queues")
+async def get_queue_metrics(
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Get depth and wait times of the Celery queues (Admin only)
+    """
+    
+    # Check if user is admin
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    concurrency = parse_queue_concurrency(settings.celery_queue_concurrency)
+    metrics = queue_metrics.snapshot()
+    for name, queue in metrics.items():
+        queue["concurrency"] = concurrency.get(name)
+    return metrics
+
+
+@admin_router.get("/job-leases")
+async def get_job_leases(
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get the lease of every periodic job: who holds it and until when (Admin only)
+    """
+    
+    # Check if user is admin
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    return lease_status(db)
+
+
 @admin_router.get("/email-logs/stats")
 async def get_email_stats(
     current_user: dict = Depends(get_current_user),
@@ -455,20 +572,37 @@ async def get_email_stats(
     if current_user.get("user_type") != "admin":
         raise HTTPException(status_code=403, detail="Admin access required")
     
-    total_sent = db.query(EmailLog).filter(EmailLog.status == "sent").count()
-    total_failed = db.query(EmailLog).filter(EmailLog.status == "failed").count()
-    total_pending = db.query(EmailLog).filter(EmailLog.status == "pending").count()
+    stats = email_stats.snapshot(db)
+    stats["deduplication"] = dedup_index.stats()
+    return stats
+
+
+@admin_router.get("/email-logs/stats/series")
+async def get_email_stats_series(
+    bucket: str = "hour",
+    window: int = 24,
+    current_user: dict = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Get email counts per status over time (Admin only)
+    
+    Query parameters:
+    - bucket: "hour" or "day"
+    - window: Number of buckets to return, ending with the current one
+    """
+    
+    # Check if user is admin
+    if current_user.get("user_type") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    
+    if bucket not in ("hour", "day"):
+        raise HTTPException(status_code=400, detail="bucket must be 'hour' or 'day'")
     
-    # By type
-    by_type = {}
-    for email_type in ["password_reset", "assignment", "grade", "attendance", "notification", "report", "welcome"]:
-        count = db.query(EmailLog).filter(EmailLog.email_type == email_type).count()
-        if count > 0:
-            by_type[email_type] = count
+    if window < 1 or window > (24 * 31 if bucket == "hour" else 366):
+        raise HTTPException(status_code=400, detail="window is out of range")
     
     return {
-        "total_sent": total_sent,
-        "total_failed": total_failed,
-        "total_pending": total_pending,
-        "by_type": by_type
+        "bucket": bucket,
+        "series": email_stats.series(db, bucket, window)
     }
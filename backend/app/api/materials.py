@@ -1,15 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status, UploadFile, File, Form
 from sqlalchemy.orm import Session
+from starlette.requests import ClientDisconnect
 from typing import List, Optional
 from datetime import datetime
 from app.core.database import get_db
 from app.api.auth import get_current_user, require_role
-from app.models.models import Material, Course, Teacher, Announcement
+from app.models.models import Material, Course, Teacher, Announcement, OnlineLesson
 from app.core.config import settings
-from app.utils.cloudinary_helper import upload_file, delete_file
+from app.services.conditional_get import not_modified, resource_version
+from app.api.schemas import CloudinaryUploadResult, UploadIntentRequest, UploadIntentResponse
+from app.services.direct_uploads import InvalidUploadIntent, complete_intent, create_intent, read_intent, receive_direct_put
+from app.services.resumable_uploads import (
+    OFFSET_CONTENT_TYPE, PURPOSES, TUS_VERSION, UPLOAD_PATH, ChecksumMismatch, InvalidUploadRequest, OffsetMismatch,
+    UploadLocked, UploadNotFound, assemble_upload, create_upload, discovery_headers, finish_upload, get_upload,
+    is_complete, parse_checksum, parse_metadata, terminate_upload, upload_headers, upload_metadata, write_chunk
+)
+from app.services.uploads import (
+    UploadTooLarge, cloudinary_resource_type, material_type, spool_upload, store_upload
+)
+from app.utils.cloudinary_helper import delete_file
 from pydantic import BaseModel
 import os
-import uuid
 import logging
 
 # Configure logger
@@ -59,19 +70,33 @@ class AnnouncementResponse(BaseModel):
         from_attributes = True
 
 
-# Material endpoints
-@router.post("/courses/{course_id}/materials", response_model=MaterialResponse)
-async def upload_material(
-    course_id: int,
-    title: str = Form(...),
-    description: Optional[str] = Form(None),
-    is_public: bool = Form(False),
-    file: UploadFile = File(...),
-    db: Session = Depends(get_db),
-    current_user=Depends(require_role(["teacher", "admin"]))
-):
-    """Upload a material/file to a course (teachers and admins only)"""
+class MaterialUploadComplete(BaseModel):
+    """Completion callback for a direct upload: the material details and proof of the upload"""
+    intent_token: str
+    title: str
+    description: Optional[str] = None
+    is_public: bool = False
+    cloudinary: Optional[CloudinaryUploadResult] = None  # Cloudinary's upload response, when storage is cloudinary
+
+
+class ResumableUploadResponse(BaseModel):
+    upload_id: str
+    purpose: str
+    target_id: int
+    filename: str
+    upload_length: int
+    upload_offset: int
+    status: str
+    result_id: Optional[int]
+    result_url: Optional[str]
+    expires_at: datetime
     
+    class Config:
+        from_attributes = True
+
+
+def _get_uploadable_course(db: Session, course_id: int, current_user: dict) -> Course:
+    """The course, if the current teacher (or any admin) may add materials to it"""
     # Verify course exists
     course = db.query(Course).filter(Course.course_id == course_id).first()
     if not course:
@@ -81,113 +106,31 @@ async def upload_material(
         )
     
     # If teacher, verify they are assigned to this course
-    user_type = current_user["user_type"]
-    if user_type == "teacher":
+    if current_user["user_type"] == "teacher":
         teacher = current_user["user"]
         if course not in teacher.courses:
             raise HTTPException(
                 status_code=status.HTTP_403_FORBIDDEN,
                 detail="You are not assigned to this course"
             )
-    
-    # Read file content
-    content = await file.read()
-    file_extension = os.path.splitext(file.filename)[1]
-    
-    # Get user info for logging
-    user_id = current_user["user"].admin_id if user_type == "admin" else current_user["user"].teacher_id
-    user_name = current_user["user"].name
-    
-    # Log upload attempt
-    logger.info(f"File upload initiated - User: {user_name} (ID: {user_id}, Type: {user_type}), "
-                f"Course: {course.title} (ID: {course_id}), "
-                f"File: {file.filename}, Size: {len(content)} bytes")
-    
-    # Determine file type
-    file_type = "document"
-    if file_extension.lower() in [".pdf"]:
-        file_type = "pdf"
-    elif file_extension.lower() in [".mp4", ".avi", ".mov", ".mkv"]:
-        file_type = "video"
-    elif file_extension.lower() in [".doc", ".docx", ".txt"]:
-        file_type = "document"
-    elif file_extension.lower() in [".ppt", ".pptx"]:
-        file_type = "presentation"
-    elif file_extension.lower() in [".zip", ".rar"]:
-        file_type = "archive"
-    
-    # Upload to Cloudinary or local storage
-    if settings.use_cloudinary:
-        logger.info(f"📤 Using CLOUDINARY for upload - File: {file.filename}")
-        
-        # Upload to Cloudinary
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        
-        # Determine resource type for Cloudinary
-        resource_type = "auto"
-        if file_type == "video":
-            resource_type = "video"
-        elif file_type in ["pdf", "document", "presentation", "archive"]:
-            resource_type = "raw"
-        
-        try:
-            result = upload_file(
-                file_content=content,
-                folder="course_materials",
-                public_id=unique_filename.replace(file_extension, ''),
-                resource_type=resource_type
-            )
-            
-            file_url = result['secure_url']
-            
-            logger.info(f"✅ CLOUDINARY upload successful - "
-                       f"File: {file.filename}, "
-                       f"URL: {file_url}, "
-                       f"Public ID: {result.get('public_id')}, "
-                       f"Size: {result.get('bytes')} bytes, "
-                       f"Format: {result.get('format')}")
-            
-        except Exception as e:
-            logger.error(f"❌ CLOUDINARY upload failed - File: {file.filename}, Error: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to upload file to cloud storage: {str(e)}"
-            )
-    else:
-        logger.info(f"💾 Using LOCAL STORAGE for upload - File: {file.filename}")
-        
-        # Save to local filesystem (fallback for development)
-        upload_dir = "uploads/materials"
-        os.makedirs(upload_dir, exist_ok=True)
-        
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(upload_dir, unique_filename)
-        
-        try:
-            with open(file_path, "wb") as buffer:
-                buffer.write(content)
-            
-            file_url = f"/uploads/materials/{unique_filename}"
-            
-            logger.info(f"✅ LOCAL STORAGE upload successful - "
-                       f"File: {file.filename}, "
-                       f"Path: {file_path}, "
-                       f"Size: {len(content)} bytes")
-            
-        except Exception as e:
-            logger.error(f"❌ LOCAL STORAGE upload failed - File: {file.filename}, Error: {str(e)}")
-            raise HTTPException(
-                status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
-                detail=f"Failed to save file locally: {str(e)}"
-            )
-    
-    # Create material record
+    return course
+
+
+def _uploader_id(current_user: dict) -> str:
+    user = current_user["user"]
+    user_id = user.admin_id if current_user["user_type"] == "admin" else user.teacher_id
+    return f"{current_user['user_type']}:{user_id}"
+
+
+def _record_material(db: Session, course: Course, title: str, description: Optional[str], is_public: bool,
+                     file_type: str, file_url: str, file_size: Optional[int], storage_type: str) -> Material:
+    """Create the material row and notify the course's students"""
     material = Material(
-        course_id=course_id,
+        course_id=course.course_id,
         title=title,
         type=file_type,
         url=file_url,
-        file_size=len(content),
+        file_size=file_size,
         description=description,
         is_public=is_public
     )
@@ -197,13 +140,12 @@ async def upload_material(
     db.refresh(material)
     
     # Log successful material creation
-    storage_type = "CLOUDINARY" if settings.use_cloudinary else "LOCAL"
     logger.info(f"✅ Material created successfully - "
                 f"ID: {material.material_id}, "
                 f"Title: {title}, "
                 f"Type: {file_type}, "
                 f"Storage: {storage_type}, "
-                f"Size: {len(content)} bytes, "
+                f"Size: {file_size} bytes, "
                 f"Course: {course.title}")
     
     # Send notification to all enrolled students about new material
@@ -214,7 +156,7 @@ async def upload_material(
         
         # Get all active enrollments for this course
         enrollments = db.query(Enrollment).filter(
-            Enrollment.course_id == course_id,
+            Enrollment.course_id == course.course_id,
             Enrollment.status == "active"
         ).all()
         
@@ -227,9 +169,9 @@ async def upload_material(
                 title=f"New Material: {title}",
                 message=f"New {file_type} material has been uploaded to {course.title}",
                 priority=NotificationPriority.MEDIUM,
-                action_url=f"/dashboard/student/courses/{course_id}/materials",
+                action_url=f"/dashboard/student/courses/{course.course_id}/materials",
                 action_text="View Materials",
-                related_course_id=course_id
+                related_course_id=course.course_id
             )
     except Exception as e:
         print(f"Failed to send material upload notification: {e}")
@@ -238,13 +180,355 @@ async def upload_material(
     return material
 
 
+# Material endpoints
+@router.post("/courses/{course_id}/materials", response_model=MaterialResponse)
+async def upload_material(
+    course_id: int,
+    title: str = Form(...),
+    description: Optional[str] = Form(None),
+    is_public: bool = Form(False),
+    file: UploadFile = File(...),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"]))
+):
+    """Upload a material/file to a course (teachers and admins only)"""
+    
+    course = _get_uploadable_course(db, course_id, current_user)
+    
+    # Stream the file to a temporary file, enforcing the size limit and hashing it on the way
+    try:
+        upload = await spool_upload(file)
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    
+    # Log upload attempt
+    logger.info(f"File upload initiated - User: {current_user['user'].name} ({_uploader_id(current_user)}), "
+                f"Course: {course.title} (ID: {course_id}), "
+                f"File: {file.filename}, Size: {upload.size} bytes, SHA-256: {upload.sha256}")
+    
+    # Determine file type
+    file_type = material_type(upload.extension)
+    
+    # Upload to Cloudinary or local storage, off the event loop
+    storage_type = "CLOUDINARY" if settings.use_cloudinary else "LOCAL"
+    try:
+        stored = await store_upload(upload, folder="course_materials", local_folder="materials",
+                                    resource_type=cloudinary_resource_type(file_type))
+        
+        logger.info(f"✅ {storage_type} upload successful - "
+                    f"File: {file.filename}, "
+                    f"URL: {stored.url}, "
+                    f"Public ID: {stored.public_id}, "
+                    f"Size: {stored.size} bytes")
+        
+    except Exception as e:
+        logger.error(f"❌ {storage_type} upload failed - File: {file.filename}, Error: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to store uploaded file: {str(e)}"
+        )
+    
+    return _record_material(db, course, title, description, is_public, file_type, stored.url, stored.size,
+                            storage_type)
+
+
+@router.post("/courses/{course_id}/materials/upload-intent", response_model=UploadIntentResponse)
+async def create_material_upload_intent(
+    course_id: int,
+    intent_request: UploadIntentRequest,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"]))
+):
+    """
+    Signed parameters to upload a material file straight to storage
+    (Cloudinary, or a presigned PUT with local storage). Finish with
+    /courses/{course_id}/materials/complete-upload.
+    """
+    _get_uploadable_course(db, course_id, current_user)
+    file_type = material_type(os.path.splitext(intent_request.filename)[1])
+    return create_intent(
+        "material", course_id, _uploader_id(current_user), intent_request.filename,
+        folder="course_materials", local_folder="materials", resource_type=cloudinary_resource_type(file_type)
+    )
+
+
+@router.post("/courses/{course_id}/materials/complete-upload", response_model=MaterialResponse)
+async def complete_material_upload(
+    course_id: int,
+    completion: MaterialUploadComplete,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"]))
+):
+    """Record the material for a finished direct upload (safe to retry)"""
+    course = _get_uploadable_course(db, course_id, current_user)
+    try:
+        claims = read_intent(completion.intent_token, "material", course_id, _uploader_id(current_user))
+        uploaded = complete_intent(claims, completion.cloudinary.dict() if completion.cloudinary else None)
+    except InvalidUploadIntent as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    
+    # A retried callback finds the material it already recorded
+    existing = db.query(Material).filter(Material.course_id == course_id, Material.url == uploaded.url).first()
+    if existing:
+        return existing
+    
+    return _record_material(db, course, completion.title, completion.description, completion.is_public,
+                            material_type(os.path.splitext(claims["filename"])[1]), uploaded.url, uploaded.size,
+                            uploaded.storage.upper())
+
+
+@router.put("/direct-uploads/{object_key:path}")
+async def receive_direct_upload(
+    object_key: str,
+    request: Request,
+    expires: int = Query(...),
+    max_bytes: int = Query(...),
+    signature: str = Query(...)
+):
+    """
+    Presigned PUT target for direct uploads when Cloudinary is disabled: a
+    local stand-in for an S3-compatible bucket. The signed URL is the
+    authorization; the body is the raw file.
+    """
+    try:
+        stored = await receive_direct_put(object_key, expires, max_bytes, signature, request.stream())
+    except (InvalidUploadIntent, ValueError) as e:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=str(e)
+        )
+    except UploadTooLarge as e:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=str(e)
+        )
+    except FileExistsError:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="File has already been uploaded"
+        )
+    return Response(status_code=status.HTTP_200_OK, headers={"ETag": f'"{stored.sha256}"'})
+
+
+# Resumable (tus) uploads
+def _tus_error(status_code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail, headers={"Tus-Resumable": TUS_VERSION})
+
+
+def _require_tus_version(tus_resumable: Optional[str] = Header(None)) -> None:
+    """412 for clients speaking another tus version"""
+    if tus_resumable != TUS_VERSION:
+        raise HTTPException(
+            status_code=status.HTTP_412_PRECONDITION_FAILED,
+            detail=f"Tus-Resumable {TUS_VERSION} required",
+            headers={"Tus-Version": TUS_VERSION}
+        )
+
+
+def _get_upload_target(db: Session, purpose: str, target_id: int, current_user: dict) -> Course:
+    """The course a resumable upload goes into (a lesson video's via its online course)"""
+    if purpose == "lesson_video":
+        lesson = db.query(OnlineLesson).filter(OnlineLesson.lesson_id == target_id).first()
+        if not lesson:
+            raise _tus_error(status.HTTP_404_NOT_FOUND, "Lesson not found")
+        return _get_uploadable_course(db, lesson.online_course.course_id, current_user)
+    return _get_uploadable_course(db, target_id, current_user)
+
+
+def _get_resumable_upload(db: Session, upload_id: str, current_user: dict):
+    try:
+        return get_upload(db, upload_id, _uploader_id(current_user))
+    except UploadNotFound:
+        raise _tus_error(status.HTTP_404_NOT_FOUND, "Upload not found")
+
+
+async def _finish_resumable_upload(db: Session, upload, current_user: dict) -> None:
+    """Store a fully received upload and record the material or the lesson video"""
+    course = _get_upload_target(db, upload.purpose, upload.target_id, current_user)
+    file_type = material_type(os.path.splitext(upload.filename)[1])
+    folder, local_folder = (
+        ("lesson_videos", "lesson_videos") if upload.purpose == "lesson_video" else ("course_materials", "materials")
+    )
+    try:
+        stored = await assemble_upload(db, upload, folder, local_folder,
+                                       resource_type=cloudinary_resource_type(file_type))
+    except Exception as e:
+        logger.error(f"❌ Resumable upload storage failed - Upload: {upload.upload_id}, Error: {str(e)}")
+        raise _tus_error(status.HTTP_500_INTERNAL_SERVER_ERROR, f"Failed to store uploaded file: {str(e)}")
+    if stored is None:
+        return  # Another request is storing it
+    
+    if upload.purpose == "lesson_video":
+        lesson = db.query(OnlineLesson).filter(OnlineLesson.lesson_id == upload.target_id).first()
+        lesson.video_url = stored.url
+        db.commit()
+        finish_upload(db, upload, lesson.lesson_id, stored.url)
+    else:
+        metadata = upload_metadata(upload)
+        material = _record_material(
+            db, course, metadata.get("title") or upload.filename, metadata.get("description"),
+            metadata.get("is_public", "").lower() == "true", file_type, stored.url, stored.size,
+            stored.storage.upper()
+        )
+        finish_upload(db, upload, material.material_id, stored.url)
+
+
+@router.options("/resumable-uploads")
+async def resumable_upload_options():
+    """tus discovery: protocol version, extensions, maximum size and checksum algorithms"""
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=discovery_headers())
+
+
+@router.post("/resumable-uploads", status_code=status.HTTP_201_CREATED)
+async def create_resumable_upload(
+    upload_length: int = Header(...),
+    upload_metadata: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"])),
+    _: None = Depends(_require_tus_version)
+):
+    """
+    Start a resumable (tus) upload of a material or a lesson video, for files
+    too large for a single request. Upload-Metadata carries filename, purpose
+    (material or lesson_video), target_id (course or lesson id) and, for
+    materials, title, description and is_public.
+    """
+    try:
+        metadata = parse_metadata(upload_metadata)
+    except InvalidUploadRequest as e:
+        raise _tus_error(status.HTTP_400_BAD_REQUEST, str(e))
+    filename = metadata.get("filename", "")
+    purpose = metadata.get("purpose", "material")
+    target_id = metadata.get("target_id", "")
+    if not filename or not target_id.isdigit() or purpose not in PURPOSES:
+        raise _tus_error(status.HTTP_400_BAD_REQUEST,
+                         "Upload-Metadata needs a filename, a target_id and purpose material or lesson_video")
+    if purpose == "lesson_video" and material_type(os.path.splitext(filename)[1]) != "video":
+        raise _tus_error(status.HTTP_400_BAD_REQUEST, "Lesson videos must be .mp4, .avi, .mov or .mkv files")
+    
+    course = _get_upload_target(db, purpose, int(target_id), current_user)
+    try:
+        upload = create_upload(
+            db, purpose, int(target_id), _uploader_id(current_user), filename, upload_length,
+            {key: metadata[key] for key in ("title", "description", "is_public") if key in metadata}
+        )
+    except InvalidUploadRequest as e:
+        raise _tus_error(status.HTTP_400_BAD_REQUEST, str(e))
+    except UploadTooLarge as e:
+        raise _tus_error(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, str(e))
+    
+    logger.info(f"Resumable upload created - User: {current_user['user'].name} ({_uploader_id(current_user)}), "
+                f"Course: {course.title}, Purpose: {purpose}, File: {filename}, Size: {upload_length} bytes, "
+                f"Upload: {upload.upload_id}")
+    return Response(
+        status_code=status.HTTP_201_CREATED,
+        headers={**upload_headers(upload), "Location": f"{UPLOAD_PATH}/{upload.upload_id}"}
+    )
+
+
+@router.head("/resumable-uploads/{upload_id}")
+async def get_resumable_upload_offset(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"])),
+    _: None = Depends(_require_tus_version)
+):
+    """Upload-Offset of a resumable upload: where to resume after a failure"""
+    upload = _get_resumable_upload(db, upload_id, current_user)
+    return Response(status_code=status.HTTP_200_OK, headers=upload_headers(upload))
+
+
+@router.get("/resumable-uploads/{upload_id}", response_model=ResumableUploadResponse)
+async def get_resumable_upload(
+    upload_id: str,
+    response: Response,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"]))
+):
+    """Status of a resumable upload, with the material or lesson it ended up in once completed"""
+    upload = _get_resumable_upload(db, upload_id, current_user)
+    response.headers["Cache-Control"] = "no-store"
+    return upload
+
+
+@router.patch("/resumable-uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_resumable_chunk(
+    upload_id: str,
+    request: Request,
+    upload_offset: int = Header(...),
+    upload_checksum: Optional[str] = Header(None),
+    content_type: Optional[str] = Header(None),
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"])),
+    _: None = Depends(_require_tus_version)
+):
+    """
+    Append the next chunk (the raw body) of a resumable upload at
+    Upload-Offset, verified against Upload-Checksum if given. The last chunk
+    stores the file and records the material or lesson video.
+    """
+    if content_type != OFFSET_CONTENT_TYPE:
+        raise _tus_error(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE, f"Content-Type must be {OFFSET_CONTENT_TYPE}")
+    upload = _get_resumable_upload(db, upload_id, current_user)
+    try:
+        checksum = parse_checksum(upload_checksum)
+    except InvalidUploadRequest as e:
+        raise _tus_error(status.HTTP_400_BAD_REQUEST, str(e))
+    
+    try:
+        await write_chunk(db, upload, upload_offset, request.stream(), checksum)
+    except OffsetMismatch as e:
+        raise _tus_error(status.HTTP_409_CONFLICT, str(e))
+    except UploadLocked:
+        raise _tus_error(status.HTTP_423_LOCKED, "Another request is writing to this upload")
+    except ChecksumMismatch as e:
+        raise _tus_error(460, str(e))  # tus: Checksum Mismatch
+    except UploadTooLarge as e:
+        raise _tus_error(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, str(e))
+    except ClientDisconnect:
+        raise _tus_error(status.HTTP_400_BAD_REQUEST, "Upload interrupted")
+    
+    if is_complete(upload):
+        await _finish_resumable_upload(db, upload, current_user)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=upload_headers(upload))
+
+
+@router.delete("/resumable-uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def terminate_resumable_upload(
+    upload_id: str,
+    db: Session = Depends(get_db),
+    current_user=Depends(require_role(["teacher", "admin"])),
+    _: None = Depends(_require_tus_version)
+):
+    """Abandon a resumable upload and delete what was received"""
+    upload = _get_resumable_upload(db, upload_id, current_user)
+    try:
+        terminate_upload(db, upload)
+    except UploadLocked:
+        raise _tus_error(status.HTTP_423_LOCKED, "Another request is writing to this upload")
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Tus-Resumable": TUS_VERSION})
+
+
 @router.get("/courses/{course_id}/materials", response_model=List[MaterialResponse])
 async def get_course_materials(
     course_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    """Get all materials for a course"""
+    """Get all materials for a course (supports conditional GET)"""
     
     # Verify course exists
     course = db.query(Course).filter(Course.course_id == course_id).first()
@@ -254,6 +538,12 @@ async def get_course_materials(
             detail="Course not found"
         )
     
+    cached = not_modified(request, response, resource_version(
+        db, Material, Material.course_id == course_id, changed_at=[Material.upload_date]
+    ))
+    if cached:
+        return cached
+    
     # Get materials
     materials = db.query(Material).filter(
         Material.course_id == course_id
@@ -384,10 +674,12 @@ async def create_announcement(
 @router.get("/courses/{course_id}/announcements", response_model=List[AnnouncementResponse])
 async def get_course_announcements(
     course_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    """Get all announcements for a course"""
+    """Get all announcements for a course (supports conditional GET)"""
     
     # Verify course exists
     course = db.query(Course).filter(Course.course_id == course_id).first()
@@ -397,6 +689,13 @@ async def get_course_announcements(
             detail="Course not found"
         )
     
+    cached = not_modified(request, response, resource_version(
+        db, Announcement, Announcement.course_id == course_id,
+        changed_at=[Announcement.updated_at, Announcement.posted_on]
+    ))
+    if cached:
+        return cached
+    
     # Get announcements
     announcements = db.query(Announcement).filter(
         Announcement.course_id == course_id
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from sqlalchemy import and_, or_
 from typing import List, Optional
@@ -16,6 +16,7 @@ from app.models.models import (
     teacher_course_association
 )
 from app.api.auth import get_current_user, require_role
+from app.services.conditional_get import not_modified, resource_version
 
 
 # Pydantic models for API
@@ -275,10 +276,12 @@ async def create_lesson(
 @router.get("/{online_course_id}/lessons", response_model=List[OnlineLessonResponse])
 async def get_lessons(
     online_course_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(get_db),
     current_user=Depends(get_current_user)
 ):
-    """Get all lessons for an online course"""
+    """Get all lessons for an online course (supports conditional GET)"""
     # Get the online course and its linked course_id
     online_course = db.query(OnlineCourse).filter(
         OnlineCourse.online_course_id == online_course_id
@@ -287,6 +290,9 @@ async def get_lessons(
     if not online_course:
         raise HTTPException(status_code=404, detail="Online course not found")
     
+    # Enrolled students, teachers and admins see every lesson
+    criteria = [OnlineLesson.online_course_id == online_course_id]
+    
     # Check if user has access to this course
     if current_user["user_type"] == "student":
         enrollment = db.query(Enrollment).filter(
@@ -298,22 +304,14 @@ async def get_lessons(
         
         if not enrollment or not enrollment.paid:
             # Return only preview lessons for non-enrolled students
-            lessons = db.query(OnlineLesson).filter(
-                and_(
-                    OnlineLesson.online_course_id == online_course_id,
-                    OnlineLesson.is_preview == True
-                )
-            ).order_by(OnlineLesson.lesson_order).all()
-        else:
-            # Return all lessons for enrolled students
-            lessons = db.query(OnlineLesson).filter(
-                OnlineLesson.online_course_id == online_course_id
-            ).order_by(OnlineLesson.lesson_order).all()
-    else:
-        # Teachers and admins can see all lessons
-        lessons = db.query(OnlineLesson).filter(
-            OnlineLesson.online_course_id == online_course_id
-        ).order_by(OnlineLesson.lesson_order).all()
+            criteria.append(OnlineLesson.is_preview == True)
+    
+    variant = "preview" if len(criteria) > 1 else "all"
+    cached = not_modified(request, response, resource_version(db, OnlineLesson, *criteria), variant=variant)
+    if cached:
+        return cached
+    
+    lessons = db.query(OnlineLesson).filter(*criteria).order_by(OnlineLesson.lesson_order).all()
     
     return lessons
 
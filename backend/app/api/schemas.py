@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import Any, Dict, Optional
 from datetime import datetime
 
 
@@ -121,4 +121,31 @@ class ChangePassword(BaseModel):
 class Message(BaseModel):
     """Generic message response"""
     message: str
-    success: bool = True
\ No newline at end of file
+    success: bool = True
+
+class UploadIntentRequest(BaseModel):
+    """A file the client wants to upload straight to storage"""
+    filename: str = Field(..., min_length=1, max_length=255)
+
+
+class UploadIntentResponse(BaseModel):
+    """Signed parameters for a direct upload (see app.services.direct_uploads)"""
+    intent_token: str
+    storage: str  # cloudinary, local
+    method: str  # POST: multipart form with ``fields`` plus ``file``; PUT: raw body
+    upload_url: str
+    fields: Dict[str, Any] = {}
+    expires_at: datetime
+    max_bytes: int
+
+    class Config:
+        from_attributes = True
+
+
+class CloudinaryUploadResult(BaseModel):
+    """The parts of Cloudinary's upload response needed to verify it"""
+    public_id: str
+    version: int
+    signature: str
+    secure_url: str
+    bytes: Optional[int] = None
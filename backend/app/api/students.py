@@ -1,17 +1,22 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query, Form, File, UploadFile
 from sqlalchemy.orm import Session
-from sqlalchemy import desc, and_
+from sqlalchemy import and_
 from typing import List, Optional
-from datetime import datetime, timedelta
+from datetime import datetime
 from pydantic import BaseModel
 
 from app.core.database import get_db
 from app.api.auth import get_current_user, require_role
 from app.models.models import (
     Student, Teacher, Course, Enrollment, Assignment, 
-    AssignmentSubmission, Material, Announcement
+    AssignmentSubmission, Announcement
 )
-from app.utils.cloudinary_helper import upload_file
+from app.api.schemas import CloudinaryUploadResult, UploadIntentRequest, UploadIntentResponse
+from app.services.direct_uploads import InvalidUploadIntent, complete_intent, create_intent, read_intent
+from app.services.student_dashboard import (
+    assignments_with_status, recent_materials, student_dashboard, upcoming_assignments
+)
+from app.services.uploads import UploadTooLarge, spool_upload, store_upload
 
 
 # Pydantic models
@@ -118,48 +123,8 @@ async def get_student_assignments(
             Enrollment.student_id == student_id
         ).all()]
         
-        # Get assignments for those courses
-        assignments = db.query(Assignment).join(
-            Course, Assignment.course_id == Course.course_id
-        ).filter(Assignment.course_id.in_(enrolled_course_ids)).order_by(
-            desc(Assignment.due_date)
-        ).all()
-        
-        result = []
-        for assignment in assignments:
-            # Get submission status
-            submission = db.query(AssignmentSubmission).filter(
-                and_(
-                    AssignmentSubmission.assignment_id == assignment.assignment_id,
-                    AssignmentSubmission.student_id == student_id
-                )
-            ).first()
-            
-            submission_status = "pending"
-            grade = None
-            if submission:
-                submission_status = "submitted"
-                grade = submission.grade
-            else:
-                # Check if assignment is overdue
-                now = datetime.now()
-                due_date = getattr(assignment, 'due_date', None)
-                if due_date is not None and due_date < now:
-                    submission_status = "overdue"
-            
-            result.append({
-                "assignment_id": assignment.assignment_id,
-                "course_id": assignment.course_id,
-                "title": assignment.title,
-                "description": assignment.description,
-                "due_date": assignment.due_date.isoformat(),
-                "max_points": assignment.max_points,
-                "course_title": assignment.course.title,
-                "submission_status": submission_status,
-                "grade": grade
-            })
-        
-        return result
+        # Assignments with the student's submission status, in two queries
+        return assignments_with_status(db, student_id, enrolled_course_ids)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -181,40 +146,8 @@ async def get_upcoming_assignments(
             Enrollment.student_id == student_id
         ).all()]
         
-        # Get upcoming assignments (next 30 days)
-        upcoming_date = datetime.now() + timedelta(days=30)
-        assignments = db.query(Assignment).join(
-            Course, Assignment.course_id == Course.course_id
-        ).filter(
-            and_(
-                Assignment.course_id.in_(enrolled_course_ids),
-                Assignment.due_date >= datetime.now(),
-                Assignment.due_date <= upcoming_date
-            )
-        ).order_by(Assignment.due_date).all()
-        
-        result = []
-        for assignment in assignments:
-            # Check if already submitted
-            submission = db.query(AssignmentSubmission).filter(
-                and_(
-                    AssignmentSubmission.assignment_id == assignment.assignment_id,
-                    AssignmentSubmission.student_id == student_id
-                )
-            ).first()
-            
-            if not submission:  # Only include if not submitted
-                result.append({
-                    "assignment_id": assignment.assignment_id,
-                    "course_id": assignment.course_id,
-                    "title": assignment.title,
-                    "description": assignment.description,
-                    "due_date": assignment.due_date.isoformat(),
-                    "max_points": assignment.max_points,
-                    "course_title": assignment.course.title
-                })
-        
-        return result
+        # Unsubmitted assignments due in the next 30 days
+        return upcoming_assignments(db, student_id, enrolled_course_ids, days=30)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -238,29 +171,7 @@ async def get_recent_materials(
         ).all()]
         
         # Get recent materials from enrolled courses
-        materials = db.query(Material).join(
-            Course, Material.course_id == Course.course_id
-        ).filter(
-            and_(
-                Material.course_id.in_(enrolled_course_ids),
-                Material.is_public == True
-            )
-        ).order_by(desc(Material.upload_date)).limit(limit).all()
-        
-        result = []
-        for material in materials:
-            result.append({
-                "material_id": material.material_id,
-                "course_id": material.course_id,
-                "title": material.title,
-                "type": material.type,
-                "url": material.url,
-                "description": material.description,
-                "upload_date": material.upload_date.isoformat(),
-                "course_title": material.course.title
-            })
-        
-        return result
+        return recent_materials(db, enrolled_course_ids, limit=limit)
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -268,6 +179,134 @@ async def get_recent_materials(
         )
 
 
+@router.get("/me/dashboard")
+async def get_my_dashboard(
+    current_user=Depends(require_role(["student"]))
+):
+    """
+    Everything the student home page shows in one payload: enrollments,
+    assignments with submission status, upcoming assignments, recent
+    materials, attendance stats and the unread notification count. Cached
+    briefly per student (see student_dashboard).
+    """
+    try:
+        return await student_dashboard.get(current_user["user"].student_id)
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching student dashboard: {str(e)}"
+        )
+
+
+class SubmissionUploadComplete(BaseModel):
+    """Completion callback for a direct submission upload"""
+    intent_token: str
+    submission_text: Optional[str] = None
+    cloudinary: Optional[CloudinaryUploadResult] = None  # Cloudinary's upload response, when storage is cloudinary
+
+
+def _get_submittable_assignment(db: Session, assignment_id: int, student_id: int) -> Assignment:
+    """The assignment, if the student is enrolled in its course and has not submitted it yet"""
+    # Get the assignment
+    assignment = db.query(Assignment).filter(
+        Assignment.assignment_id == assignment_id
+    ).first()
+    
+    if not assignment:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Assignment not found"
+        )
+    
+    # Verify student is enrolled in the course
+    enrollment = db.query(Enrollment).filter(
+        and_(
+            Enrollment.student_id == student_id,
+            Enrollment.course_id == assignment.course_id
+        )
+    ).first()
+    
+    if not enrollment:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You are not enrolled in this course"
+        )
+    
+    # Check if already submitted
+    existing_submission = db.query(AssignmentSubmission).filter(
+        and_(
+            AssignmentSubmission.assignment_id == assignment_id,
+            AssignmentSubmission.student_id == student_id
+        )
+    ).first()
+    
+    if existing_submission:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="You have already submitted this assignment. Please contact your teacher to resubmit."
+        )
+    return assignment
+
+
+def _submission_created(submission: AssignmentSubmission) -> dict:
+    return {
+        "message": "Assignment submitted successfully",
+        "submission_id": submission.submission_id,  # type: ignore
+        "submitted_at": submission.submitted_at.isoformat()  # type: ignore
+    }
+
+
+def _record_submission(db: Session, assignment: Assignment, student_id: int, submission_text: Optional[str],
+                       file_url: Optional[str]) -> dict:
+    """Create the submission row and notify the teacher"""
+    assignment_id = assignment.assignment_id
+    submission = AssignmentSubmission(
+        assignment_id=assignment_id,
+        student_id=student_id,
+        submission_text=submission_text,
+        file_url=file_url,
+        submitted_at=datetime.now()
+    )
+    
+    db.add(submission)
+    db.commit()
+    db.refresh(submission)
+    student_dashboard.invalidate(student_id)
+    
+    # Send notification to teacher about new submission
+    try:
+        from app.services.notification_service import NotificationService
+        from app.models.notification_models import NotificationType, NotificationPriority
+        from app.models.models import Course
+        
+        # Get the course and teacher
+        course = db.query(Course).filter(Course.course_id == assignment.course_id).first()  # type: ignore
+        if course and course.admin_id:  # type: ignore
+            notification_service = NotificationService(db)
+            
+            # Get student name
+            student = db.query(Student).filter(Student.student_id == student_id).first()
+            student_name = f"{student.first_name} {student.last_name}" if student else "A student"  # type: ignore
+            
+            notification_service.create_notification(
+                user_id=course.admin_id,  # type: ignore
+                user_type="teacher",
+                notification_type=NotificationType.ASSIGNMENT_CREATED,  # Using this for submission notification
+                title=f"New Submission: {assignment.title}",  # type: ignore
+                message=f"{student_name} submitted {assignment.title} in {course.title}",  # type: ignore
+                priority=NotificationPriority.MEDIUM,
+                action_url=f"/dashboard/teacher/assignments/{assignment_id}/submissions",
+                action_text="View Submissions",
+                related_assignment_id=assignment_id,
+                related_course_id=assignment.course_id  # type: ignore
+            )
+    except Exception as e:
+        print(f"Failed to send submission notification: {e}")
+        # Don't fail the submission if notification fails
+    
+    return _submission_created(submission)
+
+
 @router.post("/assignments/{assignment_id}/submit")
 async def submit_assignment(
     assignment_id: int,
@@ -279,45 +318,7 @@ async def submit_assignment(
     """Submit an assignment with optional text and file attachment"""
     try:
         student_id = current_user["user"].student_id
-        
-        # Get the assignment
-        assignment = db.query(Assignment).filter(
-            Assignment.assignment_id == assignment_id
-        ).first()
-        
-        if not assignment:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Assignment not found"
-            )
-        
-        # Verify student is enrolled in the course
-        enrollment = db.query(Enrollment).filter(
-            and_(
-                Enrollment.student_id == student_id,
-                Enrollment.course_id == assignment.course_id
-            )
-        ).first()
-        
-        if not enrollment:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You are not enrolled in this course"
-            )
-        
-        # Check if already submitted
-        existing_submission = db.query(AssignmentSubmission).filter(
-            and_(
-                AssignmentSubmission.assignment_id == assignment_id,
-                AssignmentSubmission.student_id == student_id
-            )
-        ).first()
-        
-        if existing_submission:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="You have already submitted this assignment. Please contact your teacher to resubmit."
-            )
+        assignment = _get_submittable_assignment(db, assignment_id, student_id)
         
         # Validate that at least one submission method is used
         if not submission_text and not file:
@@ -326,75 +327,92 @@ async def submit_assignment(
                 detail="Please provide either submission text or a file"
             )
         
-        # Upload file if provided
+        # Upload file if provided: streamed to a temporary file, then stored off the event loop
         file_url = None
         if file:
             try:
-                # Read file content
-                content = await file.read()
-                
-                # Upload to Cloudinary
-                result = upload_file(
-                    file_content=content,
-                    folder="assignment_submissions",
-                    resource_type="auto"
+                upload = await spool_upload(file)
+            except UploadTooLarge as e:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=str(e)
                 )
-                file_url = result.get("secure_url")
+            try:
+                stored = await store_upload(upload, folder="assignment_submissions",
+                                            local_folder="assignment_submissions")
+                file_url = stored.url
             except Exception as e:
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
                     detail=f"Error uploading file: {str(e)}"
                 )
         
-        # Create submission record
-        submission = AssignmentSubmission(
-            assignment_id=assignment_id,
-            student_id=student_id,
-            submission_text=submission_text,
-            file_url=file_url,
-            submitted_at=datetime.now()
-        )
-        
-        db.add(submission)
-        db.commit()
-        db.refresh(submission)
+        return _record_submission(db, assignment, student_id, submission_text, file_url)
         
-        # Send notification to teacher about new submission
+    except HTTPException:
+        raise
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error submitting assignment: {str(e)}"
+        )
+
+
+@router.post("/assignments/{assignment_id}/submit/upload-intent", response_model=UploadIntentResponse)
+async def create_submission_upload_intent(
+    assignment_id: int,
+    intent_request: UploadIntentRequest,
+    current_user=Depends(require_role(["student"])),
+    db: Session = Depends(get_db)
+):
+    """
+    Signed parameters to upload a submission file straight to storage.
+    Finish with /assignments/{assignment_id}/submit/complete-upload.
+    """
+    student_id = current_user["user"].student_id
+    _get_submittable_assignment(db, assignment_id, student_id)
+    return create_intent(
+        "submission", assignment_id, f"student:{student_id}", intent_request.filename,
+        folder="assignment_submissions", local_folder="assignment_submissions"
+    )
+
+
+@router.post("/assignments/{assignment_id}/submit/complete-upload")
+async def complete_submission_upload(
+    assignment_id: int,
+    completion: SubmissionUploadComplete,
+    current_user=Depends(require_role(["student"])),
+    db: Session = Depends(get_db)
+):
+    """Record the submission for a finished direct upload (safe to retry)"""
+    try:
+        student_id = current_user["user"].student_id
         try:
-            from app.services.notification_service import NotificationService
-            from app.models.notification_models import NotificationType, NotificationPriority
-            from app.models.models import Course
-            
-            # Get the course and teacher
-            course = db.query(Course).filter(Course.course_id == assignment.course_id).first()  # type: ignore
-            if course and course.admin_id:  # type: ignore
-                notification_service = NotificationService(db)
-                
-                # Get student name
-                student = db.query(Student).filter(Student.student_id == student_id).first()
-                student_name = f"{student.first_name} {student.last_name}" if student else "A student"  # type: ignore
-                
-                notification_service.create_notification(
-                    user_id=course.admin_id,  # type: ignore
-                    user_type="teacher",
-                    notification_type=NotificationType.ASSIGNMENT_CREATED,  # Using this for submission notification
-                    title=f"New Submission: {assignment.title}",  # type: ignore
-                    message=f"{student_name} submitted {assignment.title} in {course.title}",  # type: ignore
-                    priority=NotificationPriority.MEDIUM,
-                    action_url=f"/dashboard/teacher/assignments/{assignment_id}/submissions",
-                    action_text="View Submissions",
-                    related_assignment_id=assignment_id,
-                    related_course_id=assignment.course_id  # type: ignore
-                )
-        except Exception as e:
-            print(f"Failed to send submission notification: {e}")
-            # Don't fail the submission if notification fails
+            claims = read_intent(completion.intent_token, "submission", assignment_id, f"student:{student_id}")
+            uploaded = complete_intent(claims, completion.cloudinary.dict() if completion.cloudinary else None)
+        except InvalidUploadIntent as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=str(e)
+            )
+        except UploadTooLarge as e:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=str(e)
+            )
         
-        return {
-            "message": "Assignment submitted successfully",
-            "submission_id": submission.submission_id,  # type: ignore
-            "submitted_at": submission.submitted_at.isoformat()  # type: ignore
-        }
+        # A retried callback finds the submission it already recorded
+        existing = db.query(AssignmentSubmission).filter(
+            AssignmentSubmission.assignment_id == assignment_id,
+            AssignmentSubmission.student_id == student_id,
+            AssignmentSubmission.file_url == uploaded.url
+        ).first()
+        if existing:
+            return _submission_created(existing)
+        
+        assignment = _get_submittable_assignment(db, assignment_id, student_id)
+        return _record_submission(db, assignment, student_id, completion.submission_text, uploaded.url)
         
     except HTTPException:
         raise
@@ -11,7 +11,11 @@ from app.models.models import (
     Teacher, Student, Course, Enrollment, Assignment, 
     AssignmentSubmission, Attendance
 )
+from app.models.email_models import EmailPreference
 from app.services.notification_service import notify_assignment_created
+from app.services.email_service import email_service
+from app.services.email_outbox import enqueue_email
+from app.services.student_dashboard import student_dashboard
 from app.utils.cloudinary_helper import upload_file
 
 router = APIRouter()
@@ -435,6 +439,30 @@ async def grade_assignment_submission(
         submission.graded_at = datetime.now()  # type: ignore
         submission.graded_by_id = teacher_id  # type: ignore
         
+        # Queue the grade email in the same transaction as the grade
+        try:
+            student = submission.student
+            preference = db.query(EmailPreference).filter(EmailPreference.email == student.email).first()
+            if not preference or (preference.email_notifications_enabled and preference.grade_notifications):
+                subject, html_content = email_service.render_grade_notification(
+                    student.name, assignment.title, grade_data.grade, assignment.max_points, grade_data.feedback  # type: ignore
+                )
+                enqueue_email(
+                    db,
+                    recipient_email=student.email,  # type: ignore
+                    subject=subject,
+                    html_content=html_content,
+                    email_type="grade",
+                    recipient_name=student.name,  # type: ignore
+                    recipient_type="student",
+                    recipient_id=student.student_id,  # type: ignore
+                    course_id=assignment.course_id,  # type: ignore
+                    assignment_id=assignment_id
+                )
+        except Exception as e:
+            print(f"Failed to queue grade email: {e}")
+            # Don't fail the grading if the email cannot be built
+        
         db.commit()
         db.refresh(submission)
         
@@ -459,6 +487,9 @@ async def grade_assignment_submission(
             print(f"Failed to send grading notification: {e}")
             # Don't fail the grading if notification fails
         
+        # The grade and its notification are both on the student's dashboard
+        student_dashboard.invalidate(submission.student_id)  # type: ignore
+        
         return {
             "message": "Assignment graded successfully",
             "submission_id": submission.submission_id,
@@ -16,6 +16,21 @@ class Settings:
     # Celery
     celery_broker_url: str = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
     celery_result_backend: str = os.getenv("CELERY_RESULT_BACKEND", "redis://localhost:6379/0")
+    celery_queue_concurrency: str = os.getenv(
+        "CELERY_QUEUE_CONCURRENCY", "interactive=4,notifications=4,bulk-reports=2,maintenance=1"
+    )  # Worker processes per queue
+    admin_stats_refresh_seconds: int = int(os.getenv("ADMIN_STATS_REFRESH_SECONDS", "300"))  # Dashboard snapshot refresh interval
+    analytics_cache_ttl_seconds: int = int(os.getenv("ANALYTICS_CACHE_TTL_SECONDS", "60"))
+    analytics_cache_stale_seconds: int = int(os.getenv("ANALYTICS_CACHE_STALE_SECONDS", "600"))  # Served stale while refreshing
+    user_search_min_similarity: float = float(os.getenv("USER_SEARCH_MIN_SIMILARITY", "0.3"))  # Trigram match threshold
+    user_search_rebuild_seconds: int = int(os.getenv("USER_SEARCH_REBUILD_SECONDS", "300"))  # In-process index (non-PostgreSQL)
+    course_seats_reconcile_seconds: int = int(os.getenv("COURSE_SEATS_RECONCILE_SECONDS", "600"))  # Also promotes waitlists
+    course_search_rebuild_seconds: int = int(os.getenv("COURSE_SEARCH_REBUILD_SECONDS", "300"))  # In-process index (non-PostgreSQL)
+    schedule_index_rebuild_seconds: int = int(os.getenv("SCHEDULE_INDEX_REBUILD_SECONDS", "300"))  # In-process index (non-PostgreSQL)
+    etag_max_body_bytes: int = int(os.getenv("ETAG_MAX_BODY_BYTES", str(1024 * 1024)))  # Larger responses are streamed without an ETag
+    student_dashboard_cache_seconds: int = int(os.getenv("STUDENT_DASHBOARD_CACHE_SECONDS", "30"))  # Per-student dashboard payload
+    student_dashboard_workers: int = int(os.getenv("STUDENT_DASHBOARD_WORKERS", "4"))  # Threads (and connections) for dashboard sections
+    job_lease_seconds: int = int(os.getenv("JOB_LEASE_SECONDS", "900"))  # Periodic job leases expire unless renewed
     
     # JWT
     secret_key: str = os.getenv("SECRET_KEY", "your-secret-key-change-this-in-production")
@@ -28,12 +43,44 @@ class Settings:
     mail_from_name: str = os.getenv("MAIL_FROM_NAME", "College Prep Platform")
     smtp_port: int = int(os.getenv("SMTP_PORT", "587"))
     smtp_server: str = os.getenv("SMTP_SERVER", "smtp.gmail.com")
+    smtp_starttls: bool = os.getenv("SMTP_STARTTLS", "True").lower() == "true"
+    smtp_pool_size: int = int(os.getenv("SMTP_POOL_SIZE", "4"))  # Connections per SMTP server
+    smtp_max_messages_per_connection: int = int(os.getenv("SMTP_MAX_MESSAGES_PER_CONNECTION", "100"))
+    smtp_max_recipients_per_message: int = int(os.getenv("SMTP_MAX_RECIPIENTS_PER_MESSAGE", "50"))
+    smtp_idle_timeout_seconds: float = float(os.getenv("SMTP_IDLE_TIMEOUT_SECONDS", "60"))
+    smtp_warm_connections: int = int(os.getenv("SMTP_WARM_CONNECTIONS", "1"))  # Opened at worker start
+    smtp_rate_per_second: float = float(os.getenv("SMTP_RATE_PER_SECOND", "0"))  # 0 = provider default
+    smtp_rate_burst: int = int(os.getenv("SMTP_RATE_BURST", "0"))  # 0 = provider default
+    smtp_interactive_rate_share: float = float(os.getenv("SMTP_INTERACTIVE_RATE_SHARE", "0.2"))  # Allowance reserved for password resets
+    smtp_inline_max_wait_seconds: float = float(os.getenv("SMTP_INLINE_MAX_WAIT_SECONDS", "2"))  # Request-path sends stay queued rather than wait longer
+    smtp_rate_local_share: int = int(os.getenv("SMTP_RATE_LOCAL_SHARE", "1"))  # Worker processes splitting the rate when Redis is down
+    email_outbox_batch_size: int = int(os.getenv("EMAIL_OUTBOX_BATCH_SIZE", "50"))
+    email_outbox_max_batches: int = int(os.getenv("EMAIL_OUTBOX_MAX_BATCHES", "20"))  # Per worker run
+    email_send_lease_seconds: int = int(os.getenv("EMAIL_SEND_LEASE_SECONDS", "300"))  # A "sending" row is reclaimed after this
+    email_retry_base_seconds: int = int(os.getenv("EMAIL_RETRY_BASE_SECONDS", "60"))
+    email_retry_max_seconds: int = int(os.getenv("EMAIL_RETRY_MAX_SECONDS", "3600"))
+    email_dedup_ttl_seconds: int = int(os.getenv("EMAIL_DEDUP_TTL_SECONDS", "600"))
+    email_template_cache_seconds: int = int(os.getenv("EMAIL_TEMPLATE_CACHE_SECONDS", "300"))  # Database template edits show up after this
+    email_stats_refresh_seconds: int = int(os.getenv("EMAIL_STATS_REFRESH_SECONDS", "300"))  # Full reload picks up other processes' changes
+    monthly_report_chunk_size: int = int(os.getenv("MONTHLY_REPORT_CHUNK_SIZE", "200"))  # Reports sent per checkpoint
+    monthly_report_max_attempts: int = int(os.getenv("MONTHLY_REPORT_MAX_ATTEMPTS", "3"))  # Sends before a report is marked failed
+    monthly_report_send_lease_seconds: int = int(os.getenv("MONTHLY_REPORT_SEND_LEASE_SECONDS", "1800"))  # A "sending" report is reclaimed after this
+    notification_digest_url: str = os.getenv("NOTIFICATION_DIGEST_URL", "http://localhost:3000/notifications")
+    notification_digest_chunk_size: int = int(os.getenv("NOTIFICATION_DIGEST_CHUNK_SIZE", "200"))  # Users per digest task
+    bulk_notification_chunk_size: int = int(os.getenv("BULK_NOTIFICATION_CHUNK_SIZE", "500"))  # Notifications per task
+    bulk_notification_inline_limit: int = int(os.getenv("BULK_NOTIFICATION_INLINE_LIMIT", "100"))  # Larger audiences go to Celery
     password_reset_url: str = os.getenv("PASSWORD_RESET_URL", "http://localhost:3000/reset-password")
     password_reset_token_expire_hours: int = int(os.getenv("PASSWORD_RESET_TOKEN_EXPIRE_HOURS", "24"))
     
     # File Upload
     upload_dir: str = "uploads"
     max_file_size: int = 10485760  # 10MB
+    upload_spool_dir: str = os.getenv("UPLOAD_SPOOL_DIR", "")  # Uploads in progress (empty: system temp dir)
+    upload_intent_expire_seconds: int = int(os.getenv("UPLOAD_INTENT_EXPIRE_SECONDS", "900"))  # Signed direct-upload parameters
+    direct_upload_max_file_size: int = int(os.getenv("DIRECT_UPLOAD_MAX_FILE_SIZE", str(500 * 1024 * 1024)))  # Not proxied through the API
+    resumable_upload_dir: str = os.getenv("RESUMABLE_UPLOAD_DIR", "resumable_uploads")  # Partial tus uploads (not served)
+    resumable_upload_max_size: int = int(os.getenv("RESUMABLE_UPLOAD_MAX_SIZE", str(5 * 1024 * 1024 * 1024)))  # Lesson videos
+    resumable_upload_expire_hours: int = int(os.getenv("RESUMABLE_UPLOAD_EXPIRE_HOURS", "24"))  # Since the last chunk received
     
     # QR Code
     qr_code_dir: str = "qr_codes"
@@ -3,6 +3,8 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.core.config import settings
 from app.core.database import engine, Base
+from app.services.conditional_get import ETagMiddleware
+from app.services.uploads import UploadSizeLimitMiddleware
 import os
 
 # Import models to ensure they are registered with SQLAlchemy
@@ -30,6 +32,9 @@ app = FastAPI(
     redoc_url="/redoc",
 )
 
+# Reject oversized multipart uploads while they stream in (inside CORS, so browsers can read the 413)
+app.add_middleware(UploadSizeLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -40,6 +45,9 @@ app.add_middleware(
     expose_headers=["*"],
 )
 
+# Weak ETags (and 304s) for JSON GET responses that do not set their own validators
+app.add_middleware(ETagMiddleware)
+
 
 @app.get("/")
 async def root():
@@ -56,6 +64,7 @@ from app.api import auth, courses, attendance, admin, students, teachers, parent
 
 app.include_router(auth.router, prefix="/api/v1/auth", tags=["authentication"])
 app.include_router(email_routes.router, prefix="/api/v1/auth", tags=["email"])
+app.include_router(email_routes.admin_router, prefix="/api/v1/admin", tags=["email"])
 app.include_router(courses.router, prefix="/api/v1/courses", tags=["courses"])
 app.include_router(online_courses.router, prefix="/api/v1/online-courses", tags=["online-courses"])
 app.include_router(attendance.router, prefix="/api/v1/attendance", tags=["attendance"])
@@ -6,6 +6,7 @@ from .models import (
     Parent,
     Course,
     Enrollment,
+    CourseWaitlistEntry,
     Material,
     ClassChat,
     ChatMessage,
@@ -33,7 +34,31 @@ from .email_models import (
     PasswordResetToken,
     EmailLog,
     MonthlyReport,
+    MonthlyReportRun,
+    JobLease,
     EmailPreference,
     EmailTemplate,
     EmailStatusEnum,
-)
\ No newline at end of file
+)
+
+from .analytics_models import (
+    DashboardStats,
+    RevenueMonthlySummary,
+)
+
+from .activity_models import (
+    ActivityEvent,
+)
+
+from .search_models import (
+    UserDirectoryEntry,
+)
+
+from .upload_models import (
+    ResumableUpload,
+)
+
+# Session hooks that must see every write, whichever process makes it (API,
+# Celery workers, scripts); imported last since they use the models above
+from app.services import activity_log as _activity_log  # noqa: E402,F401
+from app.services import user_search as _user_search  # noqa: E402,F401
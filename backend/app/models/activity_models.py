@@ -0,0 +1,31 @@
+"""
+Activity Models - Append-only log of platform activity
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Index
+from app.core.database import Base
+
+
+class ActivityEvent(Base):
+    """One change to an enrollment, payment, user, course or grade; rows are never updated"""
+    __tablename__ = "activity_events"
+
+    event_id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True, autoincrement=True)
+    occurred_at = Column(DateTime, nullable=False)  # UTC, time of the flush that made the change
+    event_type = Column(String(50), nullable=False)  # enrollment_created, payment_received, user_registered, ...
+    entity_type = Column(String(30), nullable=False)  # enrollment, payment, student, course, submission, ...
+    entity_id = Column(Integer, nullable=False)
+    user_type = Column(String(20), nullable=True)  # The user the event is about (student enrolled, user registered)
+    user_id = Column(Integer, nullable=True)
+    user_name = Column(String(100), nullable=True)
+    actor_type = Column(String(20), nullable=True)  # Authenticated user who made the change, if any
+    actor_id = Column(Integer, nullable=True)
+    description = Column(String(255), nullable=False)
+    details = Column(Text, nullable=True)  # JSON: changed fields as {"field": [old, new]} and event data
+
+    __table_args__ = (
+        Index("ix_activity_events_occurred_at_event_id", "occurred_at", "event_id"),  # Recent feed (keyset)
+        Index("ix_activity_events_type_occurred_at", "event_type", "occurred_at", "event_id"),
+        Index("ix_activity_events_entity", "entity_type", "entity_id", "event_id"),  # Audit trail per record
+        Index("ix_activity_events_user", "user_type", "user_id", "event_id"),
+    )
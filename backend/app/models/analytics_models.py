@@ -0,0 +1,34 @@
+"""
+Analytics Models - Precomputed summaries behind the admin dashboard
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Float
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class DashboardStats(Base):
+    """Single-row snapshot of the admin dashboard counters, refreshed periodically"""
+    __tablename__ = "dashboard_stats"
+
+    stats_id = Column(Integer, primary_key=True)  # Always 1
+    total_students = Column(Integer, default=0, nullable=False)
+    total_teachers = Column(Integer, default=0, nullable=False)
+    total_courses = Column(Integer, default=0, nullable=False)
+    active_enrollments = Column(Integer, default=0, nullable=False)
+    pending_payments = Column(Integer, default=0, nullable=False)
+    total_revenue = Column(Float, default=0.0, nullable=False)
+    monthly_revenue = Column(Float, default=0.0, nullable=False)  # Paid in the 30 days before refreshed_at
+    average_attendance = Column(Float, default=0.0, nullable=False)
+    refreshed_at = Column(DateTime, nullable=False)
+
+
+class RevenueMonthlySummary(Base):
+    """Paid enrollments and revenue per course per month, rebuilt on every refresh"""
+    __tablename__ = "revenue_monthly_summary"
+
+    month = Column(String(7), primary_key=True)  # YYYY-MM of paid_date
+    course_id = Column(Integer, primary_key=True)
+    paid_enrollments = Column(Integer, default=0, nullable=False)
+    revenue = Column(Float, default=0.0, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now())
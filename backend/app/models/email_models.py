@@ -2,7 +2,7 @@
 Email System Models - Database models for password reset tokens, email logs, and reports
 """
 
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Enum
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Float, Text, ForeignKey, Enum, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -13,9 +13,11 @@ import enum
 class EmailStatusEnum(str, enum.Enum):
     """Email sending status"""
     PENDING = "pending"
+    SENDING = "sending"  # Claimed by an outbox worker until next_retry_at
     SENT = "sent"
     FAILED = "failed"
     BOUNCED = "bounced"
+    SUPPRESSED = "suppressed"  # Duplicate of an email sent moments earlier
 
 
 class PasswordResetToken(Base):
@@ -46,19 +48,22 @@ class EmailLog(Base):
     recipient_id = Column(Integer, nullable=True, index=True)
     subject = Column(String(255), nullable=False)
     email_type = Column(String(50), nullable=False, index=True)  # welcome, password_reset, assignment, grade, notification, report
-    status = Column(String(20), default=EmailStatusEnum.PENDING, index=True)  # pending, sent, failed, bounced
+    status = Column(String(20), default=EmailStatusEnum.PENDING, index=True)  # pending, sending, sent, failed, bounced, suppressed
     error_message = Column(Text, nullable=True)
     sent_at = Column(DateTime(timezone=True), nullable=True)
     attempted_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
     retry_count = Column(Integer, default=0)
     max_retries = Column(Integer, default=3)
-    next_retry_at = Column(DateTime(timezone=True), nullable=True)
+    next_retry_at = Column(DateTime(timezone=True), nullable=True)  # Pending: when due; sending: when the claim lapses
     
     # Additional context
     course_id = Column(Integer, ForeignKey("courses.course_id"), nullable=True)
     assignment_id = Column(Integer, ForeignKey("assignments.assignment_id"), nullable=True)
     notification_id = Column(Integer, ForeignKey("notifications.notification_id"), nullable=True)
     
+    # Rendered body, stored so the outbox worker can (re)send it
+    html_content = Column(Text, nullable=True)
+
     # Email content hash for deduplication
     content_hash = Column(String(64), nullable=True)
     
@@ -67,6 +72,11 @@ class EmailLog(Base):
     clicked_at = Column(DateTime(timezone=True), nullable=True)
     unsubscribed_at = Column(DateTime(timezone=True), nullable=True)
 
+    __table_args__ = (
+        # Outbox workers scan for pending rows that are due for (re)delivery
+        Index("ix_email_logs_outbox", "status", "next_retry_at"),
+    )
+
 
 class MonthlyReport(Base):
     """Track monthly report generations"""
@@ -93,6 +103,7 @@ class MonthlyReport(Base):
     students_count = Column(Integer, nullable=True)  # For teachers
     assignments_graded = Column(Integer, nullable=True)  # For teachers
     pending_assignments = Column(Integer, nullable=True)  # For teachers
+    assignments_posted = Column(Integer, nullable=True)  # For teachers
     
     # Admin specific
     total_students = Column(Integer, nullable=True)
@@ -100,14 +111,61 @@ class MonthlyReport(Base):
     total_courses = Column(Integer, nullable=True)
     total_enrollments = Column(Integer, nullable=True)
     total_revenue = Column(Float, nullable=True)
+    new_enrollments = Column(Integer, nullable=True)
     
     # Status
-    status = Column(String(20), default="pending")  # pending, generated, sent, failed
+    status = Column(String(20), default="pending")  # pending, generated, sending, sent, failed
+    lease_expires_at = Column(DateTime, nullable=True)  # Sending: when the claim lapses
+    send_attempts = Column(Integer, nullable=False, default=0)  # Failed sends go back to generated until the cap
     generated_at = Column(DateTime(timezone=True), nullable=True)
     sent_at = Column(DateTime(timezone=True), nullable=True)
     error_message = Column(Text, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
+    __table_args__ = (
+        Index("ix_monthly_reports_period_recipient", "year", "month", "report_type", "recipient_id"),
+    )
+
+
+class MonthlyReportRun(Base):
+    """Checkpointed run sending one month's reports"""
+    __tablename__ = "monthly_report_runs"
+
+    run_id = Column(Integer, primary_key=True, index=True)
+    month = Column(Integer, nullable=False)
+    year = Column(Integer, nullable=False)
+    status = Column(String(20), default="pending")  # pending, building, sending, completed, failed
+
+    # Checkpoint: last report_id whose outcome has been committed
+    cursor = Column(Integer, default=0, nullable=False)
+    total_reports = Column(Integer, nullable=True)
+    sent_count = Column(Integer, default=0, nullable=False)
+    failed_count = Column(Integer, default=0, nullable=False)
+    processed_at_start = Column(Integer, default=0)  # Processed count when the current attempt started
+
+    started_at = Column(DateTime(timezone=True), nullable=True)  # Current attempt
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+    error_message = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint("year", "month", name="uq_monthly_report_runs_period"),
+    )
+
+
+class JobLease(Base):
+    """Lease held by the worker running a periodic job, with a fencing token"""
+    __tablename__ = "job_leases"
+
+    name = Column(String(100), primary_key=True)
+    holder = Column(String(255), nullable=True)  # host:pid:task_id of the current holder
+    fencing_token = Column(Integer, default=0, nullable=False)  # Incremented on every acquisition
+    acquired_at = Column(DateTime, nullable=True)
+    renewed_at = Column(DateTime, nullable=True)
+    expires_at = Column(DateTime, nullable=True)
+    released_at = Column(DateTime, nullable=True)
+
 
 class EmailPreference(Base):
     """User email notification preferences"""
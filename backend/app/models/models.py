@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Float, Text, ForeignKey, Index, Table, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.core.database import Base
@@ -16,7 +16,9 @@ teacher_course_association = Table(
     'teacher_course',
     Base.metadata,
     Column('teacher_id', Integer, ForeignKey('teachers.teacher_id')),
-    Column('course_id', Integer, ForeignKey('courses.course_id'))
+    Column('course_id', Integer, ForeignKey('courses.course_id')),
+    Index('ix_teacher_course_course_id', 'course_id'),  # Teacher IDs for a page of courses
+    Index('ix_teacher_course_teacher_id', 'teacher_id')  # A teacher's courses (schedule conflicts)
 )
 
 
@@ -115,6 +117,7 @@ class Course(Base):
     is_online = Column(Boolean, default=False)
     location = Column(String(200), nullable=True)
     status = Column(String(20), default="active")  # active, inactive, completed
+    seats_taken = Column(Integer, default=0, server_default="0", nullable=False)  # Active enrollments, see enrollment_seats
     admin_id = Column(Integer, ForeignKey("admins.admin_id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -143,12 +146,35 @@ class Enrollment(Base):
     enrollment_date = Column(DateTime(timezone=True), server_default=func.now())
     status = Column(String(20), default="active")  # active, completed, dropped, suspended
 
+    __table_args__ = (
+        Index("ix_enrollments_paid_paid_date", "paid", "paid_date"),  # Revenue aggregates
+        Index("ix_enrollments_course_id_status", "course_id", "status"),  # Active enrollment counts per course
+        Index("ix_enrollments_student_id_status", "student_id", "status"),  # A student's active courses
+    )
+
     # Relationships
     student = relationship("Student", back_populates="enrollments")
     course = relationship("Course", back_populates="enrollments")
     payments = relationship("Payment", back_populates="enrollment")
 
 
+class CourseWaitlistEntry(Base):
+    __tablename__ = "course_waitlist"
+
+    waitlist_id = Column(Integer, primary_key=True, index=True)
+    course_id = Column(Integer, ForeignKey("courses.course_id"), nullable=False)
+    student_id = Column(Integer, ForeignKey("students.student_id"), nullable=False)
+    status = Column(String(20), default="waiting", nullable=False)  # waiting, promoted, cancelled
+    created_at = Column(DateTime, nullable=False)
+    promoted_at = Column(DateTime, nullable=True)
+    enrollment_id = Column(Integer, ForeignKey("enrollments.enrollment_id"), nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("course_id", "student_id", name="uq_course_waitlist_course_student"),
+        Index("ix_course_waitlist_course_status", "course_id", "status", "waitlist_id"),  # Next in line
+    )
+
+
 class Material(Base):
     __tablename__ = "materials"
 
@@ -208,6 +234,7 @@ class Announcement(Base):
     is_important = Column(Boolean, default=False)
     posted_by_id = Column(Integer, nullable=False)  # teacher_id or admin_id
     posted_by_type = Column(String(20), nullable=False)  # teacher, admin
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
     # Relationships
     course = relationship("Course", back_populates="announcements")
@@ -316,7 +343,7 @@ class OnlineCourse(Base):
     __tablename__ = "online_courses"
 
     online_course_id = Column(Integer, primary_key=True, index=True)
-    course_id = Column(Integer, ForeignKey("courses.course_id"), nullable=False)
+    course_id = Column(Integer, ForeignKey("courses.course_id"), nullable=False, index=True)
     
     # Course structure
     total_lessons = Column(Integer, default=0)
@@ -0,0 +1,28 @@
+"""
+Search Models - Denormalized rows maintained for search
+"""
+
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Index
+from app.core.database import Base
+
+
+class UserDirectoryEntry(Base):
+    """One row per student, teacher, admin and parent, kept current on every write"""
+    __tablename__ = "user_directory"
+
+    user_type = Column(String(20), primary_key=True)  # student, teacher, admin, parent
+    user_id = Column(Integer, primary_key=True)
+    name = Column(String(100), nullable=False)
+    email = Column(String(255), nullable=False)
+    phone = Column(String(20), nullable=True)
+    phone_digits = Column(String(20), nullable=True)
+    is_active = Column(Boolean, default=True, nullable=False)
+    created_at = Column(DateTime, nullable=True)
+    search_text = Column(Text, nullable=False)  # Lowercased name/email tokens and phone digits, space separated
+    indexed_at = Column(DateTime, nullable=False)
+
+    # PostgreSQL also gets a pg_trgm GIN index on search_text (see the migration)
+    __table_args__ = (
+        Index("ix_user_directory_created_at", "created_at", "user_type", "user_id"),
+        Index("ix_user_directory_indexed_at", "indexed_at"),  # In-process index catch-up
+    )
@@ -0,0 +1,30 @@
+"""
+Upload Models - State of resumable uploads in progress
+"""
+
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Text, Index
+from app.core.database import Base
+
+
+class ResumableUpload(Base):
+    """One tus upload: the bytes received so far live in a file under resumable_upload_dir"""
+    __tablename__ = "resumable_uploads"
+
+    upload_id = Column(String(32), primary_key=True)  # uuid4 hex, also the data file name
+    purpose = Column(String(20), nullable=False)  # material, lesson_video
+    target_id = Column(Integer, nullable=False)  # course_id for materials, lesson_id for lesson videos
+    owner = Column(String(50), nullable=False)  # Uploader, "admin:1" or "teacher:7"
+    filename = Column(String(255), nullable=False)
+    upload_length = Column(BigInteger, nullable=False)  # Total size declared at creation
+    upload_offset = Column(BigInteger, nullable=False, default=0)  # Bytes received and verified
+    upload_metadata = Column(Text, nullable=True)  # JSON: title, description, is_public, ...
+    status = Column(String(20), nullable=False, default="uploading")  # uploading, assembling, completed
+    result_id = Column(Integer, nullable=True)  # Material or lesson the upload ended up in
+    result_url = Column(String(500), nullable=True)
+    created_at = Column(DateTime, nullable=False)
+    updated_at = Column(DateTime, nullable=False)
+    expires_at = Column(DateTime, nullable=False)  # Pushed back by every chunk
+
+    __table_args__ = (
+        Index("ix_resumable_uploads_expires_at", "expires_at"),  # Cleanup of abandoned uploads
+    )
@@ -0,0 +1,345 @@
+"""
+Activity Log - Append-only activity events for the admin feed and auditing
+
+Session events turn every flushed change to the tracked models into rows in
+``activity_events``:
+
+- students, teachers, admins, parents: ``user_registered``
+- courses: ``course_created``, ``course_updated``, ``course_deleted``
+- enrollments: ``enrollment_created``, ``enrollment_status_changed``,
+  ``payment_received`` (paid set), ``enrollment_deleted``
+- payments: ``payment_recorded``, ``payment_status_changed``
+- assignment submissions: ``grade_recorded``
+
+The rows are inserted by the same flush, so an event exists exactly when its
+change is committed, whichever code path made it. ``app.models`` imports this
+module, so the hooks are registered in every process that uses the models:
+the API, Celery workers and scripts. Requests authenticated through
+``get_current_user`` stamp the user on the session and the events record it
+as the actor.
+
+Reading the feed is one range scan over ``(occurred_at, event_id)``, paged
+with an opaque keyset cursor instead of OFFSET. Events are never updated or
+deleted through the ORM (and, on PostgreSQL, a trigger rejects it).
+"""
+
+import json
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, inspect, tuple_
+from sqlalchemy.orm import Session
+
+from app.models import (
+    ActivityEvent, Admin, Assignment, AssignmentSubmission, Course, Enrollment, Parent, Payment, Student, Teacher
+)
+
+logger = logging.getLogger(__name__)
+
+ACTOR_KEY = "activity_actor"
+
+USER_MODELS = {Student: "student", Teacher: "teacher", Admin: "admin", Parent: "parent"}
+# Feed "type" values the dashboard already knows; other events use their own name
+FEED_TYPES = {"enrollment_created": "enrollment", "payment_received": "payment"}
+COURSE_FIELDS = ("title", "description", "start_time", "end_time", "price", "max_students",
+                 "is_online", "location", "status")
+
+
+class InvalidCursor(ValueError):
+    """The paging cursor could not be parsed"""
+
+
+def set_activity_actor(db: Session, user_type: str, user_id: int) -> None:
+    """Record the authenticated user as the actor of changes made through ``db``"""
+    db.info[ACTOR_KEY] = (user_type, user_id)
+
+
+# ==================== Change Capture ====================
+
+def _json_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _changes(obj: Any, fields: Sequence[str]) -> Dict[str, List[Any]]:
+    """``{"field": [old, new]}`` for the given attributes that changed in this flush"""
+    state = inspect(obj)
+    changes = {}
+    for field in fields:
+        history = state.attrs[field].history
+        if history.added or history.deleted:
+            old = history.deleted[0] if history.deleted else None
+            new = history.added[0] if history.added else None
+            if old != new:
+                changes[field] = [_json_value(old), _json_value(new)]
+    return changes
+
+
+def _lookup(session: Session, model: Any, pk: Any, attr: str = "name") -> Optional[Any]:
+    """Attribute of a related row, from the identity map when it is already loaded"""
+    if pk is None:
+        return None
+    obj = session.get(model, pk)
+    return getattr(obj, attr, None) if obj is not None else None
+
+
+def _user_events(obj: Any, user_type: str) -> List[Dict[str, Any]]:
+    user_id = getattr(obj, f"{user_type}_id")
+    return [{
+        "event_type": "user_registered",
+        "entity_type": user_type,
+        "entity_id": user_id,
+        "user_type": user_type,
+        "user_id": user_id,
+        "user_name": obj.name,
+        "description": f"New {user_type} registered: {obj.name}",
+        "details": {"email": obj.email, "is_active": obj.is_active if obj.is_active is not None else True},
+    }]
+
+
+def _course_events(obj: Course, kind: str) -> List[Dict[str, Any]]:
+    if kind == "new":
+        event_type, description, details = "course_created", f"New course '{obj.title}' created", None
+    elif kind == "deleted":
+        event_type, description, details = "course_deleted", f"Course '{obj.title}' deleted", None
+    else:
+        details = _changes(obj, COURSE_FIELDS)
+        if not details:
+            return []
+        event_type, description = "course_updated", f"Course '{obj.title}' updated"
+    return [{
+        "event_type": event_type,
+        "entity_type": "course",
+        "entity_id": obj.course_id,
+        "description": description,
+        "details": details,
+    }]
+
+
+def _enrollment_events(session: Session, obj: Enrollment, kind: str) -> List[Dict[str, Any]]:
+    title = _lookup(session, Course, obj.course_id, "title")
+    base = {
+        "entity_type": "enrollment",
+        "entity_id": obj.enrollment_id,
+        "user_type": "student",
+        "user_id": obj.student_id,
+        "user_name": _lookup(session, Student, obj.student_id),
+    }
+    events = []
+    if kind == "new":
+        events.append({**base, "event_type": "enrollment_created",
+                       "description": f"New student enrolled in {title}",
+                       "details": {"course_id": obj.course_id, "status": obj.status or "active"}})
+        if obj.paid:
+            events.append({**base, "event_type": "payment_received",
+                           "description": f"Payment received for {title}",
+                           "details": {"course_id": obj.course_id}})
+        return events
+
+    if kind == "deleted":
+        return [{**base, "event_type": "enrollment_deleted",
+                 "description": f"Enrollment in {title} removed",
+                 "details": {"course_id": obj.course_id}}]
+
+    changes = _changes(obj, ("paid", "status"))
+    if changes.get("paid", [None, None])[1]:
+        events.append({**base, "event_type": "payment_received",
+                       "description": f"Payment received for {title}",
+                       "details": {"course_id": obj.course_id,
+                                   "paid_date": _json_value(obj.paid_date)}})
+    if "status" in changes:
+        events.append({**base, "event_type": "enrollment_status_changed",
+                       "description": f"Enrollment in {title} changed to {obj.status}",
+                       "details": {"course_id": obj.course_id, "status": changes["status"]}})
+    return events
+
+
+def _payment_events(session: Session, obj: Payment, kind: str) -> List[Dict[str, Any]]:
+    if kind == "deleted":
+        return []
+    student_id = _lookup(session, Enrollment, obj.enrollment_id, "student_id")
+    base = {
+        "entity_type": "payment",
+        "entity_id": obj.payment_id,
+        "user_type": "student" if student_id else None,
+        "user_id": student_id,
+        "user_name": _lookup(session, Student, student_id),
+    }
+    if kind == "new":
+        status = obj.payment_status or "pending"
+        return [{**base, "event_type": "payment_recorded",
+                 "description": f"Payment of {obj.amount} recorded ({status})",
+                 "details": {"enrollment_id": obj.enrollment_id, "amount": obj.amount,
+                             "payment_method": obj.payment_method, "payment_status": status}}]
+
+    changes = _changes(obj, ("payment_status",))
+    if not changes:
+        return []
+    return [{**base, "event_type": "payment_status_changed",
+             "description": f"Payment of {obj.amount} marked {obj.payment_status}",
+             "details": {"enrollment_id": obj.enrollment_id, **changes}}]
+
+
+def _grade_events(session: Session, obj: AssignmentSubmission, kind: str) -> List[Dict[str, Any]]:
+    if kind == "deleted" or obj.grade is None:
+        return []
+    changes = {"grade": [None, obj.grade]} if kind == "new" else _changes(obj, ("grade",))
+    if not changes:
+        return []
+    title = _lookup(session, Assignment, obj.assignment_id, "title")
+    return [{
+        "event_type": "grade_recorded",
+        "entity_type": "submission",
+        "entity_id": obj.submission_id,
+        "user_type": "student",
+        "user_id": obj.student_id,
+        "user_name": _lookup(session, Student, obj.student_id),
+        "description": f"Assignment '{title}' graded",
+        "details": {"assignment_id": obj.assignment_id, **changes},
+    }]
+
+
+def _events_for(session: Session, obj: Any, kind: str) -> List[Dict[str, Any]]:
+    user_type = USER_MODELS.get(type(obj))
+    if user_type is not None:
+        return _user_events(obj, user_type) if kind == "new" else []
+    if isinstance(obj, Course):
+        return _course_events(obj, kind)
+    if isinstance(obj, Enrollment):
+        return _enrollment_events(session, obj, kind)
+    if isinstance(obj, Payment):
+        return _payment_events(session, obj, kind)
+    if isinstance(obj, AssignmentSubmission):
+        return _grade_events(session, obj, kind)
+    return []
+
+
+def _record_flush(session: Session, flush_context: Any) -> None:
+    """Insert activity events for the tracked rows written by this flush"""
+    changed = (
+        [(obj, "new") for obj in session.new]
+        + [(obj, "dirty") for obj in session.dirty]
+        + [(obj, "deleted") for obj in session.deleted]
+    )
+    if not any(isinstance(obj, (Course, Enrollment, Payment, AssignmentSubmission, *USER_MODELS))
+               for obj, _ in changed):
+        return
+
+    events: List[Dict[str, Any]] = []
+    for obj, kind in changed:
+        events.extend(_events_for(session, obj, kind))
+    if not events:
+        return
+
+    actor_type, actor_id = session.info.get(ACTOR_KEY, (None, None))
+    now = datetime.utcnow()
+    rows = [
+        {
+            "occurred_at": now,
+            "event_type": item["event_type"],
+            "entity_type": item["entity_type"],
+            "entity_id": item["entity_id"],
+            "user_type": item.get("user_type"),
+            "user_id": item.get("user_id"),
+            "user_name": item.get("user_name"),
+            "actor_type": actor_type,
+            "actor_id": actor_id,
+            "description": item["description"][:255],
+            "details": json.dumps(item["details"], default=str) if item.get("details") else None,
+        }
+        for item in events
+    ]
+    session.connection().execute(ActivityEvent.__table__.insert(), rows)
+
+
+def _keep_previous_value(target: Any, value: Any, oldvalue: Any, initiator: Any) -> Any:
+    """No-op listener; registering it with active_history keeps old values in history"""
+    return value
+
+
+def _reject_change(mapper: Any, connection: Any, target: ActivityEvent) -> None:
+    raise RuntimeError("activity_events is append-only")
+
+
+event.listen(Session, "after_flush", _record_flush)
+for _attribute in (
+    *(getattr(Course, field) for field in COURSE_FIELDS),
+    Enrollment.paid, Enrollment.status, Payment.payment_status, AssignmentSubmission.grade,
+):
+    event.listen(_attribute, "set", _keep_previous_value, active_history=True, retval=True)
+event.listen(ActivityEvent, "before_update", _reject_change)
+event.listen(ActivityEvent, "before_delete", _reject_change)
+
+
+# ==================== Reading ====================
+
+def encode_cursor(item: ActivityEvent) -> str:
+    return f"{item.occurred_at.isoformat()}~{item.event_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    occurred_at, _, event_id = cursor.rpartition("~")
+    try:
+        return datetime.fromisoformat(occurred_at), int(event_id)
+    except ValueError:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+def list_activity(
+    db: Session,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+    event_types: Optional[Sequence[str]] = None,
+    entity_type: Optional[str] = None,
+    entity_id: Optional[int] = None,
+    user_type: Optional[str] = None,
+    user_id: Optional[int] = None,
+    since: Optional[datetime] = None,
+) -> Tuple[List[ActivityEvent], Optional[str]]:
+    """
+    Newest events first, ``limit`` at a time. Pass the returned cursor back
+    to get the next (older) page; it is None on the last page.
+    """
+    query = db.query(ActivityEvent)
+    if event_types:
+        query = query.filter(ActivityEvent.event_type.in_(event_types))
+    if entity_type:
+        query = query.filter(ActivityEvent.entity_type == entity_type)
+    if entity_id is not None:
+        query = query.filter(ActivityEvent.entity_id == entity_id)
+    if user_type:
+        query = query.filter(ActivityEvent.user_type == user_type)
+    if user_id is not None:
+        query = query.filter(ActivityEvent.user_id == user_id)
+    if since is not None:
+        query = query.filter(ActivityEvent.occurred_at >= since)
+    if cursor:
+        query = query.filter(
+            tuple_(ActivityEvent.occurred_at, ActivityEvent.event_id) < decode_cursor(cursor)
+        )
+
+    rows = query.order_by(
+        ActivityEvent.occurred_at.desc(), ActivityEvent.event_id.desc()
+    ).limit(limit + 1).all()
+
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+
+def serialize_event(item: ActivityEvent) -> Dict[str, Any]:
+    """Feed entry, in the shape the admin dashboard already renders"""
+    return {
+        "id": f"{item.entity_type}_{item.entity_id}_{item.event_id}",
+        "type": FEED_TYPES.get(item.event_type, item.event_type),
+        "event_type": item.event_type,
+        "description": item.description,
+        "timestamp": item.occurred_at.isoformat(),
+        "user_name": item.user_name or "System",
+        "entity_type": item.entity_type,
+        "entity_id": item.entity_id,
+        "actor_type": item.actor_type,
+        "actor_id": item.actor_id,
+        "details": json.loads(item.details) if item.details else None,
+    }
@@ -0,0 +1,262 @@
+"""
+Admin Stats - Precomputed admin dashboard counters and revenue summaries
+
+The dashboard numbers are aggregates over every student, enrollment and
+attendance record. Instead of computing them on each request, a periodic task
+(``refresh_admin_stats``) computes them with SQL aggregates and stores:
+
+- one ``dashboard_stats`` row with the dashboard counters
+- ``revenue_monthly_summary``: paid enrollments and revenue per course per
+  month, rebuilt with a single INSERT ... SELECT grouped by month
+
+Requests read the stored row and the (small) summary table, so their cost
+does not depend on the number of enrollments. A snapshot older than twice the
+refresh interval (beat not running) is refreshed inline.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from sqlalchemy import case, delete, desc, func, insert, literal_column, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import (
+    Attendance, Course, DashboardStats, Enrollment, RevenueMonthlySummary, Student, Teacher
+)
+
+logger = logging.getLogger(__name__)
+
+STATS_ROW_ID = 1
+UNDATED_MONTH = "0000-00"
+
+
+def _month_bucket(db: Session, column: Any) -> Any:
+    """``YYYY-MM`` label of a timestamp column, grouped in SQL"""
+    if db.get_bind().dialect.name == "postgresql":
+        return func.to_char(func.date_trunc(literal_column("'month'"), column), "YYYY-MM")
+    return func.strftime("%Y-%m", column)
+
+
+def compute_dashboard_stats(db: Session, now: datetime) -> Dict[str, Any]:
+    """Dashboard counters from aggregate queries (no rows are loaded)"""
+    total_students = db.query(func.count(Student.student_id)).filter(Student.is_active == True).scalar()  # noqa: E712
+    total_teachers = db.query(func.count(Teacher.teacher_id)).filter(Teacher.is_active == True).scalar()  # noqa: E712
+    total_courses = db.query(func.count(Course.course_id)).filter(Course.status == "active").scalar()
+
+    active_enrollments, pending_payments = db.query(
+        func.sum(case((Enrollment.status == "active", 1), else_=0)),
+        func.sum(case((Enrollment.paid == False, 1), else_=0)),  # noqa: E712
+    ).one()
+
+    thirty_days_ago = now - timedelta(days=30)
+    total_revenue, monthly_revenue = db.query(
+        func.coalesce(func.sum(Course.price), 0.0),
+        func.coalesce(func.sum(case((Enrollment.paid_date >= thirty_days_ago, Course.price), else_=0.0)), 0.0),
+    ).select_from(Enrollment).join(
+        Course, Enrollment.course_id == Course.course_id
+    ).filter(
+        Enrollment.paid == True  # noqa: E712
+    ).one()
+
+    attendance_total, attendance_present = db.query(
+        func.count(Attendance.attendance_id),
+        func.sum(case((Attendance.status.in_(["present", "late"]), 1), else_=0)),
+    ).one()
+
+    return {
+        "total_students": total_students or 0,
+        "total_teachers": total_teachers or 0,
+        "total_courses": total_courses or 0,
+        "active_enrollments": int(active_enrollments or 0),
+        "pending_payments": int(pending_payments or 0),
+        "total_revenue": float(total_revenue or 0),
+        "monthly_revenue": float(monthly_revenue or 0),
+        "average_attendance": round((attendance_present or 0) * 100.0 / attendance_total, 1) if attendance_total else 0.0,
+    }
+
+
+def rebuild_revenue_summary(db: Session) -> None:
+    """Replace the monthly revenue summary with one INSERT ... SELECT (caller commits)"""
+    # Paid without a paid_date: counted per course, never in a month
+    month = func.coalesce(_month_bucket(db, Enrollment.paid_date), UNDATED_MONTH)
+    grouped = select(
+        month.label("month"),
+        Enrollment.course_id,
+        func.count(Enrollment.enrollment_id),
+        func.coalesce(func.sum(Course.price), 0.0),
+    ).select_from(Enrollment).join(
+        Course, Enrollment.course_id == Course.course_id
+    ).where(
+        Enrollment.paid == True  # noqa: E712
+    ).group_by(month, Enrollment.course_id)
+
+    db.execute(delete(RevenueMonthlySummary))
+    db.execute(insert(RevenueMonthlySummary).from_select(
+        ["month", "course_id", "paid_enrollments", "revenue"], grouped
+    ))
+
+
+def refresh_dashboard_stats(db: Session) -> DashboardStats:
+    """Recompute the dashboard snapshot and the revenue summary in one transaction"""
+    now = datetime.utcnow()
+    values = compute_dashboard_stats(db, now)
+
+    stats = db.query(DashboardStats).filter(DashboardStats.stats_id == STATS_ROW_ID).first()
+    if stats is None:
+        stats = DashboardStats(stats_id=STATS_ROW_ID)
+        db.add(stats)
+    for key, value in values.items():
+        setattr(stats, key, value)
+    stats.refreshed_at = now
+
+    rebuild_revenue_summary(db)
+    db.commit()
+    return stats
+
+
+def get_dashboard_stats(db: Session, max_age_seconds: Optional[int] = None) -> DashboardStats:
+    """The stored snapshot, refreshed first if it is missing or too old"""
+    max_age_seconds = max_age_seconds or settings.admin_stats_refresh_seconds * 2
+    stats = db.query(DashboardStats).filter(DashboardStats.stats_id == STATS_ROW_ID).first()
+    if stats is None or stats.refreshed_at < datetime.utcnow() - timedelta(seconds=max_age_seconds):
+        try:
+            stats = refresh_dashboard_stats(db)
+        except IntegrityError:
+            # Refreshed concurrently by another request; use its snapshot
+            db.rollback()
+            stats = db.query(DashboardStats).filter(DashboardStats.stats_id == STATS_ROW_ID).one()
+    return stats
+
+
+def revenue_analytics(db: Session, months: int = 12) -> Dict[str, Any]:
+    """Revenue per month (last ``months`` months) and per course, read from the summary"""
+    get_dashboard_stats(db)
+
+    first_month = (datetime.utcnow() - timedelta(days=months * 365 // 12)).strftime("%Y-%m")
+    monthly = db.query(
+        RevenueMonthlySummary.month, func.sum(RevenueMonthlySummary.revenue)
+    ).filter(
+        RevenueMonthlySummary.month >= first_month
+    ).group_by(RevenueMonthlySummary.month).order_by(RevenueMonthlySummary.month).all()
+
+    by_course = db.query(
+        Course.title,
+        func.sum(RevenueMonthlySummary.paid_enrollments),
+        func.sum(RevenueMonthlySummary.revenue),
+    ).select_from(RevenueMonthlySummary).join(
+        Course, Course.course_id == RevenueMonthlySummary.course_id
+    ).group_by(Course.course_id, Course.title).all()
+
+    return {
+        "monthlyRevenue": [
+            {"month": month, "revenue": round(float(revenue or 0), 2)}
+            for month, revenue in monthly
+        ],
+        "courseRevenue": [
+            {"course": title, "enrollments": int(enrollments or 0), "revenue": round(float(revenue or 0), 2)}
+            for title, enrollments, revenue in by_course
+        ],
+    }
+
+
+# ==================== Analytics ====================
+
+def _rate(part: Any, total: Any) -> float:
+    return round(part * 100.0 / total, 1) if total else 0.0
+
+
+def enrollment_analytics(db: Session, months: int = 6) -> Dict[str, Any]:
+    """Enrollments per course against capacity, by status, and per month"""
+    course_enrollments = db.query(
+        Course.title,
+        Course.max_students,
+        func.count(Enrollment.enrollment_id).label('enrolled_count')
+    ).outerjoin(
+        Enrollment, Course.course_id == Enrollment.course_id
+    ).group_by(
+        Course.course_id, Course.title, Course.max_students
+    ).all()
+
+    status_breakdown = db.query(
+        Enrollment.status, func.count(Enrollment.enrollment_id)
+    ).group_by(Enrollment.status).all()
+
+    since = datetime.utcnow() - timedelta(days=months * 365 // 12)
+    month = _month_bucket(db, Enrollment.enrollment_date)
+    monthly_enrollments = db.query(
+        month.label('month'), func.count(Enrollment.enrollment_id)
+    ).filter(
+        Enrollment.enrollment_date >= since
+    ).group_by(month).order_by(month).all()
+
+    return {
+        "courseEnrollments": [
+            {
+                "course": course.title,
+                "enrolled": course.enrolled_count,
+                "capacity": course.max_students,
+                "utilization": _rate(course.enrolled_count, course.max_students)
+            }
+            for course in course_enrollments
+        ],
+        "statusBreakdown": [
+            {"status": enrollment_status, "count": count}
+            for enrollment_status, count in status_breakdown
+        ],
+        "monthlyTrend": [
+            {"month": month_label, "count": count}
+            for month_label, count in monthly_enrollments
+        ]
+    }
+
+
+def attendance_analytics(db: Session, top: int = 10) -> Dict[str, Any]:
+    """Attendance per course and the students attending most"""
+    present = func.sum(case((Attendance.status == 'present', 1), else_=0))
+    course_attendance = db.query(
+        Course.title,
+        func.count(Attendance.attendance_id).label('total_sessions'),
+        present.label('present_count'),
+        func.sum(case((Attendance.status == 'absent', 1), else_=0)).label('absent_count'),
+        func.sum(case((Attendance.status == 'late', 1), else_=0)).label('late_count')
+    ).join(
+        Attendance, Course.course_id == Attendance.course_id
+    ).group_by(
+        Course.course_id, Course.title
+    ).all()
+
+    top_students = db.query(
+        Student.name,
+        func.count(Attendance.attendance_id).label('total_sessions'),
+        present.label('present_count')
+    ).join(
+        Attendance, Student.student_id == Attendance.student_id
+    ).group_by(
+        Student.student_id, Student.name
+    ).order_by(desc('present_count')).limit(top).all()
+
+    return {
+        "courseAttendance": [
+            {
+                "course": course.title,
+                "totalSessions": course.total_sessions,
+                "present": int(course.present_count or 0),
+                "absent": int(course.absent_count or 0),
+                "late": int(course.late_count or 0),
+                "attendanceRate": _rate(course.present_count or 0, course.total_sessions)
+            }
+            for course in course_attendance
+        ],
+        "topStudents": [
+            {
+                "name": student.name,
+                "totalSessions": student.total_sessions,
+                "present": int(student.present_count or 0),
+                "attendanceRate": _rate(student.present_count or 0, student.total_sessions)
+            }
+            for student in top_students
+        ]
+    }
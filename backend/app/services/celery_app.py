@@ -5,22 +5,41 @@ Handles asynchronous email sending and scheduled tasks
 
 from celery import Celery
 from celery.schedules import crontab
+from celery.signals import (
+    before_task_publish, celeryd_init, task_prerun, worker_process_init, worker_process_shutdown
+)
 from datetime import timedelta
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal, engine
 from app.core.config import settings
 from app.services.email_service import email_service
-from app.models import (
-    PasswordResetToken, EmailLog, MonthlyReport, Student, Teacher, Admin,
-    Assignment, AssignmentSubmission, Enrollment, Attendance, Course, Payment
+from app.services.worker_loop import worker_loop, run_async
+from app.services.email_outbox import process_outbox
+from app.services.monthly_reports import finish_run, get_or_create_run, prepare_run, send_report_chunk
+from app.services.notification_digest import digest_recipients, send_digest_chunk
+from app.services.notification_service import NotificationService
+from app.services.fanout import fan_out, summarize_chunks, timed_chunk
+from app.services.admin_stats import refresh_dashboard_stats
+from app.services.enrollment_seats import courses_with_open_waitlist, promote_waitlist, reconcile_seats
+from app.services.resumable_uploads import cleanup_expired_uploads
+from app.services.job_locks import (
+    LeaseLost, acquire_lease, default_holder, release_lease, renew_lease, singleton_job, skipped_while_held
+)
+from app.services.task_queues import (
+    NOTIFICATIONS, TASK_QUEUES, TASK_ROUTES, apply_queue_concurrency, record_queue_wait, stamp_published_at
 )
-from sqlalchemy import and_, func
+from app.models import MonthlyReportRun, NotificationPriority, NotificationType, PasswordResetToken
+from sqlalchemy import and_
 from datetime import datetime
 import logging
 
 # Configure logging
 logger = logging.getLogger(__name__)
 
+# Leases held by the fanned-out periodic jobs
+MONTHLY_REPORTS_LEASE = "send_monthly_reports"
+DIGEST_LEASE = "send_notification_digest"
+
 # Initialize Celery app
 celery_app = Celery(
     'college_prep_platform',
@@ -42,6 +61,26 @@ celery_app.conf.beat_schedule = {
         'task': 'app.services.celery_app.send_monthly_reports',
         'schedule': crontab(day_of_month=1, hour=8, minute=0),  # Run at 8 AM on first day of month
     },
+    'refresh-admin-stats': {
+        'task': 'app.services.celery_app.refresh_admin_stats',
+        'schedule': timedelta(seconds=settings.admin_stats_refresh_seconds),  # Dashboard snapshot
+    },
+    'reconcile-course-seats': {
+        'task': 'app.services.celery_app.reconcile_course_seats',
+        'schedule': timedelta(seconds=settings.course_seats_reconcile_seconds),  # Seat counters and waitlists
+    },
+    'cleanup-resumable-uploads': {
+        'task': 'app.services.celery_app.cleanup_resumable_uploads',
+        'schedule': timedelta(hours=1),  # Abandoned tus uploads and their partial files
+    },
+    'process-email-outbox': {
+        'task': 'app.services.celery_app.process_email_outbox',
+        'schedule': timedelta(seconds=15),  # Drain queued and retrying emails
+    },
+    'process-interactive-email-outbox': {
+        'task': 'app.services.celery_app.process_interactive_email_outbox',
+        'schedule': timedelta(seconds=5),  # Password resets the request path could not send
+    },
 }
 
 # Celery configuration
@@ -53,8 +92,38 @@ celery_app.conf.update(
     enable_utc=True,
     task_track_started=True,
     task_time_limit=30 * 60,  # 30 minutes
+    # Queues and routing (see app/services/task_queues.py)
+    task_queues=TASK_QUEUES,
+    task_routes=TASK_ROUTES,
+    task_default_queue=NOTIFICATIONS,
+    # Take one message at a time so a busy worker does not hold tasks other workers could start
+    worker_prefetch_multiplier=1,
 )
 
+before_task_publish.connect(stamp_published_at, weak=False)
+task_prerun.connect(record_queue_wait, weak=False)
+celeryd_init.connect(apply_queue_concurrency, weak=False)
+
+
+# ==================== Worker Lifecycle ====================
+
+@worker_process_init.connect
+def init_worker_event_loop(**kwargs):
+    """Start this worker process's event loop and warm the SMTP pool"""
+    worker_loop.start()
+    if email_service.enabled and email_service.pool:
+        try:
+            run_async(email_service.pool.warm(settings.smtp_warm_connections), timeout=30)
+        except Exception as exc:
+            logger.warning(f"Could not warm SMTP pool: {str(exc)}")
+
+
+@worker_process_shutdown.connect
+def shutdown_worker_event_loop(**kwargs):
+    """Close pooled SMTP connections and stop the event loop"""
+    cleanup = email_service.pool.close() if email_service.pool else None
+    worker_loop.stop(cleanup=cleanup)
+
 
 # ==================== Email Sending Tasks ====================
 
@@ -64,8 +133,7 @@ def send_password_reset_email_task(self, email: str, name: str, reset_token: str
     Celery task to send password reset email asynchronously
     """
     try:
-        import asyncio
-        result = asyncio.run(
+        result = run_async(
             email_service.send_password_reset_email(email, name, reset_token, reset_url)
         )
         
@@ -94,8 +162,7 @@ def send_assignment_notification_task(
     Celery task to send assignment notifications
     """
     try:
-        import asyncio
-        result = asyncio.run(
+        result = run_async(
             email_service.send_assignment_notification(
                 student_emails, assignment_title, course_title, due_date, course_url
             )
@@ -123,8 +190,7 @@ def send_grade_notification_task(
     Celery task to send grade notifications
     """
     try:
-        import asyncio
-        result = asyncio.run(
+        result = run_async(
             email_service.send_grade_notification(
                 student_email, student_name, assignment_title, grade, max_points, feedback
             )
@@ -138,9 +204,56 @@ def send_grade_notification_task(
         raise self.retry(exc=exc, countdown=60)
 
 
+def _drain_outbox(batch_size: int = None, log_ids: list = None, interactive: bool = None):
+    totals = {"claimed": 0, "sent": 0, "suppressed": 0, "deferred": 0, "retrying": 0, "failed": 0}
+    batch_size = batch_size or settings.email_outbox_batch_size
+    db = SessionLocal()
+
+    try:
+        for _ in range(settings.email_outbox_max_batches):
+            counts = run_async(process_outbox(db, batch_size, log_ids, interactive=interactive))
+            for key, value in counts.items():
+                totals[key] += value
+            if counts["claimed"] < batch_size:
+                break
+
+        if totals["claimed"]:
+            logger.info(f"Email outbox processed: {totals}")
+        return {"status": "success", **totals}
+
+    except Exception as exc:
+        logger.error(f"Error processing email outbox: {str(exc)}")
+        return {"status": "failed", "error": str(exc), **totals}
+    finally:
+        db.close()
+
+
+@celery_app.task
+def process_email_outbox(batch_size: int = None, log_ids: list = None):
+    """
+    Deliver queued emails from the outbox, except password resets.
+
+    Any number of these can run at once across workers; each batch is claimed
+    with SKIP LOCKED so workers never pick up the same rows.
+    """
+    return _drain_outbox(batch_size, log_ids, interactive=False)
+
+
+@celery_app.task
+def process_interactive_email_outbox(batch_size: int = None, log_ids: list = None):
+    """
+    Deliver queued password resets from the outbox.
+
+    Runs on the interactive queue and draws from the interactive rate limit
+    lane, so resets never wait behind notification or report mail.
+    """
+    return _drain_outbox(batch_size, log_ids, interactive=True)
+
+
 # ==================== Scheduled Tasks ====================
 
 @celery_app.task
+@singleton_job("cleanup_expired_reset_tokens")
 def cleanup_expired_reset_tokens():
     """
     Clean up expired password reset tokens (runs daily at 2 AM)
@@ -168,363 +281,288 @@ def cleanup_expired_reset_tokens():
 
 
 @celery_app.task
-def send_notification_digest():
+@singleton_job("cleanup_resumable_uploads")
+def cleanup_resumable_uploads():
     """
-    Send daily notification digest to users (runs at 9 AM)
+    Delete resumable uploads that have expired, with their partial data files
     """
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        
-        # This would aggregate notifications from the day and send digest emails
-        # Implementation depends on your notification system
-        
-        logger.info("Notification digest task executed")
+        deleted_count = cleanup_expired_uploads(db)
+        logger.info(f"Cleaned up {deleted_count} expired resumable uploads")
+        return {"status": "success", "deleted_count": deleted_count}
+    
+    except Exception as exc:
+        logger.error(f"Error cleaning up resumable uploads: {str(exc)}")
+        return {"status": "failed", "error": str(exc)}
+    finally:
         db.close()
-        return {"status": "success"}
+
+
+@celery_app.task
+@singleton_job("refresh_admin_stats")
+def refresh_admin_stats():
+    """
+    Recompute the admin dashboard snapshot and revenue summary
+    """
+    db = SessionLocal()
+    try:
+        stats = refresh_dashboard_stats(db)
+        return {"status": "success", "refreshed_at": stats.refreshed_at.isoformat()}
     
     except Exception as exc:
-        logger.error(f"Error sending notification digest: {str(exc)}")
+        logger.error(f"Error refreshing admin stats: {str(exc)}")
         return {"status": "failed", "error": str(exc)}
+    finally:
+        db.close()
 
 
 @celery_app.task
-def send_monthly_reports():
+@singleton_job("reconcile_course_seats")
+def reconcile_course_seats():
     """
-    Send monthly reports to all users (runs at 8 AM on the 1st of each month)
+    Recount course seat counters and enroll waitlisted students into seats
+    that have become free
     """
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        import asyncio
-        
-        # Get current month and year
-        now = datetime.utcnow()
-        month = now.month
-        year = now.year
-        
-        # Send reports to all students
-        students = db.query(Student).filter(Student.is_active == True).all()  # noqa: E712
-        
-        for student in students:
-            task_id = send_student_monthly_report.delay(
-                student_id=student.student_id,
-                month=month,
-                year=year
-            )
-            logger.info(f"Queued monthly report for student {student.student_id}: {task_id}")
-        
-        # Send reports to all teachers
-        teachers = db.query(Teacher).filter(Teacher.is_active == True).all()  # noqa: E712
-        
-        for teacher in teachers:
-            task_id = send_teacher_monthly_report.delay(
-                teacher_id=teacher.teacher_id,
-                month=month,
-                year=year
-            )
-            logger.info(f"Queued monthly report for teacher {teacher.teacher_id}: {task_id}")
-        
-        # Send reports to all admins
-        admins = db.query(Admin).filter(Admin.is_active == True).all()  # noqa: E712
-        
-        for admin in admins:
-            task_id = send_admin_monthly_report.delay(
-                admin_id=admin.admin_id,
-                month=month,
-                year=year
+        corrected = reconcile_seats(db)
+        db.commit()
+
+        promoted = []
+        for course_id in courses_with_open_waitlist(db):
+            promoted.extend(promote_waitlist(db, course_id))
+
+        if promoted:
+            NotificationService(db).bulk_notify(
+                [{"user_id": e.student_id, "user_type": "student"} for e in promoted],
+                NotificationType.ENROLLMENT_APPROVED,
+                title="Enrolled from the waitlist",
+                message="A seat opened up and you have been enrolled in the course.",
+                priority=NotificationPriority.HIGH,
             )
-            logger.info(f"Queued monthly report for admin {admin.admin_id}: {task_id}")
-        
-        db.close()
-        
-        return {
-            "status": "success",
-            "students_count": len(students),
-            "teachers_count": len(teachers),
-            "admins_count": len(admins)
-        }
+        return {"status": "success", "corrected": len(corrected), "promoted": len(promoted)}
     
     except Exception as exc:
-        logger.error(f"Error sending monthly reports: {str(exc)}")
+        logger.error(f"Error reconciling course seats: {str(exc)}")
         return {"status": "failed", "error": str(exc)}
+    finally:
+        db.close()
 
 
-@celery_app.task(bind=True, max_retries=3)
-def send_student_monthly_report(self, student_id: int, month: int, year: int):
+@celery_app.task(bind=True)
+def send_notification_digest(self):
     """
-    Generate and send monthly report for a specific student
+    Send daily notification digest to users (runs at 9 AM)
+    
+    Recipients are fanned out in chunks of ``notification_digest_chunk_size``
+    users per task. The job's lease is held until the last chunk is done.
     """
+    db = SessionLocal()
+    lease = None
     try:
-        db = SessionLocal()
-        
-        student = db.query(Student).filter(Student.student_id == student_id).first()
-        if not student:
-            db.close()
-            return {"status": "failed", "error": "Student not found"}
-        
-        # Calculate attendance
-        attendances = db.query(Attendance).filter(
-            and_(
-                Attendance.student_id == student_id,
-                func.extract('month', Attendance.attendance_date) == month,
-                func.extract('year', Attendance.attendance_date) == year
-            )
-        ).all()
-        
-        total_classes = len(set(a.course_id for a in attendances))
-        attended_classes = len([a for a in attendances if a.status == "present"])
-        attendance_percentage = (attended_classes / total_classes * 100) if total_classes > 0 else 0
-        
-        # Calculate grades
-        submissions = db.query(AssignmentSubmission).filter(
-            and_(
-                AssignmentSubmission.student_id == student_id,
-                AssignmentSubmission.grade != None  # noqa: E711
-            )
-        ).all()
-        
-        assignments_completed = len(submissions)
-        average_grade = (sum(s.grade for s in submissions) / len(submissions)) if submissions else 0
-        
-        # Find outstanding assignments
-        outstanding = db.query(Assignment).filter(
-            and_(
-                Assignment.due_date > datetime.utcnow(),
-                ~Assignment.submissions.any(AssignmentSubmission.student_id == student_id)
-            )
-        ).count()
-        
-        # Send email
-        import asyncio
-        month_name = datetime(year, month, 1).strftime("%B")
-        
-        result = asyncio.run(
-            email_service.send_monthly_student_report(
-                student_email=student.email,
-                student_name=student.name,
-                month=month_name,
-                year=str(year),
-                total_classes=total_classes,
-                attended_classes=attended_classes,
-                attendance_percentage=attendance_percentage,
-                assignments_completed=assignments_completed,
-                average_grade=average_grade,
-                outstanding_assignments=outstanding
-            )
+        lease = acquire_lease(db, DIGEST_LEASE, default_holder(self.request.id))
+        if lease is None:
+            return skipped_while_held(db, DIGEST_LEASE)
+        
+        since = datetime.utcnow() - timedelta(days=1)
+        users = digest_recipients(db, since)
+        
+        fan_out(
+            send_notification_digest_chunk,
+            users,
+            settings.notification_digest_chunk_size,
+            args=(since.isoformat(), lease.token),
+            callback=fanout_complete.s(DIGEST_LEASE, lease.token),
         )
         
-        # Log report generation
-        report = MonthlyReport(
-            month=month,
-            year=year,
-            report_type="student",
-            recipient_id=student_id,
-            recipient_type="student",
-            recipient_email=student.email,
-            total_classes=total_classes,
-            classes_attended=attended_classes,
-            attendance_percentage=attendance_percentage,
-            assignments_completed=assignments_completed,
-            average_grade=average_grade,
-            outstanding_assignments=outstanding,
-            status="sent" if result else "failed",
-            sent_at=datetime.utcnow() if result else None
-        )
-        db.add(report)
-        db.commit()
-        db.close()
-        
-        logger.info(f"Sent monthly report to student {student_id}")
-        return {"status": "success" if result else "failed", "student_id": student_id}
+        logger.info(f"Notification digest dispatched for {len(users)} users")
+        return {"status": "success", "recipients": len(users), "lease_token": lease.token}
     
     except Exception as exc:
-        logger.error(f"Error sending student monthly report: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60)
+        if lease is not None:
+            release_lease(db, DIGEST_LEASE, lease.token)
+        logger.error(f"Error sending notification digest: {str(exc)}")
+        return {"status": "failed", "error": str(exc)}
+    finally:
+        db.close()
 
 
-@celery_app.task(bind=True, max_retries=3)
-def send_teacher_monthly_report(self, teacher_id: int, month: int, year: int):
+@celery_app.task(bind=True)
+def send_monthly_reports(self, month: int = None, year: int = None):
     """
-    Generate and send monthly report for a specific teacher
+    Send monthly reports to all users (runs at 8 AM on the 1st of each month)
+    
+    Reports are built in this task, then sent by chunk tasks fanned out over
+    the workers; the run is closed by a chord callback once every chunk is
+    done. The month's run is checkpointed, so triggering it again after a
+    crash only sends the reports that are still unsent.
+    
+    Only one run is active at a time: the job's lease is held from here until
+    the chord callback, and chunks renew it with its fencing token.
     """
+    db = SessionLocal()
+    lease = None
     try:
-        db = SessionLocal()
-        
-        teacher = db.query(Teacher).filter(Teacher.teacher_id == teacher_id).first()
-        if not teacher:
-            db.close()
-            return {"status": "failed", "error": "Teacher not found"}
-        
-        # Get teacher's courses
-        courses = [c.course_id for c in teacher.courses]
-        
-        # Count students taught
-        students_taught = db.query(Enrollment).filter(
-            Enrollment.course_id.in_(courses)
-        ).distinct(Enrollment.student_id).count()
-        
-        # Count assignments posted this month
-        assignments_posted = db.query(Assignment).filter(
-            and_(
-                Assignment.course_id.in_(courses),
-                func.extract('month', Assignment.created_at) == month,
-                func.extract('year', Assignment.created_at) == year
-            )
-        ).count()
-        
-        # Count assignments graded
-        assignments_graded = db.query(AssignmentSubmission).filter(
-            and_(
-                Assignment.course_id.in_(courses),
-                AssignmentSubmission.graded_by_id == teacher_id,
-                func.extract('month', AssignmentSubmission.graded_at) == month,
-                func.extract('year', AssignmentSubmission.graded_at) == year
-            )
-        ).count()
-        
-        # Calculate average grade
-        submissions = db.query(AssignmentSubmission).filter(
-            and_(
-                AssignmentSubmission.graded_by_id == teacher_id,
-                AssignmentSubmission.grade != None  # noqa: E711
-            )
-        ).all()
-        average_grade = (sum(s.grade for s in submissions) / len(submissions)) if submissions else 0
-        
-        # Pending assignments
-        pending_assignments = db.query(AssignmentSubmission).filter(
-            and_(
-                Assignment.course_id.in_(courses),
-                AssignmentSubmission.graded_at == None  # noqa: E711
-            )
-        ).count()
-        
-        # Send email
-        import asyncio
-        month_name = datetime(year, month, 1).strftime("%B")
-        
-        result = asyncio.run(
-            email_service.send_monthly_teacher_report(
-                teacher_email=teacher.email,
-                teacher_name=teacher.name,
-                month=month_name,
-                year=str(year),
-                students_taught=students_taught,
-                assignments_posted=assignments_posted,
-                assignments_graded=assignments_graded,
-                pending_assignments=pending_assignments,
-                average_class_grade=average_grade
-            )
+        # Get current month and year
+        now = datetime.utcnow()
+        month = month or now.month
+        year = year or now.year
+        
+        lease = acquire_lease(db, MONTHLY_REPORTS_LEASE, default_holder(self.request.id))
+        if lease is None:
+            return skipped_while_held(db, MONTHLY_REPORTS_LEASE)
+        
+        run = get_or_create_run(db, month, year)
+        if run.status == "completed":
+            release_lease(db, MONTHLY_REPORTS_LEASE, lease.token)
+            return {"status": "success", "run_id": run.run_id, "message": "already sent"}
+        
+        report_ids = prepare_run(db, run)
+        fan_out(
+            send_monthly_report_chunk,
+            report_ids,
+            settings.monthly_report_chunk_size,
+            args=(run.run_id, lease.token),
+            callback=finish_monthly_report_run.s(run.run_id, lease.token),
         )
         
-        # Log report generation
-        report = MonthlyReport(
-            month=month,
-            year=year,
-            report_type="teacher",
-            recipient_id=teacher_id,
-            recipient_type="teacher",
-            recipient_email=teacher.email,
-            students_count=students_taught,
-            assignments_graded=assignments_graded,
-            pending_assignments=pending_assignments,
-            status="sent" if result else "failed",
-            sent_at=datetime.utcnow() if result else None
-        )
-        db.add(report)
-        db.commit()
+        logger.info(f"Monthly report run {run.run_id} dispatched {len(report_ids)} reports")
+        return {"status": "success", "run_id": run.run_id, "dispatched": len(report_ids), "lease_token": lease.token}
+    
+    except Exception as exc:
+        if lease is not None:
+            release_lease(db, MONTHLY_REPORTS_LEASE, lease.token)
+        logger.error(f"Error sending monthly reports: {str(exc)}")
+        return {"status": "failed", "error": str(exc)}
+    finally:
         db.close()
-        
-        logger.info(f"Sent monthly report to teacher {teacher_id}")
-        return {"status": "success" if result else "failed", "teacher_id": teacher_id}
+
+
+# ==================== Fan-out Chunk Tasks ====================
+
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
+@timed_chunk
+def send_monthly_report_chunk(report_ids: list, run_id: int, lease_token: int = None):
+    """
+    Send one chunk of monthly reports and advance the run's counters
     
+    Acknowledged only after it finishes, so a chunk whose worker died is
+    redelivered; reports it already sent are skipped. A chunk from a run
+    whose lease was taken over is fenced off and sends nothing. Any other
+    error is reported in the result rather than raised, so the chord callback
+    still closes the run and releases the lease; the chunk's reports stay
+    unsent for the next trigger.
+    """
+    db = SessionLocal()
+    try:
+        if lease_token is not None:
+            renew_lease(db, MONTHLY_REPORTS_LEASE, lease_token)
+        return run_async(send_report_chunk(db, report_ids, run_id=run_id))
+    except LeaseLost as exc:
+        logger.warning(f"Monthly report chunk fenced off: {str(exc)}")
+        return {"sent": 0, "failed": 0, "fenced": len(report_ids)}
     except Exception as exc:
-        logger.error(f"Error sending teacher monthly report: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60)
+        db.rollback()
+        logger.error(f"Monthly report chunk of run {run_id} failed: {str(exc)}", exc_info=True)
+        return {"sent": 0, "failed": 0, "errored": len(report_ids)}
+    finally:
+        db.close()
 
 
-@celery_app.task(bind=True, max_retries=3)
-def send_admin_monthly_report(self, admin_id: int, month: int, year: int):
+@celery_app.task
+def finish_monthly_report_run(results: list, run_id: int, lease_token: int = None):
+    """Chord callback: close the run once every chunk has reported back, and release the lease"""
+    summary = summarize_chunks(results)
+    db = SessionLocal()
+    try:
+        run = db.query(MonthlyReportRun).filter(MonthlyReportRun.run_id == run_id).first()
+        if run is None:
+            logger.error(f"Monthly report run {run_id} not found: {summary}")
+            return {"status": "failed", "run_id": run_id, "error": "run not found", **summary}
+        run = finish_run(db, run)
+        logger.info(f"Monthly report run {run_id} {run.status}: {summary}")
+        return {"status": "success", "run_id": run_id, "run_status": run.status, **summary}
+    finally:
+        if lease_token is not None:
+            db.rollback()
+            release_lease(db, MONTHLY_REPORTS_LEASE, lease_token)
+        db.close()
+
+
+@celery_app.task(acks_late=True, reject_on_worker_lost=True)
+@timed_chunk
+def send_notification_digest_chunk(users: list, since: str, lease_token: int = None):
     """
-    Generate and send monthly platform report for admin
+    Send the digests of one chunk of ``[user_id, user_type]`` pairs.
+    Errors are reported in the result so the chord callback still releases the lease.
     """
+    db = SessionLocal()
     try:
-        db = SessionLocal()
-        
-        admin = db.query(Admin).filter(Admin.admin_id == admin_id).first()
-        if not admin:
-            db.close()
-            return {"status": "failed", "error": "Admin not found"}
-        
-        # Get platform statistics
-        total_students = db.query(Student).filter(Student.is_active == True).count()  # noqa: E712
-        total_teachers = db.query(Teacher).filter(Teacher.is_active == True).count()  # noqa: E712
-        total_courses = db.query(Course).filter(Course.status == "active").count()
-        total_enrollments = db.query(Enrollment).count()
-        
-        # Revenue calculation
-        payments = db.query(Payment).filter(
-            and_(
-                Payment.payment_status == "completed",
-                func.extract('month', Payment.payment_date) == month,
-                func.extract('year', Payment.payment_date) == year
-            )
-        ).all()
-        total_revenue = sum(p.amount for p in payments)
-        
-        # New enrollments this month
-        new_enrollments = db.query(Enrollment).filter(
-            and_(
-                func.extract('month', Enrollment.enrollment_date) == month,
-                func.extract('year', Enrollment.enrollment_date) == year
-            )
-        ).count()
-        
-        # Active users (logged in this month) - simplified
-        active_users = total_students + total_teachers
-        
-        # Send email
-        import asyncio
-        month_name = datetime(year, month, 1).strftime("%B")
-        
-        result = asyncio.run(
-            email_service.send_monthly_admin_report(
-                admin_email=admin.email,
-                admin_name=admin.name,
-                month=month_name,
-                year=str(year),
-                total_students=total_students,
-                total_teachers=total_teachers,
-                total_courses=total_courses,
-                total_enrollments=total_enrollments,
-                total_revenue=total_revenue,
-                active_users=active_users,
-                new_enrollments=new_enrollments
-            )
-        )
-        
-        # Log report generation
-        report = MonthlyReport(
-            month=month,
-            year=year,
-            report_type="admin",
-            recipient_id=admin_id,
-            recipient_type="admin",
-            recipient_email=admin.email,
-            total_students=total_students,
-            total_teachers=total_teachers,
-            total_courses=total_courses,
-            total_enrollments=total_enrollments,
-            total_revenue=total_revenue,
-            status="sent" if result else "failed",
-            sent_at=datetime.utcnow() if result else None
+        if lease_token is not None:
+            renew_lease(db, DIGEST_LEASE, lease_token)
+        return run_async(send_digest_chunk(db, users, datetime.fromisoformat(since)))
+    except LeaseLost as exc:
+        logger.warning(f"Notification digest chunk fenced off: {str(exc)}")
+        return {"sent": 0, "failed": 0, "fenced": len(users)}
+    except Exception as exc:
+        db.rollback()
+        logger.error(f"Notification digest chunk failed: {str(exc)}", exc_info=True)
+        return {"sent": 0, "failed": 0, "errored": len(users)}
+    finally:
+        db.close()
+
+
+@celery_app.task
+@timed_chunk
+def create_notifications_chunk(users: list, notification_type: str, title: str, message: str, options: dict = None):
+    """Create (and deliver) one notification per user in the chunk with one commit"""
+    options = dict(options or {})
+    if "priority" in options:
+        options["priority"] = NotificationPriority(options["priority"])
+    
+    db = SessionLocal()
+    try:
+        created = NotificationService(db).bulk_notify(
+            users, NotificationType(notification_type), title, message, **options
         )
-        db.add(report)
-        db.commit()
+        return {"created": len(created)}
+    finally:
         db.close()
-        
-        logger.info(f"Sent monthly report to admin {admin_id}")
-        return {"status": "success" if result else "failed", "admin_id": admin_id}
+
+
+@celery_app.task
+def fanout_complete(results: list, job: str, lease_token: int = None):
+    """
+    Chord callback for fan-out jobs that only need their summary logged;
+    releases the job's lease when the job held one
+    """
+    summary = summarize_chunks(results)
+    logger.info(f"Fan-out job {job} finished: {summary}")
+    if lease_token is not None:
+        db = SessionLocal()
+        try:
+            release_lease(db, job, lease_token)
+        finally:
+            db.close()
+    return {"status": "success", "job": job, **summary}
+
+
+def queue_bulk_notification(
+    users: list,
+    notification_type: NotificationType,
+    title: str,
+    message: str,
+    **options
+):
+    """Create a notification for many users in chunked Celery tasks"""
+    if isinstance(options.get("priority"), NotificationPriority):
+        options["priority"] = options["priority"].value
     
-    except Exception as exc:
-        logger.error(f"Error sending admin monthly report: {str(exc)}")
-        raise self.retry(exc=exc, countdown=60)
+    return fan_out(
+        create_notifications_chunk,
+        users,
+        settings.bulk_notification_chunk_size,
+        args=(NotificationType(notification_type).value, title, message, options),
+        callback=fanout_complete.s("bulk_notification"),
+    )
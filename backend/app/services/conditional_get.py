@@ -0,0 +1,221 @@
+"""
+Conditional GET - ETag/Last-Modified validators for read-heavy resources
+
+The frontend polls course, lesson, material and announcement lists. Most polls
+find nothing new, yet each one used to load and serialize every row.
+
+``resource_version`` derives a validator from one aggregate query over the
+resource's scope: the row count, the highest primary key and the latest
+change timestamp. Inserting, updating or deleting a row changes at least one
+of them. ``not_modified`` turns the validator into ``ETag``/``Last-Modified``
+headers and answers 304 when the client's copy is current, before the
+endpoint loads any rows.
+
+Last-Modified cannot see deletes, so ``If-Modified-Since`` is only honoured
+for single-row resources. Collections are revalidated by ETag.
+
+``ETagMiddleware`` covers every other GET endpoint: it hashes JSON bodies into
+a weak ETag and replaces a matching response with an empty 304. That saves
+bandwidth but not the work of building the response.
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Iterable, List, Optional
+
+from fastapi import Request, Response, status
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Course
+
+logger = logging.getLogger(__name__)
+
+VALIDATED_CACHE_CONTROL = "private, no-cache"  # Stored, but revalidated on every use
+
+
+@dataclass
+class Validator:
+    """Version of a resource scope, from resource_version"""
+    version: str
+    last_modified: Optional[datetime] = None
+    single: bool = False  # Deletes are visible (as a 404), so If-Modified-Since is safe
+
+
+# ==================== Validators ====================
+
+def _as_utc(value: Any) -> Optional[datetime]:
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)  # Stored as UTC (CURRENT_TIMESTAMP on SQLite)
+    return value.astimezone(timezone.utc)
+
+
+def resource_version(db: Session, model: Any, *criteria: Any, changed_at: Iterable[Any] = (),
+                     single: bool = False) -> Validator:
+    """
+    Validator of the ``model`` rows matching ``criteria``, from their count,
+    highest primary key and latest ``changed_at`` (default: ``updated_at``,
+    then ``created_at``). One aggregate query; no rows are loaded.
+    """
+    changed_columns: List[Any] = list(changed_at) or [
+        getattr(model, name) for name in ("updated_at", "created_at") if hasattr(model, name)
+    ]
+    changed = changed_columns[0] if len(changed_columns) == 1 else func.coalesce(*changed_columns)
+    primary_key = inspect(model).primary_key[0]
+
+    count, max_id, last_changed = db.query(
+        func.count(primary_key), func.max(primary_key), func.max(changed)
+    ).filter(*criteria).one()
+
+    last_modified = _as_utc(last_changed)
+    stamp = last_modified.isoformat() if last_modified else ""
+    return Validator(version=f"{count}-{max_id or 0}-{stamp}", last_modified=last_modified, single=single)
+
+
+def _etag(request: Request, version: str, variant: str) -> str:
+    # The same scope can be rendered differently per query string (paging, filters) or per user
+    key = f"{request.url.path}?{request.url.query}|{variant}|{version}"
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()[:20]}"'
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison against an If-None-Match list"""
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    return any(
+        (tag.strip()[2:] if tag.strip().startswith("W/") else tag.strip()) == opaque
+        for tag in if_none_match.split(",")
+    )
+
+
+def _not_modified_since(if_modified_since: str, last_modified: datetime) -> bool:
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        since = since.replace(tzinfo=timezone.utc)
+    # HTTP dates have whole seconds
+    return last_modified.replace(microsecond=0) <= since
+
+
+def not_modified(request: Request, response: Response, validator: Validator,
+                 variant: str = "") -> Optional[Response]:
+    """
+    Put the validator headers on ``response``. Returns an empty 304 response
+    (carrying the same headers) if the client's copy is current, else None.
+    ``variant`` distinguishes representations of the same scope (e.g. what a
+    user is allowed to see).
+    """
+    headers = {"ETag": _etag(request, validator.version, variant), "Cache-Control": VALIDATED_CACHE_CONTROL}
+    if validator.last_modified is not None:
+        headers["Last-Modified"] = format_datetime(validator.last_modified, usegmt=True)
+    response.headers.update(headers)
+
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        current = _etag_matches(if_none_match, headers["ETag"])
+    elif validator.single and validator.last_modified is not None and "if-modified-since" in request.headers:
+        current = _not_modified_since(request.headers["if-modified-since"], validator.last_modified)
+    else:
+        current = False
+    if current:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return None
+
+
+# ==================== Course Versioning ====================
+
+def _touch_course(target: Course, value: Any, initiator: Any) -> None:
+    """Teacher assignments are listed with the course; changing them bumps updated_at"""
+    target.updated_at = func.now()
+
+
+event.listen(Course.teachers, "append", _touch_course)
+event.listen(Course.teachers, "remove", _touch_course)
+
+
+# ==================== Middleware ====================
+
+class ETagMiddleware:
+    """
+    Weak ETags for JSON GET responses that do not set their own: the body is
+    hashed, and a response matching If-None-Match is replaced by a 304.
+    """
+
+    def __init__(self, app: Any, max_body_bytes: Optional[int] = None):
+        self.app = app
+        self.max_body_bytes = settings.etag_max_body_bytes if max_body_bytes is None else max_body_bytes
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] != "http" or scope["method"] not in ("GET", "HEAD"):
+            await self.app(scope, receive, send)
+            return
+
+        if_none_match = None
+        for name, value in scope["headers"]:
+            if name == b"if-none-match":
+                if_none_match = value.decode("latin-1")
+
+        start: Optional[dict] = None
+        chunks: List[bytes] = []
+        passthrough = False
+
+        async def send_buffered(message: dict) -> None:
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                if (
+                    message["status"] != status.HTTP_200_OK
+                    or b"etag" in headers
+                    or not headers.get(b"content-type", b"").startswith(b"application/json")
+                ):
+                    passthrough = True
+                    await send(message)
+                else:
+                    start = message
+                return
+
+            chunks.append(message.get("body", b""))
+            size = sum(len(chunk) for chunk in chunks)
+            if message.get("more_body", False) and size <= self.max_body_bytes:
+                return
+            if message.get("more_body", False):
+                # Too large to hash in memory: send what we have and stream the rest
+                passthrough = True
+                await send(start)
+                await send({"type": "http.response.body", "body": b"".join(chunks), "more_body": True})
+                return
+
+            body = b"".join(chunks)
+            etag = f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+            if if_none_match is not None and _etag_matches(if_none_match, etag):
+                headers = [
+                    (name, value) for name, value in start.get("headers", [])
+                    if name.lower() not in (b"content-length", b"content-type")
+                ]
+                await send({
+                    "type": "http.response.start",
+                    "status": status.HTTP_304_NOT_MODIFIED,
+                    "headers": headers + [(b"etag", etag.encode())],
+                })
+                await send({"type": "http.response.body", "body": b""})
+                return
+
+            await send({**start, "headers": list(start.get("headers", [])) + [(b"etag", etag.encode())]})
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_buffered)
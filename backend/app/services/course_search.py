@@ -0,0 +1,347 @@
+"""
+Course Search - Full-text catalog search with facets and cursor paging
+
+Courses are matched on their title and description: every query word must
+match, and the last one also matches as a prefix (search as you type). Title
+matches rank above description matches.
+
+On PostgreSQL the match is a ``tsvector`` query against a GIN expression
+index over ``DOCUMENT_SQL``. Other databases (SQLite in tests and local
+development) use an in-process inverted index over the courses table. It is
+caught up from ``updated_at``/``created_at`` on every search and rebuilt every
+``course_search_rebuild_seconds`` to drop deleted courses.
+
+Facets (online/offline, status, difficulty level of online courses, teachers
+and the price range) are counted in one aggregate query over the matches.
+Each facet is counted with every filter except its own, so a client can show
+the alternatives to the value it has selected.
+
+Results are paged with an opaque cursor on (score, course_id).
+"""
+
+import logging
+import math
+import re
+import threading
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import timedelta
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import Float, Numeric, String, case, cast, func, literal, literal_column, null, select, tuple_, union_all
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Course, OnlineCourse, teacher_course_association
+
+logger = logging.getLogger(__name__)
+
+# Must match the expression of ix_courses_search_document (PostgreSQL), or the index is not used
+DOCUMENT_SQL = (
+    "setweight(to_tsvector('english', coalesce({table}title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce({table}description, '')), 'B')"
+)
+TITLE_WEIGHT = 3.0
+# Rows written by other processes can commit slightly after their timestamp
+CATCH_UP_MARGIN = timedelta(seconds=5)
+
+Score = Union[float, Decimal]
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+_STOP_WORDS = frozenset(
+    "a an and are as at be by for from in into is it of on or the to with".split()
+)
+
+
+class InvalidCursor(ValueError):
+    """The paging cursor could not be parsed"""
+
+
+@dataclass
+class CourseFilters:
+    """Facet selections; None (or empty) means no filter"""
+    is_online: Optional[bool] = None
+    status: Optional[str] = None
+    difficulty: Optional[str] = None
+    min_price: Optional[float] = None
+    max_price: Optional[float] = None
+    teacher_ids: List[int] = field(default_factory=list)
+
+
+# ==================== Text ====================
+
+def query_words(text: str) -> List[str]:
+    """Lowercased words of ``text`` without stop words, in order"""
+    return [word for word in _TOKEN_SPLIT.split((text or "").lower()) if word and word not in _STOP_WORDS]
+
+
+def stem(word: str) -> str:
+    """Strip plural endings, so "courses" finds "course" as the english stemmer does"""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us", "is")):
+        return word[:-1]
+    return word
+
+
+def tsquery_text(words: List[str]) -> str:
+    """``to_tsquery`` input: every word required, the last one as a prefix"""
+    return " & ".join(words[:-1] + [f"{words[-1]}:*"])
+
+
+# ==================== Cursor ====================
+
+def encode_cursor(score: Score, course_id: int) -> str:
+    return f"{score}~{course_id}"
+
+
+def decode_cursor(cursor: str, exact: bool) -> Tuple[Score, int]:
+    """(score, course_id); the score is a Decimal for SQL-ranked pages"""
+    try:
+        score, course_id = cursor.split("~")
+        return (Decimal(score) if exact else float(score)), int(course_id)
+    except (ArithmeticError, ValueError):
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+# ==================== In-process Index ====================
+
+class CourseSearchIndex:
+    """Inverted index over course titles and descriptions, for databases without tsvector"""
+
+    def __init__(self, rebuild_seconds: Optional[float] = None):
+        self.rebuild_seconds = (
+            settings.course_search_rebuild_seconds if rebuild_seconds is None else rebuild_seconds
+        )
+        self._docs: Dict[int, Dict[str, float]] = {}
+        self._postings: Dict[str, Set[int]] = defaultdict(set)
+        self._watermark: Optional[Any] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _remove(self, course_id: int) -> None:
+        for term in self._docs.pop(course_id, {}):
+            ids = self._postings.get(term)
+            if ids is not None:
+                ids.discard(course_id)
+                if not ids:
+                    del self._postings[term]
+
+    def _add(self, course_id: int, title: Optional[str], description: Optional[str]) -> None:
+        self._remove(course_id)
+        weights: Dict[str, float] = defaultdict(float)
+        for word in query_words(title):
+            weights[stem(word)] += TITLE_WEIGHT
+        for word in query_words(description):
+            weights[stem(word)] += 1.0
+        self._docs[course_id] = dict(weights)
+        for term in weights:
+            self._postings[term].add(course_id)
+
+    def _apply(self, rows: Iterable[Any]) -> None:
+        for row in rows:
+            self._add(row.course_id, row.title, row.description)
+            if row.changed_at is not None and (self._watermark is None or row.changed_at > self._watermark):
+                self._watermark = row.changed_at
+
+    def _columns(self, db: Session) -> Any:
+        changed_at = func.coalesce(Course.updated_at, Course.created_at)
+        return db.query(Course.course_id, Course.title, Course.description, changed_at.label("changed_at"))
+
+    def refresh(self, db: Session) -> None:
+        """Rebuild when due, otherwise apply courses changed since the last look"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.rebuild_seconds:
+                self._docs.clear()
+                self._postings.clear()
+                self._watermark = None
+                self._apply(self._columns(db))
+                self._loaded_at = time.monotonic()
+            elif self._watermark is not None:
+                self._apply(self._columns(db).filter(
+                    func.coalesce(Course.updated_at, Course.created_at) >= self._watermark - CATCH_UP_MARGIN
+                ))
+            else:
+                self._apply(self._columns(db))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def scores(self, words: List[str]) -> Dict[int, float]:
+        """Courses containing every word (the last as a prefix), with their tf-idf score"""
+        terms = [stem(word) for word in words]
+        with self._lock:
+            total = len(self._docs) or 1
+            matched: Optional[Set[int]] = None
+            expanded: List[List[str]] = []
+            for position, term in enumerate(terms):
+                if position == len(terms) - 1:
+                    # The last word may be unfinished: match the raw word as a prefix too
+                    options = [t for t in self._postings if t.startswith(term) or t.startswith(words[-1])]
+                else:
+                    options = [term] if term in self._postings else []
+                ids = set().union(*(self._postings[t] for t in options)) if options else set()
+                matched = ids if matched is None else matched & ids
+                expanded.append(options)
+                if not matched:
+                    return {}
+
+            scores = {}
+            for course_id in matched:
+                weights = self._docs[course_id]
+                score = 0.0
+                for options in expanded:
+                    for term in options:
+                        if term in weights:
+                            score += weights[term] * math.log(1 + total / len(self._postings[term]))
+                length = sum(weights.values())
+                scores[course_id] = round(score / (1 + math.log(1 + length)), 6)
+        return scores
+
+
+# ==================== Search ====================
+
+def _conditions(matches: Any, filters: CourseFilters, exclude: Optional[str] = None) -> List[Any]:
+    """WHERE conditions for the filters, leaving out the ``exclude`` facet"""
+    c = matches.c
+    conditions = []
+    if filters.is_online is not None and exclude != "mode":
+        conditions.append(func.coalesce(c.is_online, False) == filters.is_online)
+    if filters.status and exclude != "status":
+        conditions.append(c.status == filters.status)
+    if filters.difficulty and exclude != "difficulty":
+        conditions.append(c.difficulty_level == filters.difficulty)
+    if exclude != "price":
+        if filters.min_price is not None:
+            conditions.append(c.price >= filters.min_price)
+        if filters.max_price is not None:
+            conditions.append(c.price <= filters.max_price)
+    if filters.teacher_ids and exclude != "teachers":
+        conditions.append(c.course_id.in_(
+            select(teacher_course_association.c.course_id).where(
+                teacher_course_association.c.teacher_id.in_(filters.teacher_ids)
+            )
+        ))
+    return conditions
+
+
+def _facets(db: Session, matches: Any, filters: CourseFilters) -> Dict[str, Any]:
+    """Every facet in one UNION ALL query: (facet, value, count, min price, max price) rows"""
+    c = matches.c
+    count = func.count(c.course_id)
+    no_value, no_price = cast(null(), String), cast(null(), Float)
+    mode = case((c.is_online == True, "online"), else_="offline")  # noqa: E712
+    teacher_id = teacher_course_association.c.teacher_id
+
+    def facet(name: str) -> Any:
+        return literal(name, String).label("facet")
+
+    rows = db.execute(union_all(
+        select(facet("total"), no_value, count, no_price, no_price).where(*_conditions(matches, filters)),
+        select(facet("mode"), mode, count, no_price, no_price).where(
+            *_conditions(matches, filters, "mode")
+        ).group_by(mode),
+        select(facet("status"), c.status, count, no_price, no_price).where(
+            *_conditions(matches, filters, "status")
+        ).group_by(c.status),
+        select(facet("difficulty"), c.difficulty_level, count, no_price, no_price).where(
+            c.difficulty_level != None, *_conditions(matches, filters, "difficulty")  # noqa: E711
+        ).group_by(c.difficulty_level),
+        select(facet("price"), no_value, count, func.min(c.price), func.max(c.price)).where(
+            *_conditions(matches, filters, "price")
+        ),
+        select(facet("teachers"), cast(teacher_id, String), func.count(func.distinct(c.course_id)), no_price, no_price)
+        .select_from(matches.join(teacher_course_association, teacher_course_association.c.course_id == c.course_id))
+        .where(*_conditions(matches, filters, "teachers"))
+        .group_by(teacher_id),
+    )).all()
+
+    facets: Dict[str, Any] = {
+        "total": 0, "mode": {}, "status": {}, "difficulty": {}, "teachers": {},
+        "price": {"min": None, "max": None},
+    }
+    for name, value, number, low, high in rows:
+        if name == "total":
+            facets["total"] = number
+        elif name == "price":
+            facets["price"] = {
+                "min": float(low) if low is not None else None,
+                "max": float(high) if high is not None else None,
+            }
+        elif name == "teachers":
+            facets["teachers"][int(value)] = number
+        elif value is not None:
+            facets[name][value] = number
+    return facets
+
+
+def search_courses(
+    db: Session,
+    query: Optional[str] = None,
+    filters: Optional[CourseFilters] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Course], Dict[str, Any], Optional[str]]:
+    """
+    One page of courses matching ``query`` and ``filters`` (best match first;
+    newest first without a query), the facet counts, and the cursor of the
+    next page (None on the last page).
+    """
+    filters = filters or CourseFilters()
+    words = query_words(query or "")
+    postgres = db.get_bind().dialect.name == "postgresql"
+    ranked_in_sql = postgres or not words
+    after = decode_cursor(cursor, exact=postgres) if cursor else None
+
+    columns = [Course.course_id, Course.is_online, Course.status, Course.price, OnlineCourse.difficulty_level]
+    scores: Dict[int, float] = {}
+    if words and postgres:
+        document = literal_column(f"({DOCUMENT_SQL.format(table='courses.')})")
+        tsquery = func.to_tsquery(literal_column("'english'"), tsquery_text(words))
+        score = func.round(cast(func.ts_rank(document, tsquery), Numeric), 6)
+        base = select(*columns, score.label("score")).where(document.op("@@")(tsquery))
+    else:
+        base = select(*columns, literal(0).label("score"))
+        if words:
+            course_search_index.refresh(db)
+            scores = course_search_index.scores(words)
+            base = base.where(Course.course_id.in_(list(scores)))
+    matches = base.select_from(Course).outerjoin(
+        OnlineCourse, OnlineCourse.course_id == Course.course_id
+    ).cte("matches")
+
+    facets = _facets(db, matches, filters)
+
+    if ranked_in_sql:
+        page = db.query(Course, matches.c.score).join(
+            matches, matches.c.course_id == Course.course_id
+        ).filter(*_conditions(matches, filters))
+        if after is not None:
+            page = page.filter(tuple_(matches.c.score, matches.c.course_id) < after)
+        rows: List[Tuple[Course, Score]] = page.order_by(
+            matches.c.score.desc(), matches.c.course_id.desc()
+        ).limit(limit + 1).all()
+    else:
+        matching_ids = db.query(matches.c.course_id).filter(*_conditions(matches, filters))
+        ranked = sorted(((scores[course_id], course_id) for (course_id,) in matching_ids), reverse=True)
+        if after is not None:
+            ranked = [item for item in ranked if item < after]
+        ranked = ranked[:limit + 1]
+        courses = {
+            course.course_id: course
+            for course in db.query(Course).filter(Course.course_id.in_([course_id for _, course_id in ranked]))
+        }
+        rows = [(courses[course_id], score) for score, course_id in ranked]
+
+    next_cursor = None
+    if len(rows) > limit:
+        course, score = rows[limit - 1]
+        next_cursor = encode_cursor(score, course.course_id)
+    return [course for course, _ in rows[:limit]], facets, next_cursor
+
+
+# Global in-process index, used when the database is not PostgreSQL
+course_search_index = CourseSearchIndex()
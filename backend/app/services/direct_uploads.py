@@ -0,0 +1,234 @@
+"""
+Direct Uploads - Signed upload intents, so file bytes bypass the API server
+
+Uploading through the API sends every byte twice (client to API, API to
+storage) and ties up a worker for the length of the upload. With an upload
+intent the API only signs; the client sends the file straight to storage:
+
+1. ``create_intent`` returns short-lived upload parameters and an intent
+   token. The token is a signed JWT naming the purpose (material or
+   submission), its target, the user and the storage key:
+
+   - Cloudinary: a signed POST to the Cloudinary upload API with a fixed
+     ``folder``/``public_id``
+   - local storage (development): a presigned PUT URL, in the style of an
+     S3-compatible bucket, served by the API's ``/direct-uploads`` endpoint
+     (``receive_direct_put``)
+
+2. The client uploads the file, then calls the completion endpoint with the
+   intent token (and, for Cloudinary, the upload response). ``complete_intent``
+   checks that the file really is in storage under the intent's key, and the
+   endpoint records the Material or AssignmentSubmission row.
+
+A signed Cloudinary POST cannot carry a size limit, so the intent's
+``max_bytes`` is enforced on completion: an upload that is larger (according
+to Cloudinary's record of the asset, not just the client's word) is deleted
+and rejected.
+
+Upload parameters expire after ``upload_intent_expire_seconds``; an upload
+started in time can be completed for ``COMPLETION_WINDOW`` more.
+"""
+
+import asyncio
+import hashlib
+import hmac
+import logging
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlencode
+
+import cloudinary.utils
+from jose import JWTError, jwt
+
+from app.core.config import settings
+from app.services.uploads import (
+    StoredFile, UploadTooLarge, local_object_path, local_object_url, new_object_key, spool_stream, store_local
+)
+from app.utils.cloudinary_helper import delete_file, get_file_info
+
+logger = logging.getLogger(__name__)
+
+INTENT_TYPE = "upload-intent"
+COMPLETION_WINDOW = timedelta(hours=6)  # Large uploads can take a while after they start
+DIRECT_PUT_PATH = "/api/v1/direct-uploads"
+
+
+class InvalidUploadIntent(Exception):
+    """The intent token, signature or uploaded file does not check out"""
+
+
+@dataclass
+class UploadIntent:
+    """What the client needs to upload straight to storage"""
+    intent_token: str
+    storage: str  # cloudinary, local
+    method: str  # POST (multipart form with ``fields``) or PUT (raw body)
+    upload_url: str
+    expires_at: datetime
+    max_bytes: int
+    fields: Dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class CompletedUpload:
+    """A file found in storage for an intent"""
+    url: str
+    size: Optional[int]
+    storage: str
+    public_id: Optional[str] = None
+
+
+# ==================== Intents ====================
+
+def create_intent(purpose: str, target_id: int, user_id: str, filename: str, folder: str, local_folder: str,
+                  resource_type: str = "auto", max_bytes: Optional[int] = None) -> UploadIntent:
+    """
+    Sign upload parameters for one file. ``purpose``/``target_id`` (e.g.
+    material/course id) and ``user_id`` are checked again on completion.
+    """
+    max_bytes = settings.direct_upload_max_file_size if max_bytes is None else max_bytes
+    now = int(time.time())
+    expires = now + settings.upload_intent_expire_seconds
+    claims: Dict[str, Any] = {
+        "typ": INTENT_TYPE,
+        "purpose": purpose,
+        "target": target_id,
+        "sub": user_id,
+        "filename": filename,
+        "max_bytes": max_bytes,
+        "exp": expires + int(COMPLETION_WINDOW.total_seconds()),
+    }
+
+    if settings.use_cloudinary:
+        key = new_object_key(folder, filename)
+        public_id = os.path.splitext(key)[0] if resource_type != "raw" else key
+        params = {"folder": folder, "public_id": public_id.split("/", 1)[1], "timestamp": now}
+        claims.update(storage="cloudinary", key=public_id)
+        intent = UploadIntent(
+            intent_token="",
+            storage="cloudinary",
+            method="POST",
+            upload_url=f"https://api.cloudinary.com/v1_1/{settings.cloudinary_cloud_name}/{resource_type}/upload",
+            expires_at=datetime.utcfromtimestamp(expires),
+            max_bytes=max_bytes,
+            fields={
+                **params,
+                "api_key": settings.cloudinary_api_key,
+                "signature": cloudinary.utils.api_sign_request(params, settings.cloudinary_api_secret),
+            },
+        )
+    else:
+        key = new_object_key(local_folder, filename)
+        claims.update(storage="local", key=key)
+        query = urlencode({"expires": expires, "max_bytes": max_bytes,
+                           "signature": _put_signature(key, expires, max_bytes)})
+        intent = UploadIntent(
+            intent_token="",
+            storage="local",
+            method="PUT",
+            upload_url=f"{DIRECT_PUT_PATH}/{key}?{query}",
+            expires_at=datetime.utcfromtimestamp(expires),
+            max_bytes=max_bytes,
+        )
+
+    intent.intent_token = jwt.encode(claims, settings.secret_key, algorithm=settings.algorithm)
+    return intent
+
+
+def read_intent(token: str, purpose: str, target_id: int, user_id: str) -> Dict[str, Any]:
+    """The claims of an intent token issued to ``user_id`` for this purpose and target"""
+    try:
+        claims = jwt.decode(token, settings.secret_key, algorithms=[settings.algorithm])
+    except JWTError as e:
+        raise InvalidUploadIntent(f"Invalid or expired upload intent: {e}")
+    if (
+        claims.get("typ") != INTENT_TYPE
+        or claims.get("purpose") != purpose
+        or claims.get("target") != target_id
+        or claims.get("sub") != user_id
+    ):
+        raise InvalidUploadIntent("Upload intent was issued for something else")
+    return claims
+
+
+def complete_intent(claims: Dict[str, Any], cloudinary_result: Optional[Dict[str, Any]] = None) -> CompletedUpload:
+    """
+    Check that the intent's file is in storage. For Cloudinary,
+    ``cloudinary_result`` is the upload response (public_id, version,
+    signature, secure_url, bytes); its signature proves the upload happened.
+    Raises UploadTooLarge, after deleting the asset, if it is over the
+    intent's ``max_bytes``.
+    """
+    key = claims["key"]
+    if claims["storage"] == "cloudinary":
+        result = cloudinary_result or {}
+        public_id, version = result.get("public_id"), result.get("version")
+        if public_id != key or version is None:
+            raise InvalidUploadIntent("Upload response does not match the upload intent")
+        expected = cloudinary.utils.api_sign_request(
+            {"public_id": public_id, "version": version}, settings.cloudinary_api_secret
+        )
+        if not hmac.compare_digest(str(result.get("signature", "")), expected):
+            raise InvalidUploadIntent("Upload response signature is invalid")
+        url = str(result.get("secure_url", ""))
+        if not url.startswith(f"https://res.cloudinary.com/{settings.cloudinary_cloud_name}/") \
+                or f"/v{version}/{public_id}" not in url:
+            raise InvalidUploadIntent("Upload response URL does not match the upload intent")
+        size = _cloudinary_size(public_id, url, result.get("bytes"), claims["max_bytes"])
+        return CompletedUpload(url=url, size=size, storage="cloudinary", public_id=public_id)
+
+    path = local_object_path(key)
+    if not os.path.isfile(path):
+        raise InvalidUploadIntent("File has not been uploaded")
+    return CompletedUpload(url=local_object_url(key), size=os.path.getsize(path), storage="local")
+
+
+def _cloudinary_size(public_id: str, url: str, reported: Optional[int], max_bytes: int) -> int:
+    """The stored asset's size; an asset over ``max_bytes`` is deleted (the response's ``bytes`` is not signed)"""
+    resource_type = url.split("/")[4]  # https://res.cloudinary.com/<cloud>/<resource_type>/upload/...
+    try:
+        size = get_file_info(public_id, resource_type=resource_type).get("bytes")
+    except Exception as e:
+        logger.warning(f"Could not look up uploaded asset {public_id}: {e}")
+        raise InvalidUploadIntent("Uploaded file could not be verified")
+
+    if reported is None or size is None or size != reported or size > max_bytes:
+        try:
+            delete_file(public_id, resource_type=resource_type)
+        except Exception as e:
+            logger.error(f"Could not delete rejected upload {public_id}: {e}")
+        if size is not None and size > max_bytes:
+            raise UploadTooLarge(max_bytes)
+        raise InvalidUploadIntent("Upload response size does not match the uploaded file")
+    return size
+
+
+# ==================== Local Presigned PUT ====================
+
+def _put_signature(key: str, expires: int, max_bytes: int) -> str:
+    message = f"PUT\n{key}\n{expires}\n{max_bytes}".encode()
+    return hmac.new(settings.secret_key.encode(), message, hashlib.sha256).hexdigest()
+
+
+async def receive_direct_put(key: str, expires: int, max_bytes: int, signature: str,
+                             chunks: AsyncIterator[bytes]) -> StoredFile:
+    """
+    Store the body of a presigned PUT under ``key``: streamed to a temporary
+    file with the signed size limit, then moved into local storage.
+    Raises InvalidUploadIntent, UploadTooLarge or FileExistsError.
+    """
+    if not hmac.compare_digest(signature, _put_signature(key, expires, max_bytes)):
+        raise InvalidUploadIntent("Invalid upload signature")
+    if time.time() > expires:
+        raise InvalidUploadIntent("Upload URL has expired")
+    if os.path.exists(local_object_path(key)):
+        raise FileExistsError(key)
+
+    upload = await spool_stream(chunks, os.path.basename(key), max_bytes)
+    try:
+        return await asyncio.to_thread(store_local, upload, key)
+    finally:
+        upload.cleanup()
@@ -0,0 +1,138 @@
+"""
+Email Deduplication - Short-lived index of recently sent email content hashes
+
+Celery retries and double-clicked actions can produce the same email several
+times within seconds. Before each SMTP call, the email's content hash is
+claimed in this index; a second claim for the same hash within the TTL means
+the message is a duplicate and is suppressed.
+
+A claim can name its owner (the outbox row being sent). The same owner can
+claim the hash again: if a worker died after claiming and before recording
+the send, the row is retried rather than suppressed as a duplicate of itself.
+
+The index lives in Redis so all workers share it, with an in-process fallback
+when Redis is not reachable.
+"""
+
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "email:dedup:"
+STATS_KEY = "email:dedup:stats"
+
+
+def compute_content_hash(
+    recipient: str,
+    email_type: str,
+    html: str,
+    entity_ids: Optional[Mapping[str, Any]] = None,
+) -> str:
+    """SHA-256 over recipient, email type, related entity ids and the rendered body"""
+    entities = ",".join(f"{k}={v}" for k, v in sorted((entity_ids or {}).items()) if v is not None)
+    digest = hashlib.sha256()
+    for part in (recipient.strip().lower(), email_type, entities, html):
+        digest.update(part.encode())
+        digest.update(b"\x00")
+    return digest.hexdigest()
+
+
+class DedupIndex:
+    """Set-if-absent index of content hashes with a TTL"""
+
+    def __init__(self, redis_url: Optional[str] = None, ttl_seconds: int = 600):
+        self.ttl_seconds = ttl_seconds
+        self._redis = None
+        self._redis_retry_at = 0.0
+        if redis_url and REDIS_AVAILABLE:
+            self._redis = redis.Redis.from_url(
+                redis_url, socket_connect_timeout=0.5, socket_timeout=0.5
+            )
+
+        self._lock = threading.Lock()
+        self._local: Dict[str, Tuple[float, str]] = {}  # hash -> (expires at, owner)
+        self._local_stats = {"checked": 0, "suppressed": 0}
+
+    def _use_redis(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning(f"Email dedup index falling back to local memory: {exc}")
+        self._redis_retry_at = time.monotonic() + 30
+
+    def claim(self, content_hash: str, owner: Optional[str] = None) -> bool:
+        """
+        Record the hash; returns False if it was already claimed within the TTL
+        (by a different owner, or by anyone when ``owner`` is None)
+        """
+        value = owner or "1"
+        if self._use_redis():
+            try:
+                pipe = self._redis.pipeline()  # type: ignore[union-attr]
+                pipe.set(KEY_PREFIX + content_hash, value, nx=True, ex=self.ttl_seconds)
+                pipe.get(KEY_PREFIX + content_hash)
+                pipe.hincrby(STATS_KEY, "checked", 1)
+                claimed, holder, _ = pipe.execute()
+                if claimed or (owner is not None and holder == owner.encode()):
+                    return True
+                self._redis.hincrby(STATS_KEY, "suppressed", 1)  # type: ignore[union-attr]
+                return False
+            except Exception as exc:
+                self._redis_failed(exc)
+
+        now = time.monotonic()
+        with self._lock:
+            self._local_stats["checked"] += 1
+            if len(self._local) > 10000:
+                self._local = {h: claim for h, claim in self._local.items() if claim[0] > now}
+            existing = self._local.get(content_hash)
+            if existing is not None and existing[0] > now and (owner is None or existing[1] != owner):
+                self._local_stats["suppressed"] += 1
+                return False
+            self._local[content_hash] = (now + self.ttl_seconds, value)
+            return True
+
+    def release(self, content_hash: str) -> None:
+        """Forget a hash whose send failed, so a retry is not treated as a duplicate"""
+        if self._use_redis():
+            try:
+                self._redis.delete(KEY_PREFIX + content_hash)  # type: ignore[union-attr]
+                return
+            except Exception as exc:
+                self._redis_failed(exc)
+
+        with self._lock:
+            self._local.pop(content_hash, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Checked/suppressed counters and the resulting duplicate rate"""
+        checked, suppressed = self._local_stats["checked"], self._local_stats["suppressed"]
+        if self._use_redis():
+            try:
+                raw = self._redis.hgetall(STATS_KEY)  # type: ignore[union-attr]
+                checked = int(raw.get(b"checked", 0))
+                suppressed = int(raw.get(b"suppressed", 0))
+            except Exception as exc:
+                self._redis_failed(exc)
+
+        return {
+            "checked": checked,
+            "suppressed": suppressed,
+            "duplicate_rate": round(suppressed / checked, 4) if checked else 0.0,
+        }
+
+
+# Global dedup index shared by the email service
+dedup_index = DedupIndex(settings.redis_url, settings.email_dedup_ttl_seconds)
@@ -0,0 +1,288 @@
+"""
+Email Outbox - Transactional queue of outgoing email backed by the email_logs table
+
+Producers call ``enqueue_email`` inside the same database transaction as the
+business change (a grade, a reset token, ...), so the email exists if and only
+if the change was committed. Outbox workers then claim due rows with
+``SELECT ... FOR UPDATE SKIP LOCKED``, move them to ``sending`` with a lease
+(``next_retry_at`` = now + ``email_send_lease_seconds``) and commit, so no row
+lock is held during the SMTP send. The outcome is recorded in a second
+transaction.
+
+Delivery is at-least-once. Concurrent workers skip each other's locked rows
+while claiming, so a row is normally sent once; but if a worker dies after
+the SMTP send and before recording it, the row stays ``sending`` until its
+lease lapses, and is then claimed and sent again. Such reclaims count as an
+attempt, so a row that keeps killing its worker ends up ``failed``.
+
+A send refused by the SMTP rate limiter (only when the caller passed a
+``max_wait``, as the request path does) is not an attempt: the row goes back
+to ``pending``, due when the limiter expects a free slot.
+"""
+
+import asyncio
+import logging
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.email_models import EmailLog, EmailStatusEnum
+from app.services.email_service import INTERACTIVE_EMAIL_TYPES, EmailService, email_service
+from app.services.email_dedup import compute_content_hash
+from app.services.rate_limiter import RateLimitExceeded
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_email(
+    db: Session,
+    recipient_email: str,
+    subject: str,
+    html_content: str,
+    email_type: str,
+    recipient_name: Optional[str] = None,
+    recipient_type: Optional[str] = None,
+    recipient_id: Optional[int] = None,
+    course_id: Optional[int] = None,
+    assignment_id: Optional[int] = None,
+    notification_id: Optional[int] = None,
+    max_retries: int = 3,
+) -> EmailLog:
+    """
+    Queue an email as part of the caller's transaction.
+
+    The row is only added to the session; it becomes visible to outbox
+    workers when the caller commits. Its content hash covers the recipient,
+    type, related entities and body, so duplicates are suppressed at send time.
+    """
+    content_hash = compute_content_hash(
+        recipient_email,
+        email_type,
+        html_content,
+        {
+            "recipient_id": recipient_id,
+            "course_id": course_id,
+            "assignment_id": assignment_id,
+            "notification_id": notification_id,
+        },
+    )
+    log = EmailLog(
+        recipient_email=recipient_email,
+        recipient_name=recipient_name,
+        recipient_type=recipient_type,
+        recipient_id=recipient_id,
+        subject=subject,
+        html_content=html_content,
+        email_type=email_type,
+        status=EmailStatusEnum.PENDING.value,
+        retry_count=0,
+        max_retries=max_retries,
+        course_id=course_id,
+        assignment_id=assignment_id,
+        notification_id=notification_id,
+        content_hash=content_hash,
+    )
+    db.add(log)
+    return log
+
+
+def backoff_delay(retry_count: int) -> timedelta:
+    """Exponential backoff with up to 10% jitter, capped at the configured maximum"""
+    base = settings.email_retry_base_seconds * (2 ** max(retry_count - 1, 0))
+    delay = min(base, settings.email_retry_max_seconds)
+    return timedelta(seconds=delay * (1 + random.random() * 0.1))
+
+
+@dataclass
+class ClaimedEmail:
+    """What a worker needs to send a claimed row, read before the claim is committed"""
+    log_id: int
+    recipient_email: str
+    subject: str
+    html_content: str
+    content_hash: Optional[str]
+    email_type: str
+
+
+def _empty_counts() -> Dict[str, int]:
+    return {"claimed": 0, "sent": 0, "suppressed": 0, "deferred": 0, "retrying": 0, "failed": 0}
+
+
+def claim_pending(
+    db: Session,
+    batch_size: int,
+    log_ids: Optional[Sequence[int]] = None,
+    interactive: Optional[bool] = None,
+) -> List[ClaimedEmail]:
+    """
+    Move up to ``batch_size`` due rows to ``sending`` and commit.
+
+    Due rows are pending rows whose retry time has come and sending rows whose
+    lease has lapsed (their worker died mid-send). Rows already locked by
+    another worker are skipped rather than waited on; the locks only last
+    until the claim is committed. ``interactive`` limits the claim to
+    INTERACTIVE_EMAIL_TYPES (True) or to every other type (False).
+    """
+    now = datetime.utcnow()
+    query = db.query(EmailLog).filter(
+        EmailLog.html_content.isnot(None),
+        or_(
+            and_(
+                EmailLog.status == EmailStatusEnum.PENDING.value,
+                or_(
+                    EmailLog.next_retry_at == None,  # noqa: E711
+                    EmailLog.next_retry_at <= now
+                )
+            ),
+            and_(
+                EmailLog.status == EmailStatusEnum.SENDING.value,
+                EmailLog.next_retry_at <= now
+            )
+        )
+    )
+
+    if log_ids is not None:
+        query = query.filter(EmailLog.log_id.in_(list(log_ids)))
+    if interactive is not None:
+        in_lane = EmailLog.email_type.in_(sorted(INTERACTIVE_EMAIL_TYPES))
+        query = query.filter(in_lane if interactive else ~in_lane)
+
+    entries = query.order_by(EmailLog.log_id).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    claimed = []
+    lease_until = now + timedelta(seconds=settings.email_send_lease_seconds)
+    for entry in entries:
+        if entry.status == EmailStatusEnum.SENDING.value:
+            # Its worker died; the email may or may not have gone out
+            entry.retry_count = (entry.retry_count or 0) + 1
+            entry.error_message = "Send lease expired"
+            if entry.retry_count >= (entry.max_retries or 0):
+                entry.status = EmailStatusEnum.FAILED.value
+                entry.next_retry_at = None
+                entry.html_content = None
+                logger.error(f"Email {entry.log_id} to {entry.recipient_email} failed permanently: lease expired")
+                continue
+            logger.warning(f"Email {entry.log_id} to {entry.recipient_email} reclaimed after its lease expired")
+
+        entry.status = EmailStatusEnum.SENDING.value
+        entry.attempted_at = now
+        entry.next_retry_at = lease_until
+        claimed.append(ClaimedEmail(
+            log_id=entry.log_id,
+            recipient_email=entry.recipient_email,
+            subject=entry.subject,
+            html_content=entry.html_content,
+            content_hash=entry.content_hash,
+            email_type=entry.email_type,
+        ))
+
+    db.commit()
+    return claimed
+
+
+async def deliver_claimed(
+    db: Session,
+    claimed: List[ClaimedEmail],
+    service: Optional[EmailService] = None,
+    max_wait: Optional[float] = None,
+) -> Dict[str, int]:
+    """Send claimed rows concurrently (no transaction open), then record each outcome and commit"""
+    service = service or email_service
+
+    results = await asyncio.gather(
+        *(
+            service.deliver(c.recipient_email, c.subject, c.html_content, c.content_hash,
+                            email_type=c.email_type, claim_owner=f"email_log:{c.log_id}", max_wait=max_wait)
+            for c in claimed
+        ),
+        return_exceptions=True,
+    )
+
+    counts = _empty_counts()
+    counts["claimed"] = len(claimed)
+    now = datetime.utcnow()
+
+    # One query reloads every row; a row reclaimed by another worker meanwhile is its to record
+    entries = {
+        entry.log_id: entry
+        for entry in db.query(EmailLog).filter(
+            EmailLog.log_id.in_([c.log_id for c in claimed]),
+            EmailLog.status == EmailStatusEnum.SENDING.value
+        )
+    }
+
+    for item, result in zip(claimed, results):
+        entry = entries.get(item.log_id)
+        if entry is None:
+            continue
+        entry.attempted_at = now
+
+        if result is False:
+            entry.status = EmailStatusEnum.SUPPRESSED.value
+            entry.next_retry_at = None
+            entry.html_content = None
+            counts["suppressed"] += 1
+            continue
+
+        if isinstance(result, RateLimitExceeded):
+            entry.status = EmailStatusEnum.PENDING.value
+            entry.next_retry_at = now + timedelta(seconds=result.wait_seconds)
+            counts["deferred"] += 1
+            continue
+
+        if not isinstance(result, BaseException):
+            entry.status = EmailStatusEnum.SENT.value
+            entry.sent_at = now
+            entry.error_message = None
+            entry.next_retry_at = None
+            entry.html_content = None  # Bodies can carry reset tokens; keep them only while queued
+            counts["sent"] += 1
+            continue
+
+        entry.retry_count = (entry.retry_count or 0) + 1
+        entry.error_message = str(result)
+
+        if entry.retry_count >= (entry.max_retries or 0):
+            entry.status = EmailStatusEnum.FAILED.value
+            entry.next_retry_at = None
+            entry.html_content = None
+            counts["failed"] += 1
+            logger.error(f"Email {entry.log_id} to {entry.recipient_email} failed permanently: {result}")
+        else:
+            entry.status = EmailStatusEnum.PENDING.value
+            entry.next_retry_at = now + backoff_delay(entry.retry_count)
+            counts["retrying"] += 1
+            logger.warning(
+                f"Email {entry.log_id} to {entry.recipient_email} failed "
+                f"(attempt {entry.retry_count}/{entry.max_retries}), retrying at {entry.next_retry_at}"
+            )
+
+    db.commit()
+    return counts
+
+
+async def process_outbox(
+    db: Session,
+    batch_size: Optional[int] = None,
+    log_ids: Optional[Sequence[int]] = None,
+    service: Optional[EmailService] = None,
+    max_wait: Optional[float] = None,
+    interactive: Optional[bool] = None,
+) -> Dict[str, int]:
+    """
+    Claim one batch of due emails, deliver it and record the outcomes.
+    With ``max_wait``, emails the rate limiter cannot take that soon stay queued.
+    """
+    try:
+        claimed = claim_pending(db, batch_size or settings.email_outbox_batch_size, log_ids, interactive)
+        if not claimed:
+            return _empty_counts()
+        return await deliver_claimed(db, claimed, service, max_wait)
+    except Exception:
+        db.rollback()
+        raise
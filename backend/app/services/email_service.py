@@ -1,74 +1,160 @@
 """
 Email Service - Handles sending emails for notifications, password reset, and reports
 
-Note: This service requires fastapi-mail to be installed.
+Note: This service requires aiosmtplib, which is installed with fastapi-mail.
 Install with: pip install fastapi-mail
 """
 
-from typing import List, Optional
+from typing import Any, Iterable, List, Mapping, Optional, Tuple
 from datetime import datetime
+from email.message import EmailMessage
+from email.utils import formataddr
 import secrets
 import hashlib
 
-# Try to import fastapi_mail, but gracefully handle if not installed
-try:
-    from fastapi_mail import FastMail, MessageSchema, ConnectionConfig
-    FASTMAIL_AVAILABLE = True
-except ImportError:
-    FASTMAIL_AVAILABLE = False
-
 from app.core.config import settings
+from app.services.smtp_pool import SMTPConnectionPool, AIOSMTPLIB_AVAILABLE
+from app.services.rate_limiter import BULK, INTERACTIVE, smtp_rate_limiter
+from app.services.email_dedup import DedupIndex, compute_content_hash, dedup_index
+from app.services.email_templates import EmailTemplateRegistry, email_templates
+
+
+# Someone is waiting on these; they draw from the interactive rate limit lane
+INTERACTIVE_EMAIL_TYPES = frozenset({"password_reset"})
 
 
 class EmailService:
     """Service for managing email notifications"""
 
-    def __init__(self):
-        self.enabled = FASTMAIL_AVAILABLE and settings.smtp_user and settings.smtp_password
-        
-        if self.enabled:
+    def __init__(
+        self,
+        pool: Optional[SMTPConnectionPool] = None,
+        dedup: Optional[DedupIndex] = None,
+        templates: Optional[EmailTemplateRegistry] = None
+    ):
+        self.sender = settings.smtp_user
+        self.pool = pool
+        self.dedup = dedup or dedup_index
+        self.templates = templates or email_templates
+        self.enabled = pool is not None or bool(
+            AIOSMTPLIB_AVAILABLE and settings.smtp_user and settings.smtp_password
+        )
+
+        if self.pool is None and self.enabled:
             try:
-                self.conf = ConnectionConfig(  # type: ignore
-                    MAIL_FROM=settings.smtp_user,
-                    MAIL_FROM_NAME=settings.mail_from_name,
-                    MAIL_STARTTLS=True,
-                    MAIL_PORT=settings.smtp_port,
-                    MAIL_SERVER=settings.smtp_server,
-                    MAIL_USERNAME=settings.smtp_user,
-                    MAIL_PASSWORD=settings.smtp_password,
-                    USE_CREDENTIALS=True,
-                    VALIDATE_CERTS=True
+                self.pool = SMTPConnectionPool(
+                    hostname=settings.smtp_server,
+                    port=settings.smtp_port,
+                    username=settings.smtp_user,
+                    password=settings.smtp_password,
+                    start_tls=settings.smtp_starttls,
+                    validate_certs=True,
+                    max_connections=settings.smtp_pool_size,
+                    max_messages_per_connection=settings.smtp_max_messages_per_connection,
+                    max_recipients_per_message=settings.smtp_max_recipients_per_message,
+                    idle_timeout=settings.smtp_idle_timeout_seconds,
+                    rate_limiter=smtp_rate_limiter(settings.smtp_server, BULK),
+                    interactive_rate_limiter=smtp_rate_limiter(settings.smtp_server, INTERACTIVE),
                 )
-                self.fast_mail = FastMail(self.conf)  # type: ignore
             except Exception as e:
                 print(f"Warning: Could not initialize email service: {e}")
                 self.enabled = False
-                self.fast_mail = None
-        else:
-            self.fast_mail = None
-            if not FASTMAIL_AVAILABLE:
-                print("Warning: fastapi-mail is not installed. Email notifications disabled.")
+                self.pool = None
+        elif not self.enabled:
+            if not AIOSMTPLIB_AVAILABLE:
+                print("Warning: aiosmtplib is not installed. Email notifications disabled.")
             if not settings.smtp_user or not settings.smtp_password:
                 print("Warning: SMTP credentials not configured. Email notifications disabled.")
 
-    async def _send_email(self, recipient: str, subject: str, html: str) -> bool:
-        """Internal method to send email"""
-        if not self.enabled or not self.fast_mail:
+    def _build_message(self, subject: str, html: str, recipient: Optional[str] = None) -> EmailMessage:
+        """Build a MIME message; bulk messages carry their recipients only in the envelope"""
+        message = EmailMessage()
+        message["From"] = formataddr((settings.mail_from_name, self.sender))
+        message["To"] = recipient or "undisclosed-recipients:;"
+        message["Subject"] = subject
+        message.set_content(html, subtype="html")
+        return message
+
+    async def deliver(
+        self,
+        recipient: str,
+        subject: str,
+        html: str,
+        content_hash: Optional[str] = None,
+        email_type: str = "notification",
+        claim_owner: Optional[str] = None,
+        max_wait: Optional[float] = None
+    ) -> bool:
+        """
+        Send one email, raising if it could not be delivered (used by the outbox).
+        Returns False without sending if the same content went out within the dedup TTL.
+        ``claim_owner`` (the outbox row) may re-send content it claimed itself earlier.
+        Raises RateLimitExceeded rather than wait for the rate limiter longer than ``max_wait``.
+        """
+        if not self.enabled or not self.pool:
+            raise RuntimeError("Email service is not configured")
+
+        content_hash = content_hash or compute_content_hash(recipient, email_type, html)
+        if not self.dedup.claim(content_hash, claim_owner):
             return False
 
         try:
-            message = MessageSchema(  # type: ignore
-                subject=subject,
+            message = self._build_message(subject, html, recipient)
+            refused = await self.pool.send_message(
+                message,
                 recipients=[recipient],
-                html=html,
-                subtype="html"
+                interactive=email_type in INTERACTIVE_EMAIL_TYPES,
+                max_wait=max_wait
             )
-            await self.fast_mail.send_message(message)  # type: ignore
+            if refused:
+                raise RuntimeError(refused.get(recipient, "Recipient refused"))
+        except Exception:
+            self.dedup.release(content_hash)
+            raise
+        return True
+
+    async def _send_email(self, recipient: str, subject: str, html: str, email_type: str = "notification") -> bool:
+        """Internal method to send email"""
+        if not self.enabled or not self.pool:
+            return False
+
+        try:
+            await self.deliver(recipient, subject, html, email_type=email_type)
             return True
         except Exception as e:
             print(f"Error sending email to {recipient}: {str(e)}")
             return False
 
+    async def _send_bulk_email(
+        self,
+        recipients: List[str],
+        subject: str,
+        html: str,
+        email_type: str = "notification"
+    ) -> int:
+        """
+        Internal method to send the same email to many recipients.
+        Returns the number of recipients the server accepted.
+        """
+        if not self.enabled or not self.pool:
+            return 0
+
+        # Recipients who already got this exact email within the dedup TTL are skipped
+        hashes = {r: compute_content_hash(r, email_type, html) for r in recipients}
+        fresh = [r for r in recipients if self.dedup.claim(hashes[r])]
+
+        try:
+            message = self._build_message(subject, html)
+            refused = await self.pool.send_bulk(message, fresh)
+        except Exception as e:
+            print(f"Error sending bulk email to {len(fresh)} recipients: {str(e)}")
+            refused = {r: str(e) for r in fresh}
+
+        for address, reason in refused.items():
+            self.dedup.release(hashes[address])
+            print(f"Error sending email to {address}: {reason}")
+        return len(recipients) - len(refused)
+
     # ==================== Authentication Emails ====================
 
     async def send_password_reset_email(
@@ -80,51 +166,27 @@ class EmailService:
     ) -> bool:
         """Send password reset email with secure token"""
         
+        subject, html_content = self.render_password_reset_email(name, reset_token, reset_url)
+        return await self._send_email(email, subject, html_content, email_type="password_reset")
+
+    def render_password_reset_email(
+        self,
+        name: str,
+        reset_token: str,
+        reset_url: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """Render the password reset email, returning (subject, html)"""
+        
         if not reset_url:
             reset_url = f"{settings.password_reset_url}?token={reset_token}"
         
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #dc2626; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .button {{ background-color: #2563eb; color: white; padding: 12px 24px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0; }}
-                    .footer {{ color: #6b7280; font-size: 12px; margin-top: 20px; border-top: 1px solid #e5e7eb; padding-top: 20px; }}
-                    .warning {{ background-color: #fef3c7; border-left: 4px solid #f59e0b; padding: 10px; margin: 15px 0; }}
-                    .token-box {{ background-color: #f3f4f6; padding: 10px; border-radius: 5px; font-family: monospace; word-break: break-all; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>🔒 Password Reset Request</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {name},</p>
-                        <p>You requested to reset your password for College Prep Platform. Click the button below to create a new password:</p>
-                        <a href="{reset_url}" class="button">Reset Your Password</a>
-                        <p><strong>Link expires in 24 hours.</strong></p>
-                        <div class="warning">
-                            <strong>⚠️ Security Notice:</strong> If you didn't request this, please ignore this email. Your account is secure.
-                        </div>
-                        <p><strong>Alternative Method:</strong></p>
-                        <p>Copy and paste this token in your reset form:</p>
-                        <div class="token-box">{reset_token}</div>
-                        <p style="color: #6b7280; font-size: 12px;">This link is unique to you. Never share it with anyone.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2025 College Prep Platform. All rights reserved.</p>
-                        <p>Questions? Contact support@collegeprep.com</p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        
-        return await self._send_email(email, "Reset Your Password - College Prep Platform", html_content)
+        return self.templates.render(
+            "password_reset",
+            name=name,
+            reset_token=reset_token,
+            reset_url=reset_url,
+            expire_hours=settings.password_reset_token_expire_hours
+        )
 
     async def send_welcome_email(
         self,
@@ -135,45 +197,15 @@ class EmailService:
     ) -> bool:
         """Send welcome email to new user"""
         
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #2563eb; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .button {{ background-color: #2563eb; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0; }}
-                    .footer {{ color: #6b7280; font-size: 12px; margin-top: 20px; border-top: 1px solid #e5e7eb; padding-top: 20px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>Welcome to College Prep Platform! 🎓</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {name},</p>
-                        <p>Your account has been successfully created as a <strong>{user_type}</strong>.</p>
-                        <p>You can now log in and access all features of the College Prep Platform.</p>
-                        <a href="{login_url}" class="button">Login to Your Account</a>
-                        <p><strong>Account Details:</strong></p>
-                        <ul>
-                            <li><strong>Email:</strong> {email}</li>
-                            <li><strong>User Type:</strong> {user_type}</li>
-                            <li><strong>Join Date:</strong> {datetime.now().strftime('%B %d, %Y')}</li>
-                        </ul>
-                        <p>If you didn't create this account, please contact our support team immediately.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2025 College Prep Platform. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        
-        return await self._send_email(email, "Welcome to College Prep Platform", html_content)
+        subject, html_content = self.templates.render(
+            "welcome",
+            email=email,
+            name=name,
+            user_type=user_type,
+            login_url=login_url,
+            join_date=datetime.now().strftime('%B %d, %Y')
+        )
+        return await self._send_email(email, subject, html_content, email_type="welcome")
 
     # ==================== Assignment & Grade Emails ====================
 
@@ -190,38 +222,16 @@ class EmailService:
         if not student_emails:
             return False
         
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #2563eb; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .button {{ background-color: #2563eb; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px; display: inline-block; margin: 20px 0; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>📝 New Assignment Posted</h1>
-                    </div>
-                    <div class="content">
-                        <p>A new assignment has been posted in <strong>{course_title}</strong>:</p>
-                        <h3>{assignment_title}</h3>
-                        <p><strong>Due Date:</strong> {due_date}</p>
-                        <a href="{course_url}" class="button">View Assignment</a>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
+        subject, html_content = self.templates.render(
+            "assignment_notification",
+            assignment_title=assignment_title,
+            course_title=course_title,
+            due_date=due_date,
+            course_url=course_url
+        )
         
-        # Send to all students
-        success_count = 0
-        for email in student_emails:
-            if await self._send_email(email, f"New Assignment: {assignment_title}", html_content):
-                success_count += 1
+        # One envelope per batch of students instead of one connection per student
+        success_count = await self._send_bulk_email(student_emails, subject, html_content, email_type="assignment")
         
         return success_count == len(student_emails)
 
@@ -236,41 +246,34 @@ class EmailService:
     ) -> bool:
         """Send grade notification to student"""
         
-        percentage = (grade / max_points) * 100
-        grade_letter = self._get_grade_letter(percentage)
-        
-        feedback_html = ""
-        if feedback:
-            feedback_html = f"<p><strong>Teacher Feedback:</strong> {feedback}</p>"
+        subject, html_content = self.render_grade_notification(
+            student_name, assignment_title, grade, max_points, feedback
+        )
+        return await self._send_email(student_email, subject, html_content, email_type="grade")
+
+    def render_grade_notification(
+        self,
+        student_name: str,
+        assignment_title: str,
+        grade: float,
+        max_points: float,
+        feedback: Optional[str] = None
+    ) -> Tuple[str, str]:
+        """Render the grade notification email, returning (subject, html)"""
         
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #2563eb; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .grade {{ font-size: 32px; font-weight: bold; color: #2563eb; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>✅ Your Assignment Has Been Graded</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {student_name},</p>
-                        <p>Your assignment <strong>"{assignment_title}"</strong> has been graded:</p>
-                        <p class="grade">{grade}/{max_points} ({percentage:.1f}%) - Grade: {grade_letter}</p>
-                        {feedback_html}
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
+        # Ungraded-scale assignments (max_points 0) get no percentage or letter
+        percentage = (grade / max_points) * 100 if max_points else None
         
-        return await self._send_email(student_email, f"Grade Posted: {assignment_title}", html_content)
+        return self.templates.render(
+            "grade_notification",
+            student_name=student_name,
+            assignment_title=assignment_title,
+            grade=grade,
+            max_points=max_points,
+            percentage=percentage,
+            grade_letter=self._get_grade_letter(percentage) if percentage is not None else None,
+            feedback=feedback
+        )
 
     # ==================== Attendance Emails ====================
 
@@ -285,50 +288,15 @@ class EmailService:
     ) -> bool:
         """Send attendance summary email"""
         
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #2563eb; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .stats {{ display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 10px; margin: 20px 0; }}
-                    .stat-box {{ background-color: white; padding: 15px; border-radius: 5px; border-left: 4px solid #2563eb; text-align: center; }}
-                    .stat-value {{ font-size: 24px; font-weight: bold; color: #2563eb; }}
-                    .stat-label {{ font-size: 12px; color: #6b7280; margin-top: 5px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>📊 Attendance Summary - {course_title}</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {student_name},</p>
-                        <p>Here's your attendance summary for <strong>{course_title}</strong>:</p>
-                        <div class="stats">
-                            <div class="stat-box">
-                                <div class="stat-value">{total_classes}</div>
-                                <div class="stat-label">Total Classes</div>
-                            </div>
-                            <div class="stat-box">
-                                <div class="stat-value">{attended_classes}</div>
-                                <div class="stat-label">Attended</div>
-                            </div>
-                            <div class="stat-box">
-                                <div class="stat-value">{attendance_percentage:.1f}%</div>
-                                <div class="stat-label">Attendance Rate</div>
-                            </div>
-                        </div>
-                        <p style="color: #6b7280;">Keep up your attendance to stay on track with your courses!</p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        
-        return await self._send_email(student_email, f"Attendance Summary: {course_title}", html_content)
+        subject, html_content = self.templates.render(
+            "attendance_summary",
+            student_name=student_name,
+            course_title=course_title,
+            total_classes=total_classes,
+            attended_classes=attended_classes,
+            attendance_percentage=attendance_percentage
+        )
+        return await self._send_email(student_email, subject, html_content, email_type="attendance")
 
     # ==================== Monthly Report Emails ====================
 
@@ -348,77 +316,20 @@ class EmailService:
     ) -> bool:
         """Send monthly report to student"""
         
-        top_course_html = f"<p><strong>Top Course:</strong> {top_course}</p>" if top_course else ""
-        
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #1e40af; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .section {{ margin: 20px 0; padding-bottom: 20px; border-bottom: 1px solid #e5e7eb; }}
-                    .section:last-child {{ border-bottom: none; }}
-                    .stat-row {{ display: flex; justify-content: space-between; padding: 8px 0; }}
-                    .stat-label {{ color: #6b7280; }}
-                    .stat-value {{ font-weight: bold; color: #1e40af; }}
-                    .footer {{ color: #6b7280; font-size: 12px; margin-top: 20px; border-top: 1px solid #e5e7eb; padding-top: 20px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>📈 Your Monthly Report - {month} {year}</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {student_name},</p>
-                        <p>Here's your performance summary for {month} {year}:</p>
-                        
-                        <div class="section">
-                            <h3>Attendance</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Total Classes:</span>
-                                <span class="stat-value">{total_classes}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Classes Attended:</span>
-                                <span class="stat-value">{attended_classes}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Attendance Rate:</span>
-                                <span class="stat-value">{attendance_percentage:.1f}%</span>
-                            </div>
-                        </div>
-                        
-                        <div class="section">
-                            <h3>Academic Performance</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Assignments Completed:</span>
-                                <span class="stat-value">{assignments_completed}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Average Grade:</span>
-                                <span class="stat-value">{average_grade:.2f}%</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Outstanding Assignments:</span>
-                                <span class="stat-value">{outstanding_assignments}</span>
-                            </div>
-                            {top_course_html}
-                        </div>
-                        
-                        <p>Keep working hard to maintain your excellent performance!</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2025 College Prep Platform. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        
-        return await self._send_email(student_email, f"Your Monthly Report - {month} {year}", html_content)
+        subject, html_content = self.templates.render(
+            "monthly_student_report",
+            student_name=student_name,
+            month=month,
+            year=year,
+            total_classes=total_classes,
+            attended_classes=attended_classes,
+            attendance_percentage=attendance_percentage,
+            assignments_completed=assignments_completed,
+            average_grade=average_grade,
+            outstanding_assignments=outstanding_assignments,
+            top_course=top_course
+        )
+        return await self._send_email(student_email, subject, html_content, email_type="report")
 
     async def send_monthly_teacher_report(
         self,
@@ -435,72 +346,19 @@ class EmailService:
     ) -> bool:
         """Send monthly report to teacher"""
         
-        course_summary_html = f"<p><strong>Course Summary:</strong> {course_summary}</p>" if course_summary else ""
-        
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #7c3aed; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .section {{ margin: 20px 0; padding-bottom: 20px; border-bottom: 1px solid #e5e7eb; }}
-                    .stat-row {{ display: flex; justify-content: space-between; padding: 8px 0; }}
-                    .stat-label {{ color: #6b7280; }}
-                    .stat-value {{ font-weight: bold; color: #7c3aed; }}
-                    .footer {{ color: #6b7280; font-size: 12px; margin-top: 20px; border-top: 1px solid #e5e7eb; padding-top: 20px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>👨‍🏫 Your Monthly Report - {month} {year}</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {teacher_name},</p>
-                        <p>Here's your teaching summary for {month} {year}:</p>
-                        
-                        <div class="section">
-                            <h3>Class Statistics</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Students Taught:</span>
-                                <span class="stat-value">{students_taught}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Average Class Grade:</span>
-                                <span class="stat-value">{average_class_grade:.2f}%</span>
-                            </div>
-                        </div>
-                        
-                        <div class="section">
-                            <h3>Assignment Management</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Assignments Posted:</span>
-                                <span class="stat-value">{assignments_posted}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Assignments Graded:</span>
-                                <span class="stat-value">{assignments_graded}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Pending Assignments:</span>
-                                <span class="stat-value">{pending_assignments}</span>
-                            </div>
-                            {course_summary_html}
-                        </div>
-                        
-                        <p>Great work this month! Keep up the excellent teaching.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2025 College Prep Platform. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-        </html>
-        """
-        
-        return await self._send_email(teacher_email, f"Your Monthly Report - {month} {year}", html_content)
+        subject, html_content = self.templates.render(
+            "monthly_teacher_report",
+            teacher_name=teacher_name,
+            month=month,
+            year=year,
+            students_taught=students_taught,
+            assignments_posted=assignments_posted,
+            assignments_graded=assignments_graded,
+            pending_assignments=pending_assignments,
+            average_class_grade=average_class_grade,
+            course_summary=course_summary
+        )
+        return await self._send_email(teacher_email, subject, html_content, email_type="report")
 
     async def send_monthly_admin_report(
         self,
@@ -518,81 +376,39 @@ class EmailService:
     ) -> bool:
         """Send monthly platform report to admin"""
         
-        html_content = f"""
-        <html>
-            <head>
-                <style>
-                    body {{ font-family: Arial, sans-serif; color: #333; }}
-                    .container {{ max-width: 600px; margin: 0 auto; padding: 20px; }}
-                    .header {{ background-color: #dc2626; color: white; padding: 20px; border-radius: 8px 8px 0 0; }}
-                    .content {{ background-color: #f9fafb; padding: 20px; border-radius: 0 0 8px 8px; }}
-                    .section {{ margin: 20px 0; padding-bottom: 20px; border-bottom: 1px solid #e5e7eb; }}
-                    .stat-row {{ display: flex; justify-content: space-between; padding: 8px 0; }}
-                    .stat-label {{ color: #6b7280; }}
-                    .stat-value {{ font-weight: bold; color: #dc2626; }}
-                    .footer {{ color: #6b7280; font-size: 12px; margin-top: 20px; border-top: 1px solid #e5e7eb; padding-top: 20px; }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h1>📊 Platform Monthly Report - {month} {year}</h1>
-                    </div>
-                    <div class="content">
-                        <p>Hello {admin_name},</p>
-                        <p>Here's the platform performance summary for {month} {year}:</p>
-                        
-                        <div class="section">
-                            <h3>User Statistics</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Total Students:</span>
-                                <span class="stat-value">{total_students}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Total Teachers:</span>
-                                <span class="stat-value">{total_teachers}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Active Users:</span>
-                                <span class="stat-value">{active_users}</span>
-                            </div>
-                        </div>
-                        
-                        <div class="section">
-                            <h3>Course & Enrollment Data</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Total Courses:</span>
-                                <span class="stat-value">{total_courses}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">Total Enrollments:</span>
-                                <span class="stat-value">{total_enrollments}</span>
-                            </div>
-                            <div class="stat-row">
-                                <span class="stat-label">New Enrollments:</span>
-                                <span class="stat-value">{new_enrollments}</span>
-                            </div>
-                        </div>
-                        
-                        <div class="section">
-                            <h3>Financial Summary</h3>
-                            <div class="stat-row">
-                                <span class="stat-label">Total Revenue:</span>
-                                <span class="stat-value">${total_revenue:,.2f}</span>
-                            </div>
-                        </div>
-                        
-                        <p>For detailed analytics, please log in to your admin dashboard.</p>
-                    </div>
-                    <div class="footer">
-                        <p>© 2025 College Prep Platform. All rights reserved.</p>
-                    </div>
-                </div>
-            </body>
-        </html>
+        subject, html_content = self.templates.render(
+            "monthly_admin_report",
+            admin_name=admin_name,
+            month=month,
+            year=year,
+            total_students=total_students,
+            total_teachers=total_teachers,
+            total_courses=total_courses,
+            total_enrollments=total_enrollments,
+            total_revenue=total_revenue,
+            active_users=active_users,
+            new_enrollments=new_enrollments
+        )
+        return await self._send_email(admin_email, subject, html_content, email_type="report")
+
+    def render_monthly_reports(
+        self,
+        report_type: str,
+        contexts: Iterable[Mapping[str, Any]]
+    ) -> List[Tuple[str, str]]:
         """
-        
-        return await self._send_email(admin_email, f"Platform Monthly Report - {month} {year}", html_content)
+        Render many monthly reports of one type ("student", "teacher" or "admin")
+        from a single compiled template, returning (subject, html) per context.
+        Each context carries the keyword arguments of the matching send_monthly_* method.
+        """
+        return self.templates.render_batch(f"monthly_{report_type}_report", contexts)
+
+    def render_notification_digests(self, contexts: Iterable[Mapping[str, Any]]) -> List[Tuple[str, str]]:
+        """
+        Render daily digests from one compiled template, returning (subject, html)
+        per context (name, count, since, notifications, dashboard_url).
+        """
+        return self.templates.render_batch("notification_digest", contexts)
 
     # ==================== Utility Methods ====================
 
@@ -0,0 +1,240 @@
+"""
+Email Stats - Cached email_logs counters for the admin dashboard
+
+The snapshot holds one count per (status, email_type) pair, loaded with a
+single GROUP BY query. After that it is kept current incrementally: EmailLog
+mapper events record every insert, delete and status change at flush time in
+the session's ``info`` and the deltas are applied when the transaction
+commits. A rollback drops them; rolling back a savepoint only drops the
+deltas recorded since it began. Sessions that never flush an EmailLog only
+pay for a dict lookup on commit, rollback and savepoint. Changes committed by
+other processes, such as Celery workers, are picked up by a full reload once
+the snapshot is older than ``email_stats_refresh_seconds``.
+
+Time-bucketed series (per hour or per day) are range scans over the indexed
+``attempted_at`` column, cached briefly per bucket size and window. Buckets
+are UTC; on PostgreSQL (``timestamptz``) they are truncated in UTC whatever
+the session time zone.
+"""
+
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import event, func, inspect, literal_column
+from sqlalchemy.orm import Session, SessionTransaction, object_session
+
+from app.core.config import settings
+from app.models.email_models import EmailLog, EmailStatusEnum
+
+SERIES_CACHE_SECONDS = 60
+BUCKET_FORMATS = {"hour": "%Y-%m-%d %H:00:00", "day": "%Y-%m-%d"}
+_DELTAS_KEY = "email_stats_deltas"
+_SAVEPOINTS_KEY = "email_stats_savepoints"
+
+StatsKey = Tuple[str, str]
+
+
+def _status_value(status: Any) -> str:
+    return str(getattr(status, "value", status))
+
+
+class EmailStatsCache:
+    """Per-process snapshot of email_logs counts by status and type"""
+
+    def __init__(self, refresh_seconds: Optional[float] = None):
+        self.refresh_seconds = (
+            settings.email_stats_refresh_seconds if refresh_seconds is None else refresh_seconds
+        )
+        self._counts: Dict[StatsKey, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._as_of: Optional[datetime] = None
+        self._series: Dict[Tuple[str, int], Tuple[float, List[Dict[str, Any]]]] = {}
+        self._lock = threading.Lock()
+
+    # ==================== Snapshot ====================
+
+    def load(self, db: Session) -> None:
+        """Rebuild the snapshot with one GROUP BY query"""
+        rows = db.query(
+            EmailLog.status, EmailLog.email_type, func.count(EmailLog.log_id)
+        ).group_by(EmailLog.status, EmailLog.email_type).all()
+
+        with self._lock:
+            self._counts = {(_status_value(s), t): n for s, t, n in rows}
+            self._loaded_at = time.monotonic()
+            self._as_of = datetime.utcnow()
+
+    def apply(self, deltas: Dict[StatsKey, int]) -> None:
+        """Fold committed changes into a loaded snapshot"""
+        with self._lock:
+            if self._loaded_at is None:
+                return
+            for key, delta in deltas.items():
+                self._counts[key] = self._counts.get(key, 0) + delta
+            self._as_of = datetime.utcnow()
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+            self._series.clear()
+
+    def snapshot(self, db: Session) -> Dict[str, Any]:
+        """Totals by status and type, reloading first if the snapshot is stale"""
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.refresh_seconds:
+            self.load(db)
+
+        with self._lock:
+            counts = dict(self._counts)
+            as_of = self._as_of
+
+        by_status: Dict[str, int] = defaultdict(int)
+        by_type: Dict[str, int] = defaultdict(int)
+        by_status_and_type: Dict[str, Dict[str, int]] = defaultdict(dict)
+        for (status, email_type), count in counts.items():
+            if count <= 0:
+                continue
+            by_status[status] += count
+            by_type[email_type] += count
+            by_status_and_type[status][email_type] = count
+
+        return {
+            "total_sent": by_status.get("sent", 0),
+            "total_failed": by_status.get("failed", 0),
+            "total_pending": by_status.get("pending", 0) + by_status.get("sending", 0),
+            "total_suppressed": by_status.get("suppressed", 0),
+            "by_type": dict(by_type),
+            "by_status_and_type": dict(by_status_and_type),
+            "as_of": as_of,
+        }
+
+    # ==================== Time Series ====================
+
+    def series(self, db: Session, bucket: str = "hour", window: int = 24) -> List[Dict[str, Any]]:
+        """
+        Email counts per status for each of the last ``window`` hours or days,
+        oldest first, with empty buckets filled with zeros.
+        """
+        if bucket not in BUCKET_FORMATS:
+            raise ValueError(f"bucket must be one of {sorted(BUCKET_FORMATS)}")
+
+        cached = self._series.get((bucket, window))
+        if cached and time.monotonic() - cached[0] < SERIES_CACHE_SECONDS:
+            return cached[1]
+
+        fmt = BUCKET_FORMATS[bucket]
+        step = timedelta(hours=1) if bucket == "hour" else timedelta(days=1)
+        now = datetime.utcnow()
+        start = datetime.strptime((now - step * (window - 1)).strftime(fmt), fmt)
+
+        if db.get_bind().dialect.name == "postgresql":
+            # timestamptz: compare with an aware bound, truncate in UTC rather than the session time zone
+            since = start.replace(tzinfo=timezone.utc)
+            bucket_expr = func.date_trunc(
+                literal_column(f"'{bucket}'"), func.timezone(literal_column("'UTC'"), EmailLog.attempted_at)
+            )
+        else:
+            since = start
+            bucket_expr = func.strftime(fmt, EmailLog.attempted_at)
+
+        rows = db.query(
+            bucket_expr.label("bucket"), EmailLog.status, func.count(EmailLog.log_id)
+        ).filter(
+            EmailLog.attempted_at >= since
+        ).group_by(bucket_expr, EmailLog.status).all()
+
+        buckets: Dict[str, Dict[str, int]] = {}
+        cursor = start
+        while cursor <= now:
+            buckets[cursor.strftime(fmt)] = defaultdict(int)
+            cursor += step
+
+        for bucket_value, status, count in rows:
+            label = bucket_value.strftime(fmt) if isinstance(bucket_value, datetime) else str(bucket_value)
+            if label in buckets:
+                buckets[label][_status_value(status)] += count
+
+        result = [{"bucket": label, **counts} for label, counts in buckets.items()]
+        self._series[(bucket, window)] = (time.monotonic(), result)
+        return result
+
+
+# ==================== Change Tracking ====================
+
+def _deltas(target: EmailLog) -> Optional[Dict[StatsKey, int]]:
+    session = object_session(target)
+    if session is None:
+        return None
+    return session.info.setdefault(_DELTAS_KEY, defaultdict(int))
+
+
+def _record_insert(mapper: Any, connection: Any, target: EmailLog) -> None:
+    deltas = _deltas(target)
+    if deltas is not None:
+        status = target.status or EmailStatusEnum.PENDING
+        deltas[(_status_value(status), target.email_type)] += 1
+
+
+def _record_delete(mapper: Any, connection: Any, target: EmailLog) -> None:
+    deltas = _deltas(target)
+    if deltas is not None:
+        deltas[(_status_value(target.status), target.email_type)] -= 1
+
+
+def _record_update(mapper: Any, connection: Any, target: EmailLog) -> None:
+    history = inspect(target).attrs.status.history
+    if not (history.added and history.deleted):
+        return
+    deltas = _deltas(target)
+    if deltas is not None:
+        deltas[(_status_value(history.deleted[0]), target.email_type)] -= 1
+        deltas[(_status_value(history.added[0]), target.email_type)] += 1
+
+
+def _apply_commit(session: Session) -> None:
+    session.info.pop(_SAVEPOINTS_KEY, None)
+    if _DELTAS_KEY in session.info:
+        deltas = session.info.pop(_DELTAS_KEY)
+        if deltas:
+            email_stats.apply(deltas)
+
+
+def _begin_savepoint(session: Session, transaction: SessionTransaction) -> None:
+    """Remember the deltas as they were when a savepoint began (kept until the outer transaction ends)"""
+    if transaction.nested and _DELTAS_KEY in session.info:
+        savepoints = session.info.setdefault(_SAVEPOINTS_KEY, {})
+        savepoints[transaction] = dict(session.info[_DELTAS_KEY])
+
+
+def _discard_rollback(session: Session, previous_transaction: SessionTransaction) -> None:
+    if not previous_transaction.nested:
+        session.info.pop(_DELTAS_KEY, None)
+        session.info.pop(_SAVEPOINTS_KEY, None)
+        return
+    if _DELTAS_KEY not in session.info:
+        return
+    # A savepoint: keep what was recorded before it began
+    before = session.info.get(_SAVEPOINTS_KEY, {}).pop(previous_transaction, None)
+    if before:
+        session.info[_DELTAS_KEY] = defaultdict(int, before)
+    else:
+        del session.info[_DELTAS_KEY]
+
+
+def _load_previous_status(target: EmailLog, value: Any, oldvalue: Any, initiator: Any) -> Any:
+    """No-op listener; registering it with active_history keeps the old status in history"""
+    return value
+
+
+# Global stats cache, kept current by the session events below
+email_stats = EmailStatsCache()
+
+event.listen(EmailLog, "after_insert", _record_insert)
+event.listen(EmailLog, "after_update", _record_update)
+event.listen(EmailLog, "after_delete", _record_delete)
+event.listen(Session, "after_commit", _apply_commit)
+event.listen(Session, "after_soft_rollback", _discard_rollback)
+event.listen(Session, "after_transaction_create", _begin_savepoint)
+event.listen(EmailLog.status, "set", _load_previous_status, active_history=True, retval=True)
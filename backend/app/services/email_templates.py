@@ -0,0 +1,255 @@
+"""
+Email Templates - Compiled, cached Jinja templates for email bodies
+
+Templates are looked up by name in the ``email_templates`` table first, so
+admins can customise wording without a deploy, and fall back to the files in
+``app/templates/email``. Each template is compiled once: the ``<style>``
+rules are inlined into the markup at compile time (mail clients ignore most
+stylesheets), then the result is compiled by Jinja and cached. Rendering a
+cached template only evaluates the compiled code, which keeps batch renders
+for monthly reports cheap.
+
+Templates run in a sandboxed environment with autoescaping, since database
+templates are editable from the admin side.
+"""
+
+import logging
+import re
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from jinja2 import Template
+from jinja2.sandbox import SandboxedEnvironment
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.email_models import EmailTemplate
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_DIR = Path(__file__).resolve().parent.parent / "templates" / "email"
+
+# Subjects for the file-based templates; database templates carry their own
+DEFAULT_SUBJECTS: Dict[str, str] = {
+    "password_reset": "Reset Your Password - College Prep Platform",
+    "welcome": "Welcome to College Prep Platform",
+    "assignment_notification": "New Assignment: {{ assignment_title }}",
+    "grade_notification": "Grade Posted: {{ assignment_title }}",
+    "attendance_summary": "Attendance Summary: {{ course_title }}",
+    "monthly_student_report": "Your Monthly Report - {{ month }} {{ year }}",
+    "monthly_teacher_report": "Your Monthly Report - {{ month }} {{ year }}",
+    "monthly_admin_report": "Platform Monthly Report - {{ month }} {{ year }}",
+    "notification_digest": "Your Daily Digest: {{ count }} unread notification{{ 's' if count != 1 }}",
+}
+
+
+# ==================== CSS Inlining ====================
+
+_STYLE_BLOCK_RE = re.compile(r"<style[^>]*>(.*?)</style>", re.IGNORECASE | re.DOTALL)
+_CSS_RULE_RE = re.compile(r"([^{}]+)\{([^{}]*)\}")
+_SIMPLE_SELECTOR_RE = re.compile(r"^(?P<tag>[a-zA-Z][a-zA-Z0-9]*)?(?:\.(?P<cls>[\w-]+))?$")
+_START_TAG_RE = re.compile(r"<(?P<tag>[a-zA-Z][a-zA-Z0-9]*)(?P<attrs>(?:[^>\"']|\"[^\"]*\"|'[^']*')*)>")
+_CLASS_ATTR_RE = re.compile(r"\sclass=\"([^\"]*)\"")
+_STYLE_ATTR_RE = re.compile(r"\sstyle=\"([^\"]*)\"")
+
+
+@dataclass
+class _CSSRule:
+    tag: Optional[str]
+    cls: Optional[str]
+    declarations: str
+    order: int
+
+    @property
+    def specificity(self) -> int:
+        return (10 if self.cls else 0) + (1 if self.tag else 0)
+
+
+def _parse_css(css: str) -> Tuple[List[_CSSRule], str]:
+    """Split a stylesheet into inlinable rules and the leftover CSS (pseudo-classes, combinators)"""
+    rules: List[_CSSRule] = []
+    leftover: List[str] = []
+
+    for selectors, body in _CSS_RULE_RE.findall(css):
+        declarations = "; ".join(d.strip() for d in body.split(";") if d.strip())
+        for selector in (s.strip() for s in selectors.split(",")):
+            match = _SIMPLE_SELECTOR_RE.match(selector)
+            if match and (match.group("tag") or match.group("cls")):
+                rules.append(_CSSRule(
+                    tag=(match.group("tag") or "").lower() or None,
+                    cls=match.group("cls"),
+                    declarations=declarations,
+                    order=len(rules),
+                ))
+            else:
+                leftover.append(f"{selector} {{ {declarations}; }}")
+
+    return rules, "\n".join(leftover)
+
+
+def inline_css(html: str) -> str:
+    """
+    Move ``<style>`` rules with simple selectors (``tag``, ``.class``,
+    ``tag.class``) into ``style`` attributes of the matching elements.
+
+    Works on template source, so Jinja expressions pass through untouched.
+    Rules that cannot be inlined stay in the ``<style>`` block; existing
+    ``style`` attributes keep precedence over inlined rules.
+    """
+    rules: List[_CSSRule] = []
+
+    def _collect(match: "re.Match[str]") -> str:
+        parsed, leftover = _parse_css(match.group(1))
+        for rule in parsed:
+            rule.order += len(rules)
+        rules.extend(parsed)
+        if leftover:
+            return f"<style>\n{leftover}\n</style>"
+        return ""
+
+    html = _STYLE_BLOCK_RE.sub(_collect, html)
+    if not rules:
+        return html
+
+    def _apply(match: "re.Match[str]") -> str:
+        tag, attrs = match.group("tag").lower(), match.group("attrs")
+        class_match = _CLASS_ATTR_RE.search(attrs)
+        classes = set(class_match.group(1).split()) if class_match else set()
+
+        matching = [
+            r for r in rules
+            if (r.tag is None or r.tag == tag) and (r.cls is None or r.cls in classes)
+        ]
+        if not matching:
+            return match.group(0)
+
+        matching.sort(key=lambda r: (r.specificity, r.order))
+        declarations = [r.declarations for r in matching]
+
+        style_match = _STYLE_ATTR_RE.search(attrs)
+        if style_match:
+            declarations.append(style_match.group(1).strip().rstrip(";"))
+            attrs = attrs[:style_match.start()] + attrs[style_match.end():]
+
+        self_closing = attrs.rstrip().endswith("/")
+        if self_closing:
+            attrs = attrs.rstrip()[:-1]
+        style = "; ".join(declarations) + ";"
+        return f"<{match.group('tag')}{attrs.rstrip()} style=\"{style}\"{' /' if self_closing else ''}>"
+
+    body_start = html.lower().find("<body")
+    if body_start == -1:
+        body_start = 0
+    return html[:body_start] + _START_TAG_RE.sub(_apply, html[body_start:])
+
+
+# ==================== Template Registry ====================
+
+@dataclass
+class CompiledEmailTemplate:
+    """A ready-to-render subject/body pair"""
+    name: str
+    source: str  # "database" or "file"
+    subject: Template
+    html: Template
+    loaded_at: float
+
+    def render(self, context: Mapping[str, Any]) -> Tuple[str, str]:
+        return self.subject.render(context).strip(), self.html.render(context)
+
+
+class EmailTemplateRegistry:
+    """Loads, compiles and caches email templates"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], Session]] = SessionLocal,
+        template_dir: Path = TEMPLATE_DIR,
+        cache_seconds: Optional[float] = None,
+    ):
+        self.session_factory = session_factory
+        self.template_dir = template_dir
+        self.cache_seconds = (
+            settings.email_template_cache_seconds if cache_seconds is None else cache_seconds
+        )
+        self._html_env = SandboxedEnvironment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+        self._subject_env = SandboxedEnvironment(autoescape=False)
+        self._cache: Dict[str, CompiledEmailTemplate] = {}
+        self._lock = threading.Lock()
+
+    def _load_from_database(self, name: str) -> Optional[Tuple[str, str]]:
+        if self.session_factory is None:
+            return None
+        try:
+            db = self.session_factory()
+            try:
+                row = db.query(EmailTemplate.subject, EmailTemplate.html_content).filter(
+                    EmailTemplate.name == name,
+                    EmailTemplate.is_active == True  # noqa: E712
+                ).first()
+            finally:
+                db.close()
+        except Exception as exc:
+            logger.warning(f"Could not load email template '{name}' from database: {exc}")
+            return None
+        return (row.subject, row.html_content) if row else None
+
+    def _load_from_file(self, name: str) -> Tuple[str, str]:
+        path = self.template_dir / f"{name}.html"
+        if name not in DEFAULT_SUBJECTS or not path.is_file():
+            raise LookupError(f"Unknown email template: {name}")
+        return DEFAULT_SUBJECTS[name], path.read_text(encoding="utf-8")
+
+    def compile(self, name: str) -> CompiledEmailTemplate:
+        """Load and compile a template, bypassing the cache"""
+        loaded = self._load_from_database(name)
+        source = "database"
+        if loaded is None:
+            loaded = self._load_from_file(name)
+            source = "file"
+
+        subject, html = loaded
+        return CompiledEmailTemplate(
+            name=name,
+            source=source,
+            subject=self._subject_env.from_string(subject),
+            html=self._html_env.from_string(inline_css(html)),
+            loaded_at=time.monotonic(),
+        )
+
+    def get(self, name: str) -> CompiledEmailTemplate:
+        """Return the cached template, recompiling once it is older than the cache TTL"""
+        cached = self._cache.get(name)
+        if cached and time.monotonic() - cached.loaded_at < self.cache_seconds:
+            return cached
+
+        compiled = self.compile(name)
+        with self._lock:
+            self._cache[name] = compiled
+        return compiled
+
+    def invalidate(self, name: Optional[str] = None) -> None:
+        """Drop one cached template (e.g. after an admin edit) or the whole cache"""
+        with self._lock:
+            if name is None:
+                self._cache.clear()
+            else:
+                self._cache.pop(name, None)
+
+    def render(self, template_name: str, /, **context: Any) -> Tuple[str, str]:
+        """Render one email, returning (subject, html)"""
+        return self.get(template_name).render(context)
+
+    def render_batch(self, name: str, contexts: Iterable[Mapping[str, Any]]) -> List[Tuple[str, str]]:
+        """Render many personalised emails from one compiled template"""
+        template = self.get(name)
+        render_subject, render_html = template.subject.render, template.html.render
+        return [(render_subject(ctx).strip(), render_html(ctx)) for ctx in contexts]
+
+
+# Global template registry
+email_templates = EmailTemplateRegistry()
@@ -0,0 +1,304 @@
+"""
+Enrollment Seats - Atomic seat reservation and course waitlists
+
+``courses.seats_taken`` counts a course's active enrollments. A seat is taken
+with one conditional UPDATE:
+
+    UPDATE courses SET seats_taken = seats_taken + 1
+    WHERE course_id = :id AND (max_students IS NULL OR seats_taken < max_students)
+
+The database applies it atomically, so concurrent requests can never push a
+course past ``max_students`` and nobody counts enrollments to decide. The
+UPDATE also locks the course row until the transaction ends, so the
+duplicate-enrollment check that follows is serialized per course as well. If
+the student turns out to be enrolled already, the rollback gives the seat back.
+
+The counter follows every other change through a session hook. An
+enrollment inserted without a reservation, a status change to or from
+``active``, or a delete all adjust it in the same flush. ``reconcile_seats``
+recounts from the enrollments table as a periodic safety net.
+
+When a course is full, students can join its waitlist. ``promote_waitlist``
+fills seats that free up in waitlist order, passing over students whose
+schedule now overlaps the course (they keep their place).
+"""
+
+import logging
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import and_, event, func, inspect, or_, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.models import Course, CourseWaitlistEntry, Enrollment
+from app.services.schedule_conflicts import student_conflicts
+
+logger = logging.getLogger(__name__)
+
+ACTIVE = "active"
+# Set on enrollments whose seat was already taken by reserve_seat
+_RESERVED_ATTR = "_seat_reserved"
+
+
+class CourseNotFound(Exception):
+    """The course does not exist"""
+
+
+class CourseFull(Exception):
+    """Every seat of the course is taken"""
+
+
+class AlreadyEnrolled(Exception):
+    """The student is already enrolled in (or waitlisted for) the course"""
+
+
+@dataclass
+class EnrollmentResult:
+    """Outcome of enroll_student: an enrollment, or a place on the waitlist"""
+    status: str  # enrolled, waitlisted
+    enrollment: Optional[Enrollment] = None
+    waitlist_entry: Optional[CourseWaitlistEntry] = None
+    position: Optional[int] = None
+
+
+# ==================== Reservation ====================
+
+def reserve_seat(db: Session, course_id: int) -> Optional[Any]:
+    """
+    Take one seat with a conditional UPDATE (caller commits or rolls back).
+    Returns the course's start time, end time and title, or None if the
+    course is full or does not exist.
+    """
+    return db.execute(
+        update(Course).where(
+            Course.course_id == course_id,
+            or_(Course.max_students == None, Course.seats_taken < Course.max_students)  # noqa: E711
+        ).values(
+            seats_taken=Course.seats_taken + 1
+        ).returning(Course.start_time, Course.end_time, Course.title)
+    ).first()
+
+
+def _new_enrollment(course_id: int, student_id: int, payment_due: Optional[datetime]) -> Enrollment:
+    enrollment = Enrollment(
+        student_id=student_id,
+        course_id=course_id,
+        paid=False,
+        payment_due=payment_due,  # Payment is due when the course starts
+        status=ACTIVE,
+    )
+    setattr(enrollment, _RESERVED_ATTR, True)
+    return enrollment
+
+
+def _waitlist_position(db: Session, entry: CourseWaitlistEntry) -> int:
+    return db.query(func.count(CourseWaitlistEntry.waitlist_id)).filter(
+        CourseWaitlistEntry.course_id == entry.course_id,
+        CourseWaitlistEntry.status == "waiting",
+        CourseWaitlistEntry.waitlist_id <= entry.waitlist_id
+    ).scalar()
+
+
+def _join_waitlist(db: Session, course_id: int, student_id: int) -> EnrollmentResult:
+    if db.query(Enrollment.enrollment_id).filter(
+        Enrollment.student_id == student_id, Enrollment.course_id == course_id
+    ).first():
+        raise AlreadyEnrolled("Already enrolled in this course")
+
+    entry = CourseWaitlistEntry(
+        course_id=course_id, student_id=student_id, status="waiting", created_at=datetime.utcnow()
+    )
+    db.add(entry)
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise AlreadyEnrolled("Already on the waitlist for this course")
+    return EnrollmentResult(status="waitlisted", waitlist_entry=entry, position=_waitlist_position(db, entry))
+
+
+def enroll_student(db: Session, course_id: int, student_id: int, waitlist: bool = False) -> EnrollmentResult:
+    """
+    Enroll a student if a seat is free. When the course is full, join the
+    waitlist if ``waitlist`` is set, otherwise raise CourseFull.
+    """
+    reserved = reserve_seat(db, course_id)
+    if reserved is None:
+        db.rollback()
+        if not db.query(Course.course_id).filter(Course.course_id == course_id).first():
+            raise CourseNotFound("Course not found")
+        if not waitlist:
+            raise CourseFull("Course is full")
+        return _join_waitlist(db, course_id, student_id)
+
+    # The reservation holds the course row lock, so this check cannot race another enrollment
+    if db.query(Enrollment.enrollment_id).filter(
+        Enrollment.student_id == student_id, Enrollment.course_id == course_id
+    ).first():
+        db.rollback()
+        raise AlreadyEnrolled("Already enrolled in this course")
+
+    enrollment = _new_enrollment(course_id, student_id, reserved.start_time)
+    db.add(enrollment)
+    db.commit()
+    return EnrollmentResult(status="enrolled", enrollment=enrollment)
+
+
+def leave_waitlist(db: Session, course_id: int, student_id: int) -> bool:
+    """Cancel a student's waiting entry; False if they were not waiting"""
+    cancelled = db.execute(
+        update(CourseWaitlistEntry).where(
+            CourseWaitlistEntry.course_id == course_id,
+            CourseWaitlistEntry.student_id == student_id,
+            CourseWaitlistEntry.status == "waiting"
+        ).values(status="cancelled")
+    ).rowcount
+    db.commit()
+    return bool(cancelled)
+
+
+# ==================== Waitlist Promotion ====================
+
+def promote_waitlist(db: Session, course_id: int, limit: Optional[int] = None) -> List[Enrollment]:
+    """
+    Enroll waiting students, oldest first, while the course has free seats.
+    Each promotion is its own transaction (reserve seat, enroll, mark entry).
+    Students who have since enrolled in an overlapping course are passed
+    over but stay on the waitlist, in case they drop the other course.
+    """
+    promoted: List[Enrollment] = []
+    passed_over: List[int] = []
+    while limit is None or len(promoted) < limit:
+        reserved = reserve_seat(db, course_id)
+        if reserved is None:
+            db.rollback()
+            break
+
+        entry_query = db.query(CourseWaitlistEntry).filter(
+            CourseWaitlistEntry.course_id == course_id,
+            CourseWaitlistEntry.status == "waiting",
+            CourseWaitlistEntry.waitlist_id.notin_(passed_over)
+        ).order_by(CourseWaitlistEntry.waitlist_id)
+        if db.get_bind().dialect.name == "postgresql":
+            entry_query = entry_query.with_for_update(skip_locked=True)
+        entry = entry_query.first()
+        if entry is None:
+            db.rollback()
+            break
+
+        already = db.query(Enrollment.enrollment_id).filter(
+            Enrollment.student_id == entry.student_id, Enrollment.course_id == course_id
+        ).first()
+        if already:
+            # Enrolled some other way meanwhile: give the seat back and drop the entry
+            db.rollback()
+            db.execute(
+                update(CourseWaitlistEntry).where(
+                    CourseWaitlistEntry.waitlist_id == entry.waitlist_id
+                ).values(status="cancelled")
+            )
+            db.commit()
+            continue
+
+        if student_conflicts(db, entry.student_id, reserved.start_time, reserved.end_time, [course_id]):
+            db.rollback()
+            passed_over.append(entry.waitlist_id)
+            logger.info(f"Waitlist entry {entry.waitlist_id} passed over: schedule conflict in course {course_id}")
+            continue
+
+        enrollment = _new_enrollment(course_id, entry.student_id, reserved.start_time)
+        db.add(enrollment)
+        db.flush()
+        entry.status = "promoted"
+        entry.promoted_at = datetime.utcnow()
+        entry.enrollment_id = enrollment.enrollment_id
+        db.commit()
+        promoted.append(enrollment)
+
+    if promoted:
+        logger.info(f"Promoted {len(promoted)} students from the waitlist of course {course_id}")
+    return promoted
+
+
+# ==================== Reconciliation ====================
+
+def reconcile_seats(db: Session) -> Dict[int, int]:
+    """
+    Recount seats_taken from active enrollments where they disagree (caller
+    commits). Returns the corrected counts by course.
+    """
+    active = select(func.count(Enrollment.enrollment_id)).where(
+        Enrollment.course_id == Course.course_id, Enrollment.status == ACTIVE
+    ).scalar_subquery()
+    corrected = db.execute(
+        update(Course).where(Course.seats_taken != active).values(
+            seats_taken=active
+        ).returning(Course.course_id, Course.seats_taken)
+    ).all()
+    if corrected:
+        logger.warning(f"Reconciled seat counters of {len(corrected)} courses")
+    return {course_id: seats for course_id, seats in corrected}
+
+
+def courses_with_open_waitlist(db: Session) -> List[int]:
+    """Courses that have waiting students and at least one free seat"""
+    return [
+        course_id for (course_id,) in db.query(Course.course_id).join(
+            CourseWaitlistEntry, and_(
+                CourseWaitlistEntry.course_id == Course.course_id,
+                CourseWaitlistEntry.status == "waiting"
+            )
+        ).filter(
+            or_(Course.max_students == None, Course.seats_taken < Course.max_students)  # noqa: E711
+        ).distinct()
+    ]
+
+
+# ==================== Counter Maintenance ====================
+
+def _record_flush(session: Session, flush_context: Any) -> None:
+    """Adjust seats_taken for enrollments inserted, re-statused or deleted in this flush"""
+    deltas: Dict[int, int] = {}
+
+    def add(course_id: Optional[int], delta: int) -> None:
+        if course_id is not None:
+            deltas[course_id] = deltas.get(course_id, 0) + delta
+
+    for obj in session.new:
+        if isinstance(obj, Enrollment) and (obj.status or ACTIVE) == ACTIVE and not getattr(obj, _RESERVED_ATTR, False):
+            add(obj.course_id, 1)
+    for obj in session.dirty:
+        if isinstance(obj, Enrollment):
+            history = inspect(obj).attrs.status.history
+            if history.added and history.deleted:
+                was_active, is_active = history.deleted[0] == ACTIVE, history.added[0] == ACTIVE
+                if was_active != is_active:
+                    add(obj.course_id, 1 if is_active else -1)
+    for obj in session.deleted:
+        if isinstance(obj, Enrollment) and obj.status == ACTIVE:
+            add(obj.course_id, -1)
+
+    deltas = {course_id: delta for course_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    connection = session.connection()
+    # Never below zero, even if the counter had drifted (SQLite spells greatest() as max())
+    floor = func.max if connection.dialect.name == "sqlite" else func.greatest
+    for course_id, delta in deltas.items():
+        connection.execute(
+            update(Course).where(Course.course_id == course_id).values(
+                seats_taken=floor(Course.seats_taken + delta, 0)
+            )
+        )
+
+
+def _keep_previous_status(target: Enrollment, value: Any, oldvalue: Any, initiator: Any) -> Any:
+    """No-op listener; registering it with active_history keeps the old status in history"""
+    return value
+
+
+event.listen(Session, "after_flush", _record_flush)
+event.listen(Enrollment.status, "set", _keep_previous_status, active_history=True, retval=True)
@@ -0,0 +1,129 @@
+"""
+Fan-out - Chunked Celery canvases for jobs that touch many recipients
+
+Sending one task per recipient floods the broker with tiny messages and pays
+the per-task overhead (serialisation, acknowledgement, result write) once per
+recipient. ``fan_out`` splits the work into chunks of ``chunk_size`` items and
+publishes one task per chunk as a group, or as a chord when a completion
+callback is given.
+
+Chunk tasks are wrapped with ``timed_chunk`` so every chunk result carries
+its item count and duration. ``summarize_chunks`` folds the chunk results
+into one summary (totals plus timing stats), which the chord callback
+receives.
+"""
+
+import functools
+import logging
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, TypeVar
+
+from celery import chord, group
+from celery.canvas import Signature
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Keys added by timed_chunk; everything else numeric in a chunk result is summed
+TIMING_KEYS = ("items", "started_at", "seconds")
+
+
+def chunked(items: Iterable[T], size: int) -> List[List[T]]:
+    """Split ``items`` into lists of at most ``size`` elements"""
+    if size <= 0:
+        raise ValueError("chunk size must be positive")
+    items = list(items)
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def timed_chunk(func: Callable[..., Optional[Dict[str, Any]]]) -> Callable[..., Dict[str, Any]]:
+    """
+    Wrap a chunk task body so its result records the chunk's item count,
+    start time and duration. The chunk is the first positional argument, so
+    chunk tasks are not bound (use ``autoretry_for`` for retries).
+    """
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+        items = args[0] if args else []
+        started_at = time.time()
+        started = time.perf_counter()
+        result = dict(func(*args, **kwargs) or {})
+        result.update(
+            items=len(items),
+            started_at=started_at,
+            seconds=round(time.perf_counter() - started, 4),
+        )
+        return result
+
+    return wrapper
+
+
+def summarize_chunks(results: Sequence[Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+    """
+    Combine chunk results into totals and timing stats.
+
+    Numeric values returned by the chunks (e.g. ``sent``/``failed``) are
+    summed; ``wall_seconds`` spans from the first chunk starting to the last
+    one finishing, while ``task_seconds`` is the summed time spent in chunks.
+    """
+    results = [r for r in results if r]
+    totals: Dict[str, float] = {}
+    durations: List[float] = []
+    first_start = last_end = None
+
+    for result in results:
+        for key, value in result.items():
+            if key in TIMING_KEYS or isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            totals[key] = totals.get(key, 0) + value
+
+        seconds = float(result.get("seconds") or 0.0)
+        durations.append(seconds)
+        started_at = result.get("started_at")
+        if started_at is not None:
+            first_start = started_at if first_start is None else min(first_start, started_at)
+            last_end = started_at + seconds if last_end is None else max(last_end, started_at + seconds)
+
+    return {
+        "chunks": len(results),
+        "items": sum(int(r.get("items") or 0) for r in results),
+        "totals": totals,
+        "task_seconds": round(sum(durations), 4),
+        "max_chunk_seconds": round(max(durations), 4) if durations else 0.0,
+        "mean_chunk_seconds": round(sum(durations) / len(durations), 4) if durations else 0.0,
+        "wall_seconds": round(last_end - first_start, 4) if first_start is not None else 0.0,
+    }
+
+
+def fan_out(
+    task: Any,
+    items: Iterable[Any],
+    chunk_size: int,
+    args: Sequence[Any] = (),
+    kwargs: Optional[Dict[str, Any]] = None,
+    callback: Optional[Signature] = None,
+    options: Optional[Dict[str, Any]] = None,
+) -> Any:
+    """
+    Publish ``task(chunk, *args, **kwargs)`` once per chunk of ``items``.
+
+    With a ``callback`` signature the chunks run as a chord and the callback
+    receives the list of chunk results as its first argument once every
+    chunk has finished (pair it with a task that calls ``summarize_chunks``).
+    Returns the group/chord result, or None when there is nothing to send.
+    """
+    chunks = chunked(items, chunk_size)
+    if not chunks:
+        if callback is not None:
+            callback.clone(args=([],)).apply_async()
+        return None
+
+    header = group(
+        task.signature((chunk, *args), kwargs or {}, **(options or {})) for chunk in chunks
+    )
+    logger.info(f"Fanning out {getattr(task, 'name', task)} as {len(chunks)} chunks of up to {chunk_size}")
+
+    if callback is not None:
+        return chord(header)(callback)
+    return header.apply_async()
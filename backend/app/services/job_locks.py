@@ -0,0 +1,183 @@
+"""
+Job Locks - Lease-based locks with fencing tokens for periodic jobs
+
+Beat can fire a job twice (two beat processes, a restart mid-schedule) and
+admins can trigger the monthly reports while the scheduled run is going. Each
+periodic job therefore takes a lease before doing any work. A lease is a row
+in ``job_leases``, acquired with one conditional UPDATE that only matches when
+the previous lease has expired or been released. That makes acquisition atomic
+in the database, with no extra infrastructure.
+
+Every acquisition increments the row's fencing token. Work that outlives the
+acquiring task (e.g. fan-out chunks) carries the token and renews the lease
+with it. Once another holder has taken over after an expiry, renewing with the
+old token fails with LeaseLost and the stale work stops instead of running
+alongside the new holder.
+"""
+
+import functools
+import logging
+import os
+import socket
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import or_, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models import JobLease
+
+logger = logging.getLogger(__name__)
+
+
+class LeaseLost(Exception):
+    """The lease expired and was taken over by another holder"""
+
+
+@dataclass
+class Lease:
+    """A held lease; ``token`` fences out previous holders"""
+    name: str
+    holder: str
+    token: int
+    expires_at: datetime
+
+
+def default_holder(task_id: Optional[str] = None) -> str:
+    """Identify the current process (and task) as a lease holder"""
+    holder = f"{socket.gethostname()}:{os.getpid()}"
+    return f"{holder}:{task_id}" if task_id else holder
+
+
+def _ensure_row(db: Session, name: str) -> None:
+    if db.query(JobLease.name).filter(JobLease.name == name).first():
+        return
+    db.add(JobLease(name=name, fencing_token=0))
+    try:
+        db.commit()
+    except IntegrityError:
+        # Created concurrently by another worker
+        db.rollback()
+
+
+def acquire_lease(db: Session, name: str, holder: str, ttl_seconds: Optional[int] = None) -> Optional[Lease]:
+    """Take the lease if it is free or expired; returns None while someone else holds it"""
+    ttl_seconds = ttl_seconds or settings.job_lease_seconds
+    _ensure_row(db, name)
+
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    token = db.execute(
+        update(JobLease).where(
+            JobLease.name == name,
+            or_(
+                JobLease.expires_at == None,  # noqa: E711
+                JobLease.expires_at <= now,
+                JobLease.released_at != None  # noqa: E711
+            )
+        ).values(
+            holder=holder,
+            fencing_token=JobLease.fencing_token + 1,
+            acquired_at=now,
+            renewed_at=now,
+            expires_at=expires_at,
+            released_at=None,
+        ).returning(JobLease.fencing_token)
+    ).scalar()
+    db.commit()
+
+    if token is None:
+        return None
+    logger.info(f"Lease {name} acquired by {holder} (token {token})")
+    return Lease(name=name, holder=holder, token=token, expires_at=expires_at)
+
+
+def renew_lease(db: Session, name: str, token: int, ttl_seconds: Optional[int] = None) -> datetime:
+    """
+    Extend a lease held with ``token``; raises LeaseLost if it was released
+    or another holder has acquired it since.
+    """
+    ttl_seconds = ttl_seconds or settings.job_lease_seconds
+    now = datetime.utcnow()
+    expires_at = now + timedelta(seconds=ttl_seconds)
+    renewed = db.execute(
+        update(JobLease).where(
+            JobLease.name == name,
+            JobLease.fencing_token == token,
+            JobLease.released_at == None  # noqa: E711
+        ).values(renewed_at=now, expires_at=expires_at)
+    ).rowcount
+    db.commit()
+
+    if not renewed:
+        raise LeaseLost(f"Lease {name} is no longer held with token {token}")
+    return expires_at
+
+
+def release_lease(db: Session, name: str, token: int) -> bool:
+    """Give the lease up; a no-op (returning False) if the token is stale"""
+    now = datetime.utcnow()
+    released = db.execute(
+        update(JobLease).where(
+            JobLease.name == name,
+            JobLease.fencing_token == token,
+            JobLease.released_at == None  # noqa: E711
+        ).values(released_at=now, expires_at=now)
+    ).rowcount
+    db.commit()
+    return bool(released)
+
+
+def lease_status(db: Session) -> List[Dict[str, Any]]:
+    """Every known lease with its holder and whether it is currently held"""
+    now = datetime.utcnow()
+    return [
+        {
+            "name": lease.name,
+            "held": lease.released_at is None and lease.expires_at is not None and lease.expires_at > now,
+            "holder": lease.holder,
+            "fencing_token": lease.fencing_token,
+            "acquired_at": lease.acquired_at,
+            "renewed_at": lease.renewed_at,
+            "expires_at": lease.expires_at,
+            "released_at": lease.released_at,
+        }
+        for lease in db.query(JobLease).order_by(JobLease.name)
+    ]
+
+
+def skipped_while_held(db: Session, name: str) -> Dict[str, Any]:
+    """Result of a job skipped because the ``name`` lease is held elsewhere"""
+    holder = db.query(JobLease.holder).filter(JobLease.name == name).scalar()
+    logger.info(f"Skipping {name}: lease held by {holder}")
+    return {"status": "skipped", "reason": "lease held", "holder": holder}
+
+
+def singleton_job(name: str, ttl_seconds: Optional[int] = None) -> Callable:
+    """
+    Run the wrapped job only while holding the ``name`` lease, releasing it
+    when the job returns. When the lease is held elsewhere the job is skipped
+    and reports the current holder.
+    """
+    def decorator(func: Callable[..., Dict[str, Any]]) -> Callable[..., Dict[str, Any]]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Dict[str, Any]:
+            db = SessionLocal()
+            try:
+                lease = acquire_lease(db, name, default_holder(), ttl_seconds)
+                if lease is None:
+                    return skipped_while_held(db, name)
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    release_lease(db, name, lease.token)
+            finally:
+                db.close()
+
+        return wrapper
+
+    return decorator
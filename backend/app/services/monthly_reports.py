@@ -0,0 +1,680 @@
+"""
+Monthly Reports - Set-based computation of monthly student, teacher and admin reports
+
+Every metric for every recipient is computed with a handful of GROUP BY
+queries over the month's date range. The number of queries does not depend on
+the number of users. Only rendering and sending are done in chunks.
+
+Each report row moves through ``pending`` (seeded for a recipient),
+``generated`` (metrics filled in), ``sending`` and ``sent`` / ``failed``. A
+month's run is tracked by a MonthlyReportRun whose cursor is the highest
+report id sent, so a run that died halfway resumes where it stopped instead
+of starting over.
+
+Sending a chunk takes three steps, like the email outbox: claim the due
+reports (``sending``, with ``lease_expires_at`` = now +
+``monthly_report_send_lease_seconds``), render them and commit; send with no
+transaction open; record the outcomes in a second short transaction. A
+report whose worker died mid-send is due again once its lease lapses.
+
+Every claim is a send attempt. A report that could not be sent goes back to
+``generated``, so the run stays open and the next trigger retries it; after
+``monthly_report_max_attempts`` it is marked ``failed`` for good.
+
+Runs are executed either in-process (``execute_run``, chunk after chunk) or
+fanned out over Celery workers: ``prepare_run`` builds the reports and
+returns the ids still to send, each chunk task calls ``send_report_chunk``
+with the run id, and ``finish_run`` closes the run once every chunk is done.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, case, distinct, func, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Query, Session
+
+from app.models import (
+    Admin, Assignment, AssignmentSubmission, Attendance, Course, Enrollment,
+    MonthlyReport, MonthlyReportRun, Payment, Student, Teacher, teacher_course_association
+)
+from app.core.config import settings
+from app.services.email_service import EmailService, email_service
+
+logger = logging.getLogger(__name__)
+
+REPORT_TYPES = ("student", "teacher", "admin")
+RECIPIENT_MODELS = {
+    "student": (Student, Student.student_id),
+    "teacher": (Teacher, Teacher.teacher_id),
+    "admin": (Admin, Admin.admin_id),
+}
+
+
+def month_bounds(month: int, year: int) -> Tuple[datetime, datetime]:
+    """Half-open [start, end) range for a month, usable by indexes unlike EXTRACT()"""
+    start = datetime(year, month, 1)
+    end = datetime(year + 1, 1, 1) if month == 12 else datetime(year, month + 1, 1)
+    return start, end
+
+
+def _grade_percentage():
+    return AssignmentSubmission.grade * 100.0 / func.coalesce(func.nullif(Assignment.max_points, 0), 100.0)
+
+
+# ==================== Metrics ====================
+
+def student_metrics(db: Session, start: datetime, end: datetime, now: datetime) -> Dict[int, Dict[str, Any]]:
+    """Attendance, submission, grade and outstanding-work metrics for every student"""
+    metrics: Dict[int, Dict[str, Any]] = defaultdict(dict)
+
+    attendance = db.query(
+        Attendance.student_id,
+        func.count(Attendance.attendance_id),
+        func.sum(case((Attendance.status == "present", 1), else_=0)),
+        func.sum(case((Attendance.status == "absent", 1), else_=0)),
+    ).filter(
+        Attendance.attendance_date >= start,
+        Attendance.attendance_date < end
+    ).group_by(Attendance.student_id)
+
+    for student_id, total, present, absent in attendance:
+        metrics[student_id].update(
+            total_classes=total,
+            classes_attended=int(present or 0),
+            classes_absent=int(absent or 0),
+            attendance_percentage=(present or 0) * 100.0 / total if total else 0.0,
+        )
+
+    submissions = db.query(
+        AssignmentSubmission.student_id,
+        func.count(AssignmentSubmission.submission_id),
+        func.avg(_grade_percentage()),
+    ).join(
+        Assignment, Assignment.assignment_id == AssignmentSubmission.assignment_id
+    ).filter(
+        AssignmentSubmission.submitted_at >= start,
+        AssignmentSubmission.submitted_at < end
+    ).group_by(AssignmentSubmission.student_id)
+
+    for student_id, completed, average in submissions:
+        metrics[student_id].update(assignments_completed=completed, average_grade=float(average or 0))
+
+    # Open assignments in the student's active courses without a submission
+    outstanding = db.query(
+        Enrollment.student_id, func.count(Assignment.assignment_id)
+    ).join(
+        Assignment, Assignment.course_id == Enrollment.course_id
+    ).outerjoin(
+        AssignmentSubmission, and_(
+            AssignmentSubmission.assignment_id == Assignment.assignment_id,
+            AssignmentSubmission.student_id == Enrollment.student_id
+        )
+    ).filter(
+        Enrollment.status == "active",
+        Assignment.due_date > now,
+        AssignmentSubmission.submission_id == None  # noqa: E711
+    ).group_by(Enrollment.student_id)
+
+    for student_id, count in outstanding:
+        metrics[student_id]["outstanding_assignments"] = count
+
+    return metrics
+
+
+def teacher_metrics(db: Session, start: datetime, end: datetime) -> Dict[int, Dict[str, Any]]:
+    """Class size, assignment and grading metrics for every teacher"""
+    metrics: Dict[int, Dict[str, Any]] = defaultdict(dict)
+    teacher_id = teacher_course_association.c.teacher_id
+    course_id = teacher_course_association.c.course_id
+
+    students = db.query(
+        teacher_id, func.count(distinct(Enrollment.student_id))
+    ).join(
+        Enrollment, Enrollment.course_id == course_id
+    ).group_by(teacher_id)
+
+    for tid, count in students:
+        metrics[tid]["students_count"] = count
+
+    posted = db.query(
+        teacher_id, func.count(Assignment.assignment_id)
+    ).join(
+        Assignment, Assignment.course_id == course_id
+    ).filter(
+        Assignment.created_at >= start,
+        Assignment.created_at < end
+    ).group_by(teacher_id)
+
+    for tid, count in posted:
+        metrics[tid]["assignments_posted"] = count
+
+    graded = db.query(
+        AssignmentSubmission.graded_by_id,
+        func.count(AssignmentSubmission.submission_id),
+        func.avg(_grade_percentage()),
+    ).join(
+        Assignment, Assignment.assignment_id == AssignmentSubmission.assignment_id
+    ).filter(
+        AssignmentSubmission.graded_by_id != None,  # noqa: E711
+        AssignmentSubmission.graded_at >= start,
+        AssignmentSubmission.graded_at < end
+    ).group_by(AssignmentSubmission.graded_by_id)
+
+    for tid, count, average in graded:
+        metrics[tid].update(assignments_graded=count, average_grade=float(average or 0))
+
+    pending = db.query(
+        teacher_id, func.count(AssignmentSubmission.submission_id)
+    ).join(
+        Assignment, Assignment.course_id == course_id
+    ).join(
+        AssignmentSubmission, AssignmentSubmission.assignment_id == Assignment.assignment_id
+    ).filter(
+        AssignmentSubmission.graded_at == None  # noqa: E711
+    ).group_by(teacher_id)
+
+    for tid, count in pending:
+        metrics[tid]["pending_assignments"] = count
+
+    return metrics
+
+
+def platform_metrics(db: Session, start: datetime, end: datetime) -> Dict[str, Any]:
+    """Platform-wide totals shared by every admin report"""
+    total_students = db.query(func.count(Student.student_id)).filter(Student.is_active == True).scalar()  # noqa: E712
+    total_teachers = db.query(func.count(Teacher.teacher_id)).filter(Teacher.is_active == True).scalar()  # noqa: E712
+    total_courses = db.query(func.count(Course.course_id)).filter(Course.status == "active").scalar()
+
+    total_enrollments, new_enrollments = db.query(
+        func.count(Enrollment.enrollment_id),
+        func.sum(case((and_(Enrollment.enrollment_date >= start, Enrollment.enrollment_date < end), 1), else_=0)),
+    ).one()
+
+    total_revenue = db.query(func.coalesce(func.sum(Payment.amount), 0.0)).filter(
+        Payment.payment_status == "completed",
+        Payment.payment_date >= start,
+        Payment.payment_date < end
+    ).scalar()
+
+    return {
+        "total_students": total_students or 0,
+        "total_teachers": total_teachers or 0,
+        "total_courses": total_courses or 0,
+        "total_enrollments": total_enrollments or 0,
+        "new_enrollments": int(new_enrollments or 0),
+        "total_revenue": float(total_revenue or 0),
+    }
+
+
+# ==================== Building ====================
+
+def seed_monthly_reports(db: Session, month: int, year: int) -> int:
+    """
+    Insert a ``pending`` report row for every active recipient that does not
+    have one for the month yet. Returns the number of new rows.
+    """
+    existing = {
+        (report_type, recipient_id)
+        for report_type, recipient_id in db.query(MonthlyReport.report_type, MonthlyReport.recipient_id).filter(
+            MonthlyReport.month == month,
+            MonthlyReport.year == year
+        )
+    }
+
+    rows: List[Dict[str, Any]] = []
+    for report_type, (model, pk) in RECIPIENT_MODELS.items():
+        for recipient_id, email in db.query(pk, model.email).filter(model.is_active == True):  # noqa: E712
+            if (report_type, recipient_id) in existing:
+                continue
+            rows.append({
+                "month": month,
+                "year": year,
+                "report_type": report_type,
+                "recipient_id": recipient_id,
+                "recipient_type": report_type,
+                "recipient_email": email,
+                "status": "pending",
+            })
+
+    if rows:
+        db.bulk_insert_mappings(MonthlyReport, rows)
+    db.commit()
+    return len(rows)
+
+
+def generate_monthly_reports(db: Session, month: int, year: int) -> Dict[str, int]:
+    """
+    Fill in the metrics of every ``pending`` report for the month and mark it
+    ``generated``, in one bulk update. Returns the number of rows per type.
+    """
+    start, end = month_bounds(month, year)
+    now = datetime.utcnow()
+
+    pending = db.query(MonthlyReport.report_id, MonthlyReport.report_type, MonthlyReport.recipient_id).filter(
+        MonthlyReport.month == month,
+        MonthlyReport.year == year,
+        MonthlyReport.status == "pending"
+    ).all()
+
+    counts = {report_type: 0 for report_type in REPORT_TYPES}
+    if not pending:
+        return counts
+
+    types = {report_type for _, report_type, _ in pending}
+    students = student_metrics(db, start, end, now) if "student" in types else {}
+    teachers = teacher_metrics(db, start, end) if "teacher" in types else {}
+    platform = platform_metrics(db, start, end) if "admin" in types else {}
+
+    updates: List[Dict[str, Any]] = []
+    for report_id, report_type, recipient_id in pending:
+        row: Dict[str, Any] = {"report_id": report_id, "status": "generated", "generated_at": now}
+        if report_type == "student":
+            m = students.get(recipient_id, {})
+            row.update(
+                total_classes=m.get("total_classes", 0),
+                classes_attended=m.get("classes_attended", 0),
+                classes_absent=m.get("classes_absent", 0),
+                attendance_percentage=m.get("attendance_percentage", 0.0),
+                assignments_completed=m.get("assignments_completed", 0),
+                average_grade=m.get("average_grade", 0.0),
+                outstanding_assignments=m.get("outstanding_assignments", 0),
+            )
+        elif report_type == "teacher":
+            m = teachers.get(recipient_id, {})
+            row.update(
+                students_count=m.get("students_count", 0),
+                assignments_posted=m.get("assignments_posted", 0),
+                average_grade=m.get("average_grade", 0.0),
+                assignments_graded=m.get("assignments_graded", 0),
+                pending_assignments=m.get("pending_assignments", 0),
+            )
+        else:
+            row.update(platform)
+        updates.append(row)
+        counts[report_type] += 1
+
+    db.bulk_update_mappings(MonthlyReport, updates)
+    db.commit()
+
+    logger.info(f"Generated monthly reports for {month}/{year}: {counts}")
+    return counts
+
+
+def build_monthly_reports(db: Session, month: int, year: int) -> Dict[str, int]:
+    """
+    Seed and generate every report for the month.
+
+    Recipients who already have a report for the month are not seeded again
+    and only ``pending`` rows are generated, so the builder can be re-run
+    safely. Returns the number of newly generated rows per type.
+    """
+    seed_monthly_reports(db, month, year)
+    return generate_monthly_reports(db, month, year)
+
+
+# ==================== Rendering & Sending ====================
+
+def _report_context(report: MonthlyReport, name: str, month_name: str) -> Dict[str, Any]:
+    """Template variables for one report row (see the send_monthly_* methods)"""
+    common = {"month": month_name, "year": str(report.year)}
+    if report.report_type == "student":
+        return {
+            **common,
+            "student_name": name,
+            "total_classes": report.total_classes or 0,
+            "attended_classes": report.classes_attended or 0,
+            "attendance_percentage": report.attendance_percentage or 0.0,
+            "assignments_completed": report.assignments_completed or 0,
+            "average_grade": report.average_grade or 0.0,
+            "outstanding_assignments": report.outstanding_assignments or 0,
+        }
+    if report.report_type == "teacher":
+        return {
+            **common,
+            "teacher_name": name,
+            "students_taught": report.students_count or 0,
+            "assignments_posted": report.assignments_posted or 0,
+            "assignments_graded": report.assignments_graded or 0,
+            "pending_assignments": report.pending_assignments or 0,
+            "average_class_grade": report.average_grade or 0.0,
+        }
+    return {
+        **common,
+        "admin_name": name,
+        "total_students": report.total_students or 0,
+        "total_teachers": report.total_teachers or 0,
+        "total_courses": report.total_courses or 0,
+        "total_enrollments": report.total_enrollments or 0,
+        "total_revenue": report.total_revenue or 0.0,
+        "active_users": (report.total_students or 0) + (report.total_teachers or 0),
+        "new_enrollments": report.new_enrollments or 0,
+    }
+
+
+@dataclass
+class ClaimedReport:
+    """A report moved to ``sending``, rendered before the claim was committed"""
+    report_id: int
+    recipient_email: str
+    subject: str
+    html: str
+
+
+def _due(now: datetime) -> Any:
+    """Generated reports, and sending ones whose worker's lease has lapsed"""
+    return or_(
+        MonthlyReport.status == "generated",
+        and_(MonthlyReport.status == "sending", MonthlyReport.lease_expires_at <= now)
+    )
+
+
+def _claim_reports(db: Session, query: Query, service: EmailService,
+                   limit: Optional[int] = None) -> Tuple[List[ClaimedReport], int]:
+    """
+    Move up to ``limit`` due reports of ``query`` to ``sending`` under a
+    lease, render them and commit. Rows locked by another worker are skipped;
+    the locks only last until the claim is committed. Returns the claimed
+    reports and the number failed instead (lease lapsed on the last attempt).
+    """
+    now = datetime.utcnow()
+    reports = query.filter(_due(now)).order_by(MonthlyReport.report_id).limit(limit).with_for_update(
+        skip_locked=True
+    ).all()
+
+    lease_until = now + timedelta(seconds=settings.monthly_report_send_lease_seconds)
+    by_type: Dict[str, List[MonthlyReport]] = defaultdict(list)
+    failed = 0
+    for report in reports:
+        if report.status == "sending":
+            # Its worker died; the email may or may not have gone out
+            report.error_message = "Send lease expired"
+            if (report.send_attempts or 0) >= settings.monthly_report_max_attempts:
+                report.status = "failed"
+                report.lease_expires_at = None
+                failed += 1
+                logger.error(f"Monthly report {report.report_id} failed: lease expired on its last attempt")
+                continue
+            logger.warning(f"Monthly report {report.report_id} reclaimed after its lease expired")
+        report.status = "sending"
+        report.send_attempts = (report.send_attempts or 0) + 1
+        report.lease_expires_at = lease_until
+        by_type[report.report_type].append(report)
+
+    claimed: List[ClaimedReport] = []
+    for report_type, group in by_type.items():
+        model, pk = RECIPIENT_MODELS[report_type]
+        names = dict(db.query(pk, model.name).filter(pk.in_([r.recipient_id for r in group])))
+        contexts = [
+            _report_context(r, names.get(r.recipient_id, ""), datetime(r.year, r.month, 1).strftime("%B"))
+            for r in group
+        ]
+        for report, (subject, html) in zip(group, service.render_monthly_reports(report_type, contexts)):
+            claimed.append(ClaimedReport(report.report_id, report.recipient_email, subject, html))
+
+    db.commit()
+    claimed.sort(key=lambda c: c.report_id)
+    return claimed, failed
+
+
+async def _deliver_reports(
+    db: Session,
+    claimed: List[ClaimedReport],
+    service: EmailService,
+    run_id: Optional[int] = None,
+    failed_on_claim: int = 0,
+) -> Dict[str, int]:
+    """
+    Send claimed reports concurrently (no transaction open), then record each
+    outcome (``sent``, back to ``generated`` for a retry, or ``failed`` on the
+    last attempt) and, with a ``run_id``, advance the run, in one commit
+    """
+    results = await asyncio.gather(
+        *(service._send_email(c.recipient_email, c.subject, c.html, email_type="report") for c in claimed),
+        return_exceptions=True,
+    )
+
+    counts = {"sent": 0, "retrying": 0, "failed": failed_on_claim}
+    if not claimed and not failed_on_claim:
+        return counts
+
+    # A report reclaimed by another worker meanwhile is its to record
+    reports = {
+        report.report_id: report
+        for report in db.query(MonthlyReport).filter(
+            MonthlyReport.report_id.in_([c.report_id for c in claimed]),
+            MonthlyReport.status == "sending"
+        )
+    }
+    now = datetime.utcnow()
+    for item, result in zip(claimed, results):
+        report = reports.get(item.report_id)
+        if report is None:
+            continue
+        report.lease_expires_at = None
+        if result is True:
+            report.status = "sent"
+            report.sent_at = now
+            counts["sent"] += 1
+        else:
+            report.error_message = str(result) if isinstance(result, BaseException) else "Email not sent"
+            if (report.send_attempts or 0) >= settings.monthly_report_max_attempts:
+                report.status = "failed"
+                counts["failed"] += 1
+            else:
+                report.status = "generated"
+                counts["retrying"] += 1
+
+    if run_id is not None:
+        _record_chunk(db, run_id, claimed[-1].report_id if claimed else 0, counts)
+    db.commit()
+    return counts
+
+
+async def send_report_chunk(
+    db: Session,
+    report_ids: Sequence[int],
+    service: Optional[EmailService] = None,
+    run_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Render and send one chunk of generated reports.
+
+    The reports are claimed as ``sending`` and committed before any email
+    goes out, so a chunk that is delivered twice never sends a report twice
+    and no row lock is held during the sends. Recipient names are loaded
+    with one query per report type, bodies are rendered from one compiled
+    template per type, and the sends run concurrently through the SMTP pool.
+    With a ``run_id`` the run's counters are advanced in the transaction
+    that records the outcomes.
+    """
+    service = service or email_service
+    claimed, failed = _claim_reports(db, db.query(MonthlyReport).filter(
+        MonthlyReport.report_id.in_(list(report_ids))
+    ), service)
+    return await _deliver_reports(db, claimed, service, run_id, failed)
+
+
+# ==================== Resumable Runs ====================
+
+def get_or_create_run(db: Session, month: int, year: int) -> MonthlyReportRun:
+    """The run tracking the month's reports; there is exactly one per month"""
+    run = db.query(MonthlyReportRun).filter(
+        MonthlyReportRun.month == month,
+        MonthlyReportRun.year == year
+    ).first()
+    if run is None:
+        run = MonthlyReportRun(month=month, year=year, status="pending", cursor=0, sent_count=0, failed_count=0)
+        db.add(run)
+        try:
+            db.commit()
+        except IntegrityError:
+            # Created concurrently by another trigger
+            db.rollback()
+            return get_or_create_run(db, month, year)
+    return run
+
+
+def _record_chunk(db: Session, run_id: int, last_report_id: int, counts: Dict[str, int]) -> None:
+    """Advance the run's cursor and counters in the chunk's transaction"""
+    db.query(MonthlyReportRun).filter(MonthlyReportRun.run_id == run_id).update({
+        MonthlyReportRun.cursor: case(
+            (MonthlyReportRun.cursor < last_report_id, last_report_id), else_=MonthlyReportRun.cursor
+        ),
+        MonthlyReportRun.sent_count: MonthlyReportRun.sent_count + counts["sent"],
+        MonthlyReportRun.failed_count: MonthlyReportRun.failed_count + counts["failed"],
+    }, synchronize_session=False)
+
+
+def _fail_run(db: Session, run: MonthlyReportRun, exc: Exception) -> None:
+    db.rollback()
+    run.status = "failed"
+    run.error_message = str(exc)
+    db.commit()
+
+
+def prepare_run(db: Session, run: MonthlyReportRun) -> List[int]:
+    """
+    (Re)start a run: build the month's reports and move the run to
+    ``sending``. Returns the ids of the reports still waiting to be sent,
+    which is empty for a completed run.
+
+    Every due report (``generated``, or ``sending`` past its lease) is
+    returned, not only those after the cursor: when chunks run in parallel
+    the cursor can pass reports whose chunk was lost. Reports already sent
+    are never returned.
+    """
+    if run.status == "completed":
+        return []
+
+    run.status = "building"
+    run.started_at = datetime.utcnow()
+    run.processed_at_start = (run.sent_count or 0) + (run.failed_count or 0)
+    run.error_message = None
+    db.commit()
+
+    try:
+        build_monthly_reports(db, run.month, run.year)
+
+        run.total_reports = db.query(func.count(MonthlyReport.report_id)).filter(
+            MonthlyReport.month == run.month,
+            MonthlyReport.year == run.year
+        ).scalar()
+        run.status = "sending"
+        db.commit()
+
+        return [report_id for report_id, in db.query(MonthlyReport.report_id).filter(
+            MonthlyReport.month == run.month,
+            MonthlyReport.year == run.year,
+            _due(datetime.utcnow())
+        ).order_by(MonthlyReport.report_id)]
+    except Exception as exc:
+        _fail_run(db, run, exc)
+        raise
+
+
+def finish_run(db: Session, run: MonthlyReportRun) -> MonthlyReportRun:
+    """
+    Mark a run ``completed`` once no generated or sending reports are left.
+
+    If some are left (a chunk was lost), the run stays ``sending`` and the
+    next trigger picks the leftovers up.
+    """
+    remaining = db.query(func.count(MonthlyReport.report_id)).filter(
+        MonthlyReport.month == run.month,
+        MonthlyReport.year == run.year,
+        MonthlyReport.status.in_(["generated", "sending"])
+    ).scalar()
+
+    db.refresh(run)
+    if remaining:
+        logger.warning(f"Monthly report run {run.run_id} finished with {remaining} reports unsent")
+        return run
+
+    run.status = "completed"
+    run.finished_at = datetime.utcnow()
+    db.commit()
+    return run
+
+
+async def execute_run(
+    db: Session,
+    run: MonthlyReportRun,
+    chunk_size: Optional[int] = None,
+    service: Optional[EmailService] = None,
+) -> MonthlyReportRun:
+    """
+    Build and send a month's reports in this process, resuming from the
+    run's checkpoint.
+
+    Each chunk claims the next due reports, sends them, and commits their
+    statuses together with the advanced cursor. After a crash, at most the
+    in-flight chunk is attempted again (once its lease lapses), and reports
+    from it that did go out are caught by the email dedup index. Sent rows are no longer
+    ``generated``, so the walk also picks up reports below the cursor that a
+    lost fan-out chunk left behind.
+    """
+    chunk_size = chunk_size or settings.monthly_report_chunk_size
+    service = service or email_service
+
+    if run.status == "completed":
+        return run
+
+    prepare_run(db, run)
+
+    try:
+        last_report_id = 0
+        while True:
+            claimed, failed = _claim_reports(db, db.query(MonthlyReport).filter(
+                MonthlyReport.month == run.month,
+                MonthlyReport.year == run.year,
+                MonthlyReport.report_id > last_report_id
+            ), service, chunk_size)
+
+            if not claimed and not failed:
+                break
+            if claimed:
+                last_report_id = claimed[-1].report_id
+            await _deliver_reports(db, claimed, service, run.run_id, failed)
+
+        finish_run(db, run)
+    except Exception as exc:
+        _fail_run(db, run, exc)
+        raise
+
+    return run
+
+
+def run_progress(run: MonthlyReportRun) -> Dict[str, Any]:
+    """Progress of a run, including throughput since it was last (re)started"""
+    processed = (run.sent_count or 0) + (run.failed_count or 0)
+    total = run.total_reports or 0
+
+    rows_per_second = None
+    if run.started_at:
+        started = run.started_at.replace(tzinfo=None)
+        finished = (run.finished_at or datetime.utcnow()).replace(tzinfo=None)
+        elapsed = (finished - started).total_seconds()
+        if elapsed > 0:
+            rows_per_second = round((processed - (run.processed_at_start or 0)) / elapsed, 2)
+
+    return {
+        "run_id": run.run_id,
+        "month": run.month,
+        "year": run.year,
+        "status": run.status,
+        "total_reports": total,
+        "sent": run.sent_count or 0,
+        "failed": run.failed_count or 0,
+        "remaining": max(total - processed, 0),
+        "percent_complete": round(processed * 100.0 / total, 1) if total else 0.0,
+        "cursor": run.cursor,
+        "rows_per_second": rows_per_second,
+        "started_at": run.started_at,
+        "finished_at": run.finished_at,
+        "error_message": run.error_message,
+    }
@@ -0,0 +1,144 @@
+"""
+Notification Digest - Daily email summarising unread notifications
+
+Users who turn on ``digest_mode`` for a notification type get one email a day
+listing their unread notifications of that type, instead of an email per
+notification. Recipients are found with one query and handed out to Celery in
+chunks. Each chunk loads its users and their notifications with one query per
+user type, renders every digest from one compiled template and sends them
+concurrently through the SMTP pool.
+
+Notifications included in a digest are flagged ``email_sent``, so a re-run on
+the same day does not mail them again.
+"""
+
+import asyncio
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import and_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Admin, Parent, Student, Teacher
+from app.models.notification_models import Notification, NotificationPreference
+from app.services.email_service import EmailService, email_service
+
+logger = logging.getLogger(__name__)
+
+USER_MODELS = {
+    "student": (Student, Student.student_id),
+    "teacher": (Teacher, Teacher.teacher_id),
+    "admin": (Admin, Admin.admin_id),
+    "parent": (Parent, Parent.parent_id),
+}
+
+
+def _digest_query(db: Session, since: datetime, frequency: str):
+    """Unread, not yet emailed notifications of types the recipient wants as a digest"""
+    return db.query(Notification).join(
+        NotificationPreference, and_(
+            NotificationPreference.user_id == Notification.user_id,
+            NotificationPreference.user_type == Notification.user_type,
+            NotificationPreference.notification_type == Notification.notification_type
+        )
+    ).filter(
+        NotificationPreference.digest_mode == True,  # noqa: E712
+        NotificationPreference.digest_frequency == frequency,
+        Notification.is_read == False,  # noqa: E712
+        Notification.is_deleted == False,  # noqa: E712
+        Notification.email_sent == False,  # noqa: E712
+        Notification.created_at >= since
+    )
+
+
+def digest_recipients(db: Session, since: datetime, frequency: str = "daily") -> List[List[Any]]:
+    """``[user_id, user_type]`` pairs with something to put in a digest (JSON-friendly for Celery)"""
+    rows = _digest_query(db, since, frequency).with_entities(
+        Notification.user_id, Notification.user_type
+    ).distinct().order_by(Notification.user_type, Notification.user_id)
+    return [[user_id, user_type] for user_id, user_type in rows]
+
+
+async def send_digest_chunk(
+    db: Session,
+    users: Sequence[Sequence[Any]],
+    since: datetime,
+    frequency: str = "daily",
+    service: Optional[EmailService] = None,
+) -> Dict[str, int]:
+    """Send the digest of every ``[user_id, user_type]`` in the chunk"""
+    service = service or email_service
+    counts = {"sent": 0, "failed": 0, "skipped": 0}
+
+    by_type: Dict[str, set] = defaultdict(set)
+    for user_id, user_type in users:
+        by_type[user_type].add(user_id)
+
+    sends = []
+    included: List[List[int]] = []
+    for user_type, user_ids in by_type.items():
+        if user_type not in USER_MODELS:
+            counts["skipped"] += len(user_ids)
+            continue
+
+        model, pk = USER_MODELS[user_type]
+        people = {
+            user_id: (name, email)
+            for user_id, name, email in db.query(pk, model.name, model.email).filter(
+                pk.in_(user_ids),
+                model.is_active == True  # noqa: E712
+            )
+        }
+
+        pending: Dict[int, List[Notification]] = defaultdict(list)
+        for notification in _digest_query(db, since, frequency).filter(
+            Notification.user_type == user_type,
+            Notification.user_id.in_(user_ids)
+        ).order_by(Notification.created_at):
+            pending[notification.user_id].append(notification)
+
+        recipients = [user_id for user_id in sorted(user_ids) if user_id in people and pending[user_id]]
+        counts["skipped"] += len(user_ids) - len(recipients)
+
+        contexts = [
+            {
+                "name": people[user_id][0],
+                "count": len(pending[user_id]),
+                "since": since.strftime("%B %d, %Y"),
+                "dashboard_url": settings.notification_digest_url,
+                "notifications": [
+                    {
+                        "title": n.title,
+                        "message": n.message,
+                        "created_at": n.created_at.strftime("%b %d, %H:%M") if n.created_at else "",
+                    }
+                    for n in pending[user_id]
+                ],
+            }
+            for user_id in recipients
+        ]
+        for user_id, (subject, html) in zip(recipients, service.render_notification_digests(contexts)):
+            sends.append(service._send_email(people[user_id][1], subject, html, email_type="digest"))
+            included.append([n.notification_id for n in pending[user_id]])
+
+    results = await asyncio.gather(*sends, return_exceptions=True)
+
+    now = datetime.utcnow()
+    sent_ids: List[int] = []
+    for notification_ids, result in zip(included, results):
+        if result is True:
+            counts["sent"] += 1
+            sent_ids.extend(notification_ids)
+        else:
+            counts["failed"] += 1
+
+    if sent_ids:
+        db.query(Notification).filter(Notification.notification_id.in_(sent_ids)).update({
+            Notification.email_sent: True,
+            Notification.email_sent_at: now,
+        }, synchronize_session=False)
+    db.commit()
+    return counts
@@ -16,6 +16,10 @@ from app.models.notification_models import (
     NotificationPriority,
     NotificationChannel
 )
+from app.core.config import settings
+
+# Sentinel: preferences not loaded by the caller
+_LOOKUP = object()
 
 
 class NotificationService:
@@ -105,22 +109,52 @@ class NotificationService:
         notification_type: NotificationType,
         title: str,
         message: str,
+        priority: NotificationPriority = NotificationPriority.MEDIUM,
+        expires_in_days: Optional[int] = None,
         **kwargs
     ) -> List[Notification]:
-        """Send notification to multiple users"""
+        """
+        Send notification to multiple users
+
+        All notifications are inserted with one flush, preferences are loaded
+        with one query and the whole batch is committed once.
+        """
         
-        notifications = []
-        for user in users:
-            notification = self.create_notification(
+        if not users:
+            return []
+        
+        expires_at = datetime.utcnow() + timedelta(days=expires_in_days) if expires_in_days else None
+        notifications = [
+            Notification(
                 user_id=user['user_id'],
                 user_type=user['user_type'],
                 notification_type=notification_type,
                 title=title,
                 message=message,
+                priority=priority,
+                expires_at=expires_at,
                 **kwargs
             )
-            notifications.append(notification)
+            for user in users
+        ]
+        self.db.add_all(notifications)
+        self.db.flush()
+        
+        preferences = {
+            (p.user_id, p.user_type): p
+            for p in self.db.query(NotificationPreference).filter(
+                NotificationPreference.notification_type == notification_type,
+                NotificationPreference.user_id.in_({user['user_id'] for user in users})
+            )
+        }
+        for notification in notifications:
+            self._deliver_notification(
+                notification,
+                preferences.get((notification.user_id, notification.user_type)),
+                commit=False
+            )
         
+        self.db.commit()
         return notifications
     
     def notify_course_students(
@@ -131,20 +165,32 @@ class NotificationService:
         message: str,
         **kwargs
     ) -> List[Notification]:
-        """Notify all students enrolled in a course"""
+        """
+        Notify all students enrolled in a course
+
+        Audiences larger than ``bulk_notification_inline_limit`` are handed to
+        Celery in chunks and an empty list is returned.
+        """
         
         from app.models.models import Enrollment
         
-        enrollments = self.db.query(Enrollment).filter(
+        student_ids = self.db.query(Enrollment.student_id).filter(
             Enrollment.course_id == course_id,
             Enrollment.status == "active"
         ).all()
         
         users = [
-            {'user_id': e.student_id, 'user_type': 'student'}
-            for e in enrollments
+            {'user_id': student_id, 'user_type': 'student'}
+            for student_id, in student_ids
         ]
         
+        if len(users) > settings.bulk_notification_inline_limit:
+            from app.services.celery_app import queue_bulk_notification
+            queue_bulk_notification(
+                users, notification_type, title, message, related_course_id=course_id, **kwargs
+            )
+            return []
+        
         return self.bulk_notify(
             users=users,
             notification_type=notification_type,
@@ -300,15 +346,21 @@ class NotificationService:
         self.db.refresh(preference)
         return preference
     
-    def _deliver_notification(self, notification: Notification):
+    def _deliver_notification(
+        self,
+        notification: Notification,
+        preferences: Any = _LOOKUP,
+        commit: bool = True
+    ):
         """Deliver notification via configured channels"""
         
-        # Get user preferences
-        preferences = self.db.query(NotificationPreference).filter(
-            NotificationPreference.user_id == notification.user_id,
-            NotificationPreference.user_type == notification.user_type,
-            NotificationPreference.notification_type == notification.notification_type
-        ).first()
+        # Get user preferences, unless the caller already loaded them
+        if preferences is _LOOKUP:
+            preferences = self.db.query(NotificationPreference).filter(
+                NotificationPreference.user_id == notification.user_id,
+                NotificationPreference.user_type == notification.user_type,
+                NotificationPreference.notification_type == notification.notification_type
+            ).first()
         
         channels = []
         
@@ -319,25 +371,26 @@ class NotificationService:
         if preferences:
             if getattr(preferences, 'email_enabled', False):
                 channels.append(NotificationChannel.EMAIL)
-                self._send_email_notification(notification)
+                self._send_email_notification(notification, commit)
             
             if getattr(preferences, 'sms_enabled', False):
                 channels.append(NotificationChannel.SMS)
-                self._send_sms_notification(notification)
+                self._send_sms_notification(notification, commit)
             
             if getattr(preferences, 'push_enabled', False):
                 channels.append(NotificationChannel.PUSH)
-                self._send_push_notification(notification)
+                self._send_push_notification(notification, commit)
         else:
             # Default: send email for high priority
             if notification.priority in [NotificationPriority.HIGH, NotificationPriority.URGENT]:
                 channels.append(NotificationChannel.EMAIL)
-                self._send_email_notification(notification)
+                self._send_email_notification(notification, commit)
         
         setattr(notification, 'sent_via', ','.join([c.value for c in channels]))
-        self.db.commit()
+        if commit:
+            self.db.commit()
     
-    def _send_email_notification(self, notification: Notification):
+    def _send_email_notification(self, notification: Notification, commit: bool = True):
         """Send email notification (placeholder for actual implementation)"""
         # TODO: Implement with FastAPI-Mail or similar
         log = NotificationLog(
@@ -349,9 +402,10 @@ class NotificationService:
         self.db.add(log)
         setattr(notification, 'email_sent', True)
         setattr(notification, 'email_sent_at', datetime.utcnow())
-        self.db.commit()
+        if commit:
+            self.db.commit()
     
-    def _send_sms_notification(self, notification: Notification):
+    def _send_sms_notification(self, notification: Notification, commit: bool = True):
         """Send SMS notification (placeholder for actual implementation)"""
         # TODO: Implement with Twilio or similar
         log = NotificationLog(
@@ -363,9 +417,10 @@ class NotificationService:
         self.db.add(log)
         setattr(notification, 'sms_sent', True)
         setattr(notification, 'sms_sent_at', datetime.utcnow())
-        self.db.commit()
+        if commit:
+            self.db.commit()
     
-    def _send_push_notification(self, notification: Notification):
+    def _send_push_notification(self, notification: Notification, commit: bool = True):
         """Send push notification (placeholder for actual implementation)"""
         # TODO: Implement with Firebase Cloud Messaging or similar
         log = NotificationLog(
@@ -375,7 +430,8 @@ class NotificationService:
             attempted_at=datetime.utcnow()
         )
         self.db.add(log)
-        self.db.commit()
+        if commit:
+            self.db.commit()
 
 
 # Helper functions for common notification scenarios
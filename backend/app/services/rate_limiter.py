@@ -0,0 +1,200 @@
+"""
+Rate Limiter - Token bucket shared by every worker sending through one SMTP provider
+
+SMTP providers throttle senders and answer with 4xx errors once a sender goes
+over its allowance. Each send reserves tokens from a bucket that refills at
+the provider's sustained rate. When the bucket is empty the reservation puts
+it in debt and the caller sleeps until its tokens have been refilled. Callers
+queue up behind each other instead of failing, and throughput stays at the
+provider ceiling.
+
+Each provider's allowance is split into two lanes with their own buckets:
+``interactive`` (mail a user is waiting for, such as password resets) gets
+``smtp_interactive_rate_share`` of the rate and burst, ``bulk`` gets the rest.
+A monthly report run can put the bulk bucket far into debt without delaying
+a reset. Callers in a request path pass ``max_wait``: if the wait would be
+longer, nothing is reserved and RateLimitExceeded is raised, so the caller can
+leave the email queued instead of sleeping.
+
+The bucket lives in Redis (updated atomically by a Lua script using the Redis
+clock), so all Celery workers draw from the same allowance. If Redis is
+unreachable, each process falls back to a local bucket with its share of the
+rate (``rate / local_share``).
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from app.core.config import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "ratelimit:smtp:"
+
+# Sustained recipients per second and burst size for common providers
+PROVIDER_LIMITS: Dict[str, Tuple[float, int]] = {
+    "smtp.gmail.com": (1.0, 20),
+    "smtp.office365.com": (0.5, 30),
+    "smtp-mail.outlook.com": (0.5, 30),
+    "smtp.sendgrid.net": (100.0, 200),
+    "smtp.mailgun.org": (50.0, 100),
+}
+DEFAULT_LIMIT: Tuple[float, int] = (5.0, 20)
+
+INTERACTIVE = "interactive"
+BULK = "bulk"
+
+# Reserve tokens; returns the seconds the caller must wait (as a string, Lua truncates numbers).
+# With a max_wait (ARGV[4] >= 0) that would be exceeded, nothing is reserved and the wait is returned negated.
+_RESERVE_SCRIPT = """
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local requested = tonumber(ARGV[3])
+local max_wait = tonumber(ARGV[4])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) + tonumber(t[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+local tokens = tonumber(state[1]) or capacity
+local ts = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate) - requested
+if max_wait >= 0 and tokens < 0 and -tokens / rate > max_wait then
+    return tostring(tokens / rate)
+end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RateLimitExceeded(Exception):
+    """Sending now would mean waiting longer than the caller allows"""
+
+    def __init__(self, wait_seconds: float):
+        super().__init__(f"SMTP rate limit: next slot in {wait_seconds:.1f}s")
+        self.wait_seconds = wait_seconds
+
+
+@dataclass
+class RateLimiterStats:
+    """Counters describing how often senders had to wait"""
+    acquired: int = 0
+    waited: int = 0
+    wait_seconds: float = 0.0
+    refused: int = 0  # Over max_wait, left for later
+
+
+class TokenBucketRateLimiter:
+    """Token bucket with a shared Redis backend and a per-process fallback"""
+
+    def __init__(
+        self,
+        name: str,
+        rate: float,
+        capacity: int,
+        redis_url: Optional[str] = None,
+        local_share: int = 1,
+    ):
+        if rate <= 0 or capacity <= 0:
+            raise ValueError("rate and capacity must be positive")
+
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.local_rate = rate / max(local_share, 1)
+        self.stats = RateLimiterStats()
+
+        self._redis = None
+        self._script = None
+        self._redis_retry_at = 0.0
+        if redis_url and REDIS_AVAILABLE:
+            self._redis = redis.Redis.from_url(
+                redis_url, socket_connect_timeout=0.5, socket_timeout=0.5
+            )
+            self._script = self._redis.register_script(_RESERVE_SCRIPT)
+
+        self._lock = threading.Lock()
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic()
+
+    def _reserve_local(self, tokens: int, max_wait: Optional[float]) -> float:
+        with self._lock:
+            now = time.monotonic()
+            remaining = min(
+                self.capacity, self._tokens + (now - self._updated_at) * self.local_rate
+            ) - tokens
+            if max_wait is not None and remaining < 0 and -remaining / self.local_rate > max_wait:
+                return remaining / self.local_rate
+            self._tokens = remaining
+            self._updated_at = now
+            return -self._tokens / self.local_rate if self._tokens < 0 else 0.0
+
+    def reserve(self, tokens: int = 1, max_wait: Optional[float] = None) -> float:
+        """
+        Take ``tokens`` from the bucket and return how long to wait before using them.
+        Raises RateLimitExceeded, taking nothing, if that would be longer than ``max_wait``.
+        """
+        delay = None
+        if self._script is not None and time.monotonic() >= self._redis_retry_at:
+            try:
+                delay = float(self._script(
+                    keys=[KEY_PREFIX + self.name],
+                    args=[self.rate, self.capacity, tokens, -1 if max_wait is None else max_wait],
+                ))
+            except Exception as exc:
+                logger.warning(f"SMTP rate limiter falling back to local bucket: {exc}")
+                self._redis_retry_at = time.monotonic() + 30
+
+        if delay is None:
+            delay = self._reserve_local(tokens, max_wait)
+        if delay < 0:
+            self.stats.refused += 1
+            raise RateLimitExceeded(-delay)
+        return delay
+
+    async def acquire(self, tokens: int = 1, max_wait: Optional[float] = None) -> float:
+        """
+        Wait until ``tokens`` are available; returns the seconds waited.
+        Raises RateLimitExceeded instead of waiting longer than ``max_wait``.
+        """
+        delay = self.reserve(tokens, max_wait)
+        self.stats.acquired += 1
+        if delay > 0:
+            self.stats.waited += 1
+            self.stats.wait_seconds += delay
+            await asyncio.sleep(delay)
+        return delay
+
+
+def smtp_rate_limiter(hostname: str, lane: str = BULK) -> TokenBucketRateLimiter:
+    """Build the shared limiter for one lane of an SMTP server, honouring env overrides"""
+    rate, capacity = PROVIDER_LIMITS.get(hostname.lower(), DEFAULT_LIMIT)
+    rate = settings.smtp_rate_per_second or rate
+    capacity = settings.smtp_rate_burst or capacity
+
+    share = min(max(settings.smtp_interactive_rate_share, 0.01), 0.99)
+    interactive_capacity = max(1, round(capacity * share))
+    if lane == INTERACTIVE:
+        rate, capacity = rate * share, interactive_capacity
+    else:
+        rate, capacity = rate * (1 - share), max(1, capacity - interactive_capacity)
+
+    return TokenBucketRateLimiter(
+        name=f"{hostname.lower()}:{lane}",
+        rate=rate,
+        capacity=capacity,
+        redis_url=settings.redis_url,
+        local_share=settings.smtp_rate_local_share,
+    )
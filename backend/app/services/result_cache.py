@@ -0,0 +1,142 @@
+"""
+Result Cache - TTL cache with stale-while-revalidate and single-flight
+
+Built for expensive, read-only aggregations such as the admin analytics
+endpoints. Results are cached per key (endpoint plus parameters):
+
+- fresh (younger than ``ttl_seconds``): served from the cache
+- stale (within a further ``stale_seconds``): served from the cache right
+  away while one background computation refreshes the entry
+- missing or older: computed, and the caller waits
+
+Concurrent requests for a key that is being computed wait for that one
+computation instead of starting their own (single-flight). Computations run
+in a worker thread with their own database session, so they do not block the
+event loop and a background refresh can outlive the request that started it.
+
+The cache is per process; with several API workers each keeps its own copy.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    value: Any
+    computed_at: float
+
+
+@dataclass
+class ResultCacheStats:
+    """How requests were served"""
+    hits: int = 0
+    stale_hits: int = 0
+    misses: int = 0
+    coalesced: int = 0
+    refreshes: int = 0
+    errors: int = 0
+
+
+class ResultCache:
+    """Per-process cache of computed results keyed by endpoint and parameters"""
+
+    def __init__(
+        self,
+        ttl_seconds: Optional[float] = None,
+        stale_seconds: Optional[float] = None,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_entries: int = 128,
+    ):
+        self.ttl_seconds = settings.analytics_cache_ttl_seconds if ttl_seconds is None else ttl_seconds
+        self.stale_seconds = settings.analytics_cache_stale_seconds if stale_seconds is None else stale_seconds
+        self.session_factory = session_factory
+        self.max_entries = max_entries
+        self.stats = ResultCacheStats()
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._inflight: Dict[Hashable, "asyncio.Task[Any]"] = {}
+
+    def _run(self, compute: Callable[[Session], Any]) -> Any:
+        db = self.session_factory()
+        try:
+            return compute(db)
+        finally:
+            db.close()
+
+    async def _compute(self, key: Hashable, compute: Callable[[Session], Any]) -> Any:
+        value = await asyncio.to_thread(self._run, compute)
+        self._entries[key] = _Entry(value=value, computed_at=time.monotonic())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return value
+
+    def _start(self, key: Hashable, compute: Callable[[Session], Any]) -> "asyncio.Task[Any]":
+        task = self._inflight.get(key)
+        if task is not None:
+            return task
+
+        task = asyncio.get_running_loop().create_task(self._compute(key, compute))
+        self._inflight[key] = task
+
+        def _done(finished: "asyncio.Task[Any]") -> None:
+            self._inflight.pop(key, None)
+            if not finished.cancelled() and finished.exception() is not None:
+                self.stats.errors += 1
+                logger.warning(f"Computing cached result {key!r} failed: {finished.exception()}")
+
+        task.add_done_callback(_done)
+        return task
+
+    async def get(self, key: Hashable, compute: Callable[[Session], Any]) -> Any:
+        """
+        Return the result for ``key``, calling ``compute(db)`` in a worker thread
+        when there is no usable cached value.
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry.computed_at
+            if age < self.ttl_seconds:
+                self.stats.hits += 1
+                return entry.value
+            if age < self.ttl_seconds + self.stale_seconds:
+                self.stats.stale_hits += 1
+                if key not in self._inflight:
+                    self.stats.refreshes += 1
+                    self._start(key, compute)
+                return entry.value
+
+        if key in self._inflight:
+            self.stats.coalesced += 1
+        else:
+            self.stats.misses += 1
+        # Shielded: a client disconnecting does not cancel the shared computation
+        return await asyncio.shield(self._start(key, compute))
+
+    def entries(self) -> List[Hashable]:
+        """Keys currently cached, least recently computed first"""
+        return list(self._entries)
+
+    def invalidate(self, prefix: Optional[Hashable] = None) -> None:
+        """Drop every entry, or those whose key (or its first element) equals ``prefix``"""
+        if prefix is None:
+            self._entries.clear()
+            return
+        for key in list(self._entries):
+            if key == prefix or (isinstance(key, tuple) and key and key[0] == prefix):
+                del self._entries[key]
+
+
+# Global cache for the admin analytics endpoints
+analytics_cache = ResultCache()
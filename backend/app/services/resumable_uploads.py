@@ -0,0 +1,429 @@
+"""
+Resumable Uploads - tus uploads for lesson videos and large materials
+
+Multipart uploads are capped at ``max_file_size`` and start over when the
+connection drops, which kept lesson videos on external Google Drive links.
+Resumable uploads follow the tus 1.0 protocol (core, plus the creation,
+expiration, checksum and termination extensions):
+
+1. POST declares the total size (``Upload-Length``) and metadata;
+   ``create_upload`` records the upload in ``resumable_uploads`` and creates
+   an empty data file for it in ``resumable_upload_dir``
+2. Each PATCH sends the next chunk at ``Upload-Offset``, optionally with an
+   ``Upload-Checksum``. ``write_chunk`` streams it into the data file from a
+   worker thread, verifies the checksum and fsyncs before the stored offset
+   moves. A chunk failing its checksum is discarded; a chunk cut off by a
+   dropped connection is kept up to the last byte received (unless it had a
+   checksum, which can no longer be verified)
+3. After a failure the client asks for the offset with HEAD and goes on from
+   there
+4. Once every byte is in, ``assemble_upload`` hands the data file to the
+   storage backend like any spooled upload, and the endpoint records the
+   Material or the lesson video
+
+Memory per request is bounded by ``CHUNK_SIZE``. A PATCH holds an exclusive
+``flock`` on the data file, so two requests for the same upload never
+interleave, whichever worker process they reach. Uploads left alone for
+``resumable_upload_expire_hours`` are removed by ``cleanup_expired_uploads``.
+"""
+
+import asyncio
+import base64
+import binascii
+import fcntl
+import hashlib
+import hmac
+import json
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.upload_models import ResumableUpload
+from app.services.uploads import CHUNK_SIZE, SpooledUpload, StoredFile, UploadTooLarge, store_spooled
+
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,expiration,checksum,termination"
+CHECKSUM_ALGORITHMS: Dict[str, Callable[[], Any]] = {
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+}
+UPLOAD_PATH = "/api/v1/resumable-uploads"
+OFFSET_CONTENT_TYPE = "application/offset+octet-stream"
+PURPOSES = ("material", "lesson_video")
+
+
+class InvalidUploadRequest(Exception):
+    """Malformed tus headers or metadata"""
+
+
+class UploadNotFound(Exception):
+    """No such upload for this user, or it has expired"""
+
+
+class UploadLocked(Exception):
+    """Another request is writing to the upload"""
+
+
+class OffsetMismatch(Exception):
+    """The chunk does not start where the upload left off"""
+
+    def __init__(self, offset: int):
+        super().__init__(f"Upload is at offset {offset}")
+        self.offset = offset
+
+
+class ChecksumMismatch(Exception):
+    """The chunk does not match its Upload-Checksum"""
+
+
+# ==================== Headers ====================
+
+def parse_metadata(header: Optional[str]) -> Dict[str, str]:
+    """Decode ``Upload-Metadata``: comma separated ``key base64(value)`` pairs"""
+    metadata: Dict[str, str] = {}
+    for pair in (header or "").split(","):
+        key, _, value = pair.strip().partition(" ")
+        if not key:
+            continue
+        try:
+            metadata[key] = base64.b64decode(value.strip(), validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise InvalidUploadRequest(f"Invalid Upload-Metadata value for {key}")
+    return metadata
+
+
+def encode_metadata(metadata: Dict[str, str]) -> str:
+    """The ``Upload-Metadata`` header for ``metadata``"""
+    return ",".join(f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in metadata.items())
+
+
+def parse_checksum(header: Optional[str]) -> Optional[Tuple[str, bytes]]:
+    """Decode ``Upload-Checksum`` (``<algorithm> <base64 digest>``) into (algorithm, digest)"""
+    if not header:
+        return None
+    algorithm, _, value = header.strip().partition(" ")
+    if algorithm not in CHECKSUM_ALGORITHMS:
+        raise InvalidUploadRequest(f"Unsupported checksum algorithm: {algorithm}")
+    try:
+        return algorithm, base64.b64decode(value.strip(), validate=True)
+    except binascii.Error:
+        raise InvalidUploadRequest("Invalid Upload-Checksum value")
+
+
+def http_date(value: datetime) -> str:
+    return format_datetime(value.replace(tzinfo=timezone.utc), usegmt=True)
+
+
+def discovery_headers() -> Dict[str, str]:
+    """What the server supports (OPTIONS)"""
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Tus-Version": TUS_VERSION,
+        "Tus-Extension": TUS_EXTENSIONS,
+        "Tus-Max-Size": str(settings.resumable_upload_max_size),
+        "Tus-Checksum-Algorithm": ",".join(CHECKSUM_ALGORITHMS),
+    }
+
+
+def upload_headers(upload: ResumableUpload) -> Dict[str, str]:
+    """Where an upload stands (creation, HEAD and PATCH responses)"""
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload.upload_offset),
+        "Upload-Length": str(upload.upload_length),
+        "Upload-Expires": http_date(upload.expires_at),
+        "Cache-Control": "no-store",
+    }
+
+
+# ==================== Uploads ====================
+
+def data_path(upload_id: str) -> str:
+    return os.path.join(settings.resumable_upload_dir, upload_id)
+
+
+def _remove_data(upload_id: str) -> None:
+    try:
+        os.remove(data_path(upload_id))
+    except FileNotFoundError:
+        pass
+
+
+def _expiry(now: datetime) -> datetime:
+    return now + timedelta(hours=settings.resumable_upload_expire_hours)
+
+
+def create_upload(db: Session, purpose: str, target_id: int, owner: str, filename: str, length: int,
+                  metadata: Optional[Dict[str, Any]] = None) -> ResumableUpload:
+    """Record a new upload of ``length`` bytes and create its empty data file"""
+    if purpose not in PURPOSES:
+        raise InvalidUploadRequest(f"Unknown upload purpose: {purpose}")
+    if length < 0:
+        raise InvalidUploadRequest("Upload-Length must not be negative")
+    if length > settings.resumable_upload_max_size:
+        raise UploadTooLarge(settings.resumable_upload_max_size)
+
+    now = datetime.utcnow()
+    upload = ResumableUpload(
+        upload_id=uuid.uuid4().hex,
+        purpose=purpose,
+        target_id=target_id,
+        owner=owner,
+        filename=filename[:255],
+        upload_length=length,
+        upload_offset=0,
+        upload_metadata=json.dumps(metadata or {}),
+        status="uploading",
+        created_at=now,
+        updated_at=now,
+        expires_at=_expiry(now),
+    )
+    os.makedirs(settings.resumable_upload_dir, exist_ok=True)
+    open(data_path(upload.upload_id), "xb").close()
+    db.add(upload)
+    db.commit()
+    db.refresh(upload)
+    return upload
+
+
+def get_upload(db: Session, upload_id: str, owner: str) -> ResumableUpload:
+    """``owner``'s upload; raises UploadNotFound for anyone else's or an expired one"""
+    upload = db.query(ResumableUpload).filter(
+        ResumableUpload.upload_id == upload_id,
+        ResumableUpload.owner == owner
+    ).first()
+    if upload is None or (upload.status != "completed" and upload.expires_at < datetime.utcnow()):
+        raise UploadNotFound(upload_id)
+    return upload
+
+
+def upload_metadata(upload: ResumableUpload) -> Dict[str, Any]:
+    return json.loads(upload.upload_metadata or "{}")
+
+
+def is_complete(upload: ResumableUpload) -> bool:
+    return upload.upload_offset == upload.upload_length
+
+
+class _DataFile:
+    """An upload's data file, exclusively locked while it is open"""
+
+    def __init__(self, path: str):
+        self.target = open(path, "r+b")
+        try:
+            fcntl.flock(self.target.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self.target.close()
+            raise UploadLocked(path)
+        self.offset = 0
+        self.max_bytes = 0
+        self.limit = 0
+        self.size = 0
+        self.digest: Any = None
+
+    def begin(self, offset: int, length: int, algorithm: Optional[str]) -> None:
+        # Anything past the offset was never acknowledged (a request that died before committing)
+        self.target.truncate(offset)
+        self.target.seek(offset)
+        self.offset = offset
+        self.max_bytes = length - offset
+        self.limit = length
+        self.digest = CHECKSUM_ALGORITHMS[algorithm]() if algorithm else None
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.limit)
+        if self.digest is not None:
+            self.digest.update(chunk)
+        self.target.write(chunk)
+
+    def matches(self, expected: bytes) -> bool:
+        return hmac.compare_digest(self.digest.digest(), expected)
+
+    def commit(self) -> None:
+        """Make the chunk durable before the offset moves past it"""
+        self.target.flush()
+        os.fsync(self.target.fileno())
+
+    def rollback(self) -> None:
+        self.target.truncate(self.offset)
+        self.size = 0
+
+    def close(self) -> None:
+        self.target.close()
+
+
+async def _receive(data: _DataFile, chunks: AsyncIterator[bytes]) -> None:
+    buffered: List[bytes] = []
+    pending = 0
+    try:
+        async for chunk in chunks:
+            buffered.append(chunk)
+            pending += len(chunk)
+            if data.size + pending > data.max_bytes:
+                raise UploadTooLarge(data.limit)
+            if pending >= CHUNK_SIZE:
+                await asyncio.to_thread(data.write, b"".join(buffered))
+                buffered, pending = [], 0
+    except UploadTooLarge:
+        raise
+    except Exception:
+        # The connection dropped: keep what did arrive
+        if buffered:
+            await asyncio.to_thread(data.write, b"".join(buffered))
+        raise
+    if buffered:
+        await asyncio.to_thread(data.write, b"".join(buffered))
+
+
+def _advance(db: Session, upload: ResumableUpload, offset: int, size: int) -> None:
+    now = datetime.utcnow()
+    moved = db.query(ResumableUpload).filter(
+        ResumableUpload.upload_id == upload.upload_id,
+        ResumableUpload.upload_offset == offset,
+        ResumableUpload.status == "uploading"
+    ).update(
+        {"upload_offset": offset + size, "updated_at": now, "expires_at": _expiry(now)},
+        synchronize_session=False
+    )
+    db.commit()
+    db.refresh(upload)
+    if not moved:
+        raise OffsetMismatch(upload.upload_offset)
+
+
+async def write_chunk(db: Session, upload: ResumableUpload, offset: int, chunks: AsyncIterator[bytes],
+                      checksum: Optional[Tuple[str, bytes]] = None) -> ResumableUpload:
+    """
+    Write the request body ``chunks`` at ``offset``, which must be where the
+    upload stands, and move the offset past it. Raises UploadLocked,
+    OffsetMismatch, UploadTooLarge or ChecksumMismatch (the chunk is then
+    discarded). The upload is refreshed in place.
+    """
+    try:
+        data = await asyncio.to_thread(_DataFile, data_path(upload.upload_id))
+    except FileNotFoundError:
+        db.refresh(upload)  # Assembled in the meantime, the file went to storage
+        raise OffsetMismatch(upload.upload_offset)
+    try:
+        db.refresh(upload)  # Another request may have moved it on before the lock was taken
+        if upload.status != "uploading" or offset != upload.upload_offset:
+            raise OffsetMismatch(upload.upload_offset)
+        await asyncio.to_thread(data.begin, offset, upload.upload_length, checksum[0] if checksum else None)
+
+        try:
+            await _receive(data, chunks)
+        except UploadTooLarge:
+            await asyncio.to_thread(data.rollback)
+            raise
+        except Exception:
+            if checksum is not None or data.size == 0:
+                await asyncio.to_thread(data.rollback)
+                raise
+            await asyncio.to_thread(data.commit)
+            _advance(db, upload, offset, data.size)
+            logger.info(f"Resumable upload {upload.upload_id} interrupted at offset {upload.upload_offset}")
+            raise
+
+        if checksum is not None and not data.matches(checksum[1]):
+            await asyncio.to_thread(data.rollback)
+            raise ChecksumMismatch(f"Chunk does not match its {checksum[0]} checksum")
+        await asyncio.to_thread(data.commit)
+        _advance(db, upload, offset, data.size)
+        return upload
+    finally:
+        await asyncio.to_thread(data.close)
+
+
+def terminate_upload(db: Session, upload: ResumableUpload) -> None:
+    """Delete an upload and the bytes received so far (raises UploadLocked while a chunk is being written)"""
+    try:
+        data: Optional[_DataFile] = _DataFile(data_path(upload.upload_id))
+    except FileNotFoundError:
+        data = None  # Completed, the file went to storage
+    try:
+        db.delete(upload)
+        db.commit()
+        _remove_data(upload.upload_id)
+    finally:
+        if data is not None:
+            data.close()
+
+
+# ==================== Assembly ====================
+
+def _spooled(upload: ResumableUpload) -> SpooledUpload:
+    path = data_path(upload.upload_id)
+    digest = hashlib.sha256()
+    with open(path, "rb") as source:
+        for block in iter(lambda: source.read(CHUNK_SIZE), b""):
+            digest.update(block)
+    return SpooledUpload(path=path, filename=upload.filename, extension=os.path.splitext(upload.filename)[1],
+                         size=upload.upload_length, sha256=digest.hexdigest())
+
+
+def _set_status(db: Session, upload: ResumableUpload, status: str) -> None:
+    upload.status = status
+    upload.updated_at = datetime.utcnow()
+    db.commit()
+
+
+async def assemble_upload(db: Session, upload: ResumableUpload, folder: str, local_folder: str,
+                          resource_type: str = "auto") -> Optional[StoredFile]:
+    """
+    Put a fully received upload in the storage backend (Cloudinary ``folder``
+    or ``upload_dir/local_folder``). Returns None if another request got to
+    it first. If storage fails the upload can be assembled again, by
+    repeating the final PATCH with an empty body.
+    """
+    claimed = db.query(ResumableUpload).filter(
+        ResumableUpload.upload_id == upload.upload_id,
+        ResumableUpload.status == "uploading",
+        ResumableUpload.upload_offset == ResumableUpload.upload_length
+    ).update({"status": "assembling", "updated_at": datetime.utcnow()}, synchronize_session=False)
+    db.commit()
+    db.refresh(upload)
+    if not claimed:
+        return None
+
+    try:
+        spooled = await asyncio.to_thread(_spooled, upload)
+        stored = await asyncio.to_thread(store_spooled, spooled, folder, local_folder, resource_type)
+    except Exception:
+        _set_status(db, upload, "uploading")
+        raise
+    logger.info(f"Resumable upload {upload.upload_id} stored - {upload.filename}, {stored.size} bytes, "
+                f"SHA-256: {stored.sha256}, URL: {stored.url}")
+    return stored
+
+
+def finish_upload(db: Session, upload: ResumableUpload, result_id: int, result_url: str) -> None:
+    """Mark an assembled upload completed; its status stays readable until it expires"""
+    now = datetime.utcnow()
+    upload.status = "completed"
+    upload.result_id = result_id
+    upload.result_url = result_url
+    upload.updated_at = now
+    upload.expires_at = _expiry(now)
+    db.commit()
+    _remove_data(upload.upload_id)  # Still there when Cloudinary has a copy
+
+
+def cleanup_expired_uploads(db: Session, now: Optional[datetime] = None) -> int:
+    """Delete uploads past their expiry and their data files"""
+    expired = db.query(ResumableUpload).filter(ResumableUpload.expires_at < (now or datetime.utcnow())).all()
+    for upload in expired:
+        _remove_data(upload.upload_id)
+        db.delete(upload)
+    db.commit()
+    return len(expired)
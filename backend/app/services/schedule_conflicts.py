@@ -0,0 +1,318 @@
+"""
+Schedule Conflicts - Overlapping courses in a student's or teacher's schedule
+
+Two courses conflict when their [start_time, end_time) intervals overlap.
+Finding the conflicts of one interval does not scan the person's courses:
+
+- PostgreSQL: ``tsrange && tsrange`` against a GiST expression index over
+  ``SCHEDULE_RANGE_SQL``, joined to the person's enrollments or assignments
+- other databases (SQLite in tests and local development): an in-process
+  centered interval tree over every course answers the overlap query in
+  O(log n + k). Only the k candidates are then checked against the person's
+  enrollments or assignments. The tree is caught up from
+  ``updated_at``/``created_at`` and rebuilt every
+  ``schedule_index_rebuild_seconds``.
+
+An exclusion constraint cannot express this rule, because a conflict is
+between two rows of the courses table joined through a student's enrollments
+(or a teacher's assignments). The check runs when a student enrolls and when
+a course is created or updated with ``teacher_ids``. ``check_schedule``
+checks a whole selection of courses at once.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import func, literal_column
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models.models import Course, Enrollment, teacher_course_association
+
+logger = logging.getLogger(__name__)
+
+# Must match the expression of ix_courses_schedule (PostgreSQL), or the index is not used
+SCHEDULE_RANGE_SQL = "tsrange({table}start_time, greatest({table}start_time, {table}end_time))"
+# Rows written by other processes can commit slightly after their timestamp
+CATCH_UP_MARGIN = timedelta(seconds=5)
+
+Interval = Tuple[datetime, datetime, int]  # start, end, course_id
+
+
+def _naive_utc(value: datetime) -> datetime:
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def overlapping_pairs(intervals: Iterable[Interval]) -> List[Tuple[int, int]]:
+    """
+    Every pair of overlapping intervals in a small list, by a sweep over start
+    times. Intervals are half-open: a course ending at 10:00 does not conflict
+    with one starting at 10:00.
+    """
+    pairs: List[Tuple[int, int]] = []
+    active: List[Interval] = []
+    for start, end, key in sorted(intervals):
+        active = [item for item in active if item[1] > start]
+        pairs.extend((item[2], key) for item in active if start < end)
+        if start < end:
+            active.append((start, end, key))
+    return pairs
+
+
+# ==================== Interval Tree ====================
+
+class _Node:
+    __slots__ = ("center", "by_start", "by_end", "left", "right")
+
+    def __init__(self, center: datetime, members: List[Interval]):
+        self.center = center
+        self.by_start = sorted(members, key=lambda item: item[0])
+        self.by_end = sorted(members, key=lambda item: item[1], reverse=True)
+        self.left: Optional["_Node"] = None
+        self.right: Optional["_Node"] = None
+
+
+class IntervalTree:
+    """
+    Static centered interval tree. Each node keeps the intervals containing
+    its center, sorted by start and by end, so a query only descends into
+    subtrees that can overlap it and reads only matching intervals:
+    O(log n + k).
+    """
+
+    def __init__(self, intervals: Iterable[Interval] = ()):
+        # Empty intervals overlap nothing
+        intervals = [item for item in intervals if item[0] < item[1]]
+        self.size = len(intervals)
+        self.root = self._build(intervals)
+
+    def _build(self, intervals: List[Interval]) -> Optional[_Node]:
+        if not intervals:
+            return None
+        starts = sorted(item[0] for item in intervals)
+        # The interval starting at the median start contains it, so every node keeps at least one interval
+        center = starts[len(starts) // 2]
+        left, right, members = [], [], []
+        for item in intervals:
+            if item[1] <= center:
+                left.append(item)
+            elif item[0] > center:
+                right.append(item)
+            else:
+                members.append(item)
+        node = _Node(center, members)
+        node.left = self._build(left)
+        node.right = self._build(right)
+        return node
+
+    def overlapping(self, start: datetime, end: datetime) -> List[int]:
+        """Keys of the intervals overlapping [start, end)"""
+        found: List[int] = []
+        if start >= end:
+            return found
+        node = self.root
+        pending: List[_Node] = []
+        while node is not None or pending:
+            if node is None:
+                node = pending.pop()
+            if end <= node.center:
+                # Members end after the center, so they overlap iff they start before ``end``
+                for item in node.by_start:
+                    if item[0] >= end:
+                        break
+                    found.append(item[2])
+                node = node.left
+            elif start > node.center:
+                # Members start at or before the center, so they overlap iff they end after ``start``
+                for item in node.by_end:
+                    if item[1] <= start:
+                        break
+                    found.append(item[2])
+                node = node.right
+            else:
+                # The query contains the center, and so overlaps every member
+                found.extend(item[2] for item in node.by_start)
+                if node.right is not None:
+                    pending.append(node.right)
+                node = node.left
+        return found
+
+
+class ScheduleIndex:
+    """Interval tree over every course, for databases without range types"""
+
+    def __init__(self, rebuild_seconds: Optional[float] = None):
+        self.rebuild_seconds = (
+            settings.schedule_index_rebuild_seconds if rebuild_seconds is None else rebuild_seconds
+        )
+        self._intervals: Dict[int, Tuple[datetime, datetime]] = {}
+        self._tree: Optional[IntervalTree] = None
+        self._watermark: Optional[Any] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _apply(self, rows: Iterable[Any]) -> None:
+        for row in rows:
+            interval = (_naive_utc(row.start_time), _naive_utc(row.end_time))
+            if self._intervals.get(row.course_id) != interval:
+                self._intervals[row.course_id] = interval
+                self._tree = None
+            if row.changed_at is not None and (self._watermark is None or row.changed_at > self._watermark):
+                self._watermark = row.changed_at
+
+    def _columns(self, db: Session) -> Any:
+        changed_at = func.coalesce(Course.updated_at, Course.created_at)
+        return db.query(Course.course_id, Course.start_time, Course.end_time, changed_at.label("changed_at"))
+
+    def refresh(self, db: Session) -> None:
+        """Rebuild when due, otherwise apply courses changed since the last look"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.rebuild_seconds:
+                self._intervals.clear()
+                self._tree = None
+                self._watermark = None
+                self._apply(self._columns(db))
+                self._loaded_at = time.monotonic()
+            elif self._watermark is not None:
+                self._apply(self._columns(db).filter(
+                    func.coalesce(Course.updated_at, Course.created_at) >= self._watermark - CATCH_UP_MARGIN
+                ))
+            else:
+                self._apply(self._columns(db))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def overlapping(self, start: datetime, end: datetime) -> List[int]:
+        with self._lock:
+            if self._tree is None:
+                self._tree = IntervalTree(
+                    (course_start, course_end, course_id)
+                    for course_id, (course_start, course_end) in self._intervals.items()
+                )
+            tree = self._tree
+        return tree.overlapping(_naive_utc(start), _naive_utc(end))
+
+
+# ==================== Conflicts ====================
+
+def _conflicts(db: Session, start: datetime, end: datetime, student_id: Optional[int] = None,
+               teacher_ids: Sequence[int] = (), exclude_course_ids: Sequence[int] = ()) -> List[Tuple[int, Course]]:
+    """(owner id, course) pairs: the courses of the student or of each teacher overlapping [start, end)"""
+    start, end = _naive_utc(start), _naive_utc(end)
+    if start >= end or (student_id is None and not teacher_ids):
+        return []
+
+    if student_id is not None:
+        query = db.query(Enrollment.student_id, Course).join(
+            Enrollment, Enrollment.course_id == Course.course_id
+        ).filter(Enrollment.student_id == student_id, Enrollment.status == "active")
+    else:
+        query = db.query(teacher_course_association.c.teacher_id, Course).join(
+            teacher_course_association, teacher_course_association.c.course_id == Course.course_id
+        ).filter(teacher_course_association.c.teacher_id.in_(list(teacher_ids)))
+
+    if db.get_bind().dialect.name == "postgresql":
+        schedule = literal_column(f"({SCHEDULE_RANGE_SQL.format(table='courses.')})")
+        query = query.filter(schedule.op("&&")(func.tsrange(start, end)))
+    else:
+        schedule_index.refresh(db)
+        candidates = schedule_index.overlapping(start, end)
+        if not candidates:
+            return []
+        # Intervals may have changed since the index was caught up; check them again
+        query = query.filter(
+            Course.course_id.in_(candidates), Course.start_time < end, Course.end_time > start
+        )
+    if exclude_course_ids:
+        query = query.filter(Course.course_id.notin_(list(exclude_course_ids)))
+    return query.order_by(Course.start_time, Course.course_id).all()
+
+
+def student_conflicts(db: Session, student_id: int, start: datetime, end: datetime,
+                      exclude_course_ids: Sequence[int] = ()) -> List[Course]:
+    """The student's active courses overlapping [start, end)"""
+    return [course for _, course in _conflicts(
+        db, start, end, student_id=student_id, exclude_course_ids=exclude_course_ids
+    )]
+
+
+def teacher_conflicts(db: Session, teacher_ids: Sequence[int], start: datetime, end: datetime,
+                      exclude_course_ids: Sequence[int] = ()) -> Dict[int, List[Course]]:
+    """Per teacher, their assigned courses overlapping [start, end) (teachers without conflicts omitted)"""
+    conflicts: Dict[int, List[Course]] = defaultdict(list)
+    for teacher_id, course in _conflicts(
+        db, start, end, teacher_ids=teacher_ids, exclude_course_ids=exclude_course_ids
+    ):
+        conflicts[teacher_id].append(course)
+    return dict(conflicts)
+
+
+def course_summary(course: Course) -> Dict[str, Any]:
+    return {
+        "course_id": course.course_id,
+        "title": course.title,
+        "start_time": course.start_time.isoformat() if course.start_time else None,
+        "end_time": course.end_time.isoformat() if course.end_time else None,
+    }
+
+
+def check_schedule(db: Session, course_ids: Sequence[int], student_id: Optional[int] = None,
+                   teacher_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Check a selection of courses against a student's (or teacher's) current
+    schedule and against each other. With no selection, check the current
+    schedule itself. One entry per checked course, in start order.
+    """
+    if course_ids:
+        selected = db.query(Course).filter(Course.course_id.in_(list(course_ids))).all()
+    elif student_id is not None:
+        selected = db.query(Course).join(Enrollment, Enrollment.course_id == Course.course_id).filter(
+            Enrollment.student_id == student_id, Enrollment.status == "active"
+        ).all()
+    else:
+        selected = db.query(Course).join(
+            teacher_course_association, teacher_course_association.c.course_id == Course.course_id
+        ).filter(teacher_course_association.c.teacher_id == teacher_id).all()
+
+    by_id = {course.course_id: course for course in selected}
+    conflicts: Dict[int, Dict[int, Dict[str, Any]]] = {course_id: {} for course_id in by_id}
+
+    # Within the selection
+    for first, second in overlapping_pairs(
+        (_naive_utc(course.start_time), _naive_utc(course.end_time), course.course_id) for course in selected
+    ):
+        conflicts[first][second] = {**course_summary(by_id[second]), "source": "selection"}
+        conflicts[second][first] = {**course_summary(by_id[first]), "source": "selection"}
+
+    # Against the existing schedule (already covered above when checking the schedule itself)
+    if course_ids:
+        for course in selected:
+            if student_id is not None:
+                existing = student_conflicts(db, student_id, course.start_time, course.end_time, [course.course_id])
+            else:
+                existing = teacher_conflicts(
+                    db, [teacher_id], course.start_time, course.end_time, [course.course_id]
+                ).get(teacher_id, [])
+            for other in existing:
+                conflicts[course.course_id].setdefault(other.course_id, {**course_summary(other), "source": "schedule"})
+
+    return [
+        {
+            **course_summary(course),
+            "has_conflicts": bool(conflicts[course.course_id]),
+            "conflicts": list(conflicts[course.course_id].values()),
+        }
+        for course in sorted(selected, key=lambda c: (c.start_time, c.course_id))
+    ]
+
+
+# Global in-process index, used when the database is not PostgreSQL
+schedule_index = ScheduleIndex()
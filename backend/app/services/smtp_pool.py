@@ -0,0 +1,262 @@
+"""
+SMTP Connection Pool - Keeps authenticated SMTP connections open and reuses them
+
+A fresh SMTP connection costs a TCP connect, EHLO, STARTTLS handshake and AUTH
+before the first byte of mail is sent. The pool keeps up to ``max_connections``
+authenticated sessions per server, hands them out to concurrent senders and
+recycles them after ``max_messages_per_connection`` messages or when they have
+been idle for too long.
+
+An optional rate limiter is consulted before each SMTP transaction, one token
+per recipient, so bulk sends never outrun the provider's allowance. Interactive
+sends (password resets) may use a separate limiter so they never queue behind
+a bulk run.
+"""
+
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from email.message import EmailMessage
+from typing import TYPE_CHECKING, AsyncIterator, Dict, List, Optional, Sequence
+
+# aiosmtplib ships as a dependency of fastapi-mail
+try:
+    import aiosmtplib
+    AIOSMTPLIB_AVAILABLE = True
+except ImportError:
+    AIOSMTPLIB_AVAILABLE = False
+
+if TYPE_CHECKING:
+    from app.services.rate_limiter import TokenBucketRateLimiter
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class PoolStats:
+    """Counters describing how the pool has been used"""
+    connections_opened: int = 0
+    connections_closed: int = 0
+    messages_sent: int = 0
+    recipients_accepted: int = 0
+    recipients_refused: int = 0
+
+
+@dataclass
+class _PooledConnection:
+    """An open SMTP session plus the bookkeeping needed to recycle it"""
+    smtp: "aiosmtplib.SMTP"
+    created_at: float = field(default_factory=time.monotonic)
+    last_used_at: float = field(default_factory=time.monotonic)
+    messages_sent: int = 0
+
+
+class SMTPConnectionPool:
+    """Bounded pool of persistent SMTP connections to a single server"""
+
+    def __init__(
+        self,
+        hostname: str,
+        port: int,
+        username: Optional[str] = None,
+        password: Optional[str] = None,
+        start_tls: Optional[bool] = None,
+        use_tls: bool = False,
+        validate_certs: bool = True,
+        max_connections: int = 4,
+        max_messages_per_connection: int = 100,
+        max_recipients_per_message: int = 50,
+        idle_timeout: float = 60.0,
+        timeout: float = 30.0,
+        rate_limiter: Optional["TokenBucketRateLimiter"] = None,
+        interactive_rate_limiter: Optional["TokenBucketRateLimiter"] = None,
+    ):
+        if not AIOSMTPLIB_AVAILABLE:
+            raise RuntimeError("aiosmtplib is not installed")
+
+        self.hostname = hostname
+        self.port = port
+        self.username = username or None
+        self.password = password or None
+        self.start_tls = start_tls
+        self.use_tls = use_tls
+        self.validate_certs = validate_certs
+        self.max_connections = max_connections
+        self.max_messages_per_connection = max_messages_per_connection
+        self.max_recipients_per_message = max_recipients_per_message
+        self.idle_timeout = idle_timeout
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self.interactive_rate_limiter = interactive_rate_limiter or rate_limiter
+
+        self.stats = PoolStats()
+        self._idle: List[_PooledConnection] = []
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    # ==================== Connection Management ====================
+
+    def _bind_to_running_loop(self) -> asyncio.Semaphore:
+        """
+        Connections and the semaphore belong to the loop that created them.
+        When the pool is used from a new loop (e.g. a fresh ``asyncio.run``),
+        the old connections are unusable and are dropped.
+        """
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop or self._semaphore is None:
+            for conn in self._idle:
+                self._discard(conn)
+            self._idle = []
+            self._semaphore = asyncio.Semaphore(self.max_connections)
+            self._loop = loop
+        return self._semaphore
+
+    async def _open(self) -> _PooledConnection:
+        """Open, upgrade and authenticate a new SMTP session"""
+        smtp = aiosmtplib.SMTP(
+            hostname=self.hostname,
+            port=self.port,
+            username=self.username,
+            password=self.password,
+            start_tls=self.start_tls,
+            use_tls=self.use_tls,
+            validate_certs=self.validate_certs,
+            timeout=self.timeout,
+        )
+        await smtp.connect()
+        self.stats.connections_opened += 1
+        return _PooledConnection(smtp=smtp)
+
+    def _discard(self, conn: _PooledConnection) -> None:
+        """Drop a connection without waiting for a polite QUIT"""
+        try:
+            conn.smtp.close()
+        except Exception:
+            pass
+        self.stats.connections_closed += 1
+
+    async def _retire(self, conn: _PooledConnection) -> None:
+        """Close a connection that is still healthy"""
+        try:
+            await conn.smtp.quit()
+        except Exception:
+            conn.smtp.close()
+        self.stats.connections_closed += 1
+
+    def _is_reusable(self, conn: _PooledConnection) -> bool:
+        if not conn.smtp.is_connected:
+            return False
+        if conn.messages_sent >= self.max_messages_per_connection:
+            return False
+        return time.monotonic() - conn.last_used_at < self.idle_timeout
+
+    @asynccontextmanager
+    async def connection(self) -> AsyncIterator[_PooledConnection]:
+        """Borrow a connection, opening one if no idle connection is usable"""
+        semaphore = self._bind_to_running_loop()
+        async with semaphore:
+            conn = None
+            while self._idle:
+                candidate = self._idle.pop()  # LIFO keeps the warmest connection busy
+                if self._is_reusable(candidate):
+                    conn = candidate
+                    break
+                await self._retire(candidate)
+
+            if conn is None:
+                conn = await self._open()
+
+            try:
+                yield conn
+            except BaseException:
+                # The session state is unknown after a failure; never reuse it
+                self._discard(conn)
+                raise
+
+            conn.last_used_at = time.monotonic()
+            if self._is_reusable(conn):
+                self._idle.append(conn)
+            else:
+                await self._retire(conn)
+
+    async def warm(self, count: int = 1) -> None:
+        """Open up to ``count`` idle connections ahead of the first send"""
+        self._bind_to_running_loop()
+        while len(self._idle) < min(count, self.max_connections):
+            self._idle.append(await self._open())
+
+    async def close(self) -> None:
+        """Close every idle connection"""
+        idle, self._idle = self._idle, []
+        for conn in idle:
+            await self._retire(conn)
+
+    # ==================== Sending ====================
+
+    async def send_message(
+        self,
+        message: EmailMessage,
+        recipients: Optional[Sequence[str]] = None,
+        interactive: bool = False,
+        max_wait: Optional[float] = None,
+    ) -> Dict[str, str]:
+        """
+        Send one message in a single SMTP transaction.
+
+        Returns a dict of refused recipients mapped to the server response.
+        A connection the server dropped while idle is replaced once. With a
+        rate limiter, waits for one token per recipient before sending, or
+        raises RateLimitExceeded if that would take longer than ``max_wait``.
+        """
+        limiter = self.interactive_rate_limiter if interactive else self.rate_limiter
+        if limiter is not None:
+            await limiter.acquire(len(recipients) if recipients else 1, max_wait)
+
+        for attempt in range(2):
+            try:
+                async with self.connection() as conn:
+                    errors, _ = await conn.smtp.send_message(message, recipients=recipients)
+                    conn.messages_sent += 1
+            except aiosmtplib.SMTPServerDisconnected:
+                if attempt:
+                    raise
+                continue
+
+            refused = {address: str(response) for address, response in errors.items()}
+            accepted = len(recipients) if recipients is not None else 1
+            self.stats.messages_sent += 1
+            self.stats.recipients_accepted += max(accepted - len(refused), 0)
+            self.stats.recipients_refused += len(refused)
+            return refused
+        return {}
+
+    async def send_bulk(self, message: EmailMessage, recipients: Sequence[str]) -> Dict[str, str]:
+        """
+        Deliver the same message to many recipients.
+
+        Recipients are split into envelopes of ``max_recipients_per_message``
+        RCPT TO commands each, so one DATA transfer covers a whole batch. The
+        batches run concurrently, bounded by the pool size.
+        """
+        if not recipients:
+            return {}
+
+        size = max(self.max_recipients_per_message, 1)
+        batches = [list(recipients[i:i + size]) for i in range(0, len(recipients), size)]
+
+        results = await asyncio.gather(
+            *(self.send_message(message, recipients=batch) for batch in batches),
+            return_exceptions=True,
+        )
+
+        refused: Dict[str, str] = {}
+        for batch, result in zip(batches, results):
+            if isinstance(result, BaseException):
+                logger.error(f"SMTP batch of {len(batch)} recipients failed: {result}")
+                refused.update({address: str(result) for address in batch})
+                self.stats.recipients_refused += len(batch)
+            else:
+                refused.update(result)
+        return refused
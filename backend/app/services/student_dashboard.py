@@ -0,0 +1,276 @@
+"""
+Student Dashboard - Everything the student home page shows, in one payload
+
+The student home page used to call five endpoints. Each one resolved the
+student's enrolled courses again, and the assignment lists looked up the
+submission of every assignment with its own query.
+
+``StudentDashboard`` resolves the enrolled course ids once, then runs the
+independent sections (enrollments, assignments with their submission status,
+upcoming assignments, recent materials, attendance stats and the unread
+notification count) concurrently on a small thread pool, each with its own
+database session. The caller's session is closed before the sections start,
+so concurrent builds never hold a connection while waiting for another.
+Every section is a fixed number of queries, whatever the number of courses
+or assignments.
+
+The payload is cached per student for ``student_dashboard_cache_seconds``
+(see ``ResultCache``); submitting or grading an assignment drops the
+student's entry.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import case, desc, func
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.models import (
+    Assignment, AssignmentSubmission, Attendance, Course, Enrollment, Material, Teacher,
+    teacher_course_association
+)
+from app.services.notification_service import NotificationService
+from app.services.result_cache import ResultCache
+
+logger = logging.getLogger(__name__)
+
+CACHE_KEY = "student-dashboard"
+UPCOMING_DAYS = 30
+RECENT_MATERIALS = 10
+
+
+# ==================== Sections ====================
+
+def enrolled_course_ids(db: Session, student_id: int) -> List[int]:
+    """Courses the student is (or was) enrolled in, except dropped ones"""
+    return [row.course_id for row in db.query(Enrollment.course_id).filter(
+        Enrollment.student_id == student_id, Enrollment.status != "dropped"
+    ).distinct()]
+
+
+def _submissions(db: Session, student_id: int, assignment_ids: Sequence[int]) -> Dict[int, AssignmentSubmission]:
+    """The student's submission per assignment, in one query"""
+    if not assignment_ids:
+        return {}
+    submissions: Dict[int, AssignmentSubmission] = {}
+    for submission in db.query(AssignmentSubmission).filter(
+        AssignmentSubmission.student_id == student_id,
+        AssignmentSubmission.assignment_id.in_(list(assignment_ids))
+    ).order_by(AssignmentSubmission.submission_id):
+        submissions.setdefault(submission.assignment_id, submission)
+    return submissions
+
+
+def assignments_with_status(db: Session, student_id: int, course_ids: Sequence[int]) -> List[Dict[str, Any]]:
+    """
+    Assignments of the courses, latest due first, with the student's
+    submission status (pending, submitted or overdue) and grade.
+    """
+    if not course_ids:
+        return []
+    rows = db.query(Assignment, Course.title).join(
+        Course, Assignment.course_id == Course.course_id
+    ).filter(Assignment.course_id.in_(list(course_ids))).order_by(desc(Assignment.due_date)).all()
+    submissions = _submissions(db, student_id, [assignment.assignment_id for assignment, _ in rows])
+
+    now = datetime.now()
+    result = []
+    for assignment, course_title in rows:
+        submission = submissions.get(assignment.assignment_id)
+        if submission is not None:
+            submission_status = "submitted"
+        elif assignment.due_date is not None and assignment.due_date < now:
+            submission_status = "overdue"
+        else:
+            submission_status = "pending"
+        result.append({
+            "assignment_id": assignment.assignment_id,
+            "course_id": assignment.course_id,
+            "title": assignment.title,
+            "description": assignment.description,
+            "due_date": assignment.due_date.isoformat(),
+            "max_points": assignment.max_points,
+            "course_title": course_title,
+            "submission_status": submission_status,
+            "grade": submission.grade if submission is not None else None
+        })
+    return result
+
+
+def upcoming_assignments(db: Session, student_id: int, course_ids: Sequence[int],
+                         days: int = UPCOMING_DAYS) -> List[Dict[str, Any]]:
+    """Unsubmitted assignments of the courses due within ``days``, soonest first"""
+    if not course_ids:
+        return []
+    now = datetime.now()
+    submitted = db.query(AssignmentSubmission.submission_id).filter(
+        AssignmentSubmission.assignment_id == Assignment.assignment_id,
+        AssignmentSubmission.student_id == student_id
+    ).exists()
+    rows = db.query(Assignment, Course.title).join(
+        Course, Assignment.course_id == Course.course_id
+    ).filter(
+        Assignment.course_id.in_(list(course_ids)),
+        Assignment.due_date >= now,
+        Assignment.due_date <= now + timedelta(days=days),
+        ~submitted
+    ).order_by(Assignment.due_date).all()
+    return [
+        {
+            "assignment_id": assignment.assignment_id,
+            "course_id": assignment.course_id,
+            "title": assignment.title,
+            "description": assignment.description,
+            "due_date": assignment.due_date.isoformat(),
+            "max_points": assignment.max_points,
+            "course_title": course_title
+        }
+        for assignment, course_title in rows
+    ]
+
+
+def recent_materials(db: Session, course_ids: Sequence[int], limit: int = RECENT_MATERIALS) -> List[Dict[str, Any]]:
+    """Latest public materials of the courses"""
+    if not course_ids:
+        return []
+    rows = db.query(Material, Course.title).join(
+        Course, Material.course_id == Course.course_id
+    ).filter(
+        Material.course_id.in_(list(course_ids)), Material.is_public == True  # noqa: E712
+    ).order_by(desc(Material.upload_date)).limit(limit).all()
+    return [
+        {
+            "material_id": material.material_id,
+            "course_id": material.course_id,
+            "title": material.title,
+            "type": material.type,
+            "url": material.url,
+            "description": material.description,
+            "upload_date": material.upload_date.isoformat() if material.upload_date else None,
+            "course_title": course_title
+        }
+        for material, course_title in rows
+    ]
+
+
+def _enrollments(db: Session, student_id: int) -> List[Dict[str, Any]]:
+    rows = db.query(Enrollment, Course).join(
+        Course, Enrollment.course_id == Course.course_id
+    ).filter(Enrollment.student_id == student_id).order_by(Course.start_time).all()
+
+    teachers: Dict[int, List[str]] = {}
+    course_ids = list({course.course_id for _, course in rows})
+    if course_ids:
+        for course_id, name in db.query(teacher_course_association.c.course_id, Teacher.name).join(
+            Teacher, Teacher.teacher_id == teacher_course_association.c.teacher_id
+        ).filter(teacher_course_association.c.course_id.in_(course_ids)).order_by(Teacher.name):
+            teachers.setdefault(course_id, []).append(name)
+
+    return [
+        {
+            "enrollment_id": enrollment.enrollment_id,
+            "course": {
+                "course_id": course.course_id,
+                "title": course.title,
+                "start_time": course.start_time.isoformat(),
+                "end_time": course.end_time.isoformat(),
+                "is_online": course.is_online,
+                "location": course.location,
+                "status": course.status,
+                "teacher_name": ", ".join(teachers.get(course.course_id, [])) or "Not assigned"
+            },
+            "paid": enrollment.paid,
+            "payment_due": enrollment.payment_due.isoformat() if enrollment.payment_due is not None else None,
+            "status": enrollment.status,
+            "amount": float(course.price)
+        }
+        for enrollment, course in rows
+    ]
+
+
+def _attendance_stats(db: Session, student_id: int) -> Dict[str, Any]:
+    """Same numbers as the attendance stats endpoint, from one aggregate query"""
+    def count(status: str) -> Any:
+        return func.coalesce(func.sum(case((Attendance.status == status, 1), else_=0)), 0)
+
+    total, present, absent, late, excused = db.query(
+        func.count(Attendance.attendance_id), count("present"), count("absent"), count("late"), count("excused")
+    ).filter(Attendance.student_id == student_id).one()
+    return {
+        "total_classes": total,
+        "present_count": present,
+        "absent_count": absent,
+        "late_count": late,
+        "excused_count": excused,
+        "attendance_percentage": round(present / total * 100, 2) if total else 0
+    }
+
+
+def _unread_notifications(db: Session, student_id: int) -> int:
+    return NotificationService(db).get_unread_count(student_id, "student")
+
+
+# Section name -> function(db, student_id, course_ids)
+SECTIONS: Dict[str, Callable[[Session, int, List[int]], Any]] = {
+    "enrollments": lambda db, student_id, course_ids: _enrollments(db, student_id),
+    "assignments": assignments_with_status,
+    "upcoming_assignments": upcoming_assignments,
+    "recent_materials": lambda db, student_id, course_ids: recent_materials(db, course_ids),
+    "attendance": lambda db, student_id, course_ids: _attendance_stats(db, student_id),
+    "unread_notifications": lambda db, student_id, course_ids: _unread_notifications(db, student_id),
+}
+
+
+# ==================== Dashboard ====================
+
+class StudentDashboard:
+    """Builds and caches the per-student dashboard payload"""
+
+    def __init__(self, cache_seconds: Optional[float] = None, session_factory: Callable[[], Session] = SessionLocal,
+                 max_workers: Optional[int] = None):
+        self.session_factory = session_factory
+        self.cache = ResultCache(
+            ttl_seconds=settings.student_dashboard_cache_seconds if cache_seconds is None else cache_seconds,
+            stale_seconds=0,
+            session_factory=session_factory,
+            max_entries=1024,
+        )
+        # Shared by every request, so it also bounds the connections the sections use
+        self._executor = ThreadPoolExecutor(
+            max_workers=settings.student_dashboard_workers if max_workers is None else max_workers,
+            thread_name_prefix="student-dashboard",
+        )
+
+    def _section(self, name: str, student_id: int, course_ids: List[int]) -> Any:
+        db = self.session_factory()
+        try:
+            return SECTIONS[name](db, student_id, course_ids)
+        finally:
+            db.close()
+
+    def build(self, db: Session, student_id: int) -> Dict[str, Any]:
+        """Resolve the courses once, then run the sections concurrently"""
+        course_ids = enrolled_course_ids(db, student_id)
+        # Hand the connection back before waiting: the sections need their own from the same pool
+        db.close()
+        futures = {
+            name: self._executor.submit(self._section, name, student_id, course_ids) for name in SECTIONS
+        }
+        payload: Dict[str, Any] = {"student_id": student_id, "course_ids": course_ids}
+        payload.update({name: future.result() for name, future in futures.items()})
+        payload["generated_at"] = datetime.utcnow().isoformat()
+        return payload
+
+    async def get(self, student_id: int) -> Dict[str, Any]:
+        return await self.cache.get((CACHE_KEY, student_id), lambda db: self.build(db, student_id))
+
+    def invalidate(self, student_id: int) -> None:
+        self.cache.invalidate((CACHE_KEY, student_id))
+
+
+# Global dashboard for the student home page
+student_dashboard = StudentDashboard()
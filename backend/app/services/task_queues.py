@@ -0,0 +1,241 @@
+"""
+Task Queues - Named Celery queues, routing rules and queue metrics
+
+Latency-sensitive tasks get their own queues and workers, so a password reset
+never waits behind a monthly report run:
+
+- ``interactive``: emails a user is waiting for right now (password reset
+  outbox rows)
+- ``notifications``: per-event emails and notifications, the outbox
+- ``bulk-reports``: monthly reports, digests and their fan-out chunks
+- ``maintenance``: housekeeping jobs
+
+Each queue is consumed by its own worker (``-Q <queue>``). A worker started
+without ``-c`` gets the queue's concurrency from ``CELERY_QUEUE_CONCURRENCY``.
+
+Queue metrics: publish time is stamped into each message's headers and the
+wait (publish to start) is recorded per queue when a worker picks the task up.
+Depth is read straight from the broker's Redis lists. Samples live in Redis
+so every worker and the API share them, with an in-process fallback when Redis
+is unreachable.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from kombu import Queue
+
+from app.core.config import settings
+
+try:
+    import redis
+    REDIS_AVAILABLE = True
+except ImportError:
+    REDIS_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+INTERACTIVE = "interactive"
+NOTIFICATIONS = "notifications"
+BULK_REPORTS = "bulk-reports"
+MAINTENANCE = "maintenance"
+QUEUE_NAMES = (INTERACTIVE, NOTIFICATIONS, BULK_REPORTS, MAINTENANCE)
+
+TASK_QUEUES = tuple(Queue(name, routing_key=name) for name in QUEUE_NAMES)
+
+_TASK_PREFIX = "app.services.celery_app."
+TASK_ROUTES: Dict[str, Dict[str, str]] = {
+    _TASK_PREFIX + name: {"queue": queue}
+    for queue, names in {
+        INTERACTIVE: ("send_password_reset_email_task", "process_interactive_email_outbox"),
+        NOTIFICATIONS: (
+            "send_assignment_notification_task",
+            "send_grade_notification_task",
+            "process_email_outbox",
+            "create_notifications_chunk",
+        ),
+        BULK_REPORTS: (
+            "send_monthly_reports",
+            "send_monthly_report_chunk",
+            "finish_monthly_report_run",
+            "send_notification_digest",
+            "send_notification_digest_chunk",
+            "fanout_complete",
+        ),
+        MAINTENANCE: (
+            "cleanup_expired_reset_tokens",
+            "refresh_admin_stats",
+            "reconcile_course_seats",
+            "cleanup_resumable_uploads",
+        ),
+    }.items()
+    for name in names
+}
+
+PUBLISHED_AT_HEADER = "published_at"
+KEY_PREFIX = "celery:queue-wait:"
+# kombu's Redis transport keeps priority levels 3/6/9 in separate lists
+_PRIORITY_SUFFIXES = ("", "\x06\x163", "\x06\x166", "\x06\x169")
+
+
+def parse_queue_concurrency(value: str) -> Dict[str, int]:
+    """Parse ``"interactive=4,bulk-reports=2"`` into a queue -> processes mapping"""
+    concurrency: Dict[str, int] = {}
+    for item in value.split(","):
+        if "=" not in item:
+            continue
+        name, _, processes = item.partition("=")
+        try:
+            concurrency[name.strip()] = max(int(processes), 1)
+        except ValueError:
+            logger.warning(f"Ignoring invalid queue concurrency entry: {item!r}")
+    return concurrency
+
+
+def worker_concurrency(queues: Iterable[str], configured: Optional[Dict[str, int]] = None) -> Optional[int]:
+    """Processes for a worker consuming ``queues``: the sum of their configured concurrency"""
+    configured = parse_queue_concurrency(settings.celery_queue_concurrency) if configured is None else configured
+    known = [configured[q] for q in queues if q in configured]
+    return sum(known) if known else None
+
+
+def _percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class QueueMetrics:
+    """Queue wait-time samples and broker queue depth"""
+
+    def __init__(self, redis_url: Optional[str] = None, sample_size: int = 500):
+        self.sample_size = sample_size
+        self._redis = None
+        self._redis_retry_at = 0.0
+        if redis_url and redis_url.startswith("redis") and REDIS_AVAILABLE:
+            self._redis = redis.Redis.from_url(
+                redis_url, socket_connect_timeout=0.5, socket_timeout=0.5
+            )
+
+        self._lock = threading.Lock()
+        self._local: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=sample_size))
+        self._local_counts: Dict[str, int] = defaultdict(int)
+
+    def _use_redis(self) -> bool:
+        return self._redis is not None and time.monotonic() >= self._redis_retry_at
+
+    def _redis_failed(self, exc: Exception) -> None:
+        logger.warning(f"Queue metrics falling back to local memory: {exc}")
+        self._redis_retry_at = time.monotonic() + 30
+
+    def record_wait(self, queue: str, seconds: float) -> None:
+        """Record how long a task sat in ``queue`` before a worker started it"""
+        seconds = max(seconds, 0.0)
+        if self._use_redis():
+            try:
+                pipe = self._redis.pipeline()  # type: ignore[union-attr]
+                pipe.lpush(KEY_PREFIX + queue, round(seconds, 4))
+                pipe.ltrim(KEY_PREFIX + queue, 0, self.sample_size - 1)
+                pipe.hincrby(KEY_PREFIX + "counts", queue, 1)
+                pipe.execute()
+                return
+            except Exception as exc:
+                self._redis_failed(exc)
+
+        with self._lock:
+            self._local[queue].append(seconds)
+            self._local_counts[queue] += 1
+
+    def _samples(self, queue: str) -> List[float]:
+        if self._use_redis():
+            try:
+                return [float(v) for v in self._redis.lrange(KEY_PREFIX + queue, 0, -1)]  # type: ignore[union-attr]
+            except Exception as exc:
+                self._redis_failed(exc)
+        with self._lock:
+            return list(self._local[queue])
+
+    def _counts(self) -> Dict[str, int]:
+        if self._use_redis():
+            try:
+                raw = self._redis.hgetall(KEY_PREFIX + "counts")  # type: ignore[union-attr]
+                return {k.decode(): int(v) for k, v in raw.items()}
+            except Exception as exc:
+                self._redis_failed(exc)
+        with self._lock:
+            return dict(self._local_counts)
+
+    def depth(self, queue: str) -> Optional[int]:
+        """Messages waiting in the broker for ``queue``, or None if the broker cannot be read"""
+        if not self._use_redis():
+            return None
+        try:
+            pipe = self._redis.pipeline()  # type: ignore[union-attr]
+            for suffix in _PRIORITY_SUFFIXES:
+                pipe.llen(queue + suffix)
+            return sum(pipe.execute())
+        except Exception as exc:
+            self._redis_failed(exc)
+            return None
+
+    def snapshot(self, queues: Iterable[str] = QUEUE_NAMES) -> Dict[str, Dict[str, Any]]:
+        """Depth and wait-time stats (over the last ``sample_size`` tasks) per queue"""
+        counts = self._counts()
+        result: Dict[str, Dict[str, Any]] = {}
+        for queue in queues:
+            samples = self._samples(queue)
+            result[queue] = {
+                "depth": self.depth(queue),
+                "started": counts.get(queue, 0),
+                "wait_samples": len(samples),
+                "wait_avg_seconds": round(sum(samples) / len(samples), 4) if samples else None,
+                "wait_p50_seconds": round(_percentile(samples, 0.5), 4) if samples else None,
+                "wait_p95_seconds": round(_percentile(samples, 0.95), 4) if samples else None,
+                "wait_max_seconds": round(max(samples), 4) if samples else None,
+            }
+        return result
+
+
+# ==================== Celery Signal Handlers ====================
+
+def stamp_published_at(headers: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+    """before_task_publish: remember when the message was sent"""
+    if headers is not None:
+        headers.setdefault(PUBLISHED_AT_HEADER, time.time())
+
+
+def record_queue_wait(task: Any = None, **kwargs: Any) -> None:
+    """task_prerun: record the time between publish and start for the task's queue"""
+    request = getattr(task, "request", None)
+    if request is None or getattr(request, "is_eager", False):
+        return
+
+    published_at = getattr(request, PUBLISHED_AT_HEADER, None)
+    if published_at is None:
+        published_at = (getattr(request, "headers", None) or {}).get(PUBLISHED_AT_HEADER)
+    queue = (getattr(request, "delivery_info", None) or {}).get("routing_key")
+    if published_at is None or not queue:
+        return
+
+    queue_metrics.record_wait(queue, time.time() - float(published_at))
+
+
+def apply_queue_concurrency(conf: Any = None, options: Optional[Dict[str, Any]] = None, **kwargs: Any) -> None:
+    """celeryd_init: size the worker pool from the queues it consumes, unless -c was given"""
+    options = options or {}
+    queues = options.get("queues")
+    if not queues or options.get("concurrency") or conf is None:
+        return
+    if isinstance(queues, str):
+        queues = queues.split(",")
+
+    processes = worker_concurrency([q.strip() for q in queues])
+    if processes:
+        conf.worker_concurrency = processes
+        logger.info(f"Worker for queues {list(queues)} running {processes} processes")
+
+
+# Global queue metrics, stored alongside the broker's queues
+queue_metrics = QueueMetrics(settings.celery_broker_url)
@@ -0,0 +1,305 @@
+"""
+Uploads - Streaming file uploads for course materials and assignment submissions
+
+Uploaded files used to be read into memory with ``await file.read()`` and
+handed to the synchronous Cloudinary client inside the request handler, so
+every upload held its whole body in memory and blocked the event loop for the
+length of the transfer.
+
+An upload now goes through three steps:
+
+- ``UploadSizeLimitMiddleware`` rejects multipart bodies larger than
+  ``max_file_size`` (plus room for the form fields) from Content-Length, or as
+  soon as the streamed body passes the limit, before it is parsed and spooled
+- ``spool_upload`` copies the file in ``CHUNK_SIZE`` chunks into a temporary
+  file in ``upload_spool_dir``, enforcing the limit exactly and computing its
+  SHA-256 on the way
+- ``store_upload`` hands the spooled file to the storage backend (Cloudinary,
+  in parts for large files, or a move into ``upload_dir`` for local storage)
+
+The copying and the storage call run in worker threads, and memory per upload
+is bounded by the chunk (or Cloudinary part) size.
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, BinaryIO, List, Optional
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+
+from app.core.config import settings
+from app.utils.cloudinary_helper import upload_file
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 1024 * 1024
+CLOUDINARY_PART_SIZE = 20 * 1024 * 1024  # Larger files are sent with upload_large (parts must be >= 5MB)
+MULTIPART_OVERHEAD = 64 * 1024  # Form fields and part headers around the file
+SAFE_EXTENSION = re.compile(r"\.[A-Za-z0-9]{1,10}")
+OBJECT_KEY = re.compile(r"[a-z_]+/[0-9a-f]{32}(\.[A-Za-z0-9]{1,10})?")
+
+
+class UploadTooLarge(Exception):
+    """The upload is larger than the allowed size"""
+
+    def __init__(self, limit: int):
+        super().__init__(f"File too large. Maximum size is {limit} bytes")
+        self.limit = limit
+
+
+@dataclass
+class SpooledUpload:
+    """An upload copied to a temporary file"""
+    path: str
+    filename: str
+    extension: str
+    size: int
+    sha256: str
+
+    def cleanup(self) -> None:
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+
+@dataclass
+class StoredFile:
+    """Where the storage backend put an upload"""
+    url: str
+    size: int
+    sha256: str
+    storage: str  # cloudinary, local
+    public_id: Optional[str] = None
+
+
+# ==================== Spooling ====================
+
+def _spool_dir() -> Optional[str]:
+    if not settings.upload_spool_dir:
+        return None  # The system temporary directory
+    os.makedirs(settings.upload_spool_dir, exist_ok=True)
+    return settings.upload_spool_dir
+
+
+class _SpoolWriter:
+    """Temporary file that counts, limits and hashes what is written to it"""
+
+    def __init__(self, filename: str, max_bytes: int):
+        self.filename = filename
+        self.extension = os.path.splitext(filename)[1]
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.digest = hashlib.sha256()
+        handle, self.path = tempfile.mkstemp(suffix=self.extension, dir=_spool_dir())
+        self.target = os.fdopen(handle, "wb")
+
+    def write(self, chunk: bytes) -> None:
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadTooLarge(self.max_bytes)
+        self.digest.update(chunk)
+        self.target.write(chunk)
+
+    def finish(self) -> SpooledUpload:
+        self.target.close()
+        return SpooledUpload(path=self.path, filename=self.filename, extension=self.extension, size=self.size,
+                             sha256=self.digest.hexdigest())
+
+    def abort(self) -> None:
+        self.target.close()
+        os.remove(self.path)
+
+
+def _copy(source: BinaryIO, filename: str, max_bytes: int) -> SpooledUpload:
+    writer = _SpoolWriter(filename, max_bytes)
+    try:
+        while True:
+            chunk = source.read(CHUNK_SIZE)
+            if not chunk:
+                break
+            writer.write(chunk)
+    except BaseException:
+        writer.abort()
+        raise
+    return writer.finish()
+
+
+async def spool_upload(file: UploadFile, max_bytes: Optional[int] = None) -> SpooledUpload:
+    """
+    Copy ``file`` to a temporary file in chunks, hashing it on the way.
+    Raises UploadTooLarge as soon as it passes ``max_bytes`` (default
+    ``max_file_size``). The caller must store or clean up the result.
+    """
+    limit = settings.max_file_size if max_bytes is None else max_bytes
+    await file.seek(0)
+    return await asyncio.to_thread(_copy, file.file, file.filename or "upload", limit)
+
+
+async def spool_stream(chunks: AsyncIterator[bytes], filename: str, max_bytes: int) -> SpooledUpload:
+    """
+    ``spool_upload`` for a raw request body (``request.stream()``): the small
+    chunks received are written in ``CHUNK_SIZE`` batches from a worker thread.
+    """
+    writer = await asyncio.to_thread(_SpoolWriter, filename, max_bytes)
+    buffered: List[bytes] = []
+    pending = 0
+    try:
+        async for chunk in chunks:
+            buffered.append(chunk)
+            pending += len(chunk)
+            if writer.size + pending > max_bytes:
+                raise UploadTooLarge(max_bytes)
+            if pending >= CHUNK_SIZE:
+                await asyncio.to_thread(writer.write, b"".join(buffered))
+                buffered, pending = [], 0
+        if buffered:
+            await asyncio.to_thread(writer.write, b"".join(buffered))
+    except BaseException:
+        await asyncio.to_thread(writer.abort)
+        raise
+    return await asyncio.to_thread(writer.finish)
+
+
+# ==================== Storage ====================
+
+def safe_extension(filename: str) -> str:
+    """The file extension if it is safe to use in a stored name, else ''"""
+    extension = os.path.splitext(filename)[1]
+    return extension if SAFE_EXTENSION.fullmatch(extension) else ""
+
+
+def new_object_key(folder: str, filename: str) -> str:
+    """A fresh ``folder/name.ext`` key for a stored file"""
+    return f"{folder}/{uuid.uuid4().hex}{safe_extension(filename)}"
+
+
+def local_object_path(object_key: str) -> str:
+    """Where local storage keeps ``object_key``; only keys from new_object_key are accepted"""
+    if not OBJECT_KEY.fullmatch(object_key):
+        raise ValueError(f"Invalid object key: {object_key}")
+    return os.path.join(settings.upload_dir, *object_key.split("/"))
+
+
+def local_object_url(object_key: str) -> str:
+    return f"/uploads/{object_key}"
+
+
+def store_local(upload: SpooledUpload, object_key: str) -> StoredFile:
+    """Move a spooled upload into local storage under ``object_key`` (never overwriting)"""
+    path = local_object_path(object_key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    if os.path.exists(path):
+        raise FileExistsError(object_key)
+    shutil.move(upload.path, path)
+    return StoredFile(url=local_object_url(object_key), size=upload.size, sha256=upload.sha256, storage="local")
+
+
+def store_spooled(upload: SpooledUpload, folder: str, local_folder: str, resource_type: str = "auto") -> StoredFile:
+    """
+    Put a spooled upload in the storage backend (blocking). Local storage
+    moves the file; with Cloudinary it stays where it is.
+    """
+    if settings.use_cloudinary:
+        with open(upload.path, "rb") as source:
+            result = upload_file(
+                file_content=source,
+                folder=folder,
+                public_id=uuid.uuid4().hex,
+                resource_type=resource_type,
+                chunk_size=CLOUDINARY_PART_SIZE if upload.size > CLOUDINARY_PART_SIZE else None
+            )
+        return StoredFile(url=result["secure_url"], size=upload.size, sha256=upload.sha256, storage="cloudinary",
+                          public_id=result.get("public_id"))
+    return store_local(upload, new_object_key(local_folder, upload.filename))
+
+
+async def store_upload(upload: SpooledUpload, folder: str, local_folder: str,
+                       resource_type: str = "auto") -> StoredFile:
+    """
+    Put a spooled upload in the storage backend from a worker thread:
+    Cloudinary ``folder`` or ``upload_dir/local_folder``. The spooled file is
+    removed either way.
+    """
+    try:
+        return await asyncio.to_thread(store_spooled, upload, folder, local_folder, resource_type)
+    finally:
+        upload.cleanup()
+
+
+def material_type(extension: str) -> str:
+    """Material.type for a file extension"""
+    extension = extension.lower()
+    if extension in [".pdf"]:
+        return "pdf"
+    if extension in [".mp4", ".avi", ".mov", ".mkv"]:
+        return "video"
+    if extension in [".ppt", ".pptx"]:
+        return "presentation"
+    if extension in [".zip", ".rar"]:
+        return "archive"
+    return "document"
+
+
+def cloudinary_resource_type(file_type: str) -> str:
+    """Cloudinary resource type for a Material.type"""
+    if file_type == "video":
+        return "video"
+    if file_type in ["pdf", "document", "presentation", "archive"]:
+        return "raw"
+    return "auto"
+
+
+# ==================== Middleware ====================
+
+class UploadSizeLimitMiddleware:
+    """
+    413 for multipart requests whose body is larger than ``max_body_bytes``
+    (default: ``max_file_size`` plus form overhead), before the body is parsed.
+    """
+
+    def __init__(self, app: Any, max_body_bytes: Optional[int] = None):
+        self.app = app
+        self.max_body_bytes = settings.max_file_size + MULTIPART_OVERHEAD if max_body_bytes is None else max_body_bytes
+
+    async def __call__(self, scope: Any, receive: Any, send: Any) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = {name: value for name, value in scope["headers"]}
+        if not headers.get(b"content-type", b"").startswith(b"multipart/form-data"):
+            await self.app(scope, receive, send)
+            return
+
+        detail = f"Request too large. Maximum upload size is {settings.max_file_size} bytes"
+        try:
+            declared = int(headers.get(b"content-length", b"0"))
+        except ValueError:
+            declared = 0
+        if declared > self.max_body_bytes:
+            response = JSONResponse({"detail": detail}, status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def receive_limited() -> dict:
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_body_bytes:
+                    # Raised inside form parsing; FastAPI passes HTTPExceptions through
+                    raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail=detail)
+            return message
+
+        await self.app(scope, receive_limited, send)
@@ -0,0 +1,399 @@
+"""
+User Search - Ranked, cursor-paged search over every user type
+
+Students, teachers, admins and parents live in four tables. ``user_directory``
+keeps one denormalized row per user with a ``search_text`` column: the
+lowercased name and email tokens, the full email and the phone digits. A
+session hook rewrites a user's row in the same flush as any change to their
+name, email, phone or active flag, so the directory is always current. The
+hook is registered by ``app.models``, so it also sees users written by Celery
+workers and scripts.
+
+Matching and ranking (higher is better):
+
+- 3: the query equals a whole token (an exact email or phone number)
+- 2: a token starts with the query (name or email prefix)
+- 1: the query appears anywhere in the text
+- plus the trigram similarity of the query to the best matching token, so
+  misspellings above ``user_search_min_similarity`` still match
+
+On PostgreSQL this runs in SQL against a pg_trgm GIN index (``LIKE`` and
+``word_similarity``). Other databases (SQLite in tests and local development)
+use an in-process trigram index over the directory instead. It is caught up
+from ``indexed_at`` on every search and rebuilt every
+``user_search_rebuild_seconds`` to drop deleted users.
+
+Results are paged with an opaque cursor on (score, user_type, user_id).
+"""
+
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import case, delete, event, func, inspect, literal, select, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import Admin, Parent, Student, Teacher, UserDirectoryEntry
+
+logger = logging.getLogger(__name__)
+
+USER_MODELS = {Student: "student", Teacher: "teacher", Admin: "admin", Parent: "parent"}
+INDEXED_FIELDS = ("name", "email", "phone", "is_active")
+# Rows written by other processes can commit slightly after their indexed_at
+CATCH_UP_MARGIN = timedelta(seconds=5)
+
+Key = Tuple[str, int]
+
+_TOKEN_SPLIT = re.compile(r"[^a-z0-9]+")
+_PHONE_CHARS = re.compile(r"[\s\-\(\)\+\.]")
+
+
+class InvalidCursor(ValueError):
+    """The paging cursor could not be parsed"""
+
+
+# ==================== Normalization ====================
+
+def phone_digits(phone: Optional[str]) -> str:
+    return re.sub(r"\D", "", phone or "")
+
+
+def build_search_text(name: str, email: str, phone: Optional[str]) -> str:
+    """Space separated, de-duplicated tokens: name words, email and its parts, phone digits"""
+    email = (email or "").lower()
+    parts = _TOKEN_SPLIT.split((name or "").lower()) + [email] + _TOKEN_SPLIT.split(email)
+    parts.append(phone_digits(phone))
+    return " ".join(dict.fromkeys(part for part in parts if part))
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, collapse whitespace; a phone-looking query becomes its digits"""
+    query = " ".join(query.lower().split())
+    compact = _PHONE_CHARS.sub("", query)
+    if len(compact) >= 3 and compact.isdigit():
+        return compact
+    return query
+
+
+def trigrams(text: str) -> Set[str]:
+    """pg_trgm style trigrams: each word padded with two leading and one trailing space"""
+    grams: Set[str] = set()
+    for word in _TOKEN_SPLIT.split(text.lower()):
+        if word:
+            padded = f"  {word} "
+            grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def _similarity(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a and b else 0.0
+
+
+def match_score(query: str, search_text: str, query_grams: Optional[Set[str]] = None,
+                min_similarity: Optional[float] = None) -> Optional[float]:
+    """Rank of ``search_text`` for a normalized query, or None if it does not match"""
+    min_similarity = settings.user_search_min_similarity if min_similarity is None else min_similarity
+    query_grams = trigrams(query) if query_grams is None else query_grams
+    padded = f" {search_text} "
+    if f" {query} " in padded:
+        base = 3
+    elif f" {query}" in padded:
+        base = 2
+    elif query in search_text:
+        base = 1
+    else:
+        base = 0
+
+    similarity = max((_similarity(query_grams, trigrams(token)) for token in search_text.split()), default=0.0)
+    if base == 0 and similarity < min_similarity:
+        return None
+    return round(base + similarity, 6)
+
+
+# ==================== Cursor ====================
+
+def encode_cursor(score: float, user_type: str, user_id: int) -> str:
+    return f"{score!r}~{user_type}~{user_id}"
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str, int]:
+    try:
+        score, user_type, user_id = cursor.split("~")
+        return float(score), user_type, int(user_id)
+    except ValueError:
+        raise InvalidCursor(f"Invalid cursor: {cursor!r}")
+
+
+# ==================== Directory Maintenance ====================
+
+def directory_row(user: Any, user_type: str, now: Optional[datetime] = None) -> Dict[str, Any]:
+    now = now or datetime.utcnow()
+    row = {
+        "user_type": user_type,
+        "user_id": getattr(user, f"{user_type}_id"),
+        "name": user.name,
+        "email": user.email,
+        "phone": user.phone,
+        "phone_digits": phone_digits(user.phone) or None,
+        "is_active": True if user.is_active is None else bool(user.is_active),
+        "search_text": build_search_text(user.name, user.email, user.phone),
+        "indexed_at": now,
+    }
+    # created_at is a server default: not loaded yet for a row inserted by this flush
+    created_at = inspect(user).dict.get("created_at")
+    if created_at is not None and created_at.tzinfo is not None:
+        created_at = created_at.replace(tzinfo=None) - created_at.utcoffset()
+    row["created_at"] = created_at or now
+    return row
+
+
+def rebuild_user_directory(db: Session, batch_size: int = 1000) -> int:
+    """Rewrite the whole directory from the user tables (caller commits)"""
+    db.execute(delete(UserDirectoryEntry))
+    now = datetime.utcnow()
+    total = 0
+    for model, user_type in USER_MODELS.items():
+        batch: List[Dict[str, Any]] = []
+        for user in db.query(model).yield_per(batch_size):
+            batch.append(directory_row(user, user_type, now))
+            if len(batch) >= batch_size:
+                db.execute(UserDirectoryEntry.__table__.insert(), batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            db.execute(UserDirectoryEntry.__table__.insert(), batch)
+            total += len(batch)
+    return total
+
+
+def _record_flush(session: Session, flush_context: Any) -> None:
+    """Rewrite the directory rows of users inserted, changed or deleted by this flush"""
+    now = datetime.utcnow()
+    removed: List[Key] = []
+    rows: List[Dict[str, Any]] = []
+
+    for obj in session.new:
+        user_type = USER_MODELS.get(type(obj))
+        if user_type is not None:
+            rows.append(directory_row(obj, user_type, now))
+    for obj in session.dirty:
+        user_type = USER_MODELS.get(type(obj))
+        if user_type is not None:
+            state = inspect(obj)
+            if any(state.attrs[field].history.has_changes() for field in INDEXED_FIELDS):
+                rows.append(directory_row(obj, user_type, now))
+    for obj in session.deleted:
+        user_type = USER_MODELS.get(type(obj))
+        if user_type is not None:
+            removed.append((user_type, getattr(obj, f"{user_type}_id")))
+
+    keys = removed + [(row["user_type"], row["user_id"]) for row in rows]
+    if not keys:
+        return
+
+    connection = session.connection()
+    connection.execute(delete(UserDirectoryEntry).where(
+        tuple_(UserDirectoryEntry.user_type, UserDirectoryEntry.user_id).in_(keys)
+    ))
+    if rows:
+        connection.execute(UserDirectoryEntry.__table__.insert(), rows)
+
+
+event.listen(Session, "after_flush", _record_flush)
+
+
+# ==================== In-process Index ====================
+
+class UserSearchIndex:
+    """Trigram postings over user_directory, for databases without pg_trgm"""
+
+    def __init__(self, rebuild_seconds: Optional[float] = None):
+        self.rebuild_seconds = (
+            settings.user_search_rebuild_seconds if rebuild_seconds is None else rebuild_seconds
+        )
+        self._docs: Dict[Key, Tuple[str, bool]] = {}
+        self._postings: Dict[str, Set[Key]] = defaultdict(set)
+        self._watermark: Optional[datetime] = None
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _remove(self, key: Key) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        for gram in trigrams(doc[0]):
+            keys = self._postings.get(gram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._postings[gram]
+
+    def _add(self, key: Key, search_text: str, is_active: bool) -> None:
+        self._remove(key)
+        self._docs[key] = (search_text, is_active)
+        for gram in trigrams(search_text):
+            self._postings[gram].add(key)
+
+    def _apply(self, rows: Iterable[Any]) -> None:
+        for row in rows:
+            self._add((row.user_type, row.user_id), row.search_text, row.is_active)
+            if self._watermark is None or row.indexed_at > self._watermark:
+                self._watermark = row.indexed_at
+
+    def _columns(self, db: Session) -> Any:
+        return db.query(
+            UserDirectoryEntry.user_type, UserDirectoryEntry.user_id, UserDirectoryEntry.search_text,
+            UserDirectoryEntry.is_active, UserDirectoryEntry.indexed_at,
+        )
+
+    def refresh(self, db: Session) -> None:
+        """Rebuild when due, otherwise apply rows indexed since the last look"""
+        with self._lock:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.rebuild_seconds:
+                self._docs.clear()
+                self._postings.clear()
+                self._watermark = None
+                self._apply(self._columns(db))
+                self._loaded_at = time.monotonic()
+            elif self._watermark is not None:
+                self._apply(self._columns(db).filter(
+                    UserDirectoryEntry.indexed_at >= self._watermark - CATCH_UP_MARGIN
+                ))
+            else:
+                self._apply(self._columns(db))
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._loaded_at = None
+
+    def rank(self, query: str, user_type: Optional[str] = None,
+             is_active: Optional[bool] = None) -> List[Tuple[float, str, int]]:
+        """Matching keys as (score, user_type, user_id), best first"""
+        query_grams = trigrams(query)
+        with self._lock:
+            overlap: Counter = Counter()
+            for gram in query_grams:
+                overlap.update(self._postings.get(gram, ()))
+            if not query_grams or len(query) < 3:
+                # Short queries share few trigrams with mid-word matches; check every document
+                candidates: Iterable[Key] = self._docs.keys()
+            else:
+                candidates = overlap.keys()
+            docs = [(key, self._docs[key]) for key in candidates]
+
+        ranked = []
+        for key, (search_text, active) in docs:
+            if user_type is not None and key[0] != user_type:
+                continue
+            if is_active is not None and active != is_active:
+                continue
+            score = match_score(query, search_text, query_grams)
+            if score is not None:
+                ranked.append((score, key[0], key[1]))
+        ranked.sort(reverse=True)
+        return ranked
+
+
+# ==================== Search ====================
+
+def _search_postgres(db: Session, query: str, user_type: Optional[str], is_active: Optional[bool],
+                     after: Optional[Tuple[float, str, int]], limit: int) -> List[Tuple[float, UserDirectoryEntry]]:
+    db.execute(select(
+        func.set_config("pg_trgm.word_similarity_threshold", str(settings.user_search_min_similarity), True)
+    ))
+    text = UserDirectoryEntry.search_text
+    padded = literal(" ") + text + literal(" ")
+    score = (
+        case(
+            (padded.contains(f" {query} ", autoescape=True), 3),
+            (padded.contains(f" {query}", autoescape=True), 2),
+            (text.contains(query, autoescape=True), 1),
+            else_=0,
+        ) + func.word_similarity(query, text)
+    ).label("score")
+
+    sql = db.query(score, UserDirectoryEntry).filter(
+        text.contains(query, autoescape=True) | literal(query).op("<%")(text)
+    )
+    if user_type is not None:
+        sql = sql.filter(UserDirectoryEntry.user_type == user_type)
+    if is_active is not None:
+        sql = sql.filter(UserDirectoryEntry.is_active == is_active)
+    if after is not None:
+        sql = sql.filter(tuple_(score, UserDirectoryEntry.user_type, UserDirectoryEntry.user_id) < after)
+    return [
+        (float(row_score), entry)
+        for row_score, entry in sql.order_by(
+            score.desc(), UserDirectoryEntry.user_type.desc(), UserDirectoryEntry.user_id.desc()
+        ).limit(limit).all()
+    ]
+
+
+def _search_index(db: Session, query: str, user_type: Optional[str], is_active: Optional[bool],
+                  after: Optional[Tuple[float, str, int]], limit: int) -> List[Tuple[float, UserDirectoryEntry]]:
+    user_search_index.refresh(db)
+    ranked = user_search_index.rank(query, user_type, is_active)
+    if after is not None:
+        ranked = [item for item in ranked if item < after]
+
+    results: List[Tuple[float, UserDirectoryEntry]] = []
+    # Fetch the page from the table; users deleted since the last rebuild drop out here
+    while ranked and len(results) < limit:
+        page, ranked = ranked[:limit - len(results)], ranked[limit - len(results):]
+        entries = {
+            (entry.user_type, entry.user_id): entry
+            for entry in db.query(UserDirectoryEntry).filter(
+                tuple_(UserDirectoryEntry.user_type, UserDirectoryEntry.user_id).in_([key[1:] for key in page])
+            )
+        }
+        results.extend((score, entries[(kind, uid)]) for score, kind, uid in page if (kind, uid) in entries)
+    return results
+
+
+def search_users(
+    db: Session,
+    query: str,
+    user_type: Optional[str] = None,
+    is_active: Optional[bool] = None,
+    limit: int = 20,
+    cursor: Optional[str] = None,
+) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    Users matching ``query``, best match first, ``limit`` at a time. Pass the
+    returned cursor back for the next page; it is None on the last page.
+    """
+    query = normalize_query(query)
+    if not query:
+        return [], None
+    after = decode_cursor(cursor) if cursor else None
+
+    search = _search_postgres if db.get_bind().dialect.name == "postgresql" else _search_index
+    rows = search(db, query, user_type, is_active, after, limit + 1)
+
+    next_cursor = None
+    if len(rows) > limit:
+        score, entry = rows[limit - 1]
+        next_cursor = encode_cursor(score, entry.user_type, entry.user_id)
+
+    return [
+        {
+            "id": entry.user_id,
+            "user_type": entry.user_type,
+            "name": entry.name,
+            "email": entry.email,
+            "phone": entry.phone,
+            "is_active": entry.is_active,
+            "created_at": entry.created_at.isoformat() if entry.created_at else None,
+            "score": round(score, 4),
+        }
+        for score, entry in rows[:limit]
+    ], next_cursor
+
+
+# Global in-process index, used when the database is not PostgreSQL
+user_search_index = UserSearchIndex()
@@ -0,0 +1,86 @@
+"""
+Worker Event Loop - One long-lived asyncio loop per Celery worker process
+
+Celery tasks are synchronous, but the email service is async. Calling
+``asyncio.run`` per task builds and tears down a loop every time, which also
+throws away every pooled SMTP connection bound to that loop. Instead, each
+worker process runs a single loop in a daemon thread and tasks submit their
+coroutines to it.
+"""
+
+import asyncio
+import logging
+import threading
+from typing import Any, Awaitable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerEventLoop:
+    """An event loop running forever in a background thread"""
+
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    @property
+    def is_running(self) -> bool:
+        return self._loop is not None and self._loop.is_running()
+
+    def start(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread if it is not already running"""
+        with self._lock:
+            if self._loop is not None and self._thread is not None and self._thread.is_alive():
+                return self._loop
+
+            loop = asyncio.new_event_loop()
+            started = threading.Event()
+
+            def run_forever() -> None:
+                asyncio.set_event_loop(loop)
+                loop.call_soon(started.set)
+                loop.run_forever()
+
+            self._thread = threading.Thread(target=run_forever, name="worker-event-loop", daemon=True)
+            self._thread.start()
+            started.wait()
+            self._loop = loop
+            logger.info("Started worker event loop")
+            return loop
+
+    def run(self, coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+        """Run a coroutine on the worker loop and block until it finishes"""
+        loop = self.start()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)  # type: ignore[arg-type]
+        return future.result(timeout)
+
+    def stop(self, cleanup: Optional[Awaitable[Any]] = None, timeout: float = 10.0) -> None:
+        """Optionally run a cleanup coroutine, then stop and close the loop"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+
+        if loop is None:
+            return
+
+        if cleanup is not None:
+            try:
+                asyncio.run_coroutine_threadsafe(cleanup, loop).result(timeout)  # type: ignore[arg-type]
+            except Exception as exc:
+                logger.warning(f"Worker event loop cleanup failed: {exc}")
+
+        loop.call_soon_threadsafe(loop.stop)
+        if thread is not None:
+            thread.join(timeout)
+        loop.close()
+        logger.info("Stopped worker event loop")
+
+
+# Process-wide instance; each forked worker process gets its own copy
+worker_loop = WorkerEventLoop()
+
+
+def run_async(coro: Awaitable[Any], timeout: Optional[float] = None) -> Any:
+    """Run a coroutine on this process's worker loop (used by Celery tasks)"""
+    return worker_loop.run(coro, timeout)
@@ -27,7 +27,8 @@ def upload_file(
     file_content: bytes | BinaryIO,
     folder: str,
     public_id: Optional[str] = None,
-    resource_type: str = "auto"
+    resource_type: str = "auto",
+    chunk_size: Optional[int] = None
 ) -> dict:
     """
     Upload a file to Cloudinary
@@ -37,6 +38,8 @@ def upload_file(
         folder: Cloudinary folder path (e.g., 'qr_codes', 'course_materials')
         public_id: Optional custom public ID for the file
         resource_type: Type of resource ('image', 'video', 'raw', 'auto')
+        chunk_size: Upload a file-like object in parts of this many bytes
+            instead of reading it into memory at once
     
     Returns:
         dict: Cloudinary response with 'secure_url', 'public_id', etc.
@@ -53,6 +56,13 @@ def upload_file(
     if public_id:
         upload_params["public_id"] = public_id
     
+    if chunk_size:
+        return cloudinary.uploader.upload_large(
+            file_content,
+            chunk_size=chunk_size,
+            **upload_params
+        )
+    
     result = cloudinary.uploader.upload(
         file_content,
         **upload_params
@@ -0,0 +1,119 @@
+"""
+Benchmark: per-message SMTP connections vs. the pooled EmailService
+
+Starts a local aiosmtpd server as a stand-in for the real SMTP provider and
+sends an assignment announcement to N recipients both ways.
+
+Usage:
+    python scripts/benchmark_smtp_pool.py --recipients 500 --latency-ms 5
+"""
+
+import argparse
+import asyncio
+import os
+import socket
+import sys
+import time
+from email.message import EmailMessage
+
+# Add the parent directory to the path so we can import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import aiosmtplib
+from aiosmtpd.controller import Controller
+
+from app.services.email_service import EmailService
+from app.services.smtp_pool import SMTPConnectionPool
+
+SENDER = "noreply@example.com"
+
+
+class SlowHandler:
+    """Accepts every message, optionally sleeping to emulate a remote server"""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.connections = 0
+        self.messages = 0
+
+    async def handle_EHLO(self, server, session, envelope, hostname, responses):
+        self.connections += 1
+        await asyncio.sleep(self.latency)  # Stand-in for TCP + TLS + AUTH round trips
+        session.host_name = hostname
+        return responses
+
+    async def handle_DATA(self, server, session, envelope):
+        self.messages += 1
+        await asyncio.sleep(self.latency)
+        return "250 OK"
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def send_unpooled(port: int, recipients: list, html: str) -> None:
+    """The previous behaviour: one connection and one message per recipient"""
+    for recipient in recipients:
+        message = EmailMessage()
+        message["From"] = SENDER
+        message["To"] = recipient
+        message["Subject"] = "New Assignment: Essay"
+        message.set_content(html, subtype="html")
+        await aiosmtplib.send(message, hostname="127.0.0.1", port=port, start_tls=False)
+
+
+async def send_pooled(port: int, recipients: list, pool_size: int, batch_size: int) -> SMTPConnectionPool:
+    pool = SMTPConnectionPool(
+        "127.0.0.1",
+        port,
+        start_tls=False,
+        max_connections=pool_size,
+        max_recipients_per_message=batch_size,
+    )
+    service = EmailService(pool=pool)
+    service.sender = SENDER
+    await service.send_assignment_notification(
+        recipients, "Essay", "English", "2025-01-01", "http://localhost:3000/courses/1"
+    )
+    await pool.close()
+    return pool
+
+
+def run(label: str, handler: SlowHandler, coro_factory):
+    handler.connections = handler.messages = 0
+    start = time.perf_counter()
+    result = asyncio.run(coro_factory())
+    elapsed = time.perf_counter() - start
+    print(f"{label:<10} {elapsed:8.3f}s  connections={handler.connections:<5} messages={handler.messages}")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipients", type=int, default=500)
+    parser.add_argument("--latency-ms", type=float, default=5.0)
+    parser.add_argument("--pool-size", type=int, default=4)
+    parser.add_argument("--batch-size", type=int, default=50)
+    args = parser.parse_args()
+
+    handler = SlowHandler(args.latency_ms / 1000)
+    port = free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+
+    recipients = [f"student{i}@example.com" for i in range(args.recipients)]
+    html = "<html><body><p>A new assignment has been posted.</p></body></html>"
+
+    print(f"Sending to {args.recipients} recipients, {args.latency_ms}ms simulated server latency\n")
+    try:
+        run("unpooled", handler, lambda: send_unpooled(port, recipients, html))
+        run("pooled", handler, lambda: send_pooled(port, recipients, args.pool_size, args.batch_size))
+    finally:
+        controller.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Load test: check-then-insert enrollment vs. atomic seat reservation
+
+Fires N concurrent enrollment attempts at one course with M seats, once with
+the previous logic (count active enrollments, then insert) and once with
+enroll_student (conditional UPDATE on courses.seats_taken), and reports how
+many students got in, request latency and throughput.
+
+The race in check-then-insert shows up on PostgreSQL, where concurrent
+transactions read the same count. SQLite serializes writers, so use a scratch
+PostgreSQL database to see the difference:
+
+Usage:
+    python scripts/load_test_enrollment.py --database-url postgresql://.../scratch --requests 300 --seats 25
+
+Without --database-url a temporary SQLite file is used. The script creates its
+own course and students and deletes them afterwards.
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, List, Tuple
+
+# Add the parent directory to the path so we can import app
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models import Course, CourseWaitlistEntry, Enrollment, Student
+from app.services.enrollment_seats import AlreadyEnrolled, CourseFull, enroll_student
+
+
+def check_then_insert(db: Session, course_id: int, student_id: int) -> str:
+    """The previous enroll endpoint: count, compare, insert"""
+    course = db.query(Course).filter(Course.course_id == course_id).first()
+    if db.query(Enrollment).filter(
+        Enrollment.student_id == student_id, Enrollment.course_id == course_id
+    ).first():
+        db.rollback()
+        return "already_enrolled"
+    current = db.query(Enrollment).filter(
+        Enrollment.course_id == course_id, Enrollment.status == "active"
+    ).count()
+    if course.max_students is not None and current >= course.max_students:
+        db.rollback()
+        return "full"
+    db.add(Enrollment(student_id=student_id, course_id=course_id, paid=False, payment_due=course.start_time))
+    db.commit()
+    return "enrolled"
+
+
+def reserve(db: Session, course_id: int, student_id: int) -> str:
+    try:
+        return enroll_student(db, course_id, student_id).status
+    except CourseFull:
+        return "full"
+    except AlreadyEnrolled:
+        return "already_enrolled"
+
+
+def make_engine(url: str):
+    if not url.startswith("sqlite"):
+        return create_engine(url, pool_size=50, max_overflow=50)
+
+    engine = create_engine(url, connect_args={"check_same_thread": False, "timeout": 60})
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection, record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection):
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+def setup(factory, requests: int, seats: int) -> Tuple[int, List[int]]:
+    tag = uuid.uuid4().hex[:8]
+    db = factory()
+    now = datetime.utcnow()
+    course = Course(title=f"Load test {tag}", start_time=now, end_time=now, price=0.0, max_students=seats)
+    students = [
+        Student(name=f"Load {i}", email=f"loadtest-{tag}-{i}@example.com", password="x",
+                parent_email="parent@example.com", parent_phone="0")
+        for i in range(requests)
+    ]
+    db.add(course)
+    db.add_all(students)
+    db.commit()
+    ids = course.course_id, [s.student_id for s in students]
+    db.close()
+    return ids
+
+
+def teardown(factory, course_id: int, student_ids: List[int]) -> None:
+    db = factory()
+    db.query(CourseWaitlistEntry).filter(CourseWaitlistEntry.course_id == course_id).delete()
+    for enrollment in db.query(Enrollment).filter(Enrollment.course_id == course_id):
+        db.delete(enrollment)
+    db.query(Student).filter(Student.student_id.in_(student_ids)).delete(synchronize_session=False)
+    db.query(Course).filter(Course.course_id == course_id).delete()
+    db.commit()
+    db.close()
+
+
+def run(factory, attempt: Callable[[Session, int, int], str], requests: int, seats: int) -> Dict[str, object]:
+    course_id, student_ids = setup(factory, requests, seats)
+    latencies: List[float] = []
+    outcomes: Dict[str, int] = {}
+    lock = threading.Lock()
+    barrier = threading.Barrier(requests)
+
+    def worker(student_id: int) -> None:
+        db = factory()
+        barrier.wait()
+        started = time.perf_counter()
+        try:
+            outcome = attempt(db, course_id, student_id)
+        except Exception as exc:
+            db.rollback()
+            outcome = f"error:{type(exc).__name__}"
+        finally:
+            db.close()
+        with lock:
+            latencies.append(time.perf_counter() - started)
+            outcomes[outcome] = outcomes.get(outcome, 0) + 1
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(sid,)) for sid in student_ids]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    db = factory()
+    enrolled = db.query(Enrollment).filter(Enrollment.course_id == course_id, Enrollment.status == "active").count()
+    db.close()
+    teardown(factory, course_id, student_ids)
+
+    latencies.sort()
+    return {
+        "enrolled": enrolled,
+        "oversubscribed_by": max(enrolled - seats, 0),
+        "outcomes": outcomes,
+        "requests_per_second": round(requests / elapsed, 1),
+        "p50_ms": round(statistics.median(latencies) * 1000, 1),
+        "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1] * 1000, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=None, help="Scratch database (default: temporary SQLite file)")
+    parser.add_argument("--requests", type=int, default=200, help="Concurrent enrollment attempts")
+    parser.add_argument("--seats", type=int, default=20, help="Course capacity")
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'enrollment_load.db')}"
+    factory = sessionmaker(bind=make_engine(url))
+
+    print(f"{args.requests} concurrent enrollments into {args.seats} seats ({url.split('://')[0]})")
+    for label, attempt in (("check-then-insert", check_then_insert), ("seat reservation", reserve)):
+        result = run(factory, attempt, args.requests, args.seats)
+        print(f"\n{label}")
+        for key, value in result.items():
+            print(f"  {key:20} {value}")
+
+
+if __name__ == "__main__":
+    main()
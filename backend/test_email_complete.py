@@ -13,7 +13,7 @@ print("="*60 + "\n")
 # Test 1: Email service initialization
 print("✓ Test 1: Email Service Initialization")
 print(f"  Status: {'✅ ENABLED' if email_service.enabled else '❌ DISABLED'}")
-print(f"  FastMail: {'✅ Available' if email_service.fast_mail else '❌ Not Available'}")
+print(f"  SMTP Pool: {'✅ Available' if email_service.pool else '❌ Not Available'}")
 print()
 
 # Test 2: Configuration
@@ -55,7 +55,7 @@ print()
 
 # Test 5: Email service status
 print("✓ Test 5: Email Service Status")
-if email_service.enabled and email_service.fast_mail:
+if email_service.enabled and email_service.pool:
     print("  ✅ Email service is fully functional")
     print("  Ready to send:")
     print("    • Password reset emails")
@@ -30,7 +30,7 @@ try:
     from app.services.email_service import email_service
     print(f"\n✅ Email service loaded")
     print(f"   Email service enabled: {email_service.enabled}")
-    print(f"   FastMail instance created: {email_service.fast_mail is not None}")
+    print(f"   SMTP pool created: {email_service.pool is not None}")
 except Exception as e:
     print(f"❌ Failed to load email service: {e}")
     import traceback
@@ -0,0 +1,146 @@
+"""Tests for the append-only activity log and its keyset-paged feed."""
+
+import asyncio
+import subprocess
+import sys
+from collections.abc import Generator
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.api.admin import get_recent_users
+from app.core.database import Base
+from app.models import ActivityEvent, Assignment, AssignmentSubmission, Course, Enrollment, Student
+from app.services.activity_log import InvalidCursor, list_activity, serialize_event, set_activity_actor
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _student(db: Session, name: str) -> Student:
+    student = Student(name=name, email=f"{name.lower()}@example.com", password="x",
+                      parent_email="p@example.com", parent_phone="1")
+    db.add(student)
+    db.commit()
+    return student
+
+
+def test_changes_are_logged_in_the_same_flush(db_session: Session) -> None:
+    now = datetime.utcnow()
+    student = _student(db_session, "Ann")
+    course = Course(title="Math", start_time=now, end_time=now, price=100.0)
+    db_session.add(course)
+    db_session.commit()
+
+    set_activity_actor(db_session, "admin", 7)
+    enrollment = Enrollment(student_id=student.student_id, course_id=course.course_id)
+    db_session.add(enrollment)
+    db_session.commit()
+    enrollment.paid = True
+    enrollment.paid_date = now
+    course.price = 120.0
+    db_session.commit()
+
+    assignment = Assignment(course_id=course.course_id, title="Quiz 1", description="d",
+                            due_date=now, max_points=10, created_by_id=1)
+    db_session.add(assignment)
+    db_session.flush()
+    submission = AssignmentSubmission(assignment_id=assignment.assignment_id, student_id=student.student_id)
+    db_session.add(submission)
+    db_session.commit()
+    submission.grade = 9.0
+    db_session.commit()
+
+    # A rolled back change leaves no event behind
+    enrollment.status = "dropped"
+    db_session.flush()
+    db_session.rollback()
+
+    events, _ = list_activity(db_session, limit=50)
+    types = [item.event_type for item in reversed(events)]
+    assert types == ["user_registered", "course_created", "enrollment_created",
+                     "payment_received", "course_updated", "grade_recorded"]
+
+    payment = serialize_event(events[2])
+    assert (payment["type"], payment["user_name"]) == ("payment", "Ann")
+    assert payment["description"] == "Payment received for Math"
+    assert (payment["actor_type"], payment["actor_id"]) == ("admin", 7)
+    assert serialize_event(events[1])["details"] == {"price": [100.0, 120.0]}
+
+
+def test_feed_pages_with_a_keyset_cursor(db_session: Session) -> None:
+    for i in range(5):
+        _student(db_session, f"S{i}")
+
+    first, cursor = list_activity(db_session, limit=2)
+    second, cursor_2 = list_activity(db_session, limit=2, cursor=cursor)
+    third, cursor_3 = list_activity(db_session, limit=2, cursor=cursor_2)
+
+    names = [item.user_name for item in first + second + third]
+    assert names == ["S4", "S3", "S2", "S1", "S0"]
+    assert cursor_3 is None
+
+    registered, _ = list_activity(db_session, event_types=["user_registered"], user_type="student", limit=10)
+    assert len(registered) == 5
+    with pytest.raises(InvalidCursor):
+        list_activity(db_session, cursor="not-a-cursor")
+
+
+def test_events_cannot_be_modified(db_session: Session) -> None:
+    _student(db_session, "Ann")
+    event = db_session.query(ActivityEvent).one()
+    event.description = "rewritten"
+    with pytest.raises(RuntimeError):
+        db_session.commit()
+
+
+def test_recent_users_report_the_live_active_flag(db_session: Session) -> None:
+    ann = _student(db_session, "Ann")
+    _student(db_session, "Bob")
+    ann.is_active = False
+    db_session.commit()
+
+    users = asyncio.run(get_recent_users(limit=10, current_user=None, db=db_session))
+
+    assert [(user["name"], user["is_active"]) for user in users] == [("Bob", True), ("Ann", False)]
+
+
+WORKER_SCRIPT = """
+import sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.services.celery_app  # what a worker loads; the API routers are never imported
+from app.core.database import Base
+from app.models import ActivityEvent, Student
+
+assert "app.api.auth" not in sys.modules
+engine = create_engine("sqlite:///:memory:")
+Base.metadata.create_all(bind=engine)
+db = sessionmaker(bind=engine)()
+db.add(Student(name="Ann", email="ann@example.com", password="x", parent_email="p@example.com", parent_phone="1"))
+db.commit()
+print(db.query(ActivityEvent.event_type).scalar())
+"""
+
+
+def test_changes_made_by_workers_are_logged() -> None:
+    # A fresh interpreter: this one has already imported every module
+    result = subprocess.run(
+        [sys.executable, "-c", WORKER_SCRIPT],
+        cwd=Path(__file__).resolve().parents[1], capture_output=True, text=True, check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == "user_registered"
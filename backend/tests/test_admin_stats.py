@@ -0,0 +1,98 @@
+"""Tests for the precomputed admin dashboard stats and revenue summary."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models import Attendance, Course, Enrollment, Student, Teacher
+from app.services.admin_stats import (
+    attendance_analytics, enrollment_analytics, get_dashboard_stats, revenue_analytics
+)
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _seed(db: Session) -> None:
+    now = datetime.utcnow()
+    math = Course(title="Math", start_time=now, end_time=now, price=100.0)
+    art = Course(title="Art", start_time=now, end_time=now, price=40.0)
+    db.add_all([math, art, Teacher(name="T", email="t@example.com", password="x")])
+    db.flush()
+
+    paid_dates = [now - timedelta(days=5), now - timedelta(days=45), None]
+    for i in range(6):
+        student = Student(name=f"S{i}", email=f"s{i}@example.com", password="x",
+                          parent_email="p@example.com", parent_phone="1")
+        db.add(student)
+        db.flush()
+        course = math if i % 2 == 0 else art
+        paid_date = paid_dates[i % 3] if i < 5 else None
+        db.add(Enrollment(student_id=student.student_id, course_id=course.course_id,
+                          paid=i < 5, paid_date=paid_date, status="active" if i < 4 else "dropped"))
+        db.add(Attendance(student_id=student.student_id, course_id=course.course_id,
+                          attendance_date=now, status="present" if i < 3 else "absent"))
+    db.commit()
+
+
+def test_dashboard_snapshot_matches_the_data_and_is_reused(db_session: Session) -> None:
+    _seed(db_session)
+
+    stats = get_dashboard_stats(db_session)
+    assert (stats.total_students, stats.total_teachers, stats.total_courses) == (6, 1, 2)
+    assert (stats.active_enrollments, stats.pending_payments) == (4, 1)
+    # Paid: S0 math, S1 art, S2 math, S3 art, S4 math
+    assert stats.total_revenue == 380.0
+    # Paid in the last 30 days: S0 (math) and S3 (art)
+    assert stats.monthly_revenue == 140.0
+    assert stats.average_attendance == 50.0
+
+    statements: list[str] = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    get_dashboard_stats(db_session)
+    assert len(statements) == 1
+
+
+def test_revenue_analytics_reads_the_monthly_summary(db_session: Session) -> None:
+    _seed(db_session)
+    now = datetime.utcnow()
+
+    analytics = revenue_analytics(db_session)
+
+    monthly = {row["month"]: row["revenue"] for row in analytics["monthlyRevenue"]}
+    assert monthly[(now - timedelta(days=5)).strftime("%Y-%m")] >= 140.0
+    assert sum(monthly.values()) == 280.0  # Undated payments are left out of the months
+    courses = {row["course"]: (row["enrollments"], row["revenue"]) for row in analytics["courseRevenue"]}
+    assert courses == {"Math": (3, 300.0), "Art": (2, 80.0)}
+
+
+def test_enrollment_and_attendance_analytics_aggregate_in_sql(db_session: Session) -> None:
+    _seed(db_session)
+
+    enrollment = enrollment_analytics(db_session)
+    by_course = {row["course"]: row["enrolled"] for row in enrollment["courseEnrollments"]}
+    assert by_course == {"Math": 3, "Art": 3}
+    assert {row["status"]: row["count"] for row in enrollment["statusBreakdown"]} == {"active": 4, "dropped": 2}
+    assert sum(row["count"] for row in enrollment["monthlyTrend"]) == 6
+
+    attendance = attendance_analytics(db_session)
+    rows = {row["course"]: row for row in attendance["courseAttendance"]}
+    # Present: S0, S2 (math) and S1 (art)
+    assert (rows["Math"]["present"], rows["Math"]["absent"]) == (2, 1)
+    assert rows["Art"]["attendanceRate"] == 33.3
+    assert attendance["topStudents"][0]["present"] == 1
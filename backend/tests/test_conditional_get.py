@@ -0,0 +1,164 @@
+"""Tests for resource validators, conditional responses and the ETag middleware."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import PlainTextResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models.models import Course, Material, Student, Teacher
+from app.services.conditional_get import ETagMiddleware, not_modified, resource_version
+from app.services.enrollment_seats import enroll_student
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _course(title: str) -> Course:
+    start = datetime(2026, 1, 5, 9)
+    # An old created_at, so the update timestamp always differs from it
+    return Course(title=title, start_time=start, end_time=start + timedelta(hours=2), price=10.0,
+                  max_students=5, created_at=datetime(2025, 1, 1))
+
+
+def test_version_changes_with_every_kind_of_write(db_session: Session) -> None:
+    course = _course("Algebra")
+    db_session.add(course)
+    db_session.commit()
+    versions = [resource_version(db_session, Course).version]
+
+    db_session.add(_course("Geometry"))
+    db_session.commit()
+    versions.append(resource_version(db_session, Course).version)
+
+    course.title = "Algebra I"
+    db_session.commit()
+    versions.append(resource_version(db_session, Course).version)
+
+    db_session.delete(db_session.query(Course).filter(Course.title == "Geometry").one())
+    db_session.commit()
+    versions.append(resource_version(db_session, Course).version)
+
+    assert len(set(versions)) == len(versions)
+    assert resource_version(db_session, Course).version == resource_version(db_session, Course).version
+
+
+def test_related_changes_bump_course_updated_at(db_session: Session) -> None:
+    course, teacher = _course("Algebra"), Teacher(name="Anna", email="anna@school.org", password="x")
+    db_session.add_all([course, teacher])
+    db_session.commit()
+    assert course.updated_at is None
+
+    course.teachers.append(teacher)  # Listed as teacher_ids
+    db_session.commit()
+    assert course.updated_at is not None
+
+    course.updated_at = None
+    db_session.commit()
+    student = Student(name="Sam", email="sam@example.com", password="x", parent_email="p@example.com",
+                      parent_phone="1")
+    db_session.add(student)
+    db_session.commit()
+    enroll_student(db_session, course.course_id, student.student_id)  # Listed as enrolled_count
+    db_session.refresh(course)
+    assert course.updated_at is not None
+
+
+def test_collection_etag_and_304(db_session: Session) -> None:
+    course = _course("Algebra")
+    db_session.add(course)
+    db_session.commit()
+    loads = []
+
+    api = FastAPI()
+
+    @api.get("/materials")
+    async def materials(request: Request, response: Response):
+        cached = not_modified(request, response, resource_version(
+            db_session, Material, Material.course_id == course.course_id, changed_at=[Material.upload_date]
+        ))
+        if cached:
+            return cached
+        loads.append(1)
+        return [m.title for m in db_session.query(Material)]
+
+    client = TestClient(api)
+    first = client.get("/materials")
+    etag = first.headers["etag"]
+    assert first.status_code == 200 and etag.startswith('W/"')
+    assert first.headers["cache-control"] == "private, no-cache"
+
+    again = client.get("/materials", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b"" and again.headers["etag"] == etag
+    assert client.get("/materials?page=2", headers={"If-None-Match": etag}).status_code == 200
+
+    # Collections ignore If-Modified-Since: it cannot see deletes
+    assert client.get("/materials", headers={"If-Modified-Since": "Fri, 01 Jan 2100 00:00:00 GMT"}).status_code == 200
+
+    db_session.add(Material(course_id=course.course_id, title="Notes", type="pdf", url="/n.pdf"))
+    db_session.commit()
+    changed = client.get("/materials", headers={"If-None-Match": etag})
+    assert changed.status_code == 200 and changed.json() == ["Notes"]
+    assert len(loads) == 4
+
+
+def test_single_row_honours_if_modified_since(db_session: Session) -> None:
+    course = _course("Algebra")
+    db_session.add(course)
+    db_session.commit()
+
+    api = FastAPI()
+
+    @api.get("/course")
+    async def get_course(request: Request, response: Response):
+        validator = resource_version(db_session, Course, Course.course_id == course.course_id, single=True)
+        return not_modified(request, response, validator) or {"title": course.title}
+
+    client = TestClient(api)
+    last_modified = client.get("/course").headers["last-modified"]
+    assert last_modified == "Wed, 01 Jan 2025 00:00:00 GMT"
+    assert client.get("/course", headers={"If-Modified-Since": last_modified}).status_code == 304
+    assert client.get("/course", headers={"If-Modified-Since": "Tue, 31 Dec 2024 00:00:00 GMT"}).status_code == 200
+
+
+def test_middleware_hashes_json_bodies() -> None:
+    api = FastAPI()
+    payload = {"value": 1}
+
+    @api.get("/data")
+    async def data():
+        return payload
+
+    @api.get("/text")
+    async def text():
+        return PlainTextResponse("hello")
+
+    api.add_middleware(ETagMiddleware, max_body_bytes=1024)
+    client = TestClient(api)
+
+    first = client.get("/data")
+    etag = first.headers["etag"]
+    cached = client.get("/data", headers={"If-None-Match": etag})
+    assert cached.status_code == 304 and cached.content == b""
+
+    payload["value"] = 2
+    assert client.get("/data", headers={"If-None-Match": etag}).json() == {"value": 2}
+    assert "etag" not in client.get("/text").headers
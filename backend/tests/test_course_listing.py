@@ -0,0 +1,57 @@
+"""Tests for course serialization without per-course lazy loads."""
+
+from collections.abc import Generator
+from datetime import datetime
+from typing import List
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.api.courses import course_responses
+from app.core.database import Base
+from app.models import Course, Enrollment, Student, Teacher
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_course_list_costs_a_constant_number_of_queries(db_session: Session) -> None:
+    now = datetime.utcnow()
+    teachers = [Teacher(name=f"T{i}", email=f"t{i}@example.com", password="x") for i in range(3)]
+    students = [Student(name=f"S{i}", email=f"s{i}@example.com", password="x",
+                        parent_email="p@example.com", parent_phone="1") for i in range(4)]
+    courses = [Course(title=f"C{i}", start_time=now, end_time=now, price=10.0, admin_id=1) for i in range(20)]
+    for i, course in enumerate(courses):
+        course.teachers = teachers[: i % 3]
+    db_session.add_all(teachers + students + courses)
+    db_session.flush()
+    for i, student in enumerate(students):
+        db_session.add(Enrollment(student_id=student.student_id, course_id=courses[0].course_id,
+                                  status="active" if i < 3 else "dropped"))
+    db_session.commit()
+    db_session.expire_all()
+
+    statements: List[str] = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+    loaded = db_session.query(Course).order_by(Course.course_id).all()
+    responses = course_responses(db_session, loaded)
+
+    assert len(statements) == 3
+    by_title = {response.title: response for response in responses}
+    assert by_title["C0"].enrolled_count == 3
+    assert by_title["C1"].enrolled_count == 0
+    assert [by_title[f"C{i}"].teacher_ids for i in range(3)] == [
+        [], [teachers[0].teacher_id], [teachers[0].teacher_id, teachers[1].teacher_id]
+    ]
@@ -0,0 +1,131 @@
+"""Tests for the course catalog search: ranking, facets and cursor paging."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models.models import Course, OnlineCourse, Teacher
+from app.services.course_search import (
+    CourseFilters, InvalidCursor, course_search_index, query_words, search_courses, stem, tsquery_text
+)
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    course_search_index.invalidate()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _course(title: str, description: str = "", price: float = 100.0, is_online: bool = False,
+            status: str = "active", teachers=(), difficulty=None) -> Course:
+    start = datetime(2026, 1, 5, 9)
+    course = Course(title=title, description=description, start_time=start, end_time=start + timedelta(hours=2),
+                    price=price, is_online=is_online, status=status, teachers=list(teachers))
+    if difficulty:
+        course.online_course = OnlineCourse(difficulty_level=difficulty)
+    return course
+
+
+def _seed(db: Session) -> None:
+    anna = Teacher(name="Anna", email="anna@school.org", password="x")
+    ben = Teacher(name="Ben", email="ben@school.org", password="x")
+    db.add_all([
+        _course("Python Programming", "Learn variables and functions", 200.0, True, teachers=[anna],
+                difficulty="beginner"),
+        _course("Data Science", "Statistics and python notebooks", 350.0, True, teachers=[anna, ben],
+                difficulty="advanced"),
+        _course("Pottery", "Hands-on clay courses", 80.0, teachers=[ben]),
+        _course("Programming Contests", "Algorithms", 120.0, status="completed"),
+    ])
+    db.commit()
+
+
+def _titles(courses) -> list:
+    return [course.title for course in courses]
+
+
+def test_text_helpers() -> None:
+    assert query_words("The Python, and DATA!") == ["python", "data"]
+    assert [stem(word) for word in ("courses", "classes", "studies", "class", "status")] == [
+        "course", "classe", "study", "class", "status"
+    ]
+    assert tsquery_text(["python", "prog"]) == "python & prog:*"
+
+
+def test_title_matches_rank_first_and_prefix_matches(db_session: Session) -> None:
+    _seed(db_session)
+
+    courses, facets, next_cursor = search_courses(db_session, "python")
+    assert _titles(courses) == ["Python Programming", "Data Science"]
+    assert facets["total"] == 2 and next_cursor is None
+
+    assert sorted(_titles(search_courses(db_session, "progr")[0])) == ["Programming Contests", "Python Programming"]
+    assert _titles(search_courses(db_session, "python programming")[0]) == ["Python Programming"]
+    assert _titles(search_courses(db_session, "course")[0]) == ["Pottery"]  # "courses" in the description
+    assert search_courses(db_session, "cobol")[0] == []
+
+
+def test_facets_leave_out_their_own_filter(db_session: Session) -> None:
+    _seed(db_session)
+    anna_id = db_session.query(Teacher.teacher_id).filter(Teacher.name == "Anna").scalar()
+
+    courses, facets, _ = search_courses(db_session, None, CourseFilters(is_online=True, status="active"))
+    assert sorted(_titles(courses)) == ["Data Science", "Python Programming"]
+    assert facets["total"] == 2
+    assert facets["mode"] == {"online": 2, "offline": 1}  # Counted without is_online
+    assert facets["status"] == {"active": 2}
+    assert facets["difficulty"] == {"beginner": 1, "advanced": 1}
+    assert facets["price"] == {"min": 200.0, "max": 350.0}
+    assert facets["teachers"] == {anna_id: 2, anna_id + 1: 1}
+
+    courses, facets, _ = search_courses(
+        db_session, "python", CourseFilters(teacher_ids=[anna_id + 1], min_price=300)
+    )
+    assert _titles(courses) == ["Data Science"]
+    assert facets["teachers"] == {anna_id: 1, anna_id + 1: 1}
+    assert facets["price"] == {"min": 350.0, "max": 350.0}  # Python courses taught by Ben
+
+
+def test_cursor_pages_cover_every_match_once(db_session: Session) -> None:
+    db_session.add_all([_course(f"Algebra {i}", "algebra practice" * (i % 3 + 1)) for i in range(7)])
+    db_session.commit()
+
+    for query in ("algebra", None):
+        seen, cursor = [], None
+        while True:
+            courses, facets, cursor = search_courses(db_session, query, limit=3, cursor=cursor)
+            seen.extend(course.course_id for course in courses)
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen)) == facets["total"] == 7
+
+    with pytest.raises(InvalidCursor):
+        search_courses(db_session, "algebra", cursor="bogus")
+
+
+def test_index_catches_up_with_changes(db_session: Session) -> None:
+    _seed(db_session)
+    assert search_courses(db_session, "ceramics")[0] == []
+
+    pottery = db_session.query(Course).filter(Course.title == "Pottery").one()
+    pottery.description = "Ceramics for beginners"
+    db_session.add(_course("Ceramics II"))
+    db_session.commit()
+
+    assert _titles(search_courses(db_session, "ceramics")[0]) == ["Ceramics II", "Pottery"]
+
+    db_session.delete(pottery)
+    db_session.commit()
+    assert _titles(search_courses(db_session, "ceramics")[0]) == ["Ceramics II"]
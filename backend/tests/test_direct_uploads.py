@@ -0,0 +1,176 @@
+"""Tests for direct uploads: intents, the local presigned PUT and completion callbacks."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+from urllib.parse import parse_qs, urlsplit
+
+import cloudinary.utils
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  (registers every table)
+from app.api import materials
+from app.api.auth import get_current_user
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.models.models import Admin, Course, Material
+from app.services import direct_uploads
+from app.services.direct_uploads import InvalidUploadIntent, complete_intent, create_intent, read_intent
+from app.services.uploads import UploadTooLarge
+
+
+@pytest.fixture()
+def db_session(tmp_path, monkeypatch) -> Generator[Session, None, None]:
+    monkeypatch.setattr(settings, "upload_spool_dir", str(tmp_path / "spool"))
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "use_cloudinary", False)
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture()
+def client(db_session: Session) -> TestClient:
+    admin = Admin(name="Ada", email="ada@school.org", password="x")
+    start = datetime(2026, 1, 5, 9)
+    db_session.add_all([
+        admin,
+        Course(title="Algebra", start_time=start, end_time=start + timedelta(hours=2), price=10.0, admin_id=1),
+    ])
+    db_session.commit()
+
+    api = FastAPI()
+    api.include_router(materials.router, prefix="/api/v1")
+    api.dependency_overrides[get_db] = lambda: db_session
+    api.dependency_overrides[get_current_user] = lambda: {"user": admin, "user_type": "admin"}
+    return TestClient(api)
+
+
+def _intent(client: TestClient, course_id: int = 1) -> dict:
+    response = client.post(f"/api/v1/courses/{course_id}/materials/upload-intent", json={"filename": "notes.pdf"})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_local_direct_upload_flow(client: TestClient, db_session: Session) -> None:
+    intent = _intent(client)
+    assert intent["storage"] == "local" and intent["method"] == "PUT"
+
+    complete = {"intent_token": intent["intent_token"], "title": "Notes", "is_public": True}
+    assert client.post("/api/v1/courses/1/materials/complete-upload", json=complete).status_code == 400
+
+    uploaded = client.put(intent["upload_url"], content=b"%PDF-1.4 notes")
+    assert uploaded.status_code == 200 and uploaded.headers["etag"]
+    assert client.put(intent["upload_url"], content=b"again").status_code == 409
+
+    material = client.post("/api/v1/courses/1/materials/complete-upload", json=complete).json()
+    assert (material["type"], material["file_size"]) == ("pdf", 14)
+    assert material["url"].startswith("/uploads/materials/") and material["url"].endswith(".pdf")
+
+    # Retried callbacks do not record the material twice
+    again = client.post("/api/v1/courses/1/materials/complete-upload", json=complete).json()
+    assert again["material_id"] == material["material_id"]
+    assert db_session.query(Material).count() == 1
+
+
+def test_presigned_put_is_checked(client: TestClient) -> None:
+    intent = _intent(client)
+    url = urlsplit(intent["upload_url"])
+    query = {name: values[0] for name, values in parse_qs(url.query).items()}
+
+    tampered = {**query, "max_bytes": str(int(query["max_bytes"]) * 2)}
+    assert client.put(url.path, params=tampered, content=b"x").status_code == 403
+    assert client.put("/api/v1/direct-uploads/materials/other.pdf", params=query, content=b"x").status_code == 403
+
+    small = create_intent("material", 1, "admin:1", "big.mp4", "course_materials", "materials", max_bytes=10)
+    assert client.put(small.upload_url, content=b"x" * 11).status_code == 413
+    assert client.put(small.upload_url, content=b"x" * 10).status_code == 200
+
+
+def test_intent_is_bound_to_its_target_and_user(client: TestClient) -> None:
+    token = _intent(client)["intent_token"]
+    assert read_intent(token, "material", 1, "admin:1")["storage"] == "local"
+    for purpose, target, user in [("submission", 1, "admin:1"), ("material", 2, "admin:1"), ("material", 1, "admin:2")]:
+        with pytest.raises(InvalidUploadIntent):
+            read_intent(token, purpose, target, user)
+    with pytest.raises(InvalidUploadIntent):
+        read_intent(token + "x", "material", 1, "admin:1")
+
+
+def test_cloudinary_completion_verifies_the_response_signature(monkeypatch) -> None:
+    stored = {"bytes": 2048}
+    monkeypatch.setattr(direct_uploads, "get_file_info", lambda public_id, resource_type: dict(stored))
+    monkeypatch.setattr(direct_uploads, "delete_file", lambda public_id, resource_type: None)
+    monkeypatch.setattr(settings, "use_cloudinary", True)
+    monkeypatch.setattr(settings, "cloudinary_cloud_name", "demo")
+    monkeypatch.setattr(settings, "cloudinary_api_key", "key")
+    monkeypatch.setattr(settings, "cloudinary_api_secret", "secret")
+
+    intent = create_intent("material", 1, "admin:1", "notes.pdf", "course_materials", "materials", resource_type="raw")
+    assert intent.method == "POST" and intent.upload_url == "https://api.cloudinary.com/v1_1/demo/raw/upload"
+    fields = intent.fields
+    assert fields["signature"] == cloudinary.utils.api_sign_request(
+        {"folder": fields["folder"], "public_id": fields["public_id"], "timestamp": fields["timestamp"]}, "secret"
+    )
+
+    claims = read_intent(intent.intent_token, "material", 1, "admin:1")
+    public_id = f"course_materials/{fields['public_id']}"
+    result = {
+        "public_id": public_id,
+        "version": 1700000000,
+        "signature": cloudinary.utils.api_sign_request({"public_id": public_id, "version": 1700000000}, "secret"),
+        "secure_url": f"https://res.cloudinary.com/demo/raw/upload/v1700000000/{public_id}",
+        "bytes": 2048,
+    }
+    uploaded = complete_intent(claims, result)
+    assert (uploaded.url, uploaded.size, uploaded.storage) == (result["secure_url"], 2048, "cloudinary")
+
+    for bad in ({"signature": "forged"}, {"public_id": "course_materials/other"},
+                {"secure_url": f"https://evil.example.com/v1700000000/{public_id}"}):
+        with pytest.raises(InvalidUploadIntent):
+            complete_intent(claims, {**result, **bad})
+
+
+def test_oversized_cloudinary_upload_is_deleted_and_rejected(monkeypatch) -> None:
+    deleted = []
+    stored = {"bytes": 5000}
+    monkeypatch.setattr(direct_uploads, "get_file_info", lambda public_id, resource_type: dict(stored))
+    monkeypatch.setattr(direct_uploads, "delete_file",
+                        lambda public_id, resource_type: deleted.append((public_id, resource_type)))
+    monkeypatch.setattr(settings, "use_cloudinary", True)
+    monkeypatch.setattr(settings, "cloudinary_cloud_name", "demo")
+    monkeypatch.setattr(settings, "cloudinary_api_secret", "secret")
+
+    intent = create_intent("material", 1, "admin:1", "notes.pdf", "course_materials", "materials",
+                           resource_type="raw", max_bytes=4096)
+    claims = read_intent(intent.intent_token, "material", 1, "admin:1")
+    public_id = f"course_materials/{intent.fields['public_id']}"
+    result = {
+        "public_id": public_id,
+        "version": 1700000000,
+        "signature": cloudinary.utils.api_sign_request({"public_id": public_id, "version": 1700000000}, "secret"),
+        "secure_url": f"https://res.cloudinary.com/demo/raw/upload/v1700000000/{public_id}",
+        "bytes": 5000,
+    }
+
+    # The response's size is not signed: understating it or leaving it out does not help
+    for reported in (5000, 100, None):
+        with pytest.raises(UploadTooLarge):
+            complete_intent(claims, {**result, "bytes": reported})
+    stored["bytes"] = 1000
+    for reported in (100, None):
+        with pytest.raises(InvalidUploadIntent):
+            complete_intent(claims, {**result, "bytes": reported})
+    assert deleted == [(public_id, "raw")] * 5
+    assert complete_intent(claims, {**result, "bytes": 1000}).size == 1000
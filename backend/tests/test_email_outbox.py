@@ -0,0 +1,237 @@
+"""Tests for the email outbox claim/deliver/backoff cycle."""
+
+import asyncio
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import Base
+from app.models.email_models import EmailLog
+from app.services.email_dedup import DedupIndex
+from app.services.email_outbox import enqueue_email, process_outbox
+from app.services.rate_limiter import RateLimitExceeded
+
+
+class FakeEmailService:
+    """Records deliveries and fails for addresses listed in ``failing``; ``backlog`` is the rate limiter's wait."""
+
+    def __init__(self, failing: set[str] | None = None, backlog: float = 0.0) -> None:
+        self.failing = failing or set()
+        self.backlog = backlog
+        self.delivered: list[str] = []
+        self.dedup = DedupIndex()
+
+    async def deliver(self, recipient: str, subject: str, html: str, content_hash: str | None = None,
+                      email_type: str = "notification", claim_owner: str | None = None,
+                      max_wait: float | None = None) -> bool:
+        if recipient in self.failing:
+            raise RuntimeError("451 Try again later")
+        if max_wait is not None and self.backlog > max_wait:
+            raise RateLimitExceeded(self.backlog)
+        if not self.dedup.claim(content_hash, claim_owner):
+            return False
+        self.delivered.append(recipient)
+        return True
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[EmailLog.__table__])
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _enqueue(db: Session, recipient: str, max_retries: int = 3) -> EmailLog:
+    return enqueue_email(
+        db,
+        recipient_email=recipient,
+        subject="Grade Posted: Essay",
+        html_content="<p>Graded</p>",
+        email_type="grade",
+        max_retries=max_retries,
+    )
+
+
+def test_enqueued_rows_are_invisible_until_commit(db_session: Session) -> None:
+    service = FakeEmailService()
+    _enqueue(db_session, "a@example.com")
+    db_session.rollback()
+
+    result = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+    assert result["claimed"] == 0
+    assert service.delivered == []
+
+
+def test_successful_delivery_marks_sent_and_drops_body(db_session: Session) -> None:
+    service = FakeEmailService()
+    log = _enqueue(db_session, "a@example.com")
+    db_session.commit()
+
+    result = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+
+    assert result == {"claimed": 1, "sent": 1, "suppressed": 0, "deferred": 0, "retrying": 0, "failed": 0}
+    db_session.refresh(log)
+    assert log.status == "sent"
+    assert log.sent_at is not None
+    assert log.html_content is None
+
+    again = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+    assert again["claimed"] == 0
+    assert service.delivered == ["a@example.com"]
+
+
+def test_failures_back_off_then_fail_permanently(db_session: Session) -> None:
+    service = FakeEmailService(failing={"bad@example.com"})
+    log = _enqueue(db_session, "bad@example.com", max_retries=2)
+    db_session.commit()
+
+    first = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+    assert first["retrying"] == 1
+    db_session.refresh(log)
+    assert log.status == "pending"
+    assert log.retry_count == 1
+    assert log.next_retry_at > datetime.utcnow()
+
+    # Not due yet, so nothing is claimed
+    assert asyncio.run(process_outbox(db_session, service=service))["claimed"] == 0  # type: ignore[arg-type]
+
+    log.next_retry_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    second = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+    assert second["failed"] == 1
+    db_session.refresh(log)
+    assert log.status == "failed"
+    assert log.error_message == "451 Try again later"
+
+
+def test_log_ids_limit_the_claim(db_session: Session) -> None:
+    service = FakeEmailService()
+    first = _enqueue(db_session, "a@example.com")
+    _enqueue(db_session, "b@example.com")
+    db_session.commit()
+
+    result = asyncio.run(process_outbox(db_session, log_ids=[first.log_id], service=service))  # type: ignore[arg-type]
+    assert result["sent"] == 1
+    assert service.delivered == ["a@example.com"]
+
+
+def test_duplicate_rows_are_suppressed_not_resent(db_session: Session) -> None:
+    service = FakeEmailService()
+    first = _enqueue(db_session, "a@example.com")
+    second = _enqueue(db_session, "a@example.com")
+    db_session.commit()
+    assert first.content_hash == second.content_hash
+
+    result = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+
+    assert result["sent"] == 1
+    assert result["suppressed"] == 1
+    db_session.refresh(second)
+    assert second.status == "suppressed"
+    assert service.delivered == ["a@example.com"]
+
+
+def test_rows_are_committed_as_sending_before_the_smtp_send(db_session: Session) -> None:
+    states = []
+
+    class InspectingService(FakeEmailService):
+        async def deliver(self, recipient, subject, html, content_hash=None, **kwargs):
+            # No transaction (and no row lock) is held while sending
+            states.append(db_session.in_transaction())
+            return await super().deliver(recipient, subject, html, content_hash, **kwargs)
+
+    log = _enqueue(db_session, "a@example.com")
+    db_session.commit()
+
+    assert asyncio.run(process_outbox(db_session, service=InspectingService()))["sent"] == 1  # type: ignore[arg-type]
+    assert states == [False]
+    db_session.refresh(log)
+    assert log.status == "sent"
+
+
+def test_stale_sending_rows_are_reclaimed(db_session: Session) -> None:
+    service = FakeEmailService()
+    stale = _enqueue(db_session, "a@example.com", max_retries=3)
+    busy = _enqueue(db_session, "b@example.com")
+    exhausted = _enqueue(db_session, "c@example.com", max_retries=1)
+    db_session.commit()
+    # A worker died mid-send on ``stale`` and ``exhausted``; ``busy`` is still being sent
+    for log, lease in ((stale, -1), (busy, 60), (exhausted, -1)):
+        log.status = "sending"
+        log.next_retry_at = datetime.utcnow() + timedelta(seconds=lease)
+    db_session.commit()
+
+    result = asyncio.run(process_outbox(db_session, service=service))  # type: ignore[arg-type]
+
+    assert result["claimed"] == 1 and result["sent"] == 1
+    assert service.delivered == ["a@example.com"]
+    for log in (stale, busy, exhausted):
+        db_session.refresh(log)
+    assert (stale.status, stale.retry_count) == ("sent", 1)
+    assert busy.status == "sending"
+    assert (exhausted.status, exhausted.error_message) == ("failed", "Send lease expired")
+
+
+def test_a_row_whose_worker_died_after_claiming_its_hash_is_not_suppressed(db_session: Session) -> None:
+    service = FakeEmailService()
+    log = _enqueue(db_session, "a@example.com")
+    db_session.commit()
+    # The first worker claimed the hash and died before recording anything
+    assert service.dedup.claim(log.content_hash, f"email_log:{log.log_id}")
+    log.status = "sending"
+    log.next_retry_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+
+    assert asyncio.run(process_outbox(db_session, service=service))["sent"] == 1  # type: ignore[arg-type]
+    assert service.delivered == ["a@example.com"]
+
+
+def test_dedup_claims_are_reentrant_for_their_owner() -> None:
+    dedup = DedupIndex()
+    assert dedup.claim("h", "email_log:1")
+    assert dedup.claim("h", "email_log:1")
+    assert not dedup.claim("h", "email_log:2")
+    assert not dedup.claim("h")
+
+
+
+def test_rate_limited_rows_stay_queued_without_using_an_attempt(db_session: Session) -> None:
+    service = FakeEmailService(backlog=600.0)
+    log = _enqueue(db_session, "a@example.com")
+    db_session.commit()
+
+    result = asyncio.run(process_outbox(db_session, service=service, max_wait=2.0))  # type: ignore[arg-type]
+
+    db_session.refresh(log)
+    assert (result["claimed"], result["deferred"], result["retrying"]) == (1, 1, 0)
+    assert (log.status, log.retry_count, log.html_content) == ("pending", 0, "<p>Graded</p>")
+    assert log.next_retry_at > datetime.utcnow() + timedelta(seconds=590)
+
+    # A worker without a deadline waits its turn once the row is due
+    log.next_retry_at = None
+    db_session.commit()
+    assert asyncio.run(process_outbox(db_session, service=service))["sent"] == 1  # type: ignore[arg-type]
+
+
+def test_resets_and_other_mail_are_claimed_by_separate_workers(db_session: Session) -> None:
+    service = FakeEmailService()
+    _enqueue(db_session, "grade@example.com")
+    enqueue_email(db_session, recipient_email="reset@example.com", subject="Reset", html_content="<p>token</p>",
+                  email_type="password_reset")
+    db_session.commit()
+
+    def drain(interactive: bool) -> int:
+        return asyncio.run(process_outbox(db_session, service=service, interactive=interactive))["sent"]  # type: ignore[arg-type]
+
+    assert drain(interactive=False) == 1
+    assert service.delivered == ["grade@example.com"]
+    assert drain(interactive=True) == 1
+    assert service.delivered == ["grade@example.com", "reset@example.com"]
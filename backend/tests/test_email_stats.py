@@ -0,0 +1,127 @@
+"""Tests for the cached email stats snapshot and time series."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import Base
+from app.models.email_models import EmailLog
+from app.services.email_stats import email_stats
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[EmailLog.__table__])
+    session = sessionmaker(bind=engine)()
+    email_stats.invalidate()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+        email_stats.invalidate()
+
+
+def _log(email_type: str, status: str = "pending", attempted_at: datetime | None = None) -> EmailLog:
+    return EmailLog(
+        recipient_email="a@example.com",
+        subject="Subject",
+        email_type=email_type,
+        status=status,
+        attempted_at=attempted_at or datetime.utcnow(),
+    )
+
+
+def test_snapshot_is_updated_incrementally_after_commit(db_session: Session) -> None:
+    db_session.add_all([_log("grade", "sent"), _log("grade", "failed"), _log("welcome", "sent")])
+    db_session.commit()
+
+    statements: list[str] = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    first = email_stats.snapshot(db_session)
+    assert first["total_sent"] == 2
+    assert first["by_type"] == {"grade": 2, "welcome": 1}
+    assert len(statements) == 1 and "GROUP BY" in statements[0]
+
+    pending = _log("report")
+    db_session.add(pending)
+    db_session.commit()
+    pending.status = "sent"
+    db_session.commit()
+
+    db_session.add(_log("report"))
+    db_session.rollback()
+
+    statements.clear()
+    second = email_stats.snapshot(db_session)
+    assert [s for s in statements if "email_logs" in s and "GROUP BY" in s] == []
+    assert second["total_sent"] == 3
+    assert second["total_pending"] == 0
+    assert second["by_status_and_type"]["sent"] == {"grade": 1, "welcome": 1, "report": 1}
+
+
+def test_only_sessions_flushing_email_logs_collect_deltas(db_session: Session) -> None:
+    email_stats.snapshot(db_session)
+    db_session.info["unrelated"] = True
+    db_session.commit()
+    assert "email_stats_deltas" not in db_session.info
+
+    # Flushed, then rolled back: never applied
+    db_session.add(_log("grade", "sent"))
+    db_session.flush()
+    assert dict(db_session.info["email_stats_deltas"]) == {("sent", "grade"): 1}
+    db_session.rollback()
+    assert "email_stats_deltas" not in db_session.info
+    assert email_stats.snapshot(db_session)["total_sent"] == 0
+
+    log = _log("grade")
+    db_session.add(log)
+    db_session.commit()
+    db_session.delete(log)
+    db_session.commit()
+    assert email_stats.snapshot(db_session)["total_pending"] == 0
+
+
+def test_savepoint_rollback_keeps_deltas_recorded_before_it(db_session: Session) -> None:
+    email_stats.snapshot(db_session)
+
+    db_session.add(_log("grade", "sent"))
+    db_session.flush()
+    savepoint = db_session.begin_nested()
+    db_session.add(_log("welcome", "sent"))
+    db_session.flush()
+    savepoint.rollback()
+    assert dict(db_session.info["email_stats_deltas"]) == {("sent", "grade"): 1}
+
+    with db_session.begin_nested():
+        db_session.add(_log("report", "failed"))
+    db_session.commit()
+    assert "email_stats_savepoints" not in db_session.info
+
+    snapshot = email_stats.snapshot(db_session)
+    assert snapshot["by_status_and_type"]["sent"] == {"grade": 1}
+    assert snapshot["total_failed"] == 1
+
+
+def test_hourly_series_fills_empty_buckets(db_session: Session) -> None:
+    now = datetime.utcnow()
+    db_session.add_all([
+        _log("grade", "sent", now),
+        _log("grade", "failed", now),
+        _log("grade", "sent", now - timedelta(hours=2)),
+        _log("grade", "sent", now - timedelta(days=3)),
+    ])
+    db_session.commit()
+
+    series = email_stats.series(db_session, "hour", 3)
+
+    assert len(series) == 3
+    assert series[0]["sent"] == 1
+    assert series[1].get("sent", 0) == 0
+    assert series[2]["sent"] == 1 and series[2]["failed"] == 1
@@ -0,0 +1,95 @@
+"""Tests for compiled email templates, CSS inlining and database overrides."""
+
+from collections.abc import Generator
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.database import Base
+from app.models.email_models import EmailTemplate
+from app.services.email_service import EmailService
+from app.services.email_templates import EmailTemplateRegistry, inline_css
+
+
+@pytest.fixture()
+def session_factory() -> Generator[sessionmaker, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine, tables=[EmailTemplate.__table__])
+    try:
+        yield sessionmaker(bind=engine)
+    finally:
+        engine.dispose()
+
+
+def test_inline_css_moves_simple_rules_and_keeps_the_rest() -> None:
+    source = (
+        "<html><head><style>p { color: red; } .big { font-size: 20px; } .x:last-child { margin: 0; }</style></head>"
+        '<body><p class="big" style="color: blue">{{ name }}</p><div>plain</div></body></html>'
+    )
+    html = inline_css(source)
+
+    assert '<p class="big" style="color: red; font-size: 20px; color: blue;">{{ name }}</p>' in html
+    assert "<div>plain</div>" in html
+    assert ".x:last-child { margin: 0; }" in html
+    assert "font-size: 20px; }" not in html
+
+
+def test_file_template_is_compiled_once_and_escapes_input(session_factory: sessionmaker) -> None:
+    registry = EmailTemplateRegistry(session_factory=session_factory)
+    service = EmailService(templates=registry)
+
+    subject, html = service.render_grade_notification("Bat", "Essay <1>", 45, 50, "Nice & tidy")
+
+    assert subject == "Grade Posted: Essay <1>"
+    assert "Essay &lt;1&gt;" in html
+    assert "Nice &amp; tidy" in html
+    assert '<p class="grade" style="font-size: 32px' in html
+    assert "<style>" not in html
+    assert registry.get("grade_notification") is registry.get("grade_notification")
+    assert registry.get("grade_notification").source == "file"
+
+
+def test_database_template_overrides_file_until_invalidated(session_factory: sessionmaker) -> None:
+    registry = EmailTemplateRegistry(session_factory=session_factory)
+    assert registry.get("welcome").source == "file"
+
+    db: Session = session_factory()
+    db.add(EmailTemplate(
+        name="welcome",
+        template_type="welcome",
+        subject="Hi {{ name }}",
+        html_content="<html><body><p>Welcome aboard, {{ name }}</p></body></html>",
+    ))
+    db.commit()
+    db.close()
+
+    registry.invalidate("welcome")
+    subject, html = registry.render("welcome", name="Saraa")
+    assert subject == "Hi Saraa"
+    assert "Welcome aboard, Saraa" in html
+
+
+def test_batch_render_personalises_each_report(session_factory: sessionmaker) -> None:
+    service = EmailService(templates=EmailTemplateRegistry(session_factory=session_factory))
+    contexts = [
+        {
+            "student_name": f"Student {i}",
+            "month": "March",
+            "year": "2025",
+            "total_classes": 20,
+            "attended_classes": i % 20,
+            "attendance_percentage": (i % 20) * 5.0,
+            "assignments_completed": 3,
+            "average_grade": 88.5,
+            "outstanding_assignments": 1,
+        }
+        for i in range(2000)
+    ]
+
+    rendered = service.render_monthly_reports("student", contexts)
+
+    assert len(rendered) == 2000
+    assert rendered[0][0] == "Your Monthly Report - March 2025"
+    assert "Hello Student 1999," in rendered[1999][1]
+    assert "95.0%" in rendered[1999][1]
@@ -0,0 +1,159 @@
+"""Tests for atomic seat reservation, the waitlist and the seat counter."""
+
+import threading
+from collections import Counter
+from collections.abc import Generator
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, List
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models import Course, CourseWaitlistEntry, Enrollment, Student
+from app.services.enrollment_seats import (
+    AlreadyEnrolled, CourseFull, CourseNotFound, enroll_student, promote_waitlist, reconcile_seats
+)
+from app.services.schedule_conflicts import schedule_index
+
+
+def _engine(path: Path) -> Engine:
+    """File-backed SQLite whose transactions take the write lock up front, like a row lock"""
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+
+    @event.listens_for(engine, "connect")
+    def _connect(dbapi_connection: Any, record: Any) -> None:
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin(connection: Any) -> None:
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+    Base.metadata.create_all(bind=engine)
+    return engine
+
+
+@pytest.fixture()
+def engine(tmp_path: Path) -> Generator[Engine, None, None]:
+    engine = _engine(tmp_path / "seats.db")
+    try:
+        yield engine
+    finally:
+        engine.dispose()
+
+
+def _seed(db: Session, students: int, max_students: int) -> int:
+    now = datetime.utcnow()
+    course = Course(title="Popular", start_time=now, end_time=now, price=10.0, max_students=max_students)
+    db.add(course)
+    db.add_all(Student(name=f"S{i}", email=f"s{i}@example.com", password="x",
+                       parent_email="p@example.com", parent_phone="1") for i in range(students))
+    db.commit()
+    return course.course_id
+
+
+def test_enroll_waitlist_and_counter(engine: Engine) -> None:
+    db = sessionmaker(bind=engine)()
+    course_id = _seed(db, students=4, max_students=2)
+
+    assert enroll_student(db, course_id, 1).status == "enrolled"
+    with pytest.raises(AlreadyEnrolled):
+        enroll_student(db, course_id, 1)
+    enroll_student(db, course_id, 2)
+    with pytest.raises(CourseFull):
+        enroll_student(db, course_id, 3)
+    with pytest.raises(CourseNotFound):
+        enroll_student(db, 999, 3)
+
+    assert enroll_student(db, course_id, 3, waitlist=True).position == 1
+    assert enroll_student(db, course_id, 4, waitlist=True).position == 2
+    assert db.get(Course, course_id).seats_taken == 2
+
+    # Dropping frees the seat through the session hook; promotion fills it in order
+    db.query(Enrollment).filter(Enrollment.student_id == 1).one().status = "dropped"
+    db.commit()
+    db.expire_all()
+    assert db.get(Course, course_id).seats_taken == 1
+    promoted = promote_waitlist(db, course_id)
+    assert [e.student_id for e in promoted] == [3]
+    statuses = dict(db.query(CourseWaitlistEntry.student_id, CourseWaitlistEntry.status))
+    assert statuses == {3: "promoted", 4: "waiting"}
+
+    # Drift (e.g. a raw SQL import) is corrected by reconciliation
+    db.query(Course).filter(Course.course_id == course_id).update({"seats_taken": 7})
+    db.commit()
+    assert reconcile_seats(db) == {course_id: 2}
+    db.close()
+
+
+def test_promotion_passes_over_students_with_a_schedule_conflict(engine: Engine) -> None:
+    schedule_index.invalidate()
+    db = sessionmaker(bind=engine)()
+    start = datetime(2026, 3, 2, 9)
+    course = Course(title="Algebra", start_time=start, end_time=start + timedelta(hours=2), price=10.0, max_students=1)
+    clash = Course(title="Chemistry", start_time=start + timedelta(hours=1), end_time=start + timedelta(hours=3),
+                   price=10.0)
+    db.add_all([course, clash])
+    db.add_all(Student(name=f"S{i}", email=f"s{i}@example.com", password="x",
+                       parent_email="p@example.com", parent_phone="1") for i in range(3))
+    db.commit()
+
+    enroll_student(db, course.course_id, 1)
+    enroll_student(db, course.course_id, 2, waitlist=True)
+    enroll_student(db, course.course_id, 3, waitlist=True)
+    # While waiting, student 2 took a course at the same time
+    enroll_student(db, clash.course_id, 2)
+
+    db.query(Enrollment).filter(Enrollment.student_id == 1).one().status = "dropped"
+    db.commit()
+    assert [e.student_id for e in promote_waitlist(db, course.course_id)] == [3]
+    statuses = dict(db.query(CourseWaitlistEntry.student_id, CourseWaitlistEntry.status))
+    assert statuses == {2: "waiting", 3: "promoted"}
+    assert db.get(Course, course.course_id).seats_taken == 1
+    db.close()
+    schedule_index.invalidate()
+
+
+def test_concurrent_enrollment_never_oversubscribes(engine: Engine) -> None:
+    factory = sessionmaker(bind=engine)
+    setup = factory()
+    course_id = _seed(setup, students=100, max_students=10)
+    setup.close()
+
+    outcomes: List[str] = []
+    lock = threading.Lock()
+    start = threading.Barrier(100)
+
+    def enroll(student_id: int, waitlist: bool) -> None:
+        db = factory()
+        start.wait()
+        try:
+            outcome = enroll_student(db, course_id, student_id, waitlist=waitlist).status
+        except (CourseFull, AlreadyEnrolled) as exc:
+            outcome = type(exc).__name__
+        finally:
+            db.close()
+        with lock:
+            outcomes.append(outcome)
+
+    # 80 distinct students plus 20 duplicate requests from student 1
+    threads = [threading.Thread(target=enroll, args=(i, i % 2 == 0)) for i in range(1, 81)]
+    threads += [threading.Thread(target=enroll, args=(1, False)) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    db = factory()
+    counts = Counter(outcomes)
+    assert counts["enrolled"] == 10
+    assert db.query(Enrollment).count() == 10
+    assert db.query(Enrollment).filter(Enrollment.student_id == 1).count() <= 1
+    assert db.get(Course, course_id).seats_taken == 10
+    assert db.query(CourseWaitlistEntry).count() == counts["waitlisted"]
+    assert reconcile_seats(db) == {}
+    db.close()
@@ -0,0 +1,59 @@
+"""Tests for the chunked Celery fan-out helper."""
+
+import pytest
+from celery import Celery
+
+from app.services.fanout import chunked, fan_out, summarize_chunks, timed_chunk
+
+
+@pytest.fixture()
+def eager_app() -> Celery:
+    app = Celery("fanout-test")
+    app.conf.update(task_always_eager=True, task_eager_propagates=True)
+    return app
+
+
+def test_chunked_splits_into_bounded_lists() -> None:
+    assert chunked(range(7), 3) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert chunked([], 3) == []
+    with pytest.raises(ValueError):
+        chunked([1], 0)
+
+
+def test_fan_out_publishes_one_task_per_chunk_and_summarises(eager_app: Celery) -> None:
+    calls: list[list[int]] = []
+
+    @eager_app.task
+    @timed_chunk
+    def double(items: list, factor: int) -> dict:
+        calls.append(items)
+        return {"processed": len(items), "value": sum(i * factor for i in items)}
+
+    @eager_app.task
+    def done(results: list) -> dict:
+        return summarize_chunks(results)
+
+    result = fan_out(double, range(1050), 200, args=(2,), callback=done.s())
+    summary = result.get()
+
+    assert len(calls) == 6
+    assert summary["chunks"] == 6
+    assert summary["items"] == 1050
+    assert summary["totals"] == {"processed": 1050, "value": 2 * sum(range(1050))}
+    assert summary["max_chunk_seconds"] >= summary["mean_chunk_seconds"] >= 0
+    assert summary["wall_seconds"] >= summary["max_chunk_seconds"]
+
+
+def test_callback_still_runs_when_there_is_nothing_to_fan_out(eager_app: Celery) -> None:
+    received: list[list] = []
+
+    @eager_app.task
+    def noop(items: list) -> None:
+        raise AssertionError("no chunks expected")
+
+    @eager_app.task
+    def done(results: list) -> None:
+        received.append(results)
+
+    assert fan_out(noop, [], 10, callback=done.s()) is None
+    assert received == [[]]
@@ -0,0 +1,111 @@
+"""Tests for grading a submission: the grade email is queued with the grade and never blocks it."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.models  # noqa: F401  (registers every table)
+from app.api import teachers
+from app.api.auth import get_current_user
+from app.core.database import Base, get_db
+from app.models.email_models import EmailLog
+from app.models.models import Assignment, AssignmentSubmission, Course, Student, Teacher
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture()
+def client(db_session: Session) -> TestClient:
+    anna = Teacher(name="Anna", email="anna@school.org", password="x")
+    sam = Student(name="Sam", email="sam@example.com", password="x", parent_email="p@example.com", parent_phone="1")
+    start = datetime(2026, 1, 5, 9)
+    db_session.add_all([
+        anna,
+        sam,
+        Course(title="Algebra", start_time=start, end_time=start + timedelta(hours=2), price=10.0, admin_id=1),
+    ])
+    db_session.commit()
+
+    api = FastAPI()
+    api.include_router(teachers.router, prefix="/api/v1/teachers")
+    api.dependency_overrides[get_db] = lambda: db_session
+    api.dependency_overrides[get_current_user] = lambda: {"user": anna, "user_type": "teacher"}
+    return TestClient(api)
+
+
+def _submission(db: Session, max_points: float) -> AssignmentSubmission:
+    assignment = Assignment(course_id=1, title="Essay", description="", due_date=datetime(2026, 1, 9),
+                            max_points=max_points, created_by_id=1)
+    db.add(assignment)
+    db.commit()
+    submission = AssignmentSubmission(assignment_id=assignment.assignment_id, student_id=1)
+    db.add(submission)
+    db.commit()
+    return submission
+
+
+def _grade(client: TestClient, submission: AssignmentSubmission, grade: float):
+    return client.put(
+        f"/api/v1/teachers/assignments/{submission.assignment_id}/submissions/{submission.submission_id}/grade",
+        json={"grade": grade, "feedback": "Thanks"},
+    )
+
+
+def test_zero_point_assignment_is_graded_and_emailed(client: TestClient, db_session: Session) -> None:
+    submission = _submission(db_session, max_points=0)
+
+    response = _grade(client, submission, 0)
+
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(AssignmentSubmission, submission.submission_id).grade == 0
+    email = db_session.query(EmailLog).filter(EmailLog.email_type == "grade").one()
+    assert "0/0" in email.html_content
+    assert "Grade:" not in email.html_content
+
+
+def test_grade_commits_when_the_email_cannot_be_built(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    submission = _submission(db_session, max_points=10)
+
+    def broken(*args, **kwargs):
+        raise RuntimeError("template missing")
+
+    monkeypatch.setattr(teachers.email_service, "render_grade_notification", broken)
+
+    response = _grade(client, submission, 7)
+
+    assert response.status_code == 200
+    db_session.expire_all()
+    assert db_session.get(AssignmentSubmission, submission.submission_id).grade == 7
+    assert db_session.query(EmailLog).count() == 0
+
+
+def test_grading_refreshes_the_student_dashboard(
+    client: TestClient, db_session: Session, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    submission = _submission(db_session, max_points=10)
+    invalidated = []
+    monkeypatch.setattr(teachers.student_dashboard, "invalidate", invalidated.append)
+
+    assert _grade(client, submission, 9).status_code == 200
+    assert invalidated == [submission.student_id]
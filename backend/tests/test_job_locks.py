@@ -0,0 +1,89 @@
+"""Tests for lease-based job locks and fencing tokens."""
+
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.models import JobLease, MonthlyReportRun
+from app.services import celery_app
+from app.services.job_locks import LeaseLost, acquire_lease, lease_status, release_lease, renew_lease
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    JobLease.__table__.create(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _expire(db: Session, name: str) -> None:
+    db.query(JobLease).filter(JobLease.name == name).update({JobLease.expires_at: datetime.utcnow() - timedelta(seconds=1)})
+    db.commit()
+
+
+def test_only_one_holder_until_release(db_session: Session) -> None:
+    first = acquire_lease(db_session, "digest", "worker-a", ttl_seconds=60)
+    assert first is not None and first.token == 1
+    assert acquire_lease(db_session, "digest", "worker-b", ttl_seconds=60) is None
+
+    [status] = lease_status(db_session)
+    assert status["held"] and status["holder"] == "worker-a" and status["fencing_token"] == 1
+
+    assert release_lease(db_session, "digest", first.token)
+    second = acquire_lease(db_session, "digest", "worker-b", ttl_seconds=60)
+    assert second is not None and second.token == 2
+
+
+def test_expired_lease_is_taken_over_and_old_token_is_fenced(db_session: Session) -> None:
+    stale = acquire_lease(db_session, "reports", "worker-a", ttl_seconds=60)
+    assert stale is not None
+    renew_lease(db_session, "reports", stale.token, ttl_seconds=60)
+
+    _expire(db_session, "reports")
+    fresh = acquire_lease(db_session, "reports", "worker-b", ttl_seconds=60)
+    assert fresh is not None and fresh.token > stale.token
+
+    with pytest.raises(LeaseLost):
+        renew_lease(db_session, "reports", stale.token)
+    # A stale holder cannot release the new holder's lease either
+    assert not release_lease(db_session, "reports", stale.token)
+    assert lease_status(db_session)[0]["holder"] == "worker-b"
+
+
+def test_a_crashing_chunk_still_lets_the_chord_release_the_lease(db_session: Session, monkeypatch) -> None:
+    lease = acquire_lease(db_session, celery_app.DIGEST_LEASE, "worker-a", ttl_seconds=900)
+    assert lease is not None
+
+    def broken_chunk(db, users, since):
+        raise RuntimeError("template missing")
+
+    monkeypatch.setattr(celery_app, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+    monkeypatch.setattr(celery_app, "send_digest_chunk", broken_chunk)
+
+    result = celery_app.send_notification_digest_chunk([[1, "student"], [2, "student"]],
+                                                       datetime.utcnow().isoformat(), lease.token)
+    assert (result["sent"], result["errored"]) == (0, 2)
+
+    summary = celery_app.fanout_complete([result], celery_app.DIGEST_LEASE, lease.token)
+    assert summary["totals"]["errored"] == 2
+    assert not lease_status(db_session)[0]["held"]
+
+
+def test_report_run_callback_releases_the_lease_when_the_run_is_gone(db_session: Session, monkeypatch) -> None:
+    MonthlyReportRun.__table__.create(bind=db_session.get_bind())
+    lease = acquire_lease(db_session, celery_app.MONTHLY_REPORTS_LEASE, "worker-a", ttl_seconds=900)
+    assert lease is not None
+    monkeypatch.setattr(celery_app, "SessionLocal", sessionmaker(bind=db_session.get_bind()))
+
+    result = celery_app.finish_monthly_report_run([], 404, lease.token)
+
+    assert result["status"] == "failed" and result["run_id"] == 404
+    assert not lease_status(db_session)[0]["held"]
@@ -0,0 +1,249 @@
+"""Tests for the set-based monthly report builder and chunked sending."""
+
+import asyncio
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.config import settings
+from app.core.database import Base
+from app.models import (
+    Admin, Assignment, AssignmentSubmission, Attendance, Course, Enrollment,
+    MonthlyReport, Payment, Student, Teacher
+)
+from app.services.email_templates import EmailTemplateRegistry
+from app.services.fanout import chunked
+from app.services.monthly_reports import (
+    build_monthly_reports, execute_run, finish_run, get_or_create_run, prepare_run, run_progress, send_report_chunk
+)
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _seed(db: Session, students: int) -> None:
+    march = datetime(2025, 3, 10)
+    teacher = Teacher(name="T", email="t@example.com", password="x")
+    course = Course(title="Math", start_time=march, end_time=march, status="active", teachers=[teacher])
+    db.add_all([teacher, course, Admin(name="A", email="a@example.com", password="x")])
+    db.flush()
+
+    graded = Assignment(course_id=course.course_id, title="HW1", description="", due_date=march,
+                        max_points=50, created_by_id=teacher.teacher_id, created_at=march)
+    upcoming = Assignment(course_id=course.course_id, title="HW2", description="", due_date=datetime(2999, 1, 1),
+                          created_by_id=teacher.teacher_id, created_at=march)
+    db.add_all([graded, upcoming])
+    db.flush()
+
+    for i in range(students):
+        student = Student(name=f"S{i}", email=f"s{i}@example.com", password="x",
+                          parent_email="p@example.com", parent_phone="1")
+        db.add(student)
+        db.flush()
+        enrollment = Enrollment(student_id=student.student_id, course_id=course.course_id,
+                                status="active", enrollment_date=march)
+        db.add(enrollment)
+        db.flush()
+        db.add_all([
+            Attendance(student_id=student.student_id, course_id=course.course_id, attendance_date=march, status="present"),
+            Attendance(student_id=student.student_id, course_id=course.course_id, attendance_date=march, status="absent"),
+            AssignmentSubmission(assignment_id=graded.assignment_id, student_id=student.student_id, submitted_at=march,
+                                 grade=40 + i % 10, graded_at=march, graded_by_id=teacher.teacher_id),
+            Payment(enrollment_id=enrollment.enrollment_id, amount=100, payment_method="card",
+                    payment_status="completed", payment_date=march),
+        ])
+    db.commit()
+
+
+def test_builder_query_count_does_not_grow_with_users(db_session: Session) -> None:
+    _seed(db_session, students=30)
+
+    statements: list[str] = []
+    event.listen(db_session.get_bind(), "before_cursor_execute",
+                 lambda conn, cursor, statement, *args: statements.append(statement))
+
+    counts = build_monthly_reports(db_session, 3, 2025)
+
+    assert counts == {"student": 30, "teacher": 1, "admin": 1}
+    # Fixed set of queries: 3 student, 4 teacher and 5 platform aggregates, 3 recipient lists,
+    # plus the existing-report and pending-report lookups
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) == 17
+
+    report = db_session.query(MonthlyReport).filter_by(report_type="student", recipient_email="s3@example.com").one()
+    assert report.status == "generated"
+    assert (report.total_classes, report.classes_attended, report.attendance_percentage) == (2, 1, 50.0)
+    assert report.average_grade == pytest.approx(86.0)
+    assert report.outstanding_assignments == 1
+
+    teacher = db_session.query(MonthlyReport).filter_by(report_type="teacher").one()
+    assert (teacher.students_count, teacher.assignments_posted, teacher.assignments_graded) == (30, 2, 30)
+
+    admin = db_session.query(MonthlyReport).filter_by(report_type="admin").one()
+    assert (admin.total_students, admin.new_enrollments, admin.total_revenue) == (30, 30, 3000.0)
+
+    assert build_monthly_reports(db_session, 3, 2025) == {"student": 0, "teacher": 0, "admin": 0}
+
+
+class FakeEmailService:
+    def __init__(self, crash_on_render: int | None = None) -> None:
+        self.templates = EmailTemplateRegistry(session_factory=None)
+        self.sent: list[tuple[str, str]] = []
+        self.renders = 0
+        self.crash_on_render = crash_on_render
+
+    def render_monthly_reports(self, report_type, contexts):
+        self.renders += 1
+        if self.renders == self.crash_on_render:
+            raise RuntimeError("worker lost")
+        return self.templates.render_batch(f"monthly_{report_type}_report", contexts)
+
+    async def _send_email(self, recipient: str, subject: str, html: str, email_type: str = "") -> bool:
+        assert email_type == "report"
+        self.sent.append((recipient, html))
+        return recipient != "s1@example.com"
+
+
+def test_chunk_renders_and_records_outcome(db_session: Session, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "monthly_report_max_attempts", 1)
+    _seed(db_session, students=3)
+    build_monthly_reports(db_session, 3, 2025)
+    ids = [r.report_id for r in db_session.query(MonthlyReport).order_by(MonthlyReport.report_id)]
+
+    service = FakeEmailService()
+    counts = asyncio.run(send_report_chunk(db_session, ids, service=service))  # type: ignore[arg-type]
+
+    assert counts == {"sent": 4, "retrying": 0, "failed": 1}
+    assert any("Hello S2," in html for _, html in service.sent)
+    statuses = {r.recipient_email: r.status for r in db_session.query(MonthlyReport)}
+    assert statuses["s1@example.com"] == "failed"
+    assert statuses["t@example.com"] == "sent"
+
+    # Already-sent rows are not picked up again
+    assert asyncio.run(send_report_chunk(db_session, ids, service=service)) == {"sent": 0, "retrying": 0, "failed": 0}  # type: ignore[arg-type]
+
+
+def test_run_resumes_after_crash_without_resending(db_session: Session, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "monthly_report_max_attempts", 1)
+    _seed(db_session, students=10)
+    run = get_or_create_run(db_session, 3, 2025)
+
+    crashing = FakeEmailService(crash_on_render=3)
+    with pytest.raises(RuntimeError):
+        asyncio.run(execute_run(db_session, run, chunk_size=4, service=crashing))  # type: ignore[arg-type]
+
+    db_session.refresh(run)
+    assert run.status == "failed"
+    assert run.sent_count + run.failed_count == 8
+    first_attempt = {recipient for recipient, _ in crashing.sent}
+
+    service = FakeEmailService()
+    run = asyncio.run(execute_run(db_session, get_or_create_run(db_session, 3, 2025), chunk_size=4, service=service))  # type: ignore[arg-type]
+
+    resumed = {recipient for recipient, _ in service.sent}
+    assert not first_attempt & resumed
+    assert len(first_attempt | resumed) == 12
+    progress = run_progress(run)
+    assert progress["status"] == "completed"
+    assert progress["total_reports"] == 12
+    assert progress["remaining"] == 0
+    assert progress["sent"] == 11 and progress["failed"] == 1
+    assert progress["rows_per_second"] is not None
+
+    # A completed run is left alone
+    again = FakeEmailService()
+    asyncio.run(execute_run(db_session, run, service=again))  # type: ignore[arg-type]
+    assert again.sent == []
+
+
+def test_fanned_out_run_records_progress_and_recovers_lost_chunks(db_session: Session, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "monthly_report_max_attempts", 1)
+    _seed(db_session, students=10)
+    run = get_or_create_run(db_session, 3, 2025)
+
+    report_ids = prepare_run(db_session, run)
+    assert run.status == "sending" and len(report_ids) == 12
+
+    service = FakeEmailService()
+    chunks = chunked(report_ids, 5)
+    # The middle chunk is lost: the run stays open
+    for chunk in (chunks[0], chunks[2]):
+        asyncio.run(send_report_chunk(db_session, chunk, service=service, run_id=run.run_id))  # type: ignore[arg-type]
+    assert finish_run(db_session, run).status == "sending"
+    assert (run.sent_count, run.failed_count, run.cursor) == (6, 1, report_ids[-1])
+
+    # Re-preparing returns only the lost reports, below the cursor
+    assert prepare_run(db_session, run) == chunks[1]
+    asyncio.run(send_report_chunk(db_session, chunks[1], service=service, run_id=run.run_id))  # type: ignore[arg-type]
+
+    progress = run_progress(finish_run(db_session, run))
+    assert progress["status"] == "completed"
+    assert progress["sent"] == 11 and progress["failed"] == 1
+    assert len(service.sent) == 12
+
+
+def test_chunk_sends_with_no_transaction_open_and_reclaims_expired_leases(db_session: Session, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "monthly_report_max_attempts", 1)
+    _seed(db_session, students=2)
+    build_monthly_reports(db_session, 3, 2025)
+    ids = [r.report_id for r in db_session.query(MonthlyReport).order_by(MonthlyReport.report_id)]
+
+    states: list[bool] = []
+
+    class InspectingService(FakeEmailService):
+        async def _send_email(self, recipient, subject, html, email_type=""):
+            # Claimed rows are committed as sending before anything goes out
+            states.append(db_session.in_transaction())
+            return await super()._send_email(recipient, subject, html, email_type)
+
+    # A worker claimed the first report and died
+    stuck = db_session.get(MonthlyReport, ids[0])
+    stuck.status, stuck.lease_expires_at = "sending", datetime.utcnow() + timedelta(minutes=5)
+    db_session.commit()
+
+    service = InspectingService()
+    counts = asyncio.run(send_report_chunk(db_session, ids, service=service))  # type: ignore[arg-type]
+    assert counts == {"sent": 2, "retrying": 0, "failed": 1}
+    assert states == [False] * 3
+
+    stuck.lease_expires_at = datetime.utcnow() - timedelta(seconds=1)
+    db_session.commit()
+    assert asyncio.run(send_report_chunk(db_session, ids, service=service))["sent"] == 1  # type: ignore[arg-type]
+    assert db_session.get(MonthlyReport, ids[0]).lease_expires_at is None
+
+
+def test_failed_sends_are_retried_by_later_runs_up_to_the_cap(db_session: Session, monkeypatch) -> None:
+    monkeypatch.setattr(settings, "monthly_report_max_attempts", 2)
+    _seed(db_session, students=2)
+    run = get_or_create_run(db_session, 3, 2025)
+
+    class OutageService(FakeEmailService):
+        async def _send_email(self, recipient, subject, html, email_type=""):
+            self.sent.append((recipient, html))
+            return False
+
+    # An outage during the whole run: nothing is lost, the run stays open
+    run = asyncio.run(execute_run(db_session, run, service=OutageService()))  # type: ignore[arg-type]
+    assert run.status == "sending" and (run.sent_count, run.failed_count) == (0, 0)
+    assert {r.status for r in db_session.query(MonthlyReport)} == {"generated"}
+
+    # The next trigger sends them; s1 keeps failing and is given up on after its second attempt
+    service = FakeEmailService()
+    run = asyncio.run(execute_run(db_session, run, service=service))  # type: ignore[arg-type]
+    assert len(service.sent) == 4
+    progress = run_progress(run)
+    assert (progress["status"], progress["sent"], progress["failed"]) == ("completed", 3, 1)
+    failed = db_session.query(MonthlyReport).filter(MonthlyReport.status == "failed").one()
+    assert (failed.recipient_email, failed.send_attempts) == ("s1@example.com", 2)
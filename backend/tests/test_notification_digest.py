@@ -0,0 +1,72 @@
+"""Tests for the daily notification digest."""
+
+import asyncio
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models import Notification, NotificationPreference, NotificationType, Student
+from app.services.email_templates import EmailTemplateRegistry
+from app.services.notification_digest import digest_recipients, send_digest_chunk
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+class FakeEmailService:
+    def __init__(self) -> None:
+        self.templates = EmailTemplateRegistry(session_factory=None)
+        self.sent: list[tuple[str, str, str]] = []
+
+    def render_notification_digests(self, contexts):
+        return self.templates.render_batch("notification_digest", contexts)
+
+    async def _send_email(self, recipient: str, subject: str, html: str, email_type: str = "") -> bool:
+        assert email_type == "digest"
+        self.sent.append((recipient, subject, html))
+        return True
+
+
+def test_digest_groups_unread_notifications_per_user(db_session: Session) -> None:
+    for i in (1, 2):
+        db_session.add(Student(name=f"S{i}", email=f"s{i}@example.com", password="x",
+                               parent_email="p@example.com", parent_phone="1"))
+    db_session.add(NotificationPreference(user_id=1, user_type="student",
+                                          notification_type=NotificationType.ANNOUNCEMENT, digest_mode=True))
+    for title in ("Closed Friday", "New schedule"):
+        db_session.add(Notification(user_id=1, user_type="student", notification_type=NotificationType.ANNOUNCEMENT,
+                                    title=title, message="..."))
+    # Not in digest mode
+    db_session.add(Notification(user_id=2, user_type="student", notification_type=NotificationType.ANNOUNCEMENT,
+                                title="Closed Friday", message="..."))
+    db_session.commit()
+
+    since = datetime.utcnow() - timedelta(days=1)
+    users = digest_recipients(db_session, since)
+    assert users == [[1, "student"]]
+
+    service = FakeEmailService()
+    counts = asyncio.run(send_digest_chunk(db_session, users, since, service=service))  # type: ignore[arg-type]
+
+    assert counts == {"sent": 1, "failed": 0, "skipped": 0}
+    recipient, subject, html = service.sent[0]
+    assert recipient == "s1@example.com"
+    assert subject == "Your Daily Digest: 2 unread notifications"
+    assert "Closed Friday" in html and "New schedule" in html
+
+    # Notifications already mailed are not included again
+    assert digest_recipients(db_session, since) == []
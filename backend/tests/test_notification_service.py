@@ -5,7 +5,7 @@ from datetime import datetime, timedelta
 from typing import Any, cast
 
 import pytest
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.database import Base
@@ -116,3 +116,29 @@ def test_mark_all_as_read_sets_timestamp(db_session: Session) -> None:
     notifications = db_session.query(Notification).filter(Notification.user_id == 2).all()
     assert all(getattr(n, "is_read") for n in notifications)
     assert all(getattr(n, "read_at") is not None for n in notifications)
+
+
+def test_bulk_notify_commits_once_and_honours_preferences(db_session: Session) -> None:
+    service = NotificationService(db_session)
+    service.update_preference(3, "student", NotificationType.ANNOUNCEMENT, email_enabled=True, push_enabled=False)
+
+    commits: list[None] = []
+    event.listen(db_session, "after_commit", lambda session: commits.append(None))
+
+    users = [{"user_id": i, "user_type": "student"} for i in range(1, 51)]
+    notifications = service.bulk_notify(
+        users,
+        NotificationType.ANNOUNCEMENT,
+        title="Closed Friday",
+        message="No classes on Friday.",
+        priority=NotificationPriority.LOW,
+        expires_in_days=2,
+    )
+
+    assert len(commits) == 1
+    assert len(notifications) == 50
+    assert db_session.query(Notification).count() == 50
+    by_user = {getattr(n, "user_id"): n for n in notifications}
+    assert getattr(by_user[3], "sent_via") == "in_app,email"
+    assert getattr(by_user[4], "sent_via") == "in_app"
+    assert db_session.query(NotificationLog).count() == 1
@@ -0,0 +1,84 @@
+"""Tests for the token-bucket SMTP rate limiter (local fallback) and its use by the pool."""
+
+import asyncio
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.services.rate_limiter import (
+    BULK, INTERACTIVE, RateLimitExceeded, TokenBucketRateLimiter, smtp_rate_limiter
+)
+
+
+def test_burst_is_free_then_callers_wait_for_refill() -> None:
+    limiter = TokenBucketRateLimiter("test", rate=50.0, capacity=5)
+
+    assert [limiter.reserve() for _ in range(5)] == [0.0] * 5
+    assert limiter.reserve() == pytest.approx(0.02, abs=0.005)
+    assert limiter.reserve(3) == pytest.approx(0.08, abs=0.005)
+
+
+def test_sustained_throughput_sits_at_the_configured_rate() -> None:
+    limiter = TokenBucketRateLimiter("test", rate=200.0, capacity=10)
+
+    async def run() -> None:
+        await asyncio.gather(*(limiter.acquire() for _ in range(70)))
+
+    started = time.monotonic()
+    asyncio.run(run())
+    elapsed = time.monotonic() - started
+
+    # 10 tokens of burst, then 60 more at 200/s
+    assert 0.28 <= elapsed < 0.6
+    assert limiter.stats.acquired == 70
+    assert limiter.stats.waited == 60
+
+
+def test_max_wait_refuses_without_taking_tokens() -> None:
+    limiter = TokenBucketRateLimiter("test", rate=10.0, capacity=1)
+    limiter.reserve()
+    limiter.reserve(20)  # A bulk run two seconds deep
+
+    with pytest.raises(RateLimitExceeded) as refused:
+        asyncio.run(limiter.acquire(max_wait=0.5))
+    assert refused.value.wait_seconds == pytest.approx(2.1, abs=0.05)
+    assert limiter.stats.refused == 1
+
+    # The refusal left the debt where it was
+    assert limiter.reserve() == pytest.approx(2.1, abs=0.05)
+    assert limiter.reserve(max_wait=5.0) == pytest.approx(2.2, abs=0.05)
+
+
+def test_interactive_lane_is_a_reserved_share_of_the_provider_limit(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "smtp_rate_per_second", 0)
+    monkeypatch.setattr(settings, "smtp_rate_burst", 0)
+    monkeypatch.setattr(settings, "smtp_interactive_rate_share", 0.2)
+    monkeypatch.setattr(settings, "redis_url", None)
+
+    bulk = smtp_rate_limiter("smtp.gmail.com", BULK)
+    interactive = smtp_rate_limiter("smtp.gmail.com", INTERACTIVE)
+
+    assert (bulk.name, interactive.name) == ("smtp.gmail.com:bulk", "smtp.gmail.com:interactive")
+    assert bulk.rate + interactive.rate == pytest.approx(1.0)
+    assert (bulk.capacity, interactive.capacity) == (16, 4)
+
+    # Draining the bulk lane leaves a reset's slot untouched
+    bulk.reserve(1000)
+    assert interactive.reserve(max_wait=0) == 0.0
+
+
+def test_local_share_splits_the_rate_between_processes() -> None:
+    limiter = TokenBucketRateLimiter("test", rate=100.0, capacity=1, local_share=4)
+
+    limiter.reserve()
+    assert limiter.reserve() == pytest.approx(0.04, abs=0.005)
+
+
+def test_unreachable_redis_falls_back_to_local_bucket() -> None:
+    pytest.importorskip("redis")
+    limiter = TokenBucketRateLimiter("test", rate=10.0, capacity=2, redis_url="redis://127.0.0.1:1")
+
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() == 0.0
+    assert limiter.reserve() > 0
@@ -0,0 +1,73 @@
+"""Tests for the analytics result cache (TTL, stale-while-revalidate, single-flight)."""
+
+import asyncio
+import threading
+import time
+from typing import Any, List
+
+from app.services.result_cache import ResultCache
+
+
+class _FakeSession:
+    def close(self) -> None:
+        pass
+
+
+def _cache(ttl: float, stale: float) -> ResultCache:
+    return ResultCache(ttl_seconds=ttl, stale_seconds=stale, session_factory=_FakeSession)
+
+
+def test_concurrent_misses_share_one_computation() -> None:
+    cache = _cache(ttl=60, stale=60)
+    calls: List[int] = []
+    lock = threading.Lock()
+
+    def compute(db: Any) -> int:
+        with lock:
+            calls.append(1)
+        time.sleep(0.05)
+        return 42
+
+    async def scenario() -> List[int]:
+        return await asyncio.gather(*(cache.get(("revenue", 12), compute) for _ in range(5)))
+
+    assert asyncio.run(scenario()) == [42] * 5
+    assert len(calls) == 1
+    assert (cache.stats.misses, cache.stats.coalesced) == (1, 4)
+
+
+def test_stale_value_is_served_while_refreshing() -> None:
+    cache = _cache(ttl=0, stale=60)
+    values = iter([1, 2])
+
+    async def scenario() -> List[int]:
+        first = await cache.get("attendance", lambda db: next(values))
+        stale = await cache.get("attendance", lambda db: next(values))
+        await asyncio.sleep(0)
+        while cache._inflight:
+            await asyncio.sleep(0.01)
+        refreshed = cache._entries["attendance"].value
+        return [first, stale, refreshed]
+
+    assert asyncio.run(scenario()) == [1, 1, 2]
+    assert (cache.stats.stale_hits, cache.stats.refreshes) == (1, 1)
+
+
+def test_failed_computation_is_not_cached_and_invalidate_drops_entries() -> None:
+    cache = _cache(ttl=60, stale=0)
+
+    def fail(db: Any) -> int:
+        raise RuntimeError("database unavailable")
+
+    async def scenario() -> None:
+        try:
+            await cache.get(("enrollment", 6), fail)
+        except RuntimeError:
+            pass
+        assert await cache.get(("enrollment", 6), lambda db: 7) == 7
+        await cache.get(("revenue", 12), lambda db: 3)
+        cache.invalidate("enrollment")
+        assert cache.entries() == [("revenue", 12)]
+
+    asyncio.run(scenario())
+    assert cache.stats.errors == 1
@@ -0,0 +1,195 @@
+"""Tests for resumable (tus) uploads: offsets, checksums, interruptions, assembly and cleanup."""
+
+import asyncio
+import base64
+import hashlib
+import os
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.requests import ClientDisconnect
+
+import app.models  # noqa: F401  (registers every table)
+from app.api import materials
+from app.api.auth import get_current_user
+from app.core.config import settings
+from app.core.database import Base, get_db
+from app.models.models import Admin, Course, Material, OnlineCourse, OnlineLesson
+from app.models.upload_models import ResumableUpload
+from app.services import resumable_uploads
+from app.services.resumable_uploads import (
+    UploadLocked, UploadNotFound, cleanup_expired_uploads, create_upload, data_path, encode_metadata, get_upload,
+    write_chunk
+)
+
+TUS = {"Tus-Resumable": "1.0.0"}
+DATA = os.urandom(3000)
+
+
+@pytest.fixture()
+def db_session(tmp_path, monkeypatch) -> Generator[Session, None, None]:
+    monkeypatch.setattr(settings, "resumable_upload_dir", str(tmp_path / "resumable"))
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "use_cloudinary", False)
+    monkeypatch.setattr(resumable_uploads, "CHUNK_SIZE", 256)
+    engine = create_engine(
+        "sqlite:///:memory:", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+@pytest.fixture()
+def client(db_session: Session) -> TestClient:
+    admin = Admin(name="Ada", email="ada@school.org", password="x")
+    start = datetime(2026, 1, 5, 9)
+    course = Course(title="Algebra", start_time=start, end_time=start + timedelta(hours=2), price=10.0, admin_id=1)
+    db_session.add_all([admin, course])
+    db_session.commit()
+    online = OnlineCourse(course_id=course.course_id)
+    db_session.add(online)
+    db_session.commit()
+    db_session.add(OnlineLesson(online_course_id=online.online_course_id, title="Intro", lesson_order=1))
+    db_session.commit()
+
+    api = FastAPI()
+    api.include_router(materials.router, prefix="/api/v1")
+    api.dependency_overrides[get_db] = lambda: db_session
+    api.dependency_overrides[get_current_user] = lambda: {"user": admin, "user_type": "admin"}
+    return TestClient(api)
+
+
+def _create(client: TestClient, length: int = len(DATA), **metadata: str):
+    metadata = {"filename": "lecture.pdf", "target_id": "1", "title": "Lecture", "is_public": "true", **metadata}
+    return client.post("/api/v1/resumable-uploads",
+                       headers={**TUS, "Upload-Length": str(length), "Upload-Metadata": encode_metadata(metadata)})
+
+
+def _patch(client: TestClient, location: str, offset: int, body: bytes, checksum: str = None):
+    headers = {**TUS, "Upload-Offset": str(offset), "Content-Type": "application/offset+octet-stream"}
+    if checksum:
+        headers["Upload-Checksum"] = checksum
+    return client.patch(location, content=body, headers=headers)
+
+
+def _sha1(data: bytes) -> str:
+    return "sha1 " + base64.b64encode(hashlib.sha1(data).digest()).decode()
+
+
+def test_material_upload_in_verified_chunks(client: TestClient, db_session: Session) -> None:
+    created = _create(client)
+    assert created.status_code == 201 and created.headers["upload-offset"] == "0"
+    location = created.headers["location"]
+
+    first = _patch(client, location, 0, DATA[:1000], _sha1(DATA[:1000]))
+    assert first.status_code == 204 and first.headers["upload-offset"] == "1000"
+
+    # A corrupted chunk is discarded; one at the wrong offset is refused
+    assert _patch(client, location, 1000, DATA[1000:2000], _sha1(b"other")).status_code == 460
+    assert _patch(client, location, 500, DATA[500:2000]).status_code == 409
+    assert client.head(location, headers=TUS).headers["upload-offset"] == "1000"
+    assert _patch(client, location, 1000, DATA[1000:] + b"extra").status_code == 413
+
+    last = _patch(client, location, 1000, DATA[1000:], _sha1(DATA[1000:]))
+    assert last.status_code == 204 and last.headers["upload-offset"] == "3000"
+
+    material = db_session.query(Material).one()
+    assert (material.title, material.type, material.file_size, material.is_public) == ("Lecture", "pdf", 3000, True)
+    with open(os.path.join(settings.upload_dir, "materials", os.path.basename(material.url)), "rb") as f:
+        assert f.read() == DATA
+
+    status = client.get(location).json()
+    assert (status["status"], status["result_id"]) == ("completed", material.material_id)
+    assert status["result_url"] == material.url
+    assert not os.path.exists(data_path(status["upload_id"]))
+    assert _patch(client, location, 3000, b"").status_code == 409
+
+
+def test_lesson_video_upload_sets_the_video_url(client: TestClient, db_session: Session) -> None:
+    assert _create(client, purpose="lesson_video", filename="intro.pdf").status_code == 400
+    assert _create(client, purpose="lesson_video", target_id="9", filename="intro.mp4").status_code == 404
+
+    location = _create(client, purpose="lesson_video", filename="intro.mp4").headers["location"]
+    assert _patch(client, location, 0, DATA).status_code == 204
+
+    lesson = db_session.query(OnlineLesson).one()
+    assert lesson.video_url.startswith("/uploads/lesson_videos/") and lesson.video_url.endswith(".mp4")
+    assert db_session.query(Material).count() == 0
+
+
+def test_interrupted_chunk_keeps_what_arrived(client: TestClient, db_session: Session) -> None:
+    upload = create_upload(db_session, "material", 1, "admin:1", "lecture.pdf", len(DATA))
+
+    async def dropped(data: bytes):
+        yield data[:600]
+        yield data[600:700]
+        raise ClientDisconnect()
+
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(write_chunk(db_session, upload, 0, dropped(DATA)))
+    assert upload.upload_offset == 700
+
+    # With a checksum the partial chunk cannot be verified, so it is dropped
+    with pytest.raises(ClientDisconnect):
+        asyncio.run(write_chunk(db_session, upload, 700, dropped(DATA[700:]), ("sha1", b"")))
+    assert upload.upload_offset == 700 and os.path.getsize(data_path(upload.upload_id)) == 700
+
+    assert _patch(client, f"/api/v1/resumable-uploads/{upload.upload_id}", 700, DATA[700:]).status_code == 204
+    assert db_session.query(Material).one().file_size == len(DATA)
+
+
+def test_protocol_checks(client: TestClient, db_session: Session, monkeypatch) -> None:
+    options = client.options("/api/v1/resumable-uploads")
+    assert options.headers["tus-version"] == "1.0.0" and "checksum" in options.headers["tus-extension"]
+    assert options.headers["tus-checksum-algorithm"] == "md5,sha1,sha256"
+
+    assert client.post("/api/v1/resumable-uploads", headers={"Upload-Length": "10"}).status_code == 412
+    monkeypatch.setattr(settings, "resumable_upload_max_size", 100)
+    assert _create(client, length=101).status_code == 413
+
+    location = _create(client, length=10).headers["location"]
+    headers = {**TUS, "Upload-Offset": "0", "Content-Type": "application/octet-stream"}
+    assert client.patch(location, content=b"x" * 10, headers=headers).status_code == 415
+    assert _patch(client, location, 0, b"x", "crc32 AAAA").status_code == 400
+
+    upload_id = location.rsplit("/", 1)[1]
+    with pytest.raises(UploadNotFound):
+        get_upload(db_session, upload_id, "teacher:1")
+
+    # A chunk in progress holds the data file
+    holder = resumable_uploads._DataFile(data_path(upload_id))
+    assert _patch(client, location, 0, b"x" * 10).status_code == 423
+    with pytest.raises(UploadLocked):
+        resumable_uploads.terminate_upload(db_session, get_upload(db_session, upload_id, "admin:1"))
+    holder.close()
+
+    assert client.delete(location, headers=TUS).status_code == 204
+    assert client.head(location, headers=TUS).status_code == 404
+    assert not os.path.exists(data_path(upload_id))
+
+
+def test_cleanup_removes_expired_uploads(db_session: Session) -> None:
+    stale = create_upload(db_session, "material", 1, "admin:1", "old.pdf", 10)
+    fresh = create_upload(db_session, "material", 1, "admin:1", "new.pdf", 10)
+    stale_id = stale.upload_id
+
+    assert cleanup_expired_uploads(db_session, now=datetime.utcnow() + timedelta(hours=1)) == 0
+    stale.expires_at = datetime.utcnow() - timedelta(minutes=1)
+    db_session.commit()
+    with pytest.raises(UploadNotFound):
+        get_upload(db_session, stale_id, "admin:1")
+
+    assert cleanup_expired_uploads(db_session) == 1
+    assert [u.upload_id for u in db_session.query(ResumableUpload)] == [fresh.upload_id]
+    assert not os.path.exists(data_path(stale_id)) and os.path.exists(data_path(fresh.upload_id))
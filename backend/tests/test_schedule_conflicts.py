@@ -0,0 +1,132 @@
+"""Tests for schedule-conflict detection: the interval tree and the student/teacher checks."""
+
+import asyncio
+import random
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.api.courses import CourseCreate, update_course
+from app.core.database import Base
+from app.models.models import Course, Enrollment, Student, Teacher
+from app.services.schedule_conflicts import (
+    IntervalTree, check_schedule, overlapping_pairs, schedule_index, student_conflicts, teacher_conflicts
+)
+
+BASE = datetime(2026, 1, 5)
+
+
+def _at(hours: float) -> datetime:
+    return BASE + timedelta(hours=hours)
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    schedule_index.invalidate()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def test_interval_tree_matches_brute_force() -> None:
+    rng = random.Random(7)
+    intervals = []
+    for key in range(500):
+        start = rng.randint(0, 1000)
+        intervals.append((_at(start), _at(start + rng.choice([0, 1, 2, 5, 40, 300])), key))
+    tree = IntervalTree(intervals)
+    assert tree.size == sum(1 for start, end, _ in intervals if start < end)
+
+    for _ in range(300):
+        start = rng.randint(-50, 1100)
+        end = start + rng.randint(1, 60)
+        expected = {key for s, e, key in intervals if s < e and s < _at(end) and _at(start) < e}
+        assert sorted(tree.overlapping(_at(start), _at(end))) == sorted(expected)
+
+
+def test_overlapping_pairs_are_half_open() -> None:
+    pairs = overlapping_pairs([(_at(0), _at(2), 1), (_at(1), _at(3), 2), (_at(3), _at(4), 3), (_at(0), _at(9), 4)])
+    assert sorted(tuple(sorted(pair)) for pair in pairs) == [(1, 2), (1, 4), (2, 4), (3, 4)]
+
+
+def _course(db: Session, title: str, start: float, end: float, teachers=()) -> Course:
+    course = Course(title=title, start_time=_at(start), end_time=_at(end), price=10.0, admin_id=1,
+                    teachers=list(teachers))
+    db.add(course)
+    db.commit()
+    return course
+
+
+def test_student_and_teacher_conflicts(db_session: Session) -> None:
+    anna = Teacher(name="Anna", email="anna@school.org", password="x")
+    sam = Student(name="Sam", email="sam@example.com", password="x", parent_email="p@example.com", parent_phone="1")
+    db_session.add_all([anna, sam])
+    db_session.commit()
+
+    algebra = _course(db_session, "Algebra", 9, 11, [anna])
+    biology = _course(db_session, "Biology", 10, 12)
+    chemistry = _course(db_session, "Chemistry", 11, 13, [anna])
+    dropped = _course(db_session, "Drama", 9, 10)
+    db_session.add_all([
+        Enrollment(student_id=sam.student_id, course_id=algebra.course_id),
+        Enrollment(student_id=sam.student_id, course_id=dropped.course_id, status="dropped"),
+    ])
+    db_session.commit()
+
+    assert [c.title for c in student_conflicts(db_session, sam.student_id, _at(10), _at(12))] == ["Algebra"]
+    assert student_conflicts(db_session, sam.student_id, _at(11), _at(12)) == []
+    assert teacher_conflicts(db_session, [anna.teacher_id], _at(10.5), _at(11.5)) == {
+        anna.teacher_id: [algebra, chemistry]
+    }
+
+    # Moving a course is picked up by the in-process index
+    biology.start_time, biology.end_time = _at(8), _at(9.5)
+    db_session.add(Enrollment(student_id=sam.student_id, course_id=biology.course_id))
+    db_session.commit()
+    assert [c.title for c in student_conflicts(db_session, sam.student_id, _at(7), _at(8.5))] == ["Biology"]
+
+    results = check_schedule(db_session, [chemistry.course_id, dropped.course_id], student_id=sam.student_id)
+    by_title = {result["title"]: result for result in results}
+    assert not by_title["Chemistry"]["has_conflicts"]
+    assert [(c["title"], c["source"]) for c in by_title["Drama"]["conflicts"]] == [
+        ("Biology", "schedule"), ("Algebra", "schedule")
+    ]
+
+    own = check_schedule(db_session, [], student_id=sam.student_id)
+    assert [(r["title"], [c["title"] for c in r["conflicts"]]) for r in own] == [
+        ("Biology", ["Algebra"]), ("Algebra", ["Biology"])
+    ]
+
+
+def test_update_course_assigns_teacher_ids_and_checks_them(db_session: Session) -> None:
+    anna = Teacher(name="Anna", email="anna@school.org", password="x")
+    ben = Teacher(name="Ben", email="ben@school.org", password="x")
+    db_session.add_all([anna, ben])
+    db_session.commit()
+    _course(db_session, "Algebra", 9, 11, [anna])
+    biology = _course(db_session, "Biology", 10, 12)
+
+    def update(teacher_ids, allow_conflicts=False):
+        data = CourseCreate(title="Biology", start_time=_at(10), end_time=_at(12), price=10.0, teacher_ids=teacher_ids)
+        return asyncio.run(update_course(
+            biology.course_id, data, allow_conflicts=allow_conflicts, db=db_session, current_user={}
+        ))
+
+    assert update([ben.teacher_id]).teacher_ids == [ben.teacher_id]
+
+    with pytest.raises(HTTPException) as error:
+        update([anna.teacher_id, ben.teacher_id])
+    assert error.value.status_code == 409
+    assert error.value.detail["conflicts"][0]["teacher_id"] == anna.teacher_id
+
+    assert update([anna.teacher_id], allow_conflicts=True).teacher_ids == [anna.teacher_id]
@@ -0,0 +1,183 @@
+"""Tests for SMTPConnectionPool reuse and batching against a local aiosmtpd server."""
+
+import asyncio
+import socket
+from collections.abc import Generator
+from typing import Any
+
+import pytest
+
+pytest.importorskip("aiosmtpd")
+from aiosmtpd.controller import Controller
+
+from app.services.email_dedup import DedupIndex
+from app.services.email_service import EmailService
+from app.services.rate_limiter import RateLimitExceeded, TokenBucketRateLimiter
+from app.services.smtp_pool import SMTPConnectionPool
+
+
+class RecordingHandler:
+    """Collects envelopes delivered to the stand-in server."""
+
+    def __init__(self) -> None:
+        self.envelopes: list[Any] = []
+
+    async def handle_DATA(self, server: Any, session: Any, envelope: Any) -> str:
+        self.envelopes.append(envelope)
+        return "250 OK"
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture()
+def smtp_server() -> Generator[tuple[RecordingHandler, int], None, None]:
+    handler = RecordingHandler()
+    port = _free_port()
+    controller = Controller(handler, hostname="127.0.0.1", port=port)
+    controller.start()
+    try:
+        yield handler, port
+    finally:
+        controller.stop()
+
+
+def _pool(port: int, **kwargs: Any) -> SMTPConnectionPool:
+    return SMTPConnectionPool(hostname="127.0.0.1", port=port, start_tls=False, **kwargs)
+
+
+def test_sequential_sends_reuse_one_connection(smtp_server: tuple[RecordingHandler, int]) -> None:
+    handler, port = smtp_server
+    pool = _pool(port, max_connections=2)
+    service = EmailService(pool=pool, dedup=DedupIndex())
+    service.sender = "noreply@example.com"
+
+    async def run() -> list[bool]:
+        results = [
+            await service._send_email(f"student{i}@example.com", "Hello", "<p>Hi</p>")
+            for i in range(5)
+        ]
+        await pool.close()
+        return results
+
+    assert all(asyncio.run(run()))
+    assert len(handler.envelopes) == 5
+    assert pool.stats.connections_opened == 1
+
+
+def test_bulk_send_batches_recipients_within_pool_bound(smtp_server: tuple[RecordingHandler, int]) -> None:
+    handler, port = smtp_server
+    pool = _pool(port, max_connections=3, max_recipients_per_message=40)
+    service = EmailService(pool=pool, dedup=DedupIndex())
+    service.sender = "noreply@example.com"
+    recipients = [f"student{i}@example.com" for i in range(500)]
+
+    async def run() -> bool:
+        result = await service.send_assignment_notification(
+            recipients, "Essay", "English", "2025-01-01", "http://localhost/course"
+        )
+        await pool.close()
+        return result
+
+    assert asyncio.run(run())
+    delivered = [rcpt for envelope in handler.envelopes for rcpt in envelope.rcpt_tos]
+    assert sorted(delivered) == sorted(recipients)
+    assert len(handler.envelopes) == 13
+    assert pool.stats.connections_opened <= 3
+
+
+def test_connection_is_recycled_after_message_limit(smtp_server: tuple[RecordingHandler, int]) -> None:
+    _, port = smtp_server
+    pool = _pool(port, max_connections=1, max_messages_per_connection=2)
+    service = EmailService(pool=pool, dedup=DedupIndex())
+    service.sender = "noreply@example.com"
+
+    async def run() -> None:
+        for i in range(5):
+            await service._send_email(f"student{i}@example.com", "Hello", "<p>Hi</p>")
+        await pool.close()
+
+    asyncio.run(run())
+    assert pool.stats.connections_opened == 3
+    assert pool.stats.connections_closed == 3
+
+
+def test_identical_email_is_suppressed_within_ttl(smtp_server: tuple[RecordingHandler, int]) -> None:
+    handler, port = smtp_server
+    pool = _pool(port)
+    dedup = DedupIndex()
+    service = EmailService(pool=pool, dedup=dedup)
+    service.sender = "noreply@example.com"
+
+    async def run() -> list[bool]:
+        results = [
+            await service._send_email("student@example.com", "Grade Posted: Essay", "<p>A</p>")
+            for _ in range(3)
+        ]
+        await pool.close()
+        return results
+
+    assert all(asyncio.run(run()))
+    assert len(handler.envelopes) == 1
+    assert dedup.stats() == {"checked": 3, "suppressed": 2, "duplicate_rate": 0.6667}
+
+
+def test_dedup_hash_uses_the_email_type_not_the_subject(smtp_server: tuple[RecordingHandler, int]) -> None:
+    handler, port = smtp_server
+    pool = _pool(port)
+    service = EmailService(pool=pool, dedup=DedupIndex())
+    service.sender = "noreply@example.com"
+
+    async def run() -> list[bool]:
+        results = [
+            await service._send_email("student@example.com", subject, "<p>A</p>", email_type=email_type)
+            for subject, email_type in (("Hello", "welcome"), ("Hi again", "welcome"), ("Hello", "grade"))
+        ]
+        await pool.close()
+        return results
+
+    assert all(asyncio.run(run()))
+    # Same type and body is a duplicate whatever the subject; another type is not
+    assert len(handler.envelopes) == 2
+
+
+def test_rate_limiter_is_charged_per_recipient(smtp_server: tuple[RecordingHandler, int]) -> None:
+    handler, port = smtp_server
+    limiter = TokenBucketRateLimiter("test", rate=1000.0, capacity=50)
+    pool = _pool(port, max_recipients_per_message=40, rate_limiter=limiter)
+    message = EmailService(pool=pool, dedup=DedupIndex())._build_message("Hello", "<p>Hi</p>")
+    message.replace_header("From", "noreply@example.com")
+
+    async def run() -> None:
+        await pool.send_bulk(message, [f"student{i}@example.com" for i in range(100)])
+        await pool.close()
+
+    asyncio.run(run())
+    assert len(handler.envelopes) == 3
+    assert limiter.stats.acquired == 3
+    assert limiter.stats.waited >= 1
+
+
+def test_password_resets_use_the_interactive_lane(smtp_server: tuple[RecordingHandler, int]) -> None:
+    handler, port = smtp_server
+    bulk = TokenBucketRateLimiter("bulk", rate=1.0, capacity=1)
+    interactive = TokenBucketRateLimiter("interactive", rate=1.0, capacity=1)
+    bulk.reserve(600)  # A report run ten minutes deep
+    pool = _pool(port, rate_limiter=bulk, interactive_rate_limiter=interactive)
+    service = EmailService(pool=pool, dedup=DedupIndex())
+    service.sender = "noreply@example.com"
+
+    async def run() -> bool:
+        sent = await service.deliver("a@example.com", "Reset", "<p>token</p>",
+                                     email_type="password_reset", max_wait=2.0)
+        with pytest.raises(RateLimitExceeded):
+            await service.deliver("a@example.com", "Graded", "<p>A</p>", email_type="grade", max_wait=2.0)
+        await pool.close()
+        return sent
+
+    assert asyncio.run(run())
+    assert len(handler.envelopes) == 1
+    assert (bulk.stats.refused, interactive.stats.acquired) == (1, 1)
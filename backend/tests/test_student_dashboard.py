@@ -0,0 +1,150 @@
+"""Tests for the student dashboard: section contents, query counts and the per-student cache."""
+
+import asyncio
+from collections.abc import Generator
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models.models import (
+    Assignment, AssignmentSubmission, Attendance, Course, Enrollment, Material, Student, Teacher
+)
+from app.models.notification_models import Notification, NotificationType
+from app.services.student_dashboard import StudentDashboard, assignments_with_status
+
+
+@pytest.fixture()
+def session_factory(tmp_path) -> Generator[sessionmaker, None, None]:
+    # A file database: the sections run concurrently on their own connections
+    engine = create_engine(f"sqlite:///{tmp_path / 'dashboard.db'}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    try:
+        yield sessionmaker(bind=engine)
+    finally:
+        engine.dispose()
+
+
+def _assignment(course_id: int, title: str, due_date: datetime) -> Assignment:
+    return Assignment(course_id=course_id, title=title, description="", due_date=due_date, created_by_id=1)
+
+
+def _seed(db: Session) -> int:
+    now = datetime.now()
+    anna = Teacher(name="Anna", email="anna@school.org", password="x")
+    sam = Student(name="Sam", email="sam@example.com", password="x", parent_email="p@example.com", parent_phone="1")
+    algebra = Course(title="Algebra", start_time=now, end_time=now + timedelta(hours=2), price=100.0,
+                     admin_id=1, teachers=[anna])
+    drama = Course(title="Drama", start_time=now - timedelta(hours=3), end_time=now - timedelta(hours=2), price=50.0,
+                   admin_id=1)
+    db.add_all([anna, sam, algebra, drama])
+    db.commit()
+
+    db.add_all([
+        Enrollment(student_id=sam.student_id, course_id=algebra.course_id),
+        Enrollment(student_id=sam.student_id, course_id=drama.course_id, status="dropped"),
+        _assignment(algebra.course_id, "Homework 1", now - timedelta(days=2)),
+        _assignment(algebra.course_id, "Homework 2", now - timedelta(days=1)),
+        _assignment(algebra.course_id, "Homework 3", now + timedelta(days=3)),
+        _assignment(algebra.course_id, "Homework 4", now + timedelta(days=60)),
+        _assignment(drama.course_id, "Monologue", now + timedelta(days=1)),
+        Material(course_id=algebra.course_id, title="Notes", type="pdf", url="/n.pdf", is_public=True),
+        Material(course_id=drama.course_id, title="Script", type="pdf", url="/s.pdf", is_public=True),
+        Attendance(student_id=sam.student_id, course_id=algebra.course_id, attendance_date=now, status="present"),
+        Attendance(student_id=sam.student_id, course_id=algebra.course_id, attendance_date=now, status="present"),
+        Attendance(student_id=sam.student_id, course_id=algebra.course_id, attendance_date=now, status="late"),
+        Notification(user_id=sam.student_id, user_type="student", title="Hi", message="Welcome",
+                     notification_type=NotificationType.COURSE_UPDATE),
+    ])
+    db.commit()
+    first = db.query(Assignment).filter(Assignment.title == "Homework 1").one()
+    db.add(AssignmentSubmission(assignment_id=first.assignment_id, student_id=sam.student_id, grade=9.0))
+    db.commit()
+    return sam.student_id
+
+
+def test_dashboard_sections(session_factory: sessionmaker) -> None:
+    with session_factory() as db:
+        student_id = _seed(db)
+    dashboard = StudentDashboard(cache_seconds=60, session_factory=session_factory, max_workers=3)
+
+    payload = asyncio.run(dashboard.get(student_id))
+    assert [e["course"]["title"] for e in payload["enrollments"]] == ["Drama", "Algebra"]
+    assert payload["enrollments"][1]["course"]["teacher_name"] == "Anna"
+    # Dropped courses are left out of everything else
+    assert [(a["title"], a["submission_status"], a["grade"]) for a in payload["assignments"]] == [
+        ("Homework 4", "pending", None),
+        ("Homework 3", "pending", None),
+        ("Homework 2", "overdue", None),
+        ("Homework 1", "submitted", 9.0),
+    ]
+    assert [a["title"] for a in payload["upcoming_assignments"]] == ["Homework 3"]
+    assert [m["title"] for m in payload["recent_materials"]] == ["Notes"]
+    assert payload["attendance"] == {
+        "total_classes": 3, "present_count": 2, "absent_count": 0, "late_count": 1, "excused_count": 0,
+        "attendance_percentage": 66.67,
+    }
+    assert payload["unread_notifications"] == 1
+
+
+def test_dashboard_is_cached_per_student(session_factory: sessionmaker) -> None:
+    with session_factory() as db:
+        student_id = _seed(db)
+    dashboard = StudentDashboard(cache_seconds=60, session_factory=session_factory, max_workers=3)
+
+    async def load_twice():
+        first = await dashboard.get(student_id)
+        with session_factory() as db:
+            homework = db.query(Assignment).filter(Assignment.title == "Homework 3").one()
+            db.add(AssignmentSubmission(assignment_id=homework.assignment_id, student_id=student_id))
+            db.commit()
+        return first, await dashboard.get(student_id)
+
+    first, second = asyncio.run(load_twice())
+    assert second is first and dashboard.cache.stats.hits == 1
+
+    dashboard.invalidate(student_id)
+    assert asyncio.run(dashboard.get(student_id))["upcoming_assignments"] == []
+
+
+def test_concurrent_misses_do_not_exhaust_the_connection_pool(tmp_path) -> None:
+    engine = create_engine(f"sqlite:///{tmp_path / 'small.db'}", connect_args={"check_same_thread": False},
+                           pool_size=2, max_overflow=0, pool_timeout=3)
+    Base.metadata.create_all(bind=engine)
+    factory = sessionmaker(bind=engine)
+    with factory() as db:
+        first = _seed(db)
+        second = Student(name="Kim", email="kim@example.com", password="x", parent_email="k@example.com",
+                         parent_phone="2")
+        db.add(second)
+        db.commit()
+        second_id = second.student_id
+    dashboard = StudentDashboard(cache_seconds=60, session_factory=factory, max_workers=2)
+
+    async def load_both():
+        return await asyncio.gather(dashboard.get(first), dashboard.get(second_id))
+
+    try:
+        payloads = asyncio.run(load_both())
+    finally:
+        engine.dispose()
+    assert [p["student_id"] for p in payloads] == [first, second_id]
+    assert payloads[1]["enrollments"] == []
+
+
+def test_assignment_status_uses_a_fixed_number_of_queries(session_factory: sessionmaker) -> None:
+    with session_factory() as db:
+        student_id = _seed(db)
+        course_id = db.query(Course.course_id).filter(Course.title == "Algebra").scalar()
+        db.add_all([
+            _assignment(course_id, f"Extra {i}", datetime.now()) for i in range(20)
+        ])
+        db.commit()
+
+        statements = []
+        event.listen(db.get_bind(), "before_cursor_execute", lambda *args: statements.append(args[2]))
+        assert len(assignments_with_status(db, student_id, [course_id])) == 24
+        assert len(statements) == 2
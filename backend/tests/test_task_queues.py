@@ -0,0 +1,61 @@
+"""Tests for Celery queue routing, per-queue concurrency and wait metrics."""
+
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.celery_app import celery_app
+from app.services.task_queues import (
+    QueueMetrics, apply_queue_concurrency, parse_queue_concurrency, record_queue_wait, stamp_published_at
+)
+
+
+@pytest.mark.parametrize("task, queue", [
+    ("send_password_reset_email_task", "interactive"),
+    ("process_interactive_email_outbox", "interactive"),
+    ("process_email_outbox", "notifications"),
+    ("send_grade_notification_task", "notifications"),
+    ("create_notifications_chunk", "notifications"),
+    ("send_monthly_report_chunk", "bulk-reports"),
+    ("send_notification_digest_chunk", "bulk-reports"),
+    ("cleanup_expired_reset_tokens", "maintenance"),
+])
+def test_tasks_are_routed_to_their_queue(task: str, queue: str) -> None:
+    route = celery_app.amqp.router.route({}, f"app.services.celery_app.{task}")
+    assert route["queue"].name == queue
+
+
+def test_worker_concurrency_follows_its_queues() -> None:
+    assert parse_queue_concurrency("interactive=4, bulk-reports=2,bad,x=y") == {"interactive": 4, "bulk-reports": 2}
+
+    conf = SimpleNamespace(worker_concurrency=None)
+    apply_queue_concurrency(conf=conf, options={"queues": ["interactive", "maintenance"], "concurrency": None})
+    assert conf.worker_concurrency == 5
+
+    # An explicit -c wins
+    conf = SimpleNamespace(worker_concurrency=None)
+    apply_queue_concurrency(conf=conf, options={"queues": ["interactive"], "concurrency": 8})
+    assert conf.worker_concurrency is None
+
+
+def test_wait_is_measured_from_publish_to_start(monkeypatch: pytest.MonkeyPatch) -> None:
+    metrics = QueueMetrics()
+    monkeypatch.setattr("app.services.task_queues.queue_metrics", metrics)
+
+    headers: dict = {}
+    stamp_published_at(headers=headers)
+    headers["published_at"] -= 2.0
+    request = SimpleNamespace(is_eager=False, published_at=headers["published_at"],
+                              delivery_info={"routing_key": "bulk-reports"})
+    record_queue_wait(task=SimpleNamespace(request=request))
+    for seconds in (0.1, 0.2, 0.3):
+        metrics.record_wait("interactive", seconds)
+
+    snapshot = metrics.snapshot()
+    assert snapshot["bulk-reports"]["wait_max_seconds"] == pytest.approx(2.0, abs=0.5)
+    assert snapshot["interactive"]["started"] == 3
+    assert snapshot["interactive"]["wait_p50_seconds"] == 0.2
+    assert snapshot["maintenance"]["wait_samples"] == 0
+    assert snapshot["maintenance"]["depth"] is None
+    assert headers["published_at"] < time.time()
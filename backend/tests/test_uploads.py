@@ -0,0 +1,97 @@
+"""Tests for streaming uploads: spooling, storage backends and the request size limit."""
+
+import asyncio
+import hashlib
+import io
+import os
+import threading
+
+import pytest
+from fastapi import FastAPI, File, UploadFile
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.services import uploads
+from app.services.uploads import UploadSizeLimitMiddleware, UploadTooLarge, spool_upload, store_upload
+
+
+@pytest.fixture()
+def storage_dirs(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "upload_spool_dir", str(tmp_path / "spool"))
+    monkeypatch.setattr(settings, "upload_dir", str(tmp_path / "uploads"))
+    monkeypatch.setattr(settings, "use_cloudinary", False)
+    return tmp_path
+
+
+def _upload(data: bytes, filename: str = "notes.pdf") -> UploadFile:
+    return UploadFile(file=io.BytesIO(data), filename=filename)
+
+
+def test_spool_hashes_and_enforces_the_limit(storage_dirs, monkeypatch) -> None:
+    monkeypatch.setattr(uploads, "CHUNK_SIZE", 1000)
+    data = os.urandom(4500)
+
+    spooled = asyncio.run(spool_upload(_upload(data), max_bytes=5000))
+    assert (spooled.size, spooled.extension) == (4500, ".pdf")
+    assert spooled.sha256 == hashlib.sha256(data).hexdigest()
+    with open(spooled.path, "rb") as f:
+        assert f.read() == data
+    spooled.cleanup()
+
+    with pytest.raises(UploadTooLarge):
+        asyncio.run(spool_upload(_upload(data), max_bytes=4000))
+    assert os.listdir(storage_dirs / "spool") == []
+
+
+def test_local_storage_moves_the_spooled_file(storage_dirs) -> None:
+    spooled = asyncio.run(spool_upload(_upload(b"hello")))
+    stored = asyncio.run(store_upload(spooled, folder="course_materials", local_folder="materials"))
+
+    assert stored.storage == "local" and stored.url.startswith("/uploads/materials/") and stored.url.endswith(".pdf")
+    with open(storage_dirs / "uploads" / "materials" / os.path.basename(stored.url), "rb") as f:
+        assert f.read() == b"hello"
+    assert not os.path.exists(spooled.path)
+
+
+def test_cloudinary_upload_runs_off_the_event_loop(storage_dirs, monkeypatch) -> None:
+    calls = []
+
+    def fake_upload_file(file_content, folder, public_id, resource_type, chunk_size):
+        calls.append((threading.current_thread() is threading.main_thread(), len(file_content.read()), chunk_size))
+        return {"secure_url": f"https://cdn.example.com/{folder}/{public_id}", "public_id": public_id}
+
+    monkeypatch.setattr(settings, "use_cloudinary", True)
+    monkeypatch.setattr(uploads, "upload_file", fake_upload_file)
+    monkeypatch.setattr(uploads, "CLOUDINARY_PART_SIZE", 10)
+
+    for data in (b"short", b"x" * 25):
+        spooled = asyncio.run(spool_upload(_upload(data)))
+        stored = asyncio.run(store_upload(spooled, folder="assignment_submissions", local_folder="submissions"))
+        assert stored.storage == "cloudinary" and stored.url.startswith("https://cdn.example.com/")
+        assert not os.path.exists(spooled.path)
+    # Large files go up in parts
+    assert calls == [(False, 5, None), (False, 25, 10)]
+
+
+def test_middleware_rejects_oversized_multipart_bodies() -> None:
+    api = FastAPI()
+
+    @api.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        return {"size": len(await file.read())}
+
+    api.add_middleware(UploadSizeLimitMiddleware, max_body_bytes=2048)
+    client = TestClient(api)
+
+    assert client.post("/upload", files={"file": ("a.txt", b"x" * 100)}).json() == {"size": 100}
+    assert client.post("/upload", files={"file": ("a.txt", b"x" * 4096)}).status_code == 413
+
+    # Without a Content-Length, the body is counted as it streams in
+    def body():
+        yield b"--b\r\nContent-Disposition: form-data; name=\"file\"; filename=\"a.txt\"\r\n\r\n"
+        for _ in range(8):
+            yield b"x" * 1024
+        yield b"\r\n--b--\r\n"
+
+    response = client.post("/upload", content=body(), headers={"content-type": "multipart/form-data; boundary=b"})
+    assert response.status_code == 413
@@ -0,0 +1,125 @@
+"""Tests for the user directory and its ranked, cursor-paged search."""
+
+import subprocess
+import sys
+from collections.abc import Generator
+from pathlib import Path
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+import app.models  # noqa: F401  (registers every table)
+from app.core.database import Base
+from app.models import Parent, Student, Teacher, UserDirectoryEntry
+from app.services.user_search import (
+    InvalidCursor, build_search_text, match_score, normalize_query, search_users, user_search_index
+)
+
+
+@pytest.fixture()
+def db_session() -> Generator[Session, None, None]:
+    engine = create_engine("sqlite:///:memory:", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    user_search_index.invalidate()
+    try:
+        yield session
+    finally:
+        session.close()
+        engine.dispose()
+
+
+def _seed(db: Session) -> None:
+    db.add_all([
+        Student(name="John Smith", email="john.smith@example.com", password="x", phone="(555) 010-2000",
+                parent_email="p@example.com", parent_phone="1"),
+        Student(name="Johnny Appleseed", email="apple@example.com", password="x",
+                parent_email="p@example.com", parent_phone="1"),
+        Teacher(name="Anna Smithers", email="anna@school.org", password="x"),
+        Parent(name="Mary Jones", email="mary@example.com", phone="555-777-1234"),
+    ])
+    db.commit()
+
+
+def test_search_text_and_scores() -> None:
+    text = build_search_text("John Smith", "John.Smith@Example.com", "+1 (555) 010")
+    assert text == "john smith john.smith@example.com example com 1555010"
+    assert normalize_query(" (555) 777-1234 ") == "5557771234"
+
+    assert match_score("john.smith@example.com", text) >= 3
+    assert 2 <= match_score("smi", text) < 3
+    assert match_score("smiht", text) is not None  # Transposed letters still match
+    assert match_score("xyz", text) is None
+
+
+def test_search_ranks_across_user_types(db_session: Session) -> None:
+    _seed(db_session)
+
+    items, _ = search_users(db_session, "smith")
+    assert [(item["user_type"], item["name"]) for item in items] == [
+        ("student", "John Smith"), ("teacher", "Anna Smithers")
+    ]
+
+    items, _ = search_users(db_session, "555 777 1234")
+    assert [item["name"] for item in items] == ["Mary Jones"]
+
+    items, _ = search_users(db_session, "john", user_type="student")
+    assert {item["name"] for item in items} == {"John Smith", "Johnny Appleseed"}
+
+
+def test_directory_follows_writes_and_pages_with_a_cursor(db_session: Session) -> None:
+    _seed(db_session)
+    assert db_session.query(UserDirectoryEntry).count() == 4
+    search_users(db_session, "john")  # Loads the in-process index
+
+    teacher = db_session.query(Teacher).one()
+    teacher.name = "Anna Johnson"
+    db_session.add(Student(name="Jon Johns", email="jj@example.com", password="x",
+                           parent_email="p@example.com", parent_phone="1"))
+    db_session.commit()
+
+    pages, cursor = [], None
+    while True:
+        items, cursor = search_users(db_session, "john", limit=2, cursor=cursor)
+        pages.append([item["name"] for item in items])
+        if cursor is None:
+            break
+    names = [name for page in pages for name in page]
+    assert len(pages) == 2 and len(names) == len(set(names))
+    assert set(names) == {"John Smith", "Johnny Appleseed", "Anna Johnson", "Jon Johns"}
+
+    db_session.delete(db_session.query(Parent).one())
+    db_session.commit()
+    assert search_users(db_session, "mary")[0] == []
+
+    with pytest.raises(InvalidCursor):
+        search_users(db_session, "john", cursor="bad")
+
+
+SCRIPT = """
+import sys
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # what a worker or script loads; the admin API is never imported
+from app.core.database import Base
+from app.models import Student, UserDirectoryEntry
+
+assert "app.api.admin" not in sys.modules
+engine = create_engine("sqlite:///:memory:")
+Base.metadata.create_all(bind=engine)
+db = sessionmaker(bind=engine)()
+db.add(Student(name="Ann", email="ann@example.com", password="x", parent_email="p@example.com", parent_phone="1"))
+db.commit()
+print(db.query(UserDirectoryEntry.search_text).scalar())
+"""
+
+
+def test_users_written_outside_the_api_reach_the_directory() -> None:
+    # A fresh interpreter: this one has already imported every module
+    result = subprocess.run(
+        [sys.executable, "-c", SCRIPT],
+        cwd=Path(__file__).resolve().parents[1], capture_output=True, text=True, check=True,
+    )
+    assert "ann@example.com" in result.stdout.strip().splitlines()[-1]
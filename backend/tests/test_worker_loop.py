@@ -0,0 +1,34 @@
+"""Tests for the per-process worker event loop used by Celery tasks."""
+
+import asyncio
+
+from app.services.worker_loop import WorkerEventLoop
+
+
+def test_coroutines_share_one_long_lived_loop() -> None:
+    worker_loop = WorkerEventLoop()
+
+    async def current_loop() -> asyncio.AbstractEventLoop:
+        return asyncio.get_running_loop()
+
+    try:
+        first = worker_loop.run(current_loop(), timeout=5)
+        second = worker_loop.run(current_loop(), timeout=5)
+        assert first is second
+        assert worker_loop.is_running
+    finally:
+        worker_loop.stop()
+
+    assert not worker_loop.is_running
+
+
+def test_stop_runs_cleanup_on_the_worker_loop() -> None:
+    worker_loop = WorkerEventLoop()
+    cleaned: list[bool] = []
+
+    async def cleanup() -> None:
+        cleaned.append(True)
+
+    worker_loop.start()
+    worker_loop.stop(cleanup=cleanup())
+    assert cleaned == [True]
@@ -20,9 +20,11 @@ start "Backend API" cmd /k "cd backend && C:\Users\tubul\OneDrive\Documents\Prim
 
 timeout /t 2 /nobreak
 
-REM Start Celery Worker
-echo Starting Celery Worker...
-start "Celery Worker" cmd /k "cd backend && C:\Users\tubul\OneDrive\Documents\Primis\.venv\Scripts\celery.exe -A app.services.celery_app worker --loglevel=info"
+REM Start Celery Workers (one per queue, so bulk runs never delay interactive emails)
+echo Starting Celery Workers...
+for %%q in (interactive notifications bulk-reports maintenance) do (
+    start "Celery Worker %%q" cmd /k "cd backend && C:\Users\tubul\OneDrive\Documents\Primis\.venv\Scripts\celery.exe -A app.services.celery_app worker -Q %%q -n %%q@%%h --loglevel=info"
+)
 
 timeout /t 2 /nobreak
 
@@ -32,9 +32,11 @@ Write-Host "1. Starting Backend API on http://localhost:8000..." -ForegroundColo
 Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$backendPath'; & '$venvPath\python.exe' -m uvicorn app.main:app --reload --port 8000" -WindowStyle Normal
 Start-Sleep -Seconds 2
 
-# Start Celery Worker
-Write-Host "2. Starting Celery Worker..." -ForegroundColor Green
-Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$backendPath'; & '$venvPath\celery.exe' -A app.services.celery_app worker --loglevel=info" -WindowStyle Normal
+# Start Celery Workers (one per queue, so bulk runs never delay interactive emails)
+Write-Host "2. Starting Celery Workers..." -ForegroundColor Green
+foreach ($queue in @("interactive", "notifications", "bulk-reports", "maintenance")) {
+    Start-Process powershell -ArgumentList "-NoExit", "-Command", "cd '$backendPath'; & '$venvPath\celery.exe' -A app.services.celery_app worker -Q $queue -n $queue@%h --loglevel=info" -WindowStyle Normal
+}
 Start-Sleep -Seconds 2
 
 # Start Celery Beat